@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 工作日日历：法定节假日与调休上班日从内置数据和 JSON / ICS 文件加载，按年存成位图，
+# 判断某天是否推送是 O(1) 的位运算，“下一个推送日”“两天之间有几个工作日”靠每年一份前缀和，不逐天循环。
+#
+# 用法：
+#   python bizvocab_calendar.py check [--date 2025-10-09]          # 是否工作日、下一个工作日、数据覆盖的年份
+#   python bizvocab_calendar.py next [--from 2025-09-26] [--count 10]
+#   python bizvocab_calendar.py between 2025-01-01 2026-01-01      # [开始, 结束) 内的工作日数
+#   python bizvocab_calendar.py bench
+#
+# 额外的日历文件用环境变量 WORKDAY_CALENDAR 指定（逗号分隔，按顺序覆盖内置数据）：
+#   JSON  {"holidays": ["2027-01-01", "2027-02-06/2027-02-14"], "workdays": ["2027-02-20"]}
+#         日期区间用 “开始/结束” 表示，两端都包含
+#   ICS   全天事件（DTSTART;VALUE=DATE，DTEND 不含），SUMMARY 含“班”的算调休上班，其余算放假
+# 没有数据的年份只按周一到周五算工作日；文件改动后最多 RELOAD_INTERVAL 秒内生效，无需重启。
+#
+# 每年的数据：
+#   bits     366 位的位图（46 字节），第 i 位为 1 表示 1 月 1 日之后第 i 天是工作日
+#   prefix   长度 天数+1 的前缀和，prefix[i] = 当年前 i 天的工作日数
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+CALENDAR_FILES = [p.strip() for p in os.getenv("WORKDAY_CALENDAR", "").split(",") if p.strip()]
+RELOAD_INTERVAL = 60  # 秒，检查日历文件是否有改动的间隔
+
+# 国务院办公厅公布的放假安排：holidays 放假（含周末），workdays 调休上班的周末
+BUILTIN = {
+    "holidays": [
+        "2025-01-01",                 # 元旦
+        "2025-01-28/2025-02-04",      # 春节
+        "2025-04-04/2025-04-06",      # 清明
+        "2025-05-01/2025-05-05",      # 劳动节
+        "2025-05-31/2025-06-02",      # 端午
+        "2025-10-01/2025-10-08",      # 国庆、中秋
+        "2026-01-01/2026-01-03",      # 元旦
+        "2026-02-15/2026-02-23",      # 春节
+        "2026-04-04/2026-04-06",      # 清明
+        "2026-05-01/2026-05-05",      # 劳动节
+        "2026-06-19/2026-06-21",      # 端午
+        "2026-09-25/2026-09-27",      # 中秋
+        "2026-10-01/2026-10-07",      # 国庆
+    ],
+    "workdays": [
+        "2025-01-26", "2025-02-08", "2025-04-27", "2025-09-28", "2025-10-11",
+        "2026-01-04", "2026-02-14", "2026-02-28", "2026-05-09", "2026-09-20", "2026-10-10",
+    ],
+}
+
+ICS_WORK_MARK = "班"  # “补班”“上班”“调休上班”
+DATE_RE = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})")
+
+# ---------- 数据源 ----------
+def parse_date(text):
+    """接受 2025-10-01 和 ICS 的 20251001 / 20251001T000000 写法"""
+    m = DATE_RE.match(text.strip())
+    if not m:
+        raise ValueError(f"无法识别的日期：{text}")
+    return datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+
+def expand(items):
+    """“开始/结束” 区间展开成日期（两端都包含）"""
+    for item in items:
+        start, _, end = str(item).partition("/")
+        first = parse_date(start)
+        last = parse_date(end) if end else first
+        for ordinal in range(first.toordinal(), last.toordinal() + 1):
+            yield datetime.date.fromordinal(ordinal)
+
+def from_mapping(data):
+    """返回 (放假日期列表, 调休上班日期列表)"""
+    return list(expand(data.get("holidays", []))), list(expand(data.get("workdays", [])))
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return from_mapping(json.load(f))
+
+def ics_events(path):
+    """逐个返回 VEVENT 的 {属性名: 值}；处理续行（以空格或制表符开头的行接在上一行后面）"""
+    with open(path, encoding="utf-8-sig") as f:
+        lines = []
+        for raw in f:
+            raw = raw.rstrip("\r\n")
+            if raw[:1] in (" ", "\t") and lines:
+                lines[-1] += raw[1:]
+            else:
+                lines.append(raw)
+    event = None
+    for line in lines:
+        if line == "BEGIN:VEVENT":
+            event = {}
+        elif line == "END:VEVENT":
+            if event is not None:
+                yield event
+            event = None
+        elif event is not None and ":" in line:
+            key, value = line.split(":", 1)
+            event[key.split(";", 1)[0].upper()] = value
+
+def load_ics(path):
+    holidays, workdays = [], []
+    for event in ics_events(path):
+        if "DTSTART" not in event:
+            continue
+        first = parse_date(event["DTSTART"])
+        # DTEND 是不含的结束日；没有 DTEND 时只占一天
+        end = parse_date(event["DTEND"]).toordinal() if "DTEND" in event else first.toordinal() + 1
+        days = [datetime.date.fromordinal(o) for o in range(first.toordinal(), max(end, first.toordinal() + 1))]
+        (workdays if ICS_WORK_MARK in event.get("SUMMARY", "") else holidays).extend(days)
+    return holidays, workdays
+
+def load_file(path):
+    return load_ics(path) if path.lower().endswith(".ics") else load_json(path)
+
+# ---------- 日历 ----------
+class WorkdayCalendar:
+    def __init__(self, sources=()):
+        """sources 为 (放假日期, 调休上班日期) 的序列，后面的覆盖前面的"""
+        self.overrides = {}  # date -> True 上班 / False 放假
+        for holidays, workdays in sources:
+            for day in holidays:
+                self.overrides[day] = False
+            for day in workdays:
+                self.overrides[day] = True
+        self.data_years = sorted({day.year for day in self.overrides})
+        self._years = {}  # year -> (1 月 1 日的 ordinal, 位图 bytes, 前缀和 ndarray)
+        self._lock = threading.Lock()
+
+    def _year(self, year):
+        entry = self._years.get(year)
+        if entry is None:
+            with self._lock:
+                entry = self._years.get(year) or self._build(year)
+                self._years[year] = entry
+        return entry
+
+    def _build(self, year):
+        jan1 = datetime.date(year, 1, 1).toordinal()
+        days = datetime.date(year, 12, 31).toordinal() - jan1 + 1
+        ordinals = np.arange(jan1, jan1 + days)
+        mask = (ordinals + 6) % 7 < 5  # ordinal 1（公元 1 年 1 月 1 日）是周一
+        for day, work in self.overrides.items():
+            if day.year == year:
+                mask[day.toordinal() - jan1] = work
+        prefix = np.zeros(days + 1, dtype=np.int32)
+        np.cumsum(mask, out=prefix[1:])
+        return jan1, np.packbits(mask).tobytes(), prefix
+
+    def is_workday(self, day):
+        jan1, bits, _ = self._year(day.year)
+        i = day.toordinal() - jan1
+        return bool(bits[i >> 3] >> (7 - (i & 7)) & 1)
+
+    def workdays_between(self, start, end):
+        """[start, end) 内的工作日数"""
+        if end <= start:
+            return 0
+        jan1, _, prefix = self._year(start.year)
+        if start.year == end.year:
+            end_jan1, _, end_prefix = jan1, None, prefix
+        else:
+            end_jan1, _, end_prefix = self._year(end.year)
+        total = int(end_prefix[end.toordinal() - end_jan1]) - int(prefix[start.toordinal() - jan1])
+        for year in range(start.year, end.year):
+            total += int(self._year(year)[2][-1])
+        return total
+
+    def next_workday(self, day, n=1, inclusive=False):
+        """day 之后的第 n 个工作日；inclusive=True 时 day 本身也算"""
+        if n < 1:
+            raise ValueError("n 至少为 1")
+        ordinal = day.toordinal() + (0 if inclusive else 1)
+        year = datetime.date.fromordinal(ordinal).year
+        while year <= datetime.MAXYEAR:
+            jan1, _, prefix = self._year(year)
+            i = ordinal - jan1
+            need = int(prefix[i]) + n
+            if prefix[-1] >= need:
+                # prefix[j] 第一次达到 need 的位置 j，对应当年第 j-1 天
+                j = int(np.searchsorted(prefix, need))
+                return datetime.date.fromordinal(jan1 + j - 1)
+            n -= int(prefix[-1]) - int(prefix[i])
+            year += 1
+            ordinal = datetime.date(year, 1, 1).toordinal() if year <= datetime.MAXYEAR else 0
+        raise ValueError("超出日期范围")
+
+    def workday_mask(self, start, days):
+        """从 start 起连续 days 天是否工作日（bool 数组），供模拟器、排期整段使用"""
+        parts = []
+        ordinal, stop = start.toordinal(), start.toordinal() + days
+        while ordinal < stop:
+            year = datetime.date.fromordinal(ordinal).year
+            jan1, bits, prefix = self._year(year)
+            n_days = len(prefix) - 1
+            year_mask = np.unpackbits(np.frombuffer(bits, dtype=np.uint8))[:n_days].astype(bool)
+            parts.append(year_mask[ordinal - jan1:min(stop - jan1, n_days)])
+            ordinal = jan1 + n_days
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=bool)
+
+    def workdays(self, start, end):
+        """[start, end) 内的全部工作日"""
+        base = start.toordinal()
+        mask = self.workday_mask(start, max(end.toordinal() - base, 0))
+        return [datetime.date.fromordinal(base + int(i)) for i in np.flatnonzero(mask)]
+
+# ---------- 默认日历 ----------
+_default = None
+_signature = None
+_checked = 0.0
+_default_lock = threading.Lock()
+
+def _file_signature(paths):
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((path, st.st_size, st.st_mtime_ns))
+        except OSError:
+            sig.append((path, None, None))
+    return tuple(sig)
+
+def load(paths=None):
+    """内置数据加上 paths（默认 WORKDAY_CALENDAR）里的文件；读不了的文件打印后跳过"""
+    paths = CALENDAR_FILES if paths is None else paths
+    sources = [from_mapping(BUILTIN)]
+    for path in paths:
+        try:
+            sources.append(load_file(path))
+        except (OSError, ValueError) as e:
+            print(f"读取日历文件 {path} 失败：{e}", file=sys.stderr)
+    return WorkdayCalendar(sources)
+
+def default():
+    """进程内共享的日历；每 RELOAD_INTERVAL 秒检查一次文件大小和修改时间，有变化就重新加载"""
+    global _default, _signature, _checked
+    now = time.monotonic()
+    if _default is not None and now - _checked < RELOAD_INTERVAL:
+        return _default
+    with _default_lock:
+        sig = _file_signature(CALENDAR_FILES)
+        if _default is None or sig != _signature:
+            _default, _signature = load(), sig
+        _checked = now
+    return _default
+
+def is_workday(day):
+    return default().is_workday(day)
+
+def next_workday(day, n=1, inclusive=False):
+    return default().next_workday(day, n, inclusive)
+
+def workdays_between(start, end):
+    return default().workdays_between(start, end)
+
+def today():
+    return datetime.datetime.now(SH_TZ).date()
+
+# ---------- 压测 ----------
+def bench(lookups=1000000, years=10, seed=0):
+    cal = default()
+    rng = random.Random(seed)
+    start = datetime.date(2025, 1, 1)
+    span = (datetime.date(2025 + years, 1, 1) - start).days
+    days = [start + datetime.timedelta(days=rng.randrange(span)) for _ in range(lookups)]
+    cal.workday_mask(start, span)  # 预先建好各年位图
+
+    t0 = time.perf_counter()
+    hits = sum(cal.is_workday(d) for d in days)
+    t1 = time.perf_counter()
+    print(f"is_workday：{lookups} 次 {t1 - t0:.2f}s（{(t1 - t0) / lookups * 1e9:.0f}ns/次），工作日 {hits / lookups:.1%}")
+
+    pairs = [(days[i], days[i] + datetime.timedelta(days=rng.randrange(1, 3 * 365))) for i in range(10000)]
+    t0 = time.perf_counter()
+    fast = [cal.workdays_between(a, b) for a, b in pairs]
+    t1 = time.perf_counter()
+    slow = [sum(cal.is_workday(datetime.date.fromordinal(o)) for o in range(a.toordinal(), b.toordinal()))
+            for a, b in pairs[:1000]]
+    t2 = time.perf_counter()
+    assert fast[:1000] == slow
+    print(f"workdays_between（跨度 ≤3 年）：前缀和 {(t1 - t0) / len(pairs) * 1e6:.1f}µs/次，"
+          f"逐天累加 {(t2 - t1) / 1000 * 1e6:.0f}µs/次")
+
+    t0 = time.perf_counter()
+    fast = [cal.next_workday(d, n) for d, n in zip(days[:10000], (rng.randrange(1, 300) for _ in range(10000)))]
+    t1 = time.perf_counter()
+    print(f"next_workday（第 1-300 个）：{(t1 - t0) / 10000 * 1e6:.1f}µs/次")
+
+    t0 = time.perf_counter()
+    fire_days = cal.workdays(start, datetime.date(2025 + years, 1, 1))
+    print(f"{years} 年内全部推送日 {len(fire_days)} 个：{(time.perf_counter() - t0) * 1000:.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="工作日日历")
+    sub = parser.add_subparsers(dest="cmd")
+    p_check = sub.add_parser("check", help="是否工作日（默认今天）")
+    p_check.add_argument("--date", type=datetime.date.fromisoformat, default=None)
+    p_next = sub.add_parser("next", help="列出接下来的工作日")
+    p_next.add_argument("--from", dest="start", type=datetime.date.fromisoformat, default=None)
+    p_next.add_argument("--count", type=int, default=10)
+    p_between = sub.add_parser("between", help="[开始, 结束) 内的工作日数")
+    p_between.add_argument("start", type=datetime.date.fromisoformat)
+    p_between.add_argument("end", type=datetime.date.fromisoformat)
+    p_bench = sub.add_parser("bench", help="查询压测")
+    p_bench.add_argument("--lookups", type=int, default=1000000)
+    p_bench.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    cal = default()
+    if args.cmd == "next":
+        day = args.start or today()
+        for _ in range(args.count):
+            day = cal.next_workday(day)
+            print(f"{day} 周{'一二三四五六日'[day.weekday()]}")
+    elif args.cmd == "between":
+        print(cal.workdays_between(args.start, args.end))
+    elif args.cmd == "bench":
+        bench(args.lookups, args.years)
+    else:
+        day = getattr(args, "date", None) or today()
+        print(f"{day} 周{'一二三四五六日'[day.weekday()]}：{'工作日' if cal.is_workday(day) else '休息日'}")
+        print(f"下一个工作日：{cal.next_workday(day)}")
+        covered = "、".join(map(str, cal.data_years)) or "无"
+        print(f"有节假日数据的年份：{covered}；其余年份只按周一到周五计算")
+
+if __name__ == "__main__":
+    main()
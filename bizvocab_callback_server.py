@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 复习卡片答题回调服务：接收飞书卡片输入框提交的答案，判分后批量写回数据库
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import datetime
+import urllib.parse
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_events
+import bizvocab_http
+import bizvocab_lookup
+import bizvocab_schema
+import bizvocab_tiering
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+CALLBACK_HOST = os.getenv("CALLBACK_HOST", "0.0.0.0")
+CALLBACK_PORT = int(os.getenv("CALLBACK_PORT", 8090))
+CALLBACK_PATH = "/feishu/card"
+# 飞书开放平台「事件与回调」里的 Verification Token，不配置则不校验
+VERIFICATION_TOKEN = os.getenv("FEISHU_VERIFICATION_TOKEN")
+LOG_FILE = "callback.log"
+# 查词结果推回群里用的机器人 webhook
+FEISHU_WEBHOOK = os.getenv("FEISHU_WEBHOOK")
+
+FLUSH_BATCH = 500     # 缓冲的答题事件达到该数量立即刷库
+FLUSH_INTERVAL = 1.0  # 最长刷库间隔（秒）
+MAX_BODY = 64 * 1024  # 回调请求体上限
+
+# 题型：与 bizvocab_reviewer.build_review_card 中写入卡片的 mode 一致
+MODE_CN_TO_EN = "cn2en"  # 提示中文，答英文
+MODE_EN_TO_CN = "en2cn"  # 提示英文，答中文
+MODE_CHOICE_CN_TO_EN = "mc_cn2en"  # 提示中文，四选一英文
+MODE_CHOICE_EN_TO_CN = "mc_en2cn"  # 提示英文，四选一中文
+CHOICE_MODES = (MODE_CHOICE_CN_TO_EN, MODE_CHOICE_EN_TO_CN)
+
+# ---------- 工具函数 ----------
+def log(msg):
+    ts = datetime.datetime.now(SH_TZ).strftime("%Y-%m-%d %H:%M:%S")
+    line = f"[{ts}] {msg}"
+    print(line)
+    with open(LOG_FILE, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+# ---------- 判分 ----------
+# 中文释义里常见的分隔符：逗号、分号、顿号（全角/半角）
+MEANING_SPLIT = re.compile(r"[，,；;、/]+")
+# 释义中的括号注释，如“（美）”、“(口语)”，判分时忽略
+MEANING_NOTE = re.compile(r"[（(][^）)]*[）)]")
+ANSWER_STRIP = re.compile(r"[\s　。.!！?？\"'“”‘’]+")
+
+def normalize_answer(text):
+    return ANSWER_STRIP.sub("", (text or "").strip().lower())
+
+def split_meanings(translation):
+    cleaned = MEANING_NOTE.sub("", translation or "")
+    return [m for m in (normalize_answer(p) for p in MEANING_SPLIT.split(cleaned)) if m]
+
+def grade_answer(term, translation, mode, answer):
+    """按题型判分：中文题比对英文单词，英文题命中任一中文释义即算对"""
+    given = normalize_answer(answer)
+    if not given:
+        return False
+    if mode == MODE_CN_TO_EN:
+        return given == normalize_answer(term)
+    for meaning in split_meanings(translation):
+        # 允许只写出释义的核心部分，如“利润”对“利润，收益”、“管理”对“管理层”；
+        # 反过来答案包含释义不算对，否则“不是利润”或把几个词堆在一起也能得分
+        if given == meaning or (len(given) >= 2 and given in meaning):
+            return True
+    return False
+
+# ---------- 数据库逻辑 ----------
+def fetch_answer_keys(word_ids):
+    if not word_ids:
+        return {}
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    # 冻结前推出的卡片可能在单词移到冷表后才作答，两层都查
+    where = "id IN (%s)" % ",".join(["%s"] * len(word_ids))
+    cursor.execute(bizvocab_tiering.union_sql(["id", "term", "translation"], where), list(word_ids) * 2)
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return {r["id"]: (r["term"], r["translation"]) for r in rows}
+
+def write_answer_stats(rows, answers=()):
+    """rows: [(word_id, correct_count, wrong_count, last_answer_at, last_correct), ...]
+    answers: 合并前的原始作答 [(word_id, correct, answered_at), ...]，同一事务写入事件日志
+    """
+    if not rows:
+        return
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    bizvocab_events.record_answers(cursor, answers)
+    cursor.executemany(
+        """
+        INSERT INTO vocab_answer_stats
+            (word_id, correct_count, wrong_count, last_answer_at, last_correct)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            correct_count = correct_count + VALUES(correct_count),
+            wrong_count = wrong_count + VALUES(wrong_count),
+            last_answer_at = GREATEST(last_answer_at, VALUES(last_answer_at)),
+            last_correct = IF(VALUES(last_answer_at) >= last_answer_at,
+                              VALUES(last_correct), last_correct)
+        """,
+        rows
+    )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+# ---------- 答案缓存 ----------
+class AnswerKeyCache:
+    """word_id -> (term, translation)；同一单词的并发未命中只查一次库"""
+
+    def __init__(self, loader=fetch_answer_keys):
+        self.loader = loader
+        self.keys = {}
+        self.pending = {}
+
+    def preload(self, keys):
+        self.keys.update(keys)
+
+    def invalidate(self, word_ids):
+        """词条或释义改过、被删掉的单词，下次作答时重新查库"""
+        for word_id in word_ids:
+            self.keys.pop(word_id, None)
+
+    async def get(self, word_id):
+        key = self.keys.get(word_id)
+        if key is not None:
+            return key
+        fut = self.pending.get(word_id)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(None, self.loader, [word_id])
+            self.pending[word_id] = fut
+            try:
+                self.keys.update(await fut)
+            finally:
+                self.pending.pop(word_id, None)
+        else:
+            await fut
+        return self.keys.get(word_id)
+
+# ---------- 合并写缓冲 ----------
+class GradeBuffer:
+    """写后缓冲：同一单词的多次作答在内存中合并，按数量或时间批量刷库"""
+
+    def __init__(self, flush_fn=write_answer_stats, batch_size=FLUSH_BATCH, interval=FLUSH_INTERVAL):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = {}  # word_id -> [correct, wrong, last_at, last_correct]
+        self.answers = []  # 原始作答，写入事件日志
+        self.events = 0
+        self.flushed_events = 0
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+
+    def add(self, word_id, correct, answered_at):
+        entry = self.pending.get(word_id)
+        if entry is None:
+            entry = self.pending[word_id] = [0, 0, answered_at, correct]
+        entry[0 if correct else 1] += 1
+        self.answers.append((word_id, correct, answered_at))
+        if answered_at >= entry[2]:
+            entry[2] = answered_at
+            entry[3] = correct
+        self.events += 1
+        if self.events >= self.batch_size:
+            self.wakeup.set()
+
+    async def flush(self):
+        async with self.lock:
+            if not self.pending:
+                return
+            batch, events, answers = self.pending, self.events, self.answers
+            self.pending, self.events, self.answers = {}, 0, []
+            rows = [(wid, c, w, at, int(last)) for wid, (c, w, at, last) in batch.items()]
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.flush_fn, rows, answers)
+            except Exception as e:
+                # 刷库失败：把这批合并回缓冲，下次再试
+                log(f"答题结果写库失败，稍后重试: {e}")
+                for wid, (c, w, at, last) in batch.items():
+                    entry = self.pending.setdefault(wid, [0, 0, at, last])
+                    entry[0] += c
+                    entry[1] += w
+                    if at >= entry[2]:
+                        entry[2], entry[3] = at, last
+                self.events += events
+                self.answers = answers + self.answers
+                return
+            self.flushed_events += events
+            self.flushed_rows += len(rows)
+            self.flush_count += 1
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            # shield：服务停止时取消 run() 不会打断进行中的写库
+            await asyncio.shield(self.flush())
+
+def post_card(card):
+    try:
+        bizvocab_http.post(FEISHU_WEBHOOK, json=card, timeout=10)
+    except Exception as e:
+        log(f"查词卡片发送失败: {e}")
+
+# ---------- 回调处理 ----------
+def extract_action(payload):
+    """兼容旧版（顶层 action/token）与 2.0 版（header/event）卡片回调格式"""
+    if "event" in payload:
+        return payload["event"].get("action") or {}, payload.get("header", {}).get("token")
+    return payload.get("action") or {}, payload.get("token")
+
+def toast(kind, content):
+    return {"toast": {"type": kind, "content": content}}
+
+class CallbackApp:
+    def __init__(self, answer_keys, buffer, lookup=None):
+        self.answer_keys = answer_keys
+        self.buffer = buffer
+        self.lookup = lookup
+        self.handled = 0
+
+    async def handle(self, payload):
+        if payload.get("type") == "url_verification":
+            return {"challenge": payload.get("challenge")}
+        if (payload.get("header") or {}).get("event_type") == "im.message.receive_v1":
+            return await self.handle_message(payload)
+
+        action, token = extract_action(payload)
+        if VERIFICATION_TOKEN and token != VERIFICATION_TOKEN:
+            return toast("error", "校验失败")
+
+        value = action.get("value") or {}
+        if value.get("action") != "answer":
+            return {}
+        try:
+            word_id = int(value["word_id"])
+        except (KeyError, TypeError, ValueError):
+            return toast("error", "无效的题目")
+
+        key = await self.answer_keys.get(word_id)
+        if key is None:
+            return toast("error", "题目已不存在")
+        term, translation = key
+        mode = value.get("mode")
+        if mode in CHOICE_MODES:
+            # 选择题按钮上带的是所选选项的单词 id，选中本词即为正确
+            try:
+                correct = int(value["choice"]) == word_id
+            except (KeyError, TypeError, ValueError):
+                return toast("error", "无效的选项")
+        else:
+            answer = action.get("input_value")
+            if answer is None:
+                answer = (action.get("form_value") or {}).get(f"answer_{word_id}", "")
+            correct = grade_answer(term, translation, mode, answer)
+
+        self.buffer.add(word_id, correct, datetime.datetime.now(SH_TZ).replace(tzinfo=None))
+        self.handled += 1
+        if correct:
+            return toast("success", "回答正确 ✅")
+        reveal = term if mode in (MODE_CN_TO_EN, MODE_CHOICE_CN_TO_EN) else translation
+        return toast("info", f"再想想 ❌ 正确答案：{reveal}")
+
+    async def handle_message(self, payload):
+        """群消息“查 xxx”：内存索引直接出结果，卡片异步推回群里"""
+        if VERIFICATION_TOKEN and payload["header"].get("token") != VERIFICATION_TOKEN:
+            return {}
+        message = (payload.get("event") or {}).get("message") or {}
+        if self.lookup is None or message.get("message_type") != "text":
+            return {}
+        try:
+            text = json.loads(message.get("content") or "{}").get("text", "")
+        except ValueError:
+            return {}
+        query = bizvocab_lookup.parse_command(text)
+        if query is None:
+            return {}
+        card = bizvocab_lookup.build_lookup_card(query, self.lookup.search(query))
+        asyncio.get_running_loop().run_in_executor(None, post_card, card)
+        return {}
+
+# ---------- HTTP 服务（asyncio，支持 keep-alive） ----------
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large"}
+
+def http_response(status, body, keep_alive):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(data)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + data
+
+async def serve_connection(app, reader, writer):
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            parts = lines[0].split(" ")
+            if len(parts) < 3:
+                break
+            method, path, version = parts[0], parts[1], parts[2]
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+            conn_header = headers.get("connection", "").lower()
+            keep_alive = conn_header != "close" if version == "HTTP/1.1" else conn_header == "keep-alive"
+
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY:
+                writer.write(http_response(413, {"msg": "body too large"}, False))
+                await writer.drain()
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            url = urllib.parse.urlsplit(path)
+            if method == "GET" and path == "/healthz":
+                status, resp = 200, {"ok": True, "handled": app.handled}
+            elif method == "GET" and url.path == "/lookup" and app.lookup is not None:
+                query = urllib.parse.parse_qs(url.query).get("q", [""])[0]
+                status, resp = 200, {"query": query, "results": app.lookup.search(query)}
+            elif method == "POST" and path == CALLBACK_PATH:
+                try:
+                    status, resp = 200, await app.handle(json.loads(body or b"{}"))
+                except ValueError:
+                    status, resp = 400, {"msg": "invalid json"}
+            else:
+                status, resp = 404, {"msg": "not found"}
+
+            writer.write(http_response(status, resp, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except Exception as e:
+        log(f"回调连接异常: {e}")
+    finally:
+        writer.close()
+
+async def start_server(app, host, port):
+    return await asyncio.start_server(lambda r, w: serve_connection(app, r, w), host, port,
+                                      backlog=1024)
+
+async def refresh_lookup(lookup, answer_keys=None, interval=bizvocab_lookup.REFRESH_INTERVAL):
+    """查词索引按变更日志增量刷新，顺带让答案缓存里改过的单词失效"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            changed = await asyncio.get_running_loop().run_in_executor(None, lookup.refresh)
+            if changed and answer_keys is not None:
+                answer_keys.invalidate(changed)
+        except Exception as e:
+            log(f"查词索引刷新失败: {e}")
+
+async def serve(host=CALLBACK_HOST, port=CALLBACK_PORT):
+    await asyncio.get_running_loop().run_in_executor(None, bizvocab_schema.migrate)
+    buffer = GradeBuffer()
+    lookup = bizvocab_lookup.LookupService()
+    await asyncio.get_running_loop().run_in_executor(None, lookup.load)
+    answer_keys = AnswerKeyCache()
+    app = CallbackApp(answer_keys, buffer, lookup)
+    server = await start_server(app, host, port)
+    flusher = asyncio.create_task(buffer.run())
+    refresher = asyncio.create_task(refresh_lookup(lookup, answer_keys))
+    log(f"答题回调服务已启动: http://{host}:{port}{CALLBACK_PATH}，查词索引 {len(lookup.index)} 个单词")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        flusher.cancel()
+        refresher.cancel()
+        await buffer.flush()
+
+# ---------- 压测：本地模拟飞书并发回调 ----------
+async def _bench_client(port, payloads, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for body in payloads:
+            req = (
+                f"POST {CALLBACK_PATH} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+            ).encode("latin-1") + body
+            t0 = time.perf_counter()
+            writer.write(req)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(re.search(rb"Content-Length: (\d+)", head).group(1))
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+async def bench(total, concurrency, words):
+    flushed = []
+    keys = {i: (f"term{i}", f"释义{i}，含义{i}") for i in range(1, words + 1)}
+    cache = AnswerKeyCache(loader=lambda ids: {})
+    cache.preload(keys)
+    buffer = GradeBuffer(flush_fn=lambda rows, answers: flushed.append(len(rows)))
+    app = CallbackApp(cache, buffer)
+    server = await start_server(app, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    flusher = asyncio.create_task(buffer.run())
+
+    def payload(n):
+        wid = n % words + 1
+        mode = MODE_CN_TO_EN if n % 2 else MODE_EN_TO_CN
+        answer = f"term{wid}" if mode == MODE_CN_TO_EN else (f"释义{wid}" if n % 3 else "错误")
+        return json.dumps({
+            "token": VERIFICATION_TOKEN,
+            "action": {"tag": "input", "input_value": answer,
+                       "value": {"action": "answer", "word_id": wid, "mode": mode}},
+        }).encode("utf-8")
+
+    per_client = [[payload(n) for n in range(c, total, concurrency)] for c in range(concurrency)]
+    latencies = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_bench_client(port, p, latencies) for p in per_client))
+    elapsed = time.perf_counter() - t0
+    flusher.cancel()
+    await buffer.flush()
+    server.close()
+    await server.wait_closed()
+
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"回调总数: {len(latencies)}，并发连接: {concurrency}，耗时 {elapsed:.2f}s")
+    print(f"吞吐: {len(latencies) / elapsed:.0f} 次/秒，p50 {pct(0.5):.2f}ms，p99 {pct(0.99):.2f}ms")
+    print(f"写库批次: {buffer.flush_count}，合并后行数: {buffer.flushed_rows}（原始事件 {buffer.flushed_events}）")
+
+def main():
+    parser = argparse.ArgumentParser(description="复习卡片答题回调服务")
+    sub = parser.add_subparsers(dest="cmd")
+    p_serve = sub.add_parser("serve", help="启动回调服务（默认）")
+    p_serve.add_argument("--host", default=CALLBACK_HOST)
+    p_serve.add_argument("--port", type=int, default=CALLBACK_PORT)
+    p_bench = sub.add_parser("bench", help="本地模拟飞书回调压测（不连数据库）")
+    p_bench.add_argument("--total", type=int, default=20000)
+    p_bench.add_argument("--concurrency", type=int, default=50)
+    p_bench.add_argument("--words", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        asyncio.run(bench(args.total, args.concurrency, args.words))
+    else:
+        try:
+            asyncio.run(serve(getattr(args, "host", CALLBACK_HOST), getattr(args, "port", CALLBACK_PORT)))
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+if __name__ == "__main__":
+    main()
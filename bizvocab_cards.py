@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 飞书卡片渲染：文本模板和卡片外壳预先编译，每个元素渲染时就序列化成 JSON 片段并记下字节数，
+# 拼消息时按请求体上限（自定义机器人 20KB）装箱：内容太多拆成几条“（续）”卡片，同一时刻发往同一个
+# webhook 的小卡片（学习 + 周报、同一时刻的复习 + 学习）合并成一条消息，少调一次 webhook。
+#
+# 用法：
+#   python bizvocab_cards.py bench [--words 5 --cards 20000]
+#   python bizvocab_cards.py split --words 200 [--max-bytes 20480]   # 查看大批量单词会拆成几条消息
+#
+# 结构：
+#   template   lark_md 文本模板（str.format 写法，编译成 f-string）+ 预先序列化好的 div 外壳，渲染结果直接是 JSON 字节
+#   Card       一张卡片的标题、颜色和若干“节”；一节是必须放在同一条消息里的元素（如题目和它的按钮）
+#   pack       把多张卡片按顺序装进不超过上限的消息
+#   Outbox     一次推送的卡片及其发送结果回调；flush 时装箱、发送并统计渲染耗时和 webhook 调用次数
+#   FRAGMENTS  进程内共享的单词片段 LRU 缓存（按字节数封顶）：键为 (片段类型, 单词 id)，值带内容版本
+#              （FRAGMENT_FIELDS 的哈希），词条/释义/例句改过就不命中；同一批热门单词推给成百上千个
+#              学习者时只渲染一次，卡片组装变成拼接缓存的字节
+# 有 orjson 时用 orjson 序列化，否则退回标准库 json。
+
+import os
+import sys
+import time
+import json
+import random
+import argparse
+import threading
+import functools
+import datetime
+import collections
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import bizvocab_http
+
+# ---------- 配置 ----------
+load_dotenv()
+
+MAX_PAYLOAD = int(os.getenv("FEISHU_MAX_PAYLOAD", 20 * 1024))  # 自定义机器人请求体上限，字节
+FRAGMENT_CACHE_BYTES = int(os.getenv("FRAGMENT_CACHE_BYTES", 16 * 1024 * 1024))  # 片段缓存上限，字节
+CONTINUED = "（续）"
+JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+
+# ---------- 序列化 ----------
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj)
+else:
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def post(url, payload, timeout=10):
+    """payload 为已序列化的字节或卡片 dict"""
+    data = payload if isinstance(payload, bytes) else dumps(payload)
+    return bizvocab_http.post(url, data=data, headers=JSON_HEADERS, timeout=timeout)
+
+# ---------- 模板 ----------
+DIV_HEAD = b'{"tag":"div","text":{"tag":"lark_md","content":'
+DIV_TAIL = b"}}"
+HR = dumps({"tag": "hr"})
+
+def div(content):
+    return DIV_HEAD + dumps(content) + DIV_TAIL
+
+def template(fmt):
+    """lark_md 文本模板：按 str.format 填字段（没用到的关键字参数忽略），直接返回序列化好的 div 元素"""
+    def render(**fields):
+        return DIV_HEAD + dumps(fmt.format(**fields)) + DIV_TAIL
+    render.fmt = fmt
+    return render
+
+def escape(text):
+    """JSON 字符串的内容部分（不含两端引号）。转义是逐字符的，分段转义后拼接与整体转义结果相同"""
+    return dumps(text)[1:-1]
+
+def fragment(fmt):
+    """同 template，但只返回转义后的文本片段，由 join_div 和其他片段拼成一个 div"""
+    def render(**fields):
+        return dumps(fmt.format(**fields))[1:-1]
+    render.fmt = fmt
+    return render
+
+def join_div(*parts):
+    return DIV_HEAD + b'"' + b"".join(parts) + b'"' + DIV_TAIL
+
+@functools.lru_cache(maxsize=64)
+def envelope(title, color):
+    """卡片外壳拆成 elements 数组前后两段字节，中间填元素；标题每天只变一次，按 (标题, 颜色) 缓存"""
+    head = dumps({
+        "msg_type": "interactive",
+        "card": {
+            "config": {"wide_screen_mode": True},
+            "header": {"template": color, "title": {"content": title, "tag": "plain_text"}},
+            "elements": [],
+        },
+    })
+    i = head.rindex(b"[]") + 1
+    return head[:i], head[i:]
+
+def section_title(title):
+    """合并进上一张卡片时，用分隔线和加粗标题隔开"""
+    return HR + b"," + div(f"**{title}**")
+
+# ---------- 片段缓存 ----------
+FRAGMENT_FIELDS = ("term", "part_of_speech", "translation", "example_sentence", "example_chinese")
+def content_version(w):
+    """片段内容版本：FRAGMENT_FIELDS 的哈希，任一字段改了就不再命中旧片段"""
+    return hash(tuple(w.get(f) for f in FRAGMENT_FIELDS))
+
+ENTRY_OVERHEAD = 200  # 每条缓存除片段字节外的大致开销：dict 槽位、键元组和条目列表
+
+def _entry_size(value):
+    return sys.getsizeof(value) + ENTRY_OVERHEAD
+
+FragmentStats = collections.namedtuple("FragmentStats", "hits misses evictions invalidations entries nbytes")
+
+class FragmentCache:
+    """(片段类型, 单词 id) -> [内容版本, 字节, 访问位]，总字节数不超过 max_bytes；多线程共用。
+    淘汰用二次机会（CLOCK）近似 LRU：命中只置访问位、不加锁不挪位置，比 OrderedDict.move_to_end
+    加锁快近一倍（命中比重新渲染还慢就没有意义了）；写入和淘汰加锁，从最早放入的条目开始，
+    访问位为 1 的清零后挪到队尾，为 0 的淘汰。命中计数不加锁，多线程下可能略微少计。
+    只给学习卡片用（单词片段长，命中省三成）；复习卡片的题干片段短，查缓存不比直接渲染快"""
+
+    def __init__(self, max_bytes=FRAGMENT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = {}  # dict 保持插入顺序，最早放入的在前
+        self.kinds = set()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get(self, kind, word, render):
+        """word 为单词行 dict；未命中或内容版本变了时调用 render(word) 并缓存结果"""
+        key = (kind, word["id"])
+        version = content_version(word)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            entry[2] = True
+            self.hits += 1
+            return entry[1]
+        value = render(word)
+        with self.lock:
+            self.misses += 1
+            self.kinds.add(kind)
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= _entry_size(old[1])
+            self.entries[key] = [version, value, False]
+            self.nbytes += _entry_size(value)
+            self._evict()
+        return value
+
+    def _evict(self):
+        entries = self.entries
+        while self.nbytes > self.max_bytes and entries:
+            key = next(iter(entries))
+            entry = entries.pop(key)
+            if entry[2]:
+                entry[2] = False
+                entries[key] = entry
+                continue
+            self.nbytes -= _entry_size(entry[1])
+            self.evictions += 1
+
+    def invalidate(self, word_ids):
+        """按变更日志移除改过或删掉的单词；内容版本已保证不会用到旧片段，这里只是及早释放内存"""
+        with self.lock:
+            for word_id in word_ids:
+                for kind in self.kinds:
+                    old = self.entries.pop((kind, word_id), None)
+                    if old is not None:
+                        self.nbytes -= _entry_size(old[1])
+                        self.invalidations += 1
+
+    def clear(self):
+        """清空缓存和计数"""
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        with self.lock:
+            return FragmentStats(self.hits, self.misses, self.evictions, self.invalidations,
+                                 len(self.entries), self.nbytes)
+
+    def settle(self, ok):
+        """不发送：按 ok 执行回调并取走卡片。卡片要先存档、再发给多个 webhook 时用（见 bizvocab_editions）"""
+        cards = self.cards
+        for callback in self.callbacks:
+            if callback is not None:
+                callback(ok)
+        self.cards, self.callbacks = [], []
+        return cards
+
+    def summary(self):
+        s = self.stats()
+        lookups = s.hits + s.misses
+        rate = s.hits / lookups * 100 if lookups else 0.0
+        return (f"片段缓存 {s.entries} 条 {s.nbytes / 1024:.0f}KB/{self.max_bytes / 1024:.0f}KB，"
+                f"命中率 {rate:.1f}%（{s.hits}/{lookups}），淘汰 {s.evictions}，失效 {s.invalidations}")
+
+FRAGMENTS = FragmentCache()
+
+# ---------- 卡片 ----------
+class Card:
+    def __init__(self, title, color):
+        self.title = title
+        self.color = color
+        self.sections = []   # 每节是逗号连好的元素 JSON 片段
+        self.started = time.perf_counter()
+        self.render_seconds = 0.0  # 从创建到放进 Outbox 的耗时，即渲染耗时
+
+    def add(self, *elements):
+        """elements 为模板渲染出的字节或元素 dict；同一次 add 的元素不会被拆到两条消息里"""
+        if len(elements) == 1 and isinstance(elements[0], bytes):
+            self.sections.append(elements[0])
+        else:
+            self.sections.append(b",".join(e if isinstance(e, bytes) else dumps(e) for e in elements))
+        return self
+
+    @classmethod
+    def from_payload(cls, payload):
+        """旧式整张卡片 dict（如周报）转成 Card，每个元素一节"""
+        body = payload["card"]
+        card = cls(body["header"]["title"]["content"], body["header"].get("template", "blue"))
+        card.sections = [dumps(e) for e in body.get("elements", [])]
+        return card
+
+    @property
+    def nbytes(self):
+        return sum(len(s) for s in self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
+# ---------- 装箱 ----------
+Message = collections.namedtuple("Message", "payload cards")  # cards：消息里包含的卡片下标
+
+class _Draft:
+    def __init__(self, title, color):
+        self.prefix, self.suffix = envelope(title, color)
+        self.parts = []
+        self.size = len(self.prefix) + len(self.suffix)
+        self.cards = set()
+
+    def fits(self, part, max_bytes):
+        return self.size + len(part) + (1 if self.parts else 0) <= max_bytes
+
+    def append(self, part, card):
+        self.size += len(part) + (1 if self.parts else 0)
+        self.parts.append(part)
+        self.cards.add(card)
+
+    def finish(self):
+        return Message(self.prefix + b",".join(self.parts) + self.suffix, frozenset(self.cards))
+
+def pack(cards, max_bytes=MAX_PAYLOAD, merge=True):
+    """按顺序把卡片装进不超过 max_bytes 的消息。
+    merge=True 时后一张卡片能整节放进当前消息就接在后面（标题变成小节标题），
+    放不下的节另起一条消息，标题加“（续）”；单独一节就超限时照常单独成一条，由飞书拒收"""
+    messages = []
+    current = None
+    for idx, card in enumerate(cards):
+        for s, section in enumerate(card.sections):
+            part = section_title(card.title) + b"," + section if s == 0 and current is not None else section
+            if current is not None and current.fits(part, max_bytes):
+                current.append(part, idx)
+                continue
+            if current is not None:
+                messages.append(current.finish())
+            current = _Draft(card.title + (CONTINUED if s else ""), card.color)
+            current.append(section, idx)
+        if not merge and current is not None:
+            messages.append(current.finish())
+            current = None
+    if current is not None:
+        messages.append(current.finish())
+    return messages
+
+# ---------- 发送 ----------
+RunStats = collections.namedtuple("RunStats", "cards webhook_calls max_bytes render_seconds failed")
+
+class Outbox:
+    """一次推送要发往同一个 webhook 的卡片；flush(send) 装箱后逐条发送，
+    再按卡片回调 on_result(是否全部发送成功)。send(payload 字节) 返回是否成功"""
+    def __init__(self, max_bytes=MAX_PAYLOAD, merge=True):
+        self.max_bytes = max_bytes
+        self.merge = merge
+        self.cards = []
+        self.callbacks = []
+        self.stats = None
+
+    def add(self, card, on_result=None):
+        card = Card.from_payload(card) if isinstance(card, dict) else card
+        card.render_seconds = time.perf_counter() - card.started
+        self.cards.append(card)
+        self.callbacks.append(on_result)
+        return self
+
+    def __len__(self):
+        return len(self.cards)
+
+    def flush(self, send):
+        """返回是否全部发送成功；没有卡片时返回 None"""
+        cards = [c for c in self.cards if len(c)]
+        if not cards:
+            return None
+        t0 = time.perf_counter()
+        messages = pack(self.cards, self.max_bytes, self.merge)
+        render = sum(c.render_seconds for c in self.cards) + time.perf_counter() - t0
+        ok = [True] * len(self.cards)
+        for m in messages:
+            sent = bool(send(m.payload))
+            for i in m.cards:
+                ok[i] = ok[i] and sent
+        for callback, result in zip(self.callbacks, ok):
+            if callback is not None:
+                callback(result)
+        self.stats = RunStats(len(cards), len(messages), max(len(m.payload) for m in messages),
+                              render, sum(1 for m in messages if not all(ok[i] for i in m.cards)))
+        self.cards, self.callbacks = [], []
+        return all(ok)
+
+    def summary(self):
+        s = self.stats
+        if s is None:
+            return "没有卡片"
+        return (f"{s.cards} 张卡片 → {s.webhook_calls} 次 webhook 调用，最大 {s.max_bytes / 1024:.1f}KB，"
+                f"渲染 {s.render_seconds * 1000:.1f}ms" + (f"，{s.failed} 条失败" if s.failed else ""))
+
+def send(card, send_payload, max_bytes=MAX_PAYLOAD):
+    """单张卡片（Card 或 dict）直接装箱发送"""
+    return Outbox(max_bytes).add(card).flush(send_payload)
+
+# ---------- 压测 ----------
+class _Uncached:
+    def get(self, kind, word, render):
+        return render(word)
+
+def bench(words_per_card=5, cards=20000, seed=0):
+    import bizvocab_cards
+    import bizvocab_learner
+    import bizvocab_loadtest
+    import bizvocab_reviewer
+    random.seed(seed)
+    words = bizvocab_loadtest.synthetic_words(2000)
+    batches = [random.sample(words, words_per_card) for _ in range(cards)]
+
+    def legacy(ws):
+        # 改造前的写法：逐词拼 dict，整张卡片交给 requests 的 json=（标准库 json、ensure_ascii）
+        elements = []
+        for w in ws:
+            pos = w.get("part_of_speech") or ""
+            content = f"✨ **{w['term']}** {f'_({pos})_' if pos else ''}\n📝 {w['translation']}"
+            if w.get("example_sentence"):
+                content += f"\n📖 {w['example_sentence']}"
+                if w.get("example_chinese"):
+                    content += f"\n🇨🇳 {w['example_chinese']}"
+            elements.append({"tag": "div", "text": {"tag": "lark_md", "content": content}})
+        card = {"msg_type": "interactive", "card": {
+            "config": {"wide_screen_mode": True},
+            "header": {"template": "green", "title": {"content": f"今日必学商务词汇 ✨ | {datetime.date.today()}",
+                                                       "tag": "plain_text"}},
+            "elements": elements}}
+        return json.dumps(card).encode("utf-8")
+
+    def render_all(build):
+        total = 0
+        for ws in batches:
+            for m in pack([build(ws)]):
+                total += len(m.payload)
+        return total
+
+    def timed(build):
+        """先换成不缓存的实现跑一遍，再用共享缓存跑一遍；返回 (不缓存耗时, 缓存耗时, 平均字节)"""
+        # 作为脚本运行时本模块是 __main__，卡片构建用的是 bizvocab_cards 模块里的缓存
+        shared = bizvocab_cards.FRAGMENTS
+        bizvocab_cards.FRAGMENTS = _Uncached()
+        try:
+            t0 = time.perf_counter()
+            nbytes = render_all(build)
+            t1 = time.perf_counter()
+        finally:
+            bizvocab_cards.FRAGMENTS = shared
+        render_all(build)
+        return t1 - t0, time.perf_counter() - t1, nbytes / cards
+
+    bizvocab_cards.FRAGMENTS.clear()
+    t0 = time.perf_counter()
+    old_bytes = sum(len(legacy(ws)) for ws in batches)
+    legacy_seconds = time.perf_counter() - t0
+    learn_plain, learn_cached, learn_bytes = timed(bizvocab_learner.build_feishu_card)
+    t0 = time.perf_counter()
+    review_bytes = render_all(bizvocab_reviewer.build_review_card) / cards
+    review_plain = time.perf_counter() - t0
+    us = lambda seconds: f"{seconds / cards * 1e6:.1f}µs/张"
+    print(f"{cards} 张 {words_per_card} 词卡片（序列化器 {'orjson' if orjson else 'json'}，词库 2000 词）：")
+    print(f"  学习卡片 逐词拼 dict + json.dumps：{us(legacy_seconds)}，平均 {old_bytes / cards:.0f} 字节")
+    print(f"  学习卡片 模板 + 片段装箱：        {us(learn_plain)}，平均 {learn_bytes:.0f} 字节")
+    print(f"  学习卡片 加片段缓存：             {us(learn_cached)}")
+    print(f"  复习卡片 模板 + 片段装箱：        {us(review_plain)}，平均 {review_bytes:.0f} 字节（不走片段缓存）")
+    print(f"  {bizvocab_cards.FRAGMENTS.summary()}")
+
+def split_demo(n_words, max_bytes):
+    import bizvocab_learner
+    import bizvocab_loadtest
+    import bizvocab_stats
+    words = bizvocab_loadtest.synthetic_words(n_words)
+    outbox = Outbox(max_bytes)
+    outbox.add(bizvocab_learner.build_feishu_card(words))
+    outbox.add(bizvocab_stats.build_weekly_card({"totals": {}, "weekly": []}))
+    sizes = []
+    outbox.flush(lambda payload: sizes.append(len(payload)) or True)
+    print(f"{n_words} 个单词 + 周报，上限 {max_bytes} 字节：" + outbox.summary())
+    print("各条消息字节数：" + ", ".join(map(str, sizes)))
+
+def main():
+    parser = argparse.ArgumentParser(description="飞书卡片渲染")
+    sub = parser.add_subparsers(dest="cmd")
+    p_bench = sub.add_parser("bench", help="渲染 + 序列化压测")
+    p_bench.add_argument("--words", type=int, default=5)
+    p_bench.add_argument("--cards", type=int, default=20000)
+    p_split = sub.add_parser("split", help="查看拆分/合并结果（不发送）")
+    p_split.add_argument("--words", type=int, default=200)
+    p_split.add_argument("--max-bytes", type=int, default=MAX_PAYLOAD)
+    args = parser.parse_args()
+
+    if args.cmd == "split":
+        split_demo(args.words, args.max_bytes)
+    else:
+        bench(getattr(args, "words", 5), getattr(args, "cards", 20000))
+
+if __name__ == "__main__":
+    main()
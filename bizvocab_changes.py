@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# business_vocab 变更日志（CDC）：触发器把每次增删改追加到 vocab_changes，派生数据按位点增量消费
+#
+# 用法：
+#   python bizvocab_changes.py status                     # 日志范围
+#   python bizvocab_changes.py tail [--after 0] [--limit 20]
+#   python bizvocab_changes.py prune [--days 30]          # 删除超过保留期的变更
+#
+# 爬虫、清洗脚本、补例句、学习/复习标记等各条写入路径都不用改：触发器在同一事务里写日志，
+# 事务回滚时日志也一起回滚。表和触发器由 bizvocab_schema 的迁移创建，UPDATE 只在触发器跟踪的列
+# 有变化时记录，fields 列出变了哪些列；INSERT / DELETE 的 fields 为空，表示整行。
+# 创建触发器需要 TRIGGER 权限，开启 binlog 时还需要 SUPER 或 log_bin_trust_function_creators=1。
+#
+# 序号是 AUTO_INCREMENT，分配顺序和提交顺序不一定一致：读到序号不连续时，空洞之后的变更
+# 写入不足 GAP_SETTLE 秒就先停在空洞前，等没提交的事务落地；超过 GAP_SETTLE 秒仍缺的序号
+# 视为回滚或预分配跳过的空号。因此持有未提交变更超过 GAP_SETTLE 秒的长事务可能被漏读。
+#
+# 消费者：内存里的派生数据（bizvocab_lookup 的查词索引、bizvocab_dispatcher 的片段缓存）启动时用
+# latest_seq 取位点并全量加载，之后用 changed_ids 增量刷新，位点只记在进程内。它们每隔几十秒就读一次，
+# 保留期（KEEP_DAYS）远长于此；进程重启后重新全量加载，不依赖被清理掉的旧变更。
+
+import os
+import argparse
+import datetime
+import collections
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_schema
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+OP_INSERT = "insert"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+BATCH = 1000        # 每次读多少条变更
+GAP_SETTLE = 5      # 秒，序号空洞等待多久后视为空号
+KEEP_DAYS = 30      # prune 默认保留天数
+PRUNE_CHUNK = 10000
+
+Change = collections.namedtuple("Change", "seq changed_at op word_id fields")
+
+# ---------- 读取 ----------
+def _fields(value):
+    # 连接器把 SET 列转成 set，部分版本返回逗号分隔的字符串
+    if not value:
+        return None
+    return frozenset(value.split(",") if isinstance(value, str) else value)
+
+def read(cursor, after, limit=BATCH, settle=GAP_SETTLE):
+    """返回 (变更列表, 新位点)：序号大于 after 的至多 limit 条，遇到尚未稳定的空洞就停下"""
+    cursor.execute("SELECT NOW(3)")
+    now = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT seq, changed_at, op, word_id, fields FROM vocab_changes WHERE seq > %s ORDER BY seq LIMIT %s",
+        (after, limit)
+    )
+    changes = []
+    expect = after + 1
+    for seq, changed_at, op, word_id, fields in cursor.fetchall():
+        if seq != expect and (now - changed_at).total_seconds() < settle:
+            break
+        changes.append(Change(seq, changed_at, op, word_id, _fields(fields)))
+        expect = seq + 1
+    return changes, expect - 1
+
+def latest_seq(cursor, settle=GAP_SETTLE):
+    """稳定位点：写入超过 settle 秒的最大序号。全量加载前取这个值，之后的变更下次增量时会再读一遍"""
+    cursor.execute(
+        "SELECT COALESCE(MAX(seq), 0) FROM vocab_changes WHERE changed_at < NOW(3) - INTERVAL %s SECOND",
+        (settle,)
+    )
+    return cursor.fetchone()[0]
+
+def changed_ids(cursor, after, fields=None, limit=BATCH):
+    """读到追平为止，返回 (需要重新加载的 id, 已删除的 id, 新位点)。
+    fields 给出时，只改了其他列的 update 不算"""
+    upserts, deletes = set(), set()
+    while True:
+        changes, offset = read(cursor, after, limit)
+        for c in changes:
+            if c.op == OP_DELETE:
+                upserts.discard(c.word_id)
+                deletes.add(c.word_id)
+            elif fields is None or c.fields is None or c.fields & fields:
+                deletes.discard(c.word_id)
+                upserts.add(c.word_id)
+        if offset == after or len(changes) < limit:
+            return upserts, deletes, offset
+        after = offset
+
+# ---------- 维护 ----------
+def status():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), MIN(seq), MAX(seq), MIN(changed_at), MAX(changed_at) FROM vocab_changes")
+    total, first, last, oldest, newest = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    print(f"变更日志: {total} 条，序号 {first or 0} ~ {last or 0}，时间 {oldest or '-'} ~ {newest or '-'}")
+
+def tail(after=0, limit=20):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    changes, _ = read(cursor, after, limit, settle=0)
+    cursor.close()
+    conn.close()
+    for c in changes:
+        fields = ",".join(sorted(c.fields)) if c.fields else "*"
+        print(f"{c.seq:>10} {c.changed_at} {c.op:<6} {c.word_id:>8} {fields}")
+
+def prune(keep_days=KEEP_DAYS):
+    """删除早于保留期的变更；分批删除，避免长事务"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    deleted = 0
+    while True:
+        cursor.execute(
+            "DELETE FROM vocab_changes WHERE changed_at < NOW(3) - INTERVAL %s DAY ORDER BY seq LIMIT %s",
+            (keep_days, PRUNE_CHUNK)
+        )
+        conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < PRUNE_CHUNK:
+            break
+    cursor.close()
+    conn.close()
+    return deleted
+
+def main():
+    parser = argparse.ArgumentParser(description="business_vocab 变更日志")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("status", help="日志范围（默认）")
+    p_tail = sub.add_parser("tail", help="查看变更")
+    p_tail.add_argument("--after", type=int, default=0)
+    p_tail.add_argument("--limit", type=int, default=20)
+    p_prune = sub.add_parser("prune", help="清理旧变更")
+    p_prune.add_argument("--days", type=int, default=KEEP_DAYS)
+    args = parser.parse_args()
+
+    bizvocab_schema.migrate()
+    if args.cmd == "tail":
+        tail(args.after, args.limit)
+    elif args.cmd == "prune":
+        print(f"已删除 {prune(args.days)} 条变更")
+    else:
+        status()
+
+if __name__ == "__main__":
+    main()
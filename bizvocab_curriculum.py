@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 学习顺序：按语料词频、BEC 级别和词性给每个单词算优先级，批量写入 business_vocab.priority_score，
+# 挑新词从 ORDER BY RAND() 全表排序改为 (learned, priority_score) 索引上的 top-k 读取。
+#
+# 用法：
+#   python bizvocab_curriculum.py recompute [--dry-run]   # 全表重算优先级（每天跑一次即可，爬虫入库后也可手动跑）
+#   python bizvocab_curriculum.py show [--limit 20]       # 查看排在最前的未学单词及各项得分
+#   python bizvocab_curriculum.py bench [--terms 100000 --sentences 200000]
+#
+# 优先级 = 词频 × WEIGHT_FREQ + 级别 × WEIGHT_LEVEL + 词性 × WEIGHT_POS，各项都归一化到 [0, 1]：
+#   词频   本地例句语料（EXAMPLE_CORPUS）加库里已有例句中的出现次数，取 log 后除以最大值；词组取各词次数的最小值
+#   级别   bec_level 1=初级 2=中级 3=高级，越基础越靠前；未标注按中级算
+#   词性   名词/动词最优先，其次形容词、副词，虚词靠后
+# 新入库的单词 priority_score 默认为 0，排在最后，直到下一次重算。
+
+import os
+import time
+import random
+import argparse
+import collections
+import mysql.connector
+import numpy as np
+from dotenv import load_dotenv
+
+import bizvocab_schema
+from bizvocab_example_sources import EXAMPLE_CORPUS, TOKEN_RE
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+WEIGHT_FREQ = 0.6
+WEIGHT_LEVEL = 0.25
+WEIGHT_POS = 0.15
+
+# 下标为 bec_level，0 表示未标注
+LEVEL_SCORES = np.array([0.6, 1.0, 0.6, 0.3], dtype=np.float32)
+POS_SCORES = {
+    "n": 1.0, "v": 1.0, "vt": 1.0, "vi": 1.0,
+    "adj": 0.8, "a": 0.8,
+    "adv": 0.6, "ad": 0.6,
+    "prep": 0.4, "conj": 0.4, "pron": 0.4,
+    "num": 0.3, "art": 0.2, "int": 0.2, "interj": 0.2,
+}
+POS_DEFAULT = 0.5
+
+# 抖动：从前 limit × CANDIDATE_FACTOR 个候选里按“得分 + 抖动 × 随机数”重新取前 limit 个，
+# 0 表示严格按优先级；同分数段的单词轮流出现，不会每个学习者都拿到完全相同的几个词
+CURRICULUM_JITTER = float(os.getenv("CURRICULUM_JITTER", "0.05"))
+CANDIDATE_FACTOR = 3
+WRITE_CHUNK = 5000
+
+FETCH_SQL = (
+    "SELECT id, term, part_of_speech, translation, example_sentence, example_chinese, priority_score "
+    "FROM business_vocab WHERE learned=0 ORDER BY priority_score DESC, id DESC LIMIT %s"
+)
+
+# ---------- 挑新词 ----------
+def candidate_pool(limit, jitter=CURRICULUM_JITTER):
+    return limit * CANDIDATE_FACTOR if jitter > 0 else limit
+
+def fetch_new_words(cursor, limit, jitter=CURRICULUM_JITTER):
+    """cursor 需为 dictionary=True；索引上倒序扫描前 candidate_pool(limit) 行"""
+    cursor.execute(FETCH_SQL, (candidate_pool(limit, jitter),))
+    rows = cursor.fetchall()
+    if jitter > 0 and len(rows) > limit:
+        rows.sort(key=lambda r: r["priority_score"] + jitter * random.random(), reverse=True)
+        rows = rows[:limit]
+    return rows
+
+# ---------- 特征 ----------
+def corpus_counts(sentences):
+    counts = collections.Counter()
+    for sentence in sentences:
+        counts.update(TOKEN_RE.findall(sentence.lower()))
+    return counts
+
+def corpus_sentences(path=EXAMPLE_CORPUS):
+    if not path or not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            sentence = line.split("\t", 1)[0].strip()
+            if sentence:
+                yield sentence
+
+def term_frequencies(terms, counts):
+    freq = np.zeros(len(terms), dtype=np.float32)
+    for i, term in enumerate(terms):
+        tokens = TOKEN_RE.findall((term or "").lower())
+        if tokens:
+            freq[i] = min(counts.get(t, 0) for t in tokens)
+    return freq
+
+def pos_key(pos):
+    """“vt.”、“n./v.” 之类只取第一个词性"""
+    pos = (pos or "").strip().lower()
+    for i, ch in enumerate(pos):
+        if not ch.isalpha():
+            return pos[:i]
+    return pos
+
+def score_components(freq, levels, pos_list):
+    """返回 (词频分, 级别分, 词性分)，均为 float32 数组"""
+    log_freq = np.log1p(freq)
+    top = log_freq.max() if len(log_freq) else 0
+    freq_score = log_freq / top if top > 0 else np.zeros_like(log_freq)
+    levels = np.clip(np.asarray(levels, dtype=np.int64), 0, len(LEVEL_SCORES) - 1)
+    level_score = LEVEL_SCORES[levels]
+    # 词性种类很少：先去重，每种查一次表再按下标展开
+    keys, inverse = np.unique(np.array([pos_key(p) for p in pos_list], dtype=object), return_inverse=True)
+    pos_score = np.array([POS_SCORES.get(k, POS_DEFAULT) for k in keys], dtype=np.float32)[inverse]
+    return freq_score.astype(np.float32), level_score, pos_score
+
+def priority_scores(freq, levels, pos_list):
+    freq_score, level_score, pos_score = score_components(freq, levels, pos_list)
+    return (WEIGHT_FREQ * freq_score + WEIGHT_LEVEL * level_score + WEIGHT_POS * pos_score).astype(np.float32)
+
+# ---------- 批量重算 ----------
+def load_rows(cursor):
+    cursor.execute("SELECT id, term, part_of_speech, IFNULL(bec_level, 0), example_sentence FROM business_vocab")
+    return cursor.fetchall()
+
+def write_scores(cursor, ids, scores):
+    """分块写入临时表后一条 UPDATE ... JOIN，只改有变化的行；返回更新行数"""
+    cursor.execute("CREATE TEMPORARY TABLE IF NOT EXISTS tmp_priority (id INT NOT NULL PRIMARY KEY, score FLOAT NOT NULL)")
+    cursor.execute("TRUNCATE TABLE tmp_priority")
+    pairs = list(zip(ids, scores.tolist()))
+    for i in range(0, len(pairs), WRITE_CHUNK):
+        cursor.executemany("INSERT INTO tmp_priority (id, score) VALUES (%s, %s)", pairs[i:i + WRITE_CHUNK])
+    cursor.execute(
+        "UPDATE business_vocab v JOIN tmp_priority t ON t.id = v.id "
+        "SET v.priority_score = t.score WHERE v.priority_score <> t.score"
+    )
+    updated = cursor.rowcount
+    cursor.execute("DROP TEMPORARY TABLE tmp_priority")
+    return updated
+
+def recompute(corpus=EXAMPLE_CORPUS, dry_run=False):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        t0 = time.perf_counter()
+        rows = load_rows(cursor)
+        if not rows:
+            return 0
+        ids, terms, pos_list, levels, examples = zip(*rows)
+        counts = corpus_counts(corpus_sentences(corpus))
+        counts.update(corpus_counts(e for e in examples if e))
+        scores = priority_scores(term_frequencies(terms, counts), levels, pos_list)
+        t1 = time.perf_counter()
+        updated = 0 if dry_run else write_scores(cursor, ids, scores)
+        conn.commit()
+        print(f"重算 {len(ids)} 个单词的优先级：计算 {t1 - t0:.2f}s，写入 {time.perf_counter() - t1:.2f}s，"
+              f"更新 {updated} 行{'（dry-run，未写入）' if dry_run else ''}")
+        return updated
+    finally:
+        cursor.close()
+        conn.close()
+
+def show(limit=20):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, term, part_of_speech, bec_level, priority_score FROM business_vocab "
+        "WHERE learned=0 ORDER BY priority_score DESC, id DESC LIMIT %s", (limit,)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    print(f"{'id':>7}  {'单词':<24}{'词性':<8}{'级别':>4}{'优先级':>10}")
+    for wid, term, pos, level, score in rows:
+        print(f"{wid:>7}  {term:<24}{pos or '-':<8}{level or '-':>4}{score:>10.4f}")
+
+# ---------- 压测 ----------
+def bench(terms=100000, sentences=200000, seed=0):
+    from bizvocab_lookup import synthetic_rows
+    rng = random.Random(seed)
+    rows = synthetic_rows(terms)
+    words = [term for _, term, _, _ in rows]
+    # 词频近似 Zipf：少数核心词大量出现，长尾词很少出现
+    ranks = np.arange(1, len(words) + 1, dtype=np.float64)
+    probs = (1 / ranks) / (1 / ranks).sum()
+    draws = np.random.default_rng(seed).choice(len(words), size=(sentences, 8), p=probs)
+    corpus = [" ".join(words[i] for i in row) for row in draws]
+    levels = [rng.randint(0, 3) for _ in rows]
+
+    t0 = time.perf_counter()
+    counts = corpus_counts(corpus)
+    t1 = time.perf_counter()
+    freq = term_frequencies(words, counts)
+    scores = priority_scores(freq, levels, [pos for _, _, pos, _ in rows])
+    t2 = time.perf_counter()
+    order = np.argsort(-scores, kind="stable")
+    print(f"{terms} 个单词 / {sentences} 句语料：统计词频 {t1 - t0:.2f}s，打分 {(t2 - t1) * 1000:.0f}ms")
+    print("前 5：" + "、".join(f"{words[i]}({scores[i]:.3f})" for i in order[:5]))
+    print(f"有词频的单词 {int((freq > 0).sum())} 个，得分中位数 {float(np.median(scores)):.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="学习顺序（单词优先级）")
+    sub = parser.add_subparsers(dest="cmd")
+    p_recompute = sub.add_parser("recompute", help="全表重算优先级（默认）")
+    p_recompute.add_argument("--corpus", default=EXAMPLE_CORPUS)
+    p_recompute.add_argument("--dry-run", action="store_true", help="只计算不写入")
+    p_show = sub.add_parser("show", help="查看排在最前的未学单词")
+    p_show.add_argument("--limit", type=int, default=20)
+    p_bench = sub.add_parser("bench", help="合成数据压测打分")
+    p_bench.add_argument("--terms", type=int, default=100000)
+    p_bench.add_argument("--sentences", type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.terms, args.sentences)
+        return
+    bizvocab_schema.migrate()
+    if args.cmd == "show":
+        show(args.limit)
+    else:
+        recompute(getattr(args, "corpus", EXAMPLE_CORPUS), getattr(args, "dry_run", False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 按学习者本地时间推送：每个学习者有自己的时区和复习/学习时间（learners 表），
+# 调度器把当天所有待触发的推送放进按秒分槽的时间轮，每秒只取当前槽，不扫描全部学习者。
+#
+# 用法：
+#   python bizvocab_dispatcher.py run [--spread 60] [--workers 32]
+#   python bizvocab_dispatcher.py profile [--date 2025-10-09] [--spread 60]   # 每秒推送量分布
+#   python bizvocab_dispatcher.py bench --learners 1000000                     # 合成数据压测，不连数据库
+#
+# 时间轮结构（一天 86400 个一秒槽，按 UTC 日切分）：
+#   entries[k]   学习者在列数组中的下标 * 2 + 任务（0 复习 / 1 学习），按 (槽, 任务) 排序
+#   starts[s]    第 s 槽在 entries 中的起始位置，槽 s 的推送即 entries[starts[s]:starts[s+1]]
+# 学习者按 id 排序存成列数组（时区编号、两个推送时刻的秒数），百万级学习者约占 30MB。
+# 当天修改过的学习者：时间轮里的旧条目打上取消标记，新的触发时间放进小顶堆。
+# 本地日期按学习者时区计算，工作日判断也按本地日期；夏令时切换当天逐个时刻换算 UTC。
+#
+# 说明：学习进度是全局的（business_vocab 的 learned / review_count），所有学习者共用一份：
+# 每天每项任务只在第一次到点时选词、推进进度一次，卡片存进 daily_editions，
+# 之后到点的学习者收到同一份卡片（见 bizvocab_editions）。
+
+import os
+import sys
+import time
+import heapq
+import fcntl
+import argparse
+import datetime
+import threading
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_calendar
+import bizvocab_cards
+import bizvocab_changes
+import bizvocab_editions
+import bizvocab_leader
+import bizvocab_schema
+import bizvocab_learner
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+LOCK_FILE = "dispatcher.lock"
+HA_MODE = os.getenv("BOT_HA", "file")
+DEFAULT_TZ = "Asia/Shanghai"
+
+JOB_REVIEW = 0
+JOB_LEARN = 1
+JOB_BOTH = 2  # 同一次触发里既到了复习又到了学习时间，两张卡片合成一条消息
+JOB_NAMES = {JOB_REVIEW: "复习", JOB_LEARN: "学习", JOB_BOTH: "复习+学习"}
+
+SLOTS = 86400
+REFRESH_INTERVAL = 30   # 每隔多少秒拉取一次 learners 表的增量修改
+PREBUILD_AHEAD = 120    # 提前多少秒在后台构建下一天的时间轮
+DELIVERY_CHUNK = 200    # 每个投递任务处理的学习者数
+LATE_WARN = 1.0         # 投递开始时间晚于目标超过该秒数时记日志
+
+def log(msg):
+    ts = datetime.datetime.now(SH_TZ).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{ts}] {msg}", flush=True)
+
+def is_workday(day):
+    return bizvocab_calendar.is_workday(day)
+
+def _seconds(value):
+    """mysql.connector 把 TIME 列读成 timedelta"""
+    return int(value.total_seconds()) % SLOTS if isinstance(value, datetime.timedelta) else int(value)
+
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        log(f"未知时区 {name}，按 {DEFAULT_TZ} 处理")
+        return ZoneInfo(DEFAULT_TZ)
+
+# ---------- 学习者列数组 ----------
+class LearnerTable:
+    def __init__(self, ids, tz_names, tz_idx, review_sec, learn_sec):
+        self.ids = np.asarray(ids, dtype=np.int64)             # 升序
+        self.tz_names = list(tz_names)
+        self.tz_idx = np.asarray(tz_idx, dtype=np.int16)
+        self.review_sec = np.asarray(review_sec, dtype=np.int32)
+        self.learn_sec = np.asarray(learn_sec, dtype=np.int32)
+        order = np.argsort(self.tz_idx, kind="stable")
+        bounds = np.searchsorted(self.tz_idx[order], np.arange(len(self.tz_names) + 1))
+        self.groups = [(self.tz_names[g], order[bounds[g]:bounds[g + 1]]) for g in range(len(self.tz_names))]
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: (id, timezone, review_time, learn_time)，按 id 升序"""
+        tz_names = sorted({r[1] or DEFAULT_TZ for r in rows})
+        tz_pos = {name: i for i, name in enumerate(tz_names)}
+        return cls(
+            [r[0] for r in rows], tz_names, [tz_pos[r[1] or DEFAULT_TZ] for r in rows],
+            [_seconds(r[2]) for r in rows], [_seconds(r[3]) for r in rows],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, learner_id):
+        pos = int(np.searchsorted(self.ids, learner_id))
+        return pos if pos < len(self.ids) and self.ids[pos] == learner_id else None
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.tz_idx.nbytes + self.review_sec.nbytes + self.learn_sec.nbytes
+
+def spread_offsets(ids, spread):
+    """按 id 散列出 [0, spread) 秒的固定偏移，把同一时刻的大量推送摊到 spread 秒内"""
+    if not spread:
+        return np.zeros(len(ids), dtype=np.int32)
+    return ((np.asarray(ids, dtype=np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32)
+            % np.uint64(spread)).astype(np.int32)
+
+def local_fire_ts(zone, local_date, secs):
+    """本地日期 + 当天秒数 → UTC 时间戳；当天 UTC 偏移不变时整列相加，夏令时切换日逐个不同时刻换算"""
+    start = datetime.datetime.combine(local_date, datetime.time(0), zone)
+    end = start + datetime.timedelta(days=1)
+    if start.utcoffset() == end.utcoffset():
+        return int(start.timestamp()) + secs.astype(np.int64)
+    uniq, inverse = np.unique(secs, return_inverse=True)
+    ts = np.array([int((start + datetime.timedelta(seconds=int(s))).timestamp()) for s in uniq], dtype=np.int64)
+    return ts[inverse]
+
+def fire_times(table, positions, zone, day_start, spread, workday):
+    """positions 这批学习者（同一时区）在 [day_start, day_start + 1 天) 内的 (UTC 时间戳, 下标*2+任务)"""
+    utc_date = datetime.datetime.fromtimestamp(day_start, datetime.timezone.utc).date()
+    offsets = spread_offsets(table.ids[positions], spread)
+    ts_parts, entry_parts = [], []
+    # 一个 UTC 日覆盖本地的前一天、当天、后一天的一部分
+    for delta in (-1, 0, 1):
+        local_date = utc_date + datetime.timedelta(days=delta)
+        if not workday(local_date):
+            continue
+        for job, secs in ((JOB_REVIEW, table.review_sec), (JOB_LEARN, table.learn_sec)):
+            ts = local_fire_ts(zone, local_date, secs[positions] + offsets)
+            mask = (ts >= day_start) & (ts < day_start + SLOTS)
+            ts_parts.append(ts[mask])
+            entry_parts.append(positions[mask].astype(np.int64) * 2 + job)
+    if not ts_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(ts_parts), np.concatenate(entry_parts)
+
+# ---------- 时间轮 ----------
+class TimingWheel:
+    def __init__(self, table, day_start, spread=0, workday=is_workday):
+        self.day_start = day_start
+        ts_parts, entry_parts = [], []
+        for tz_name, positions in table.groups:
+            ts, entries = fire_times(table, positions, _zone(tz_name), day_start, spread, workday)
+            ts_parts.append(ts)
+            entry_parts.append(entries)
+        slots = np.concatenate(ts_parts) - day_start if ts_parts else np.empty(0, dtype=np.int64)
+        entries = np.concatenate(entry_parts) if entry_parts else np.empty(0, dtype=np.int64)
+        # 同一秒内复习排在学习前面，与原来 10:25 / 10:30 的先后一致
+        order = np.argsort(slots * 2 + (entries & 1), kind="stable")
+        self.entries = entries[order]
+        self.starts = np.searchsorted(slots[order], np.arange(SLOTS + 1)).astype(np.int64)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def segment(self, first_slot, last_slot):
+        return self.entries[self.starts[first_slot]:self.starts[last_slot + 1]]
+
+    def per_second(self):
+        return np.diff(self.starts)
+
+    @property
+    def nbytes(self):
+        return self.entries.nbytes + self.starts.nbytes
+
+def utc_day_start(ts):
+    return int(ts) - int(ts) % SLOTS
+
+# ---------- 数据库 ----------
+LEARNER_COLUMNS = "id, timezone, review_time, learn_time"
+
+def load_learners(since=None):
+    """返回 (行, 快照时间)；since 不为空时只返回之后修改过的学习者（含停用的，active 在最后一列）"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT NOW(3)")
+    snapshot = cursor.fetchone()[0]
+    if since is None:
+        cursor.execute(f"SELECT {LEARNER_COLUMNS}, active FROM learners WHERE active = 1 ORDER BY id")
+    else:
+        cursor.execute(
+            f"SELECT {LEARNER_COLUMNS}, active FROM learners WHERE updated_at > %s ORDER BY id", (since,)
+        )
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return rows, snapshot
+
+def fetch_webhooks(learner_ids):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, webhook FROM learners WHERE active = 1 AND id IN (%s)" % ",".join(["%s"] * len(learner_ids)),
+        list(learner_ids)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return rows
+
+# 每项任务对应的卡片；复习+学习的两份卡片装进同一批消息
+JOB_KINDS = {
+    JOB_REVIEW: (bizvocab_editions.KIND_REVIEW,),
+    JOB_LEARN: (bizvocab_editions.KIND_LEARN,),
+    JOB_BOTH: (bizvocab_editions.KIND_REVIEW, bizvocab_editions.KIND_LEARN),
+}
+
+def deliver(job, learner_ids, fire_ts):
+    """默认投递：当天（UTC）的卡片只生成一次，同一份消息发到每个学习者的 webhook；
+    工作日已按学习者本地日期判断过"""
+    messages = bizvocab_editions.payloads(JOB_KINDS[job], bizvocab_editions.utc_date(fire_ts))
+    if not messages:
+        return
+    for learner_id, webhook in fetch_webhooks(learner_ids):
+        try:
+            if not bizvocab_editions.send(messages, webhook):
+                log(f"学习者 {learner_id} {JOB_NAMES[job]}推送未全部成功")
+        except Exception as e:
+            log(f"学习者 {learner_id} {JOB_NAMES[job]}推送失败: {e}")
+
+def evict_changed_fragments(offset):
+    """词条/释义/例句改过或删掉的单词从卡片片段缓存里移除，返回新的变更日志位点；offset 为空时只取当前位点"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        if offset is None:
+            return bizvocab_changes.latest_seq(cursor)
+        ids, removed, offset = bizvocab_changes.changed_ids(
+            cursor, offset, frozenset(bizvocab_cards.FRAGMENT_FIELDS))
+    finally:
+        cursor.close()
+        conn.close()
+    bizvocab_cards.FRAGMENTS.invalidate(ids | removed)
+    return offset
+
+def merge_jobs(review_ids, learn_ids):
+    """同一批触发里两项任务都到了的学习者改为 JOB_BOTH；返回非空的 (任务, id 数组)"""
+    both = np.intersect1d(review_ids, learn_ids)
+    if len(both):
+        review_ids = np.setdiff1d(review_ids, both)
+        learn_ids = np.setdiff1d(learn_ids, both)
+    return [(j, ids) for j, ids in ((JOB_REVIEW, review_ids), (JOB_LEARN, learn_ids), (JOB_BOTH, both)) if len(ids)]
+
+# ---------- 调度器 ----------
+class Dispatcher:
+    def __init__(self, loader=load_learners, handler=deliver, spread=0, workers=16,
+                 chunk=DELIVERY_CHUNK, workday=is_workday, lease=None):
+        self.loader = loader
+        self.handler = handler
+        self.spread = spread
+        self.chunk = chunk
+        self.workday = workday
+        self.lease = lease
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deliver")
+        self.table = self.wheel = None
+        self.cancelled = None
+        self.extra = []        # 当天修改过的学习者：(UTC 时间戳, 任务, 学习者 id, 版本)
+        self.versions = {}
+        self.next_slot = 0
+        self.snapshot = None
+        self.pending = None    # 后台构建中的下一天 (学习者列数组, 时间轮, 快照时间)
+        self.prebuild_thread = None
+        self.stats = {"fired": 0, "ticks": 0, "tick_seconds": 0.0}
+        self.fragment_offset = None
+
+    def _build(self, day_start):
+        rows, snapshot = self.loader()
+        table = rows if isinstance(rows, LearnerTable) else LearnerTable.from_rows(rows)
+        return table, TimingWheel(table, day_start, self.spread, self.workday), snapshot
+
+    def _install(self, table, wheel, snapshot):
+        self.table, self.wheel, self.snapshot = table, wheel, snapshot
+        self.cancelled = np.zeros(len(table), dtype=bool)
+        self.extra = []
+        self.versions = {}
+
+    def start_day(self, now=None):
+        now = time.time() if now is None else now
+        t0 = time.perf_counter()
+        self._install(*self._build(utc_day_start(now)))
+        self.next_slot = int(now) - self.wheel.day_start
+        log(f"时间轮就绪：{len(self.table)} 个学习者，今日 {len(self.wheel)} 次推送，"
+            f"构建耗时 {time.perf_counter() - t0:.2f}s")
+
+    def refresh(self, now=None):
+        """拉取快照之后修改过的学习者：取消时间轮里的旧条目，剩余时间内的新触发时间进堆"""
+        if self.snapshot is None:
+            return 0
+        rows, snapshot = self.loader(since=self.snapshot)
+        self.snapshot = snapshot
+        now = time.time() if now is None else now
+        day_start = self.wheel.day_start
+        for row in rows:
+            learner_id, active = row[0], row[-1]
+            pos = self.table.position(learner_id)
+            if pos is not None:
+                self.cancelled[pos] = True
+            version = self.versions.get(learner_id, 0) + 1
+            self.versions[learner_id] = version
+            if not active:
+                continue
+            single = LearnerTable.from_rows([row[:4]])
+            ts, entries = fire_times(single, np.arange(1), _zone(single.tz_names[0]),
+                                     day_start, self.spread, self.workday)
+            for t, e in zip(ts.tolist(), entries.tolist()):
+                if t >= max(now, day_start + self.next_slot):
+                    heapq.heappush(self.extra, (t, e & 1, learner_id, version))
+        return len(rows)
+
+    def _dispatch(self, job, learner_ids, fire_ts):
+        for i in range(0, len(learner_ids), self.chunk):
+            self.pool.submit(self._deliver_chunk, job, learner_ids[i:i + self.chunk], fire_ts)
+        self.stats["fired"] += len(learner_ids)
+
+    def _deliver_chunk(self, job, learner_ids, fire_ts):
+        late = time.time() - fire_ts
+        if late > LATE_WARN:
+            log(f"{JOB_NAMES[job]}推送延迟 {late:.1f}s（{len(learner_ids)} 人）")
+        try:
+            self.handler(job, learner_ids, fire_ts)
+        except Exception as e:
+            log(f"{JOB_NAMES[job]}投递失败: {e}")
+
+    def fire_due(self, now):
+        """触发 next_slot 到当前秒之间的所有槽（落后时一次追上）和堆里到期的条目"""
+        t0 = time.perf_counter()
+        wheel = self.wheel
+        last_slot = min(int(now) - wheel.day_start, SLOTS - 1)
+        if last_slot >= self.next_slot:
+            seg = wheel.segment(self.next_slot, last_slot)
+            if len(seg):
+                pos = seg >> 1
+                job = seg & 1
+                live = ~self.cancelled[pos]
+                fire_ts = wheel.day_start + last_slot
+                for j, ids in merge_jobs(self.table.ids[pos[live & (job == JOB_REVIEW)]],
+                                         self.table.ids[pos[live & (job == JOB_LEARN)]]):
+                    self._dispatch(j, ids.tolist(), fire_ts)
+            self.next_slot = last_slot + 1
+        due = {JOB_REVIEW: [], JOB_LEARN: []}
+        while self.extra and self.extra[0][0] <= now:
+            ts, j, learner_id, version = heapq.heappop(self.extra)
+            if self.versions.get(learner_id) == version:
+                due[j].append(learner_id)
+        for j, ids in merge_jobs(np.array(due[JOB_REVIEW], dtype=np.int64), np.array(due[JOB_LEARN], dtype=np.int64)):
+            self._dispatch(j, ids.tolist(), int(now))
+        self.stats["ticks"] += 1
+        self.stats["tick_seconds"] += time.perf_counter() - t0
+
+    def _prebuild(self, day_start):
+        try:
+            self.pending = self._build(day_start)
+        except Exception as e:
+            log(f"预构建下一天时间轮失败，将在零点同步构建: {e}")
+
+    def roll_over(self, now):
+        day_start = self.wheel.day_start + SLOTS
+        if self.prebuild_thread is not None:
+            self.prebuild_thread.join()
+            self.prebuild_thread = None
+        if self.pending is not None and self.pending[1].day_start == day_start:
+            self._install(*self.pending)
+        else:
+            self._install(*self._build(day_start))
+        self.pending = None
+        self.next_slot = 0
+        # 预构建快照之后的修改在新的一天重新生效
+        self.refresh(now)
+        log(f"切换到新的一天：今日 {len(self.wheel)} 次推送；{bizvocab_cards.FRAGMENTS.summary()}")
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        self.start_day()
+        last_refresh = time.monotonic()
+        while not stop.is_set():
+            now = time.time()
+            if self.lease is not None and not self.lease.is_leader():
+                # 备用节点只跟随进度；当前秒的槽可能已被原主节点触发，接手后从下一秒开始
+                self.next_slot = min(int(now) - self.wheel.day_start + 1, SLOTS)
+            else:
+                self.fire_due(now)
+            if self.next_slot >= SLOTS:
+                self.roll_over(now)
+                continue
+            seconds_left = self.wheel.day_start + SLOTS - now
+            if seconds_left < PREBUILD_AHEAD and self.pending is None and self.prebuild_thread is None:
+                self.prebuild_thread = threading.Thread(
+                    target=self._prebuild, args=(self.wheel.day_start + SLOTS,), daemon=True)
+                self.prebuild_thread.start()
+            if time.monotonic() - last_refresh >= REFRESH_INTERVAL:
+                try:
+                    changed = self.refresh()
+                    if changed:
+                        log(f"{changed} 个学习者的推送设置已更新")
+                except Exception as e:
+                    log(f"拉取学习者修改失败: {e}")
+                try:
+                    self.fragment_offset = evict_changed_fragments(self.fragment_offset)
+                except Exception as e:
+                    log(f"读取单词变更日志失败: {e}")
+                last_refresh = time.monotonic()
+            # 睡到下一整秒
+            stop.wait(1 - time.time() % 1 + 0.001)
+        self.pool.shutdown(wait=True)
+
+# ---------- 负载分布 ----------
+def load_profile(wheel, top=5):
+    per_second = wheel.per_second()
+    busy = np.flatnonzero(per_second)
+    print(f"全天推送 {len(wheel)} 次，分布在 {len(busy)} 个秒槽，峰值 {int(per_second.max()) if len(wheel) else 0} 次/秒")
+    for slot in np.argsort(per_second)[::-1][:top]:
+        if per_second[slot]:
+            t = datetime.datetime.fromtimestamp(wheel.day_start + int(slot), datetime.timezone.utc)
+            print(f"  {t:%H:%M:%S} UTC  {int(per_second[slot])} 次")
+
+# ---------- 压测 ----------
+BENCH_ZONES = ["Asia/Shanghai", "Asia/Tokyo", "Asia/Kolkata", "Europe/London", "Europe/Berlin",
+               "America/New_York", "America/Los_Angeles", "Australia/Adelaide", "America/Sao_Paulo", "UTC"]
+
+def synthetic_table(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # 大多数人停留在默认时间，其余在 07:00-21:00 之间的整分钟
+    custom = rng.random(n) < 0.4
+    review = np.where(custom, rng.integers(7 * 60, 21 * 60, size=n) * 60, 10 * 3600 + 25 * 60)
+    learn = np.where(custom, review + 300, 10 * 3600 + 30 * 60)
+    tz_idx = rng.choice(len(BENCH_ZONES), size=n, p=[0.6] + [0.4 / (len(BENCH_ZONES) - 1)] * (len(BENCH_ZONES) - 1))
+    return LearnerTable(np.arange(1, n + 1), BENCH_ZONES, tz_idx, review, learn)
+
+def bench(learners, spread, realtime, realtime_seconds):
+    table = synthetic_table(learners)
+    # 选一个工作日做全天分布，避免周末/假期时间轮为空
+    day = bizvocab_calendar.next_workday(datetime.date.today(), inclusive=True)
+    day_start = int(datetime.datetime.combine(day, datetime.time(0), datetime.timezone.utc).timestamp())
+    for s in sorted({0, spread}):
+        t0 = time.perf_counter()
+        wheel = TimingWheel(table, day_start, s)
+        print(f"--- spread={s}s  {day} UTC ---")
+        print(f"构建 {len(table)} 人时间轮 {time.perf_counter() - t0:.2f}s，"
+              f"内存：学习者 {table.nbytes / 2**20:.1f}MB + 时间轮 {wheel.nbytes / 2**20:.1f}MB")
+        load_profile(wheel, top=3)
+
+    # 空转一整天的每个槽，统计单次取槽成本（不含投递）
+    dispatcher = Dispatcher(loader=lambda since=None: (table, None), handler=lambda *a: None, spread=spread)
+    dispatcher._install(table, wheel, None)
+    dispatcher._dispatch = lambda job, ids, fire_ts: None
+    t0 = time.perf_counter()
+    for slot in range(SLOTS):
+        dispatcher.fire_due(day_start + slot)
+    print(f"逐秒触发全天 86400 个槽：平均每次 {(time.perf_counter() - t0) / SLOTS * 1e6:.1f}µs")
+
+    if realtime:
+        bench_realtime(realtime, realtime_seconds)
+
+def bench_realtime(count, seconds):
+    """未来几秒内安排 count 次推送，用真实时钟跑调度循环，统计投递开始时间相对目标的延迟"""
+    now = int(time.time()) + 2
+    start = now % SLOTS
+    secs = (start + np.arange(count) % seconds) % SLOTS
+    table = LearnerTable(np.arange(1, count + 1), ["UTC"], np.zeros(count), secs, (secs + seconds) % SLOTS)
+    lateness = []
+    lock = threading.Lock()
+
+    def handler(job, learner_ids, fire_ts):
+        late = time.time() - fire_ts
+        with lock:
+            lateness.extend([late] * len(learner_ids))
+
+    dispatcher = Dispatcher(loader=lambda since=None: (table, None), handler=handler,
+                            workday=lambda day: True, workers=8)
+    stop = threading.Event()
+    runner = threading.Thread(target=dispatcher.run, args=(stop,))
+    runner.start()
+    time.sleep(2 * seconds + 3)
+    stop.set()
+    runner.join()
+    values = np.sort(np.array(lateness))
+    if not len(values):
+        print("实时压测没有触发任何推送（跨 UTC 零点时会出现），请重试")
+        return
+    print(f"--- 实时触发 {len(values)} 次（{seconds}s 内每秒 {count // seconds} 人 × 2 个任务）---")
+    print(f"投递开始延迟 p50 {np.percentile(values, 50) * 1000:.1f}ms  p99 {np.percentile(values, 99) * 1000:.1f}ms  "
+          f"max {values[-1] * 1000:.1f}ms；平均每次 tick {dispatcher.stats['tick_seconds'] / max(dispatcher.stats['ticks'], 1) * 1000:.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="按学习者本地时间推送的调度器")
+    sub = parser.add_subparsers(dest="cmd")
+    p_run = sub.add_parser("run", help="启动调度（默认）")
+    p_run.add_argument("--spread", type=int, default=int(os.getenv("DISPATCH_SPREAD", 0)),
+                       help="把同一时刻的推送按学习者摊到 N 秒内")
+    p_run.add_argument("--workers", type=int, default=16)
+    p_profile = sub.add_parser("profile", help="查看某天（UTC）的每秒推送量")
+    p_profile.add_argument("--date", type=datetime.date.fromisoformat, default=None)
+    p_profile.add_argument("--spread", type=int, default=0)
+    p_bench = sub.add_parser("bench", help="合成学习者压测（不连数据库）")
+    p_bench.add_argument("--learners", type=int, default=1000000)
+    p_bench.add_argument("--spread", type=int, default=60)
+    p_bench.add_argument("--realtime", type=int, default=50000, help="实时触发压测的学习者数，0 为跳过")
+    p_bench.add_argument("--realtime-seconds", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.learners, args.spread, args.realtime, args.realtime_seconds)
+        return
+    if args.cmd == "profile":
+        day = args.date or datetime.datetime.now(datetime.timezone.utc).date()
+        rows, _ = load_learners()
+        day_start = int(datetime.datetime.combine(day, datetime.time(0), datetime.timezone.utc).timestamp())
+        load_profile(TimingWheel(LearnerTable.from_rows(rows), day_start, args.spread))
+        return
+
+    bizvocab_schema.migrate()
+    lease = lock_fh = None
+    if HA_MODE == "db":
+        lease = bizvocab_leader.LeaderLease(
+            "dispatcher", on_change=lambda leader: log("当选主节点" if leader else "已不是主节点，转为备用")
+        ).start()
+    else:
+        lock_fh = bizvocab_learner.acquire_lock(LOCK_FILE)
+    spread = getattr(args, "spread", 0)
+    workers = getattr(args, "workers", 16)
+    try:
+        Dispatcher(spread=spread, workers=workers, lease=lease).run()
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        if lease is not None:
+            lease.stop()
+        else:
+            fcntl.flock(lock_fh, fcntl.LOCK_UN)
+            lock_fh.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 选择题干扰项：预先为每个单词算好“拼写相近”和“释义相近”的 top-k 邻居，存进 vocab_neighbors，
+# 生成复习卡片时按主键取出即可，不在推送时做相似度计算。
+#
+# 用法：
+#   python bizvocab_distractors.py update      # 只为新增单词算邻居，并把它们并入老单词的邻居表（默认）
+#   python bizvocab_distractors.py rebuild     # 全量重算
+#   python bizvocab_distractors.py show <term>
+#   python bizvocab_distractors.py bench --terms 100000
+#
+# 相似度：字符 n-gram TF-IDF 的余弦相似度。
+#   拼写  term 加首尾标记后的 2/3-gram
+#   释义  translation 去掉分隔符后的单字/双字
+# n-gram 按词表精确编号（不散列，没有不同 n-gram 撞到同一维的假邻居），行归一化后分块算相似度（每块 BLOCK 行 × 全部单词）：
+#   文档频率最高的 DENSE_GRAMS 个 n-gram 存成稠密矩阵，做矩阵乘；
+#   其余 n-gram 每个只出现在少数单词里，存成倒排表，按块展开后累加到同一个分数矩阵。
+# 每块用 argpartition 取 top-k，内存只跟块大小有关，没有 Python 层面的 n² 循环。
+# 增量更新时 IDF 按当前全量重算，老单词之间的分数不重算；词库变化较大后跑一次 rebuild。
+
+import os
+import time
+import random
+import argparse
+import mysql.connector
+import numpy as np
+from dotenv import load_dotenv
+
+import bizvocab_schema
+import bizvocab_tiering
+from bizvocab_lookup import GRAM_STRIP, normalize_term, synthetic_rows
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+KIND_SPELLING = "spelling"
+KIND_MEANING = "meaning"
+KINDS = (KIND_SPELLING, KIND_MEANING)
+
+TOP_K = 8            # 每类保存的邻居数，卡片只用其中 3 个，多存几个用来避开重复释义
+DENSE_GRAMS = 512    # 存成稠密矩阵的高频 n-gram 数，其余走倒排表
+BLOCK = 512          # 分块矩阵乘的行数：内存约 BLOCK × 单词数 × 4 字节
+CHOICES = 4          # 选择题选项数（含正确答案）
+
+# ---------- 特征 ----------
+def spelling_key(term):
+    return normalize_term(term)
+
+def meaning_key(translation):
+    return GRAM_STRIP.sub("", translation or "")
+
+def spelling_grams(term):
+    text = f"^{spelling_key(term)}$"
+    return [text[i:i + n] for n in (2, 3) for i in range(len(text) - n + 1)]
+
+def meaning_grams(translation):
+    text = meaning_key(translation)
+    return [text[i:i + n] for n in (1, 2) for i in range(len(text) - n + 1)]
+
+FEATURES = {
+    KIND_SPELLING: (spelling_key, spelling_grams),
+    KIND_MEANING: (meaning_key, meaning_grams),
+}
+
+def _ranges(starts, lengths):
+    """把若干段 [start, start + length) 连成一个下标数组"""
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return offsets + np.arange(total, dtype=np.int64)
+
+class Features:
+    """n-gram 计数 → TF-IDF → 行 L2 归一化（空文本为全零行）。
+
+    n-gram 按词表编号，文档频率最高的 dense 个放进稠密矩阵，其余按行和按列（倒排）各存一份。
+    """
+    def __init__(self, texts, grams_fn, dense=DENSE_GRAMS):
+        vocab, rows, cols = {}, [], []
+        for i, text in enumerate(texts):
+            for g in grams_fn(text):
+                rows.append(i)
+                cols.append(vocab.setdefault(g, len(vocab)))
+        n, size = len(texts), max(len(vocab), 1)
+        # 合并同一单词里重复的 n-gram，得到按 (行, 列) 排序的词频
+        pairs, tf = np.unique(np.asarray(rows, dtype=np.int64) * size + np.asarray(cols, dtype=np.int64),
+                              return_counts=True)
+        rows, cols = pairs // size, pairs % size
+        df = np.bincount(cols, minlength=size)
+        idf = np.log((1 + n) / (1 + df)) + 1
+        weights = tf * idf[cols]
+        weights /= np.sqrt(np.bincount(rows, weights * weights, minlength=n))[rows]
+        # 按文档频率排名，前 dense 个进稠密矩阵
+        rank = np.empty(size, dtype=np.int64)
+        rank[np.argsort(-df, kind="stable")] = np.arange(size)
+        in_dense = rank[cols] < dense
+        self.n = n
+        self.dense = np.zeros((n, min(dense, len(vocab))), dtype=np.float32)
+        self.dense[rows[in_dense], rank[cols[in_dense]]] = weights[in_dense]
+        rows, cols, weights = rows[~in_dense], cols[~in_dense], weights[~in_dense].astype(np.float32)
+        self.row_ptr = np.searchsorted(rows, np.arange(n + 1))
+        self.row_cols, self.row_weights = cols, weights
+        by_col = np.argsort(cols, kind="stable")
+        self.col_ptr = np.searchsorted(cols[by_col], np.arange(size + 1))
+        self.col_rows, self.col_weights = rows[by_col], weights[by_col]
+
+    def __len__(self):
+        return self.n
+
+    def similarity(self, rows, others=None):
+        """rows 与 others（缺省全部单词）两两的余弦相似度，float32 矩阵 [len(rows), len(others)]"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if others is None:
+            sims = self.dense[rows] @ self.dense.T
+            column = None
+        else:
+            others = np.asarray(others, dtype=np.int64)
+            sims = self.dense[rows] @ self.dense[others].T
+            column = np.full(self.n, -1, dtype=np.int64)
+            column[others] = np.arange(len(others))
+        # 稀疏部分：展开 rows 的低频 n-gram，再展开每个 n-gram 的倒排表
+        starts = self.row_ptr[rows]
+        lengths = self.row_ptr[rows + 1] - starts
+        entries = _ranges(starts, lengths)
+        local = np.repeat(np.arange(len(rows)), lengths)
+        grams = self.row_cols[entries]
+        starts = self.col_ptr[grams]
+        lengths = self.col_ptr[grams + 1] - starts
+        postings = _ranges(starts, lengths)
+        local = np.repeat(local, lengths)
+        values = np.repeat(self.row_weights[entries], lengths) * self.col_weights[postings]
+        targets = self.col_rows[postings]
+        if column is not None:
+            targets = column[targets]
+            hit = targets >= 0
+            local, targets, values = local[hit], targets[hit], values[hit]
+        np.add.at(sims, (local, targets), values)
+        return sims
+
+# ---------- 分块 top-k ----------
+def blocked_topk(features, rows, k, block=BLOCK):
+    """rows 中每个单词在全部单词中的 top-k（排除自身），返回 (下标 [n, k], 分数 [n, k])"""
+    k = min(k, len(features) - 1)
+    idx = np.zeros((len(rows), max(k, 0)), dtype=np.int64)
+    val = np.zeros((len(rows), max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return idx, val
+    for start in range(0, len(rows), block):
+        own = rows[start:start + block]
+        sims = features.similarity(own)
+        sims[np.arange(len(own)), own] = -np.inf
+        # 原地取负后取前 k 个：精确分数里大半是 0，对大量相同值选第 n-k 名的 argpartition 很慢
+        np.negative(sims, out=sims)
+        part = np.argpartition(sims, k - 1, axis=1)[:, :k]
+        scores = -np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-scores, axis=1)
+        idx[start:start + block] = np.take_along_axis(part, order, axis=1)
+        val[start:start + block] = np.take_along_axis(scores, order, axis=1)
+    return idx, val
+
+def _keep(ids, keys, row, candidates, k):
+    """候选 [(下标, 分数)] 按分数取前 k 个，跳过相似度为 0 和文本与自身相同的（重复词条/同一释义）"""
+    kept = []
+    for j, score in candidates:
+        if score <= 0 or keys[j] == keys[row]:
+            continue
+        kept.append((round(float(score), 4), int(ids[j])))
+        if len(kept) == k:
+            break
+    return kept
+
+def compute_neighbors(ids, texts, kind, rows=None, k=TOP_K, dense=DENSE_GRAMS, block=BLOCK):
+    """为 rows（缺省全部）对应的单词算 kind 类邻居，返回 ({word_id: [(分数, 邻居 id), ...]}, 特征, 文本键)"""
+    key_fn, grams_fn = FEATURES[kind]
+    keys = [key_fn(t) for t in texts]
+    features = Features(texts, grams_fn, dense)
+    rows = np.arange(len(ids)) if rows is None else np.asarray(rows, dtype=np.int64)
+    # 多取几个，过滤掉重复文本后仍能凑够 k 个
+    idx, val = blocked_topk(features, rows, k + 4, block)
+    neighbors = {}
+    for qi, r in enumerate(rows.tolist()):
+        neighbors[int(ids[r])] = _keep(ids, keys, r, zip(idx[qi].tolist(), val[qi].tolist()), k)
+    return neighbors, features, keys
+
+def merge_new(ids, keys, features, new_rows, existing, k=TOP_K, block=BLOCK):
+    """把新单词并入老单词的邻居表：只有比老单词当前第 k 名更像的才会替换，返回有变化的老单词 id"""
+    new_rows = np.asarray(new_rows, dtype=np.int64)
+    new_set = set(new_rows.tolist())
+    old_rows = np.array([r for r in range(len(ids)) if r not in new_set], dtype=np.int64)
+    if not len(old_rows) or not len(new_rows):
+        return set()
+    # 每个老单词的入选门槛：邻居不满 k 个时为 0
+    threshold = np.array([
+        existing[int(ids[r])][-1][0] if len(existing.get(int(ids[r]), [])) >= k else 0.0 for r in old_rows
+    ], dtype=np.float32)
+    changed = set()
+    for start in range(0, len(old_rows), block):
+        rows = old_rows[start:start + block]
+        sims = features.similarity(rows, new_rows)
+        hit_r, hit_c = np.nonzero(sims > threshold[start:start + block, None])
+        for i, c in zip(hit_r.tolist(), hit_c.tolist()):
+            r, j = int(rows[i]), int(new_rows[c])
+            if keys[j] == keys[r]:
+                continue
+            wid = int(ids[r])
+            merged = sorted(existing.get(wid, []) + [(round(float(sims[i, c]), 4), int(ids[j]))], reverse=True)
+            existing[wid] = merged[:k]
+            changed.add(wid)
+    return changed
+
+# ---------- 数据库 ----------
+def load_words(cursor):
+    # 冷表里的词仍可作为干扰项
+    cursor.execute(f"SELECT id, term, translation FROM {bizvocab_tiering.ALL_VIEW} ORDER BY id")
+    return cursor.fetchall()
+
+def load_neighbors(cursor, kind):
+    cursor.execute(
+        "SELECT word_id, score, neighbor_id FROM vocab_neighbors WHERE kind = %s ORDER BY word_id, rank_no", (kind,)
+    )
+    existing = {}
+    for wid, score, nid in cursor.fetchall():
+        existing.setdefault(wid, []).append((float(score), nid))
+    return existing
+
+def save_neighbors(cursor, kind, neighbors, word_ids):
+    word_ids = list(word_ids)
+    for i in range(0, len(word_ids), 1000):
+        chunk = word_ids[i:i + 1000]
+        cursor.execute(
+            "DELETE FROM vocab_neighbors WHERE kind = %s AND word_id IN (%s)" % ("%s", ",".join(["%s"] * len(chunk))),
+            [kind] + chunk
+        )
+        rows = [(wid, kind, rank, nid, score)
+                for wid in chunk for rank, (score, nid) in enumerate(neighbors.get(wid, []), start=1)]
+        if rows:
+            cursor.executemany(
+                "INSERT INTO vocab_neighbors (word_id, kind, rank_no, neighbor_id, score) VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+
+def update(full=False):
+    """增量（或全量）更新邻居表，返回 {kind: 写入的单词数}"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    written = {}
+    try:
+        words = load_words(cursor)
+        if len(words) < 2:
+            return written
+        ids = [w[0] for w in words]
+        texts = {KIND_SPELLING: [w[1] for w in words], KIND_MEANING: [w[2] for w in words]}
+        for kind in KINDS:
+            existing = {} if full else load_neighbors(cursor, kind)
+            if full:
+                new_rows = list(range(len(ids)))
+            else:
+                cursor.execute("SELECT DISTINCT word_id FROM vocab_neighbors WHERE kind = %s", (kind,))
+                done = {r[0] for r in cursor.fetchall()}
+                new_rows = [i for i, wid in enumerate(ids) if wid not in done]
+            if not new_rows:
+                written[kind] = 0
+                continue
+            neighbors, features, keys = compute_neighbors(ids, texts[kind], kind, new_rows)
+            changed = set() if full else merge_new(ids, keys, features, new_rows, existing)
+            existing.update(neighbors)
+            if full:
+                cursor.execute("DELETE FROM vocab_neighbors WHERE kind = %s", (kind,))
+            save_neighbors(cursor, kind, existing, set(neighbors) | changed)
+            conn.commit()
+            written[kind] = len(neighbors) + len(changed)
+    finally:
+        cursor.close()
+        conn.close()
+    return written
+
+# ---------- 卡片用：按主键取干扰项 ----------
+def fetch_choices(word_ids):
+    """{word_id: {kind: [(邻居 id, term, translation), ...]}}，一次主键范围查询"""
+    if not word_ids:
+        return {}
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT n.word_id, n.kind, n.neighbor_id, COALESCE(h.term, c.term), COALESCE(h.translation, c.translation) "
+        "FROM vocab_neighbors n "
+        "LEFT JOIN business_vocab h ON h.id = n.neighbor_id "
+        "LEFT JOIN business_vocab_cold c ON c.id = n.neighbor_id "
+        "WHERE n.word_id IN (%s) AND (h.id IS NOT NULL OR c.id IS NOT NULL) "
+        "ORDER BY n.word_id, n.kind, n.rank_no" % ",".join(["%s"] * len(word_ids)),
+        list(word_ids)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    choices = {}
+    for wid, kind, nid, term, translation in rows:
+        choices.setdefault(wid, {}).setdefault(kind, []).append((nid, term, translation))
+    return choices
+
+def pick_options(word, neighbors, show_term, count=CHOICES):
+    """选出 count 个选项（含正确答案，已打乱）：[(word_id, 显示文本)]；干扰项不足时返回 None。
+
+    show_term=True 时选项是英文单词（中文题），优先拼写相近；否则选项是中文释义，优先释义相近。
+    """
+    order = (KIND_SPELLING, KIND_MEANING) if show_term else (KIND_MEANING, KIND_SPELLING)
+    text_of = (lambda term, translation: term) if show_term else (lambda term, translation: translation)
+    correct = text_of(word["term"], word["translation"])
+    options = [(word["id"], correct)]
+    seen = {(correct or "").strip().lower()}
+    for kind in order:
+        for nid, term, translation in neighbors.get(kind, []):
+            text = text_of(term, translation)
+            key = (text or "").strip().lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            options.append((nid, text))
+            if len(options) == count:
+                random.shuffle(options)
+                return options
+    return None
+
+def show(term):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(bizvocab_tiering.union_sql(["id", "term", "translation"], "term = %s"), (term, term))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    if row is None:
+        print(f"词库里没有 {term}")
+        return
+    for kind, items in fetch_choices([row[0]]).get(row[0], {}).items():
+        print(f"[{kind}] " + "；".join(f"{t}（{tr}）" for _, t, tr in items))
+
+# ---------- 压测 ----------
+def bench(terms, new):
+    rows = synthetic_rows(terms)
+    ids = [r[0] for r in rows]
+    for kind, col in ((KIND_SPELLING, 1), (KIND_MEANING, 3)):
+        texts = [r[col] for r in rows]
+        t0 = time.perf_counter()
+        base = list(range(terms - new))
+        neighbors, features, keys = compute_neighbors(ids[:terms - new], texts[:terms - new], kind, base)
+        full = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        new_rows = list(range(terms - new, terms))
+        added, features, keys = compute_neighbors(ids, texts, kind, new_rows)
+        changed = merge_new(ids, keys, features, new_rows, neighbors)
+        inc = time.perf_counter() - t0
+        sample = ids[0]
+        print(f"[{kind}] 全量 {terms - new} 个单词 {full:.1f}s；新增 {new} 个增量 {inc:.2f}s，"
+              f"老单词邻居变化 {len(changed)} 个")
+        print(f"  例：{texts[0]} → " + "、".join(texts[ids.index(n)] for _, n in neighbors[sample][:3]))
+
+def main():
+    parser = argparse.ArgumentParser(description="选择题干扰项（近邻索引）")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("update", help="为新增单词计算邻居（默认）")
+    sub.add_parser("rebuild", help="全量重算")
+    p_show = sub.add_parser("show", help="查看某个单词的干扰项")
+    p_show.add_argument("term")
+    p_bench = sub.add_parser("bench", help="合成词库压测（不连数据库）")
+    p_bench.add_argument("--terms", type=int, default=100000)
+    p_bench.add_argument("--new", type=int, default=200, help="增量新增的单词数")
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.terms, args.new)
+        return
+    bizvocab_schema.migrate()
+    if args.cmd == "show":
+        show(args.term)
+    else:
+        t0 = time.perf_counter()
+        written = update(full=args.cmd == "rebuild")
+        print(f"已更新邻居：{written}，耗时 {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    main()
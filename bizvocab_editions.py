@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 每日卡片：学习进度是全局的（business_vocab 的 learned / review_count），所以每天每项任务只选一次词、
+# 渲染一次卡片、推进一次进度，同一份卡片再发给当天所有到点的学习者（bizvocab_dispatcher / bizvocab_shards）。
+#
+# 用法：
+#   python bizvocab_editions.py show [--date 2025-10-09]   # 某天（UTC）已生成的卡片
+#   python bizvocab_editions.py prune [--keep-days 30]
+#
+# 卡片生成后存进 daily_editions（每天每项任务一行，卡片按节存成 JSON），调度器重启或主备切换后从表里取回，
+# 不会重新选词；生成过程用 GET_LOCK 串行，多个进程同时要同一份卡片时只有一个去选词。
+# 存档成功后才提交进度（学习的认领 commit / 复习的 mark_words_reviewed），存档失败时释放认领。
+# 进度在卡片生成时推进一次，个别学习者的 webhook 发送失败只记日志，不回滚共享进度。
+# 复习和学习同时到点的学习者，两份卡片装进同一批消息（bizvocab_cards.pack）。
+
+import os
+import json
+import argparse
+import datetime
+import threading
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_cards
+import bizvocab_learner
+import bizvocab_reviewer
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+KIND_REVIEW = "review"
+KIND_LEARN = "learn"
+BUILDERS = {
+    KIND_REVIEW: lambda outbox: bizvocab_reviewer.run_review(check_workday=False, outbox=outbox),
+    KIND_LEARN: lambda outbox: bizvocab_learner.run_once(check_workday=False, outbox=outbox),
+}
+
+LOCK_TIMEOUT = 120  # 等待别的进程生成同一份卡片的秒数
+KEEP_DAYS = 30
+
+def utc_date(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).date()
+
+# ---------- 存档 ----------
+def card_to_dict(card):
+    return {"title": card.title, "color": card.color, "sections": [s.decode("utf-8") for s in card.sections]}
+
+def card_from_dict(data):
+    card = bizvocab_cards.Card(data["title"], data["color"])
+    card.sections = [s.encode("utf-8") for s in data["sections"]]
+    return card
+
+def load_or_build(conn, kind, day):
+    """返回该天该任务的卡片列表；表里没有时选词生成，存档后再推进进度"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (f"bizvocab_edition:{day}:{kind}", LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise RuntimeError(f"等待生成 {day} 的{kind}卡片超时")
+    try:
+        cursor.execute("SELECT cards FROM daily_editions WHERE edition_date = %s AND kind = %s", (day, kind))
+        row = cursor.fetchone()
+        if row is not None:
+            return [card_from_dict(d) for d in json.loads(row[0])]
+        outbox = bizvocab_cards.Outbox()
+        BUILDERS[kind](outbox)
+        cards = list(outbox.cards)
+        try:
+            cursor.execute(
+                "INSERT INTO daily_editions (edition_date, kind, cards) VALUES (%s, %s, %s)",
+                (day, kind, json.dumps([card_to_dict(c) for c in cards], ensure_ascii=False))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            outbox.settle(False)
+            raise
+        outbox.settle(True)
+        return cards
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (f"bizvocab_edition:{day}:{kind}",))
+        cursor.fetchall()
+        cursor.close()
+
+# ---------- 进程内缓存 ----------
+class Editions:
+    """(日期, 任务组合) -> 装箱好的消息字节；只保留最近两天"""
+    def __init__(self, loader=load_or_build):
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.cards = {}
+        self.messages = {}
+
+    def payloads(self, kinds, day):
+        key = (day, tuple(kinds))
+        got = self.messages.get(key)
+        if got is not None:
+            return got
+        with self.lock:
+            got = self.messages.get(key)
+            if got is None:
+                cards = [c for kind in kinds for c in self._cards(kind, day)]
+                got = [m.payload for m in bizvocab_cards.pack(cards)]
+                self.messages[key] = got
+        return got
+
+    def _cards(self, kind, day):
+        if (day, kind) not in self.cards:
+            conn = mysql.connector.connect(**DB_CONFIG)
+            try:
+                self.cards[(day, kind)] = self.loader(conn, kind, day)
+            finally:
+                conn.close()
+            self._forget(day)
+        return self.cards[(day, kind)]
+
+    def _forget(self, day):
+        oldest = day - datetime.timedelta(days=1)
+        for cache in (self.cards, self.messages):
+            for key in [k for k in cache if k[0] < oldest]:
+                del cache[key]
+
+EDITIONS = Editions()
+
+def payloads(kinds, day):
+    return EDITIONS.payloads(kinds, day)
+
+def send(messages, webhook=None, check_workday=False):
+    """把同一份消息发到一个学习者的 webhook；返回值与 run_once / run_review 相同：
+    全部成功 True，有失败 False，没有内容 None"""
+    if not messages:
+        return None
+    ok = True
+    for payload in messages:
+        ok = bizvocab_learner.send_to_feishu(payload, webhook) and ok
+    return ok
+
+# ---------- 命令 ----------
+def show(day):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT kind, cards, created_at FROM daily_editions WHERE edition_date = %s", (day,))
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    if not rows:
+        print(f"{day} 还没有生成卡片。")
+    for kind, cards, created_at in rows:
+        cards = json.loads(cards)
+        sections = sum(len(c["sections"]) for c in cards)
+        print(f"{kind}: {len(cards)} 张卡片 {sections} 节，生成于 {created_at}")
+        for c in cards:
+            print(f"  {c['title']}")
+
+def prune(keep_days=KEEP_DAYS):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM daily_editions WHERE edition_date < CURDATE() - INTERVAL %s DAY", (keep_days,))
+    removed = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="每日卡片")
+    sub = parser.add_subparsers(dest="cmd")
+    p_show = sub.add_parser("show", help="查看某天的卡片（默认今天，UTC）")
+    p_show.add_argument("--date", type=datetime.date.fromisoformat, default=None)
+    p_prune = sub.add_parser("prune", help="删除旧卡片")
+    p_prune.add_argument("--keep-days", type=int, default=KEEP_DAYS)
+    args = parser.parse_args()
+
+    if args.cmd == "prune":
+        print(f"已删除 {prune(args.keep_days)} 份旧卡片")
+    else:
+        show(getattr(args, "date", None) or datetime.datetime.now(datetime.timezone.utc).date())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 学习/复习/答题事件日志：只追加，按月分区，定期汇总成按天的统计
+#
+# 用法：
+#   python bizvocab_events.py maintain                 # 补建未来月份分区 + 汇总到今天（每天跑一次即可）
+#   python bizvocab_events.py rollup [--since 2025-10-01]
+#   python bizvocab_events.py report [--days 30]       # 只读按天汇总表
+#   python bizvocab_events.py partitions               # 查看各月分区行数
+#   python bizvocab_events.py archive --before 2025-07 [--dir archive] [--no-export]
+#                                                      # 导出为 csv.gz 后整分区删除
+#
+# business_vocab 上的 review_count / last_review_date / learn_date 每次都会被覆盖，
+# 历史只保留在这里。写入与业务更新在同一事务里，一次推送的多个单词合并为一条多行 INSERT。
+
+import os
+import csv
+import gzip
+import argparse
+import datetime
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_schema
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+EVENT_LEARN = "learn"
+EVENT_REVIEW = "review"
+EVENT_ANSWER = "answer"
+
+PARTITIONS_AHEAD = 3  # 始终保留未来几个月的空分区，避免写入落到 pmax
+ARCHIVE_DIR = "archive"
+
+INSERT_SQL = "INSERT INTO vocab_events (event_at, event_type, word_id, correct) VALUES (%s, %s, %s, %s)"
+
+def now_local():
+    return datetime.datetime.now(SH_TZ).replace(tzinfo=None)
+
+# ---------- 写入（在调用方事务内） ----------
+def record(cursor, event_type, word_ids, at=None):
+    """同一时刻的一批学习/复习事件；executemany 会被改写成一条多行 INSERT"""
+    if not word_ids:
+        return
+    at = at or now_local()
+    cursor.executemany(INSERT_SQL, [(at, event_type, wid, None) for wid in word_ids])
+
+def record_answers(cursor, answers):
+    """answers: [(word_id, correct, answered_at), ...]"""
+    if not answers:
+        return
+    cursor.executemany(INSERT_SQL, [(at, EVENT_ANSWER, wid, int(ok)) for wid, ok, at in answers])
+
+# ---------- 分区维护 ----------
+def month_start(day):
+    return day.replace(day=1)
+
+def add_months(day, n):
+    y, m = divmod(day.year * 12 + day.month - 1 + n, 12)
+    return datetime.date(y, m + 1, 1)
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+def partition_clause(month):
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1)}')"
+
+def list_partitions(cursor):
+    """[(分区名, 上界字符串或 MAXVALUE, 估算行数), ...]，按顺序"""
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'vocab_events' ORDER BY PARTITION_ORDINAL_POSITION"
+    )
+    return [(name, (desc or "").strip("'"), rows) for name, desc, rows in cursor.fetchall()]
+
+def ensure_partitions(cursor, ahead=PARTITIONS_AHEAD):
+    """把 pmax 拆出缺少的月份分区；pmax 通常是空的，REORGANIZE 只改元数据"""
+    bounds = [datetime.date.fromisoformat(b[:10]) for name, b, _ in list_partitions(cursor) if name != "pmax"]
+    first = month_start(datetime.datetime.now(SH_TZ).date())
+    # 只能在最后一个已有分区之后追加；停机太久时，中间月份的事件留在最后一个分区里
+    after = max(bounds) if bounds else datetime.date.min
+    missing = [add_months(first, i) for i in range(ahead + 1) if add_months(first, i) >= after]
+    if not missing:
+        return []
+    parts = [partition_clause(m) for m in missing] + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"]
+    cursor.execute(f"ALTER TABLE vocab_events REORGANIZE PARTITION pmax INTO ({', '.join(parts)})")
+    return [partition_name(m) for m in missing]
+
+# ---------- 按天汇总 ----------
+ROLLUP_SQL = """
+    INSERT INTO vocab_events_daily (day, event_type, events, words, correct)
+    SELECT DATE(event_at), event_type, COUNT(*), COUNT(DISTINCT word_id), SUM(IFNULL(correct, 0))
+    FROM vocab_events
+    WHERE event_at >= %s AND event_at < %s
+    GROUP BY DATE(event_at), event_type
+    ON DUPLICATE KEY UPDATE
+        events = VALUES(events), words = VALUES(words), correct = VALUES(correct)
+"""
+
+def rollup(cursor, since=None, until=None):
+    """逐天重算 [since, until] 的汇总（可重复执行）；since 缺省为汇总表里最后一天，那天可能只汇总了一半"""
+    until = until or datetime.datetime.now(SH_TZ).date()
+    if since is None:
+        cursor.execute("SELECT MAX(day) FROM vocab_events_daily")
+        since = cursor.fetchone()[0]
+        if since is None:
+            cursor.execute("SELECT MIN(event_at) FROM vocab_events")
+            first = cursor.fetchone()[0]
+            if first is None:
+                return 0
+            since = first.date()
+    days = 0
+    day = since
+    while day <= until:
+        cursor.execute(ROLLUP_SQL, (day, day + datetime.timedelta(days=1)))
+        days += 1
+        day += datetime.timedelta(days=1)
+    return days
+
+def maintain(since=None):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        added = ensure_partitions(cursor)
+        days = rollup(cursor, since)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return added, days
+
+# ---------- 读取 ----------
+def read_daily(days=30):
+    start = datetime.datetime.now(SH_TZ).date() - datetime.timedelta(days=days - 1)
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT day, event_type, events, words, correct FROM vocab_events_daily WHERE day >= %s ORDER BY day",
+        (start,)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    daily = {}
+    for day, event_type, events, words, correct in rows:
+        daily.setdefault(day, {})[event_type] = (int(events), int(words), int(correct))
+    return daily
+
+def print_report(daily):
+    if not daily:
+        print("汇总表里没有记录，先运行 rollup。")
+        return
+    print(f"{'日期':<12}{'新学':>6}{'复习':>6}{'答题':>6}{'正确率':>8}")
+    for day, types in sorted(daily.items()):
+        learn = types.get(EVENT_LEARN, (0, 0, 0))[0]
+        review = types.get(EVENT_REVIEW, (0, 0, 0))[0]
+        answers, _, correct = types.get(EVENT_ANSWER, (0, 0, 0))
+        rate = f"{correct / answers:.0%}" if answers else "-"
+        print(f"{day.isoformat():<12}{learn:>6}{review:>6}{answers:>6}{rate:>8}")
+
+def show_partitions():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    parts = list_partitions(cursor)
+    cursor.close()
+    conn.close()
+    for name, bound, rows in parts:
+        print(f"{name:<10} < {bound:<22} 约 {rows} 行")
+
+# ---------- 归档 ----------
+def archive(before, directory=ARCHIVE_DIR, export=True):
+    """删除上界不晚于 before（某月 1 日）的分区；删除前先汇总这些天并导出原始事件"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        old = []
+        for name, bound, _ in list_partitions(cursor):
+            if name != "pmax" and datetime.date.fromisoformat(bound[:10]) <= before:
+                old.append((name, bound[:10]))
+        if not old:
+            print("没有需要归档的分区。")
+            return
+        cursor.execute("SELECT MIN(event_at) FROM vocab_events PARTITION (%s)" % ", ".join(n for n, _ in old))
+        first = cursor.fetchone()[0]
+        if first is not None:
+            rollup(cursor, first.date(), before - datetime.timedelta(days=1))
+            conn.commit()
+        if export:
+            os.makedirs(directory, exist_ok=True)
+        for name, bound in old:
+            if export:
+                path = os.path.join(directory, f"vocab_events_{name[1:]}.csv.gz")
+                # 服务端游标逐行流式导出，不把整月事件读进内存
+                stream = conn.cursor()
+                stream.execute(f"SELECT id, event_at, event_type, word_id, correct FROM vocab_events PARTITION ({name})")
+                count = 0
+                with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["id", "event_at", "event_type", "word_id", "correct"])
+                    for row in stream:
+                        writer.writerow(row)
+                        count += 1
+                stream.close()
+                print(f"{name}: 导出 {count} 条到 {path}")
+            cursor.execute(f"ALTER TABLE vocab_events DROP PARTITION {name}")
+            print(f"{name}: 已删除（< {bound}）")
+    finally:
+        cursor.close()
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="学习事件日志")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("maintain", help="补建分区并汇总到今天（默认）")
+    p_rollup = sub.add_parser("rollup", help="重算按天汇总")
+    p_rollup.add_argument("--since", type=datetime.date.fromisoformat, default=None)
+    p_report = sub.add_parser("report", help="按天汇总报表")
+    p_report.add_argument("--days", type=int, default=30)
+    sub.add_parser("partitions", help="查看分区")
+    p_archive = sub.add_parser("archive", help="导出并删除旧分区")
+    p_archive.add_argument("--before", required=True, help="YYYY-MM，删除该月之前的分区")
+    p_archive.add_argument("--dir", default=ARCHIVE_DIR)
+    p_archive.add_argument("--no-export", action="store_true", help="直接删除，不导出原始事件")
+    args = parser.parse_args()
+
+    bizvocab_schema.migrate()
+    if args.cmd == "report":
+        print_report(read_daily(args.days))
+    elif args.cmd == "partitions":
+        show_partitions()
+    elif args.cmd == "archive":
+        archive(datetime.date.fromisoformat(args.before + "-01"), args.dir, not args.no_export)
+    else:
+        added, days = maintain(getattr(args, "since", None))
+        if added:
+            print(f"新建分区: {', '.join(added)}")
+        print(f"已汇总 {days} 天")
+
+if __name__ == "__main__":
+    main()
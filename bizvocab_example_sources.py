@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 多来源例句查询：Tatoeba API、本地双语语料、静态词典文件，按对冲（hedged）方式并发竞速
+#
+# 查询流程：先问首选来源；它在“延迟预算”内没有答复（或已失败）就启动下一个来源，
+# 谁先给出英文例句就用谁，其余请求取消。每个来源的预算取其最近若干次耗时的分位数，
+# 来源变慢时预算自动变长，避免无谓地多发请求。
+#
+# 用法：
+#   python bizvocab_example_sources.py query negotiate
+#   python bizvocab_example_sources.py bench --words 2000      # 本地桩服务对比单来源与对冲查询的尾延迟
+#
+# 配置（.env）：
+#   EXAMPLE_PROVIDERS=tatoeba,corpus,dictionary   来源及顺序
+#   EXAMPLE_CORPUS=data/example_corpus.tsv         每行“英文<TAB>中文”（Tatoeba 导出的双语句对格式）
+#   EXAMPLE_DICT=data/example_dict.json            {"term": {"example_sentence": ..., "example_chinese": ...}}
+# 本地文件不存在时对应来源自动跳过。
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+
+import bizvocab_http
+import bizvocab_schema
+
+# ---------- 配置 ----------
+load_dotenv()
+
+TATOEBA_API = os.getenv("TATOEBA_API", "https://tatoeba.org/en/api_v0/search")
+TATOEBA_INTERVAL = float(os.getenv("TATOEBA_API_DELAY", 1))  # 相邻两次请求的最小间隔（防反爬）
+EXAMPLE_PROVIDERS = os.getenv("EXAMPLE_PROVIDERS", "tatoeba,corpus,dictionary")
+EXAMPLE_CORPUS = os.getenv("EXAMPLE_CORPUS", "data/example_corpus.tsv")
+EXAMPLE_DICT = os.getenv("EXAMPLE_DICT", "data/example_dict.json")
+
+LOOKUP_TIMEOUT = 10.0    # 整次查询的上限，与原来单个请求的超时一致
+HEDGE_QUANTILE = 0.9     # 预算取该来源最近耗时的分位数
+HEDGE_DEFAULT = 0.5      # 样本不足时的预算（秒）
+HEDGE_MIN = 0.05
+HEDGE_MAX = 3.0
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200     # 每个来源保留最近多少次耗时
+
+def make_example(sentence, chinese):
+    chinese = chinese or None
+    return {
+        "example_sentence": sentence,
+        "example_chinese": chinese,
+        "example_status": bizvocab_schema.EXAMPLE_COMPLETE if chinese else bizvocab_schema.EXAMPLE_PARTIAL,
+    }
+
+# ---------- 耗时统计 ----------
+class LatencyStats:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = collections.deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.calls = self.hits = self.errors = self.cancelled = 0
+
+    def record(self, seconds, hit, error=False):
+        with self.lock:
+            self.samples.append(seconds)
+            self.calls += 1
+            self.hits += bool(hit)
+            self.errors += bool(error)
+
+    def record_cancel(self):
+        with self.lock:
+            self.cancelled += 1
+
+    def quantile(self, q):
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            values = sorted(self.samples)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def budget(self, q=HEDGE_QUANTILE):
+        value = self.quantile(q)
+        return HEDGE_DEFAULT if value is None else min(max(value, HEDGE_MIN), HEDGE_MAX)
+
+# ---------- 来源 ----------
+class ExampleProvider:
+    """来源接口：lookup 返回 make_example(...) 或 None；cancel 被置位时应尽快放弃"""
+    name = "base"
+
+    def __init__(self):
+        self.stats = LatencyStats()
+
+    def ready(self, cancel):
+        """发请求前的准备（如限速等待）；返回 False 表示等待期间已被取消"""
+        return True
+
+    def lookup(self, word, cancel):
+        raise NotImplementedError
+
+class TatoebaProvider(ExampleProvider):
+    name = "tatoeba"
+
+    def __init__(self, api=TATOEBA_API, interval=TATOEBA_INTERVAL, timeout=LOOKUP_TIMEOUT, name=None):
+        super().__init__()
+        self.api = api
+        self.interval = interval
+        self.timeout = timeout
+        self.name = name or self.name
+        # 同一主机的请求节奏由共用 HTTP 连接池维护，与进程内其他 Tatoeba 调用共用
+        self.limit = bizvocab_http.configure_host(bizvocab_http.host_of(api), interval=interval)
+
+    def ready(self, cancel):
+        """在计时开始前等到本次的发送时间点，排队等待不算进延迟统计"""
+        return self.limit.pace(cancel)
+
+    def lookup(self, word, cancel):
+        # 对冲查询本身就是重试手段，这里不再退避重试；节奏已在 ready() 里等过
+        resp = bizvocab_http.get(
+            self.api, params={"from": "eng", "query": word, "to": "cmn"}, timeout=self.timeout,
+            retries=0, paced=False
+        )
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+        results = resp.json().get("results", [])
+        if not results:
+            return None
+        first = results[0]
+        sentence = (first.get("text") or "").strip()
+        if not sentence:
+            return None
+        translations = first.get("translations", [])
+        chinese = None
+        if translations and isinstance(translations[0], list) and translations[0]:
+            chinese = (translations[0][0].get("text") or "").strip()
+        return make_example(sentence, chinese)
+
+TOKEN_RE = re.compile(r"[a-z][a-z'-]*")
+
+class CorpusProvider(ExampleProvider):
+    """本地双语语料：首次使用时建倒排索引（单词 -> 句子编号），多词条目取各词集合的交集再整词匹配"""
+    name = "corpus"
+
+    def __init__(self, path=EXAMPLE_CORPUS, pairs=None):
+        super().__init__()
+        self.path = path
+        self.pairs = pairs
+        self.index = None
+        self.load_lock = threading.Lock()
+
+    def _load(self):
+        with self.load_lock:
+            if self.index is not None:
+                return
+            pairs = self.pairs
+            if pairs is None:
+                pairs = []
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.rstrip("\n").split("\t")
+                        if parts and parts[0].strip():
+                            pairs.append((parts[0].strip(), parts[1].strip() if len(parts) > 1 else None))
+            index = collections.defaultdict(list)
+            for i, (sentence, _) in enumerate(pairs):
+                for token in set(TOKEN_RE.findall(sentence.lower())):
+                    index[token].append(i)
+            self.pairs, self.index = pairs, index
+
+    def lookup(self, word, cancel):
+        self._load()
+        tokens = TOKEN_RE.findall(word.lower())
+        if not tokens:
+            return None
+        candidates = None
+        for token in sorted(tokens, key=lambda t: len(self.index.get(t, ()))):
+            ids = self.index.get(token)
+            if not ids:
+                return None
+            candidates = set(ids) if candidates is None else candidates.intersection(ids)
+            if not candidates:
+                return None
+        pattern = re.compile(r"\b" + r"\s+".join(map(re.escape, tokens)) + r"\b", re.IGNORECASE)
+        best = None
+        # 有中文翻译的优先，其次取较短的句子
+        for i in sorted(candidates):
+            sentence, chinese = self.pairs[i]
+            if pattern.search(sentence):
+                key = (chinese is None, len(sentence))
+                if best is None or key < best[0]:
+                    best = (key, sentence, chinese)
+        return make_example(best[1], best[2]) if best else None
+
+class DictionaryProvider(ExampleProvider):
+    name = "dictionary"
+
+    def __init__(self, path=EXAMPLE_DICT, entries=None):
+        super().__init__()
+        self.path = path
+        self.entries = entries
+
+    def lookup(self, word, cancel):
+        if self.entries is None:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = {k.lower(): v for k, v in json.load(f).items()}
+        entry = self.entries.get(word.lower())
+        if not entry or not entry.get("example_sentence"):
+            return None
+        return make_example(entry["example_sentence"], entry.get("example_chinese"))
+
+PROVIDER_TYPES = {
+    "tatoeba": (TatoebaProvider, None),
+    "corpus": (CorpusProvider, lambda: EXAMPLE_CORPUS),
+    "dictionary": (DictionaryProvider, lambda: EXAMPLE_DICT),
+}
+
+def default_providers(spec=EXAMPLE_PROVIDERS):
+    providers = []
+    for name in (s.strip() for s in spec.split(",") if s.strip()):
+        cls, path = PROVIDER_TYPES[name]
+        if path is not None and not os.path.exists(path()):
+            continue
+        providers.append(cls())
+    return providers
+
+# ---------- 对冲查询 ----------
+class HedgedLookup:
+    def __init__(self, providers, workers=16, timeout=LOOKUP_TIMEOUT, quantile=HEDGE_QUANTILE):
+        self.providers = list(providers)
+        self.timeout = timeout
+        self.quantile = quantile
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="example")
+        # lookup 在多个线程里并发调用，计数都在 stats_lock 下更新
+        self.stats_lock = threading.Lock()
+        self.launched = 0
+        self.lookups = 0
+        self.wins = collections.Counter()
+
+    def _call(self, provider, word, cancel):
+        if not provider.ready(cancel):
+            return None
+        t0 = time.perf_counter()
+        try:
+            result = provider.lookup(word, cancel)
+        except Exception:
+            provider.stats.record(time.perf_counter() - t0, False, error=True)
+            raise
+        # 输掉竞速的请求也记入耗时，预算才不会只反映快的那部分
+        provider.stats.record(time.perf_counter() - t0, result is not None)
+        return result
+
+    def lookup(self, word):
+        """返回 (例句, 来源名)；所有来源都没有结果时返回 (None, None)"""
+        with self.stats_lock:
+            self.lookups += 1
+        cancel = threading.Event()
+        deadline = time.monotonic() + self.timeout
+        running = {}
+        queue = list(self.providers)
+        next_launch = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                # 到了对冲时间点（或正在跑的都失败了）就启动下一个来源
+                if queue and (now >= next_launch or not running):
+                    provider = queue.pop(0)
+                    running[self.pool.submit(self._call, provider, word, cancel)] = provider
+                    with self.stats_lock:
+                        self.launched += 1
+                    next_launch = now + provider.stats.budget(self.quantile)
+                if not running:
+                    return None, None
+                wait_until = min(deadline, next_launch) if queue else deadline
+                done, _ = wait(running, timeout=max(wait_until - time.monotonic(), 0),
+                               return_when=FIRST_COMPLETED)
+                for fut in done:
+                    provider = running.pop(fut)
+                    try:
+                        result = fut.result()
+                    except Exception:
+                        result = None
+                    if result is not None:
+                        with self.stats_lock:
+                            self.wins[provider.name] += 1
+                        return result, provider.name
+                if time.monotonic() >= deadline:
+                    return None, None
+        finally:
+            cancel.set()
+            for fut, provider in running.items():
+                if fut.cancel() or not fut.done():
+                    provider.stats.record_cancel()
+
+    def report(self):
+        with self.stats_lock:
+            lookups, launched, wins = self.lookups, self.launched, dict(self.wins)
+        print(f"查询 {lookups} 次，发出请求 {launched} 次（平均 {launched / max(lookups, 1):.2f}）")
+        for p in self.providers:
+            q50, q90 = p.stats.quantile(0.5), p.stats.quantile(0.9)
+            fmt = lambda v: f"{v * 1000:.0f}ms" if v is not None else "-"
+            print(f"  {p.name:<12} 请求 {p.stats.calls:>6}  命中 {p.stats.hits:>6}  失败 {p.stats.errors:>5}  "
+                  f"取消 {p.stats.cancelled:>5}  胜出 {wins.get(p.name, 0):>6}  p50 {fmt(q50)}  p90 {fmt(q90)}  "
+                  f"预算 {p.stats.budget(self.quantile) * 1000:.0f}ms")
+
+_default = None
+_default_lock = threading.Lock()
+
+def find_example(word):
+    """进程内共享一个按 .env 配置的对冲查询器；返回例句 dict 或 None"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HedgedLookup(default_providers())
+    result, source = _default.lookup(word)
+    if result is None:
+        print(f"❌ 单词[{word}] 各来源均未找到例句")
+    else:
+        print(f"✅ 单词[{word}] 例句来自 {source}（英文：{result['example_sentence'][:30]}...）")
+    return result
+
+# ---------- 压测 ----------
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+def run_bench(lookup, words, concurrency):
+    latencies = []
+    hits = 0
+    lock = threading.Lock()
+
+    def one(word):
+        nonlocal hits
+        t0 = time.perf_counter()
+        result, _ = lookup.lookup(word)
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+            hits += result is not None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, words))
+    latencies.sort()
+    return hits, latencies
+
+def bench(words_total, concurrency, latency, jitter, tail_rate, tail_ms, error_rate, corpus_coverage):
+    import bizvocab_loadtest as lt  # 桩服务复用压测脚本
+    stubs = []
+    urls = []
+    for _ in range(2):  # 主站与镜像各一个桩，延迟分布相同、互相独立
+        behavior = lt.StubBehavior(latency, jitter, error_rate, tail_rate=tail_rate, tail_ms=tail_ms)
+        server, url = lt.start_stub(lt.TatoebaStubHandler, behavior, no_chinese_rate=0.2)
+        stubs.append(server)
+        urls.append(url + "/en/api_v0/search")
+    words = [w["term"] for w in lt.synthetic_words(words_total)]
+    rng = random.Random(1)
+    pairs = [(f"We need to {w} the contract before Friday.", f"我们需要在周五前{w}合同。")
+             for w in words if rng.random() < corpus_coverage]
+
+    def providers():
+        return [TatoebaProvider(urls[0], interval=0), TatoebaProvider(urls[1], interval=0, name="tatoeba-mirror"),
+                CorpusProvider(pairs=list(pairs))]
+
+    # 预热：先跑一轮让各来源攒够耗时样本
+    for label, chain in (("单来源（仅 Tatoeba）", providers()[:1]), ("对冲（Tatoeba→镜像→本地语料）", providers())):
+        lookup = HedgedLookup(chain, workers=concurrency * len(chain))
+        run_bench(lookup, words[:HEDGE_MIN_SAMPLES * 5], concurrency)
+        t0 = time.perf_counter()
+        hits, lat = run_bench(lookup, words, concurrency)
+        wall = time.perf_counter() - t0
+        print(f"--- {label} ---")
+        print(f"命中 {hits}/{len(words)}  吞吐 {len(words) / wall:.0f}/s  p50 {percentile(lat, 0.5) * 1000:.0f}ms  "
+              f"p95 {percentile(lat, 0.95) * 1000:.0f}ms  p99 {percentile(lat, 0.99) * 1000:.0f}ms  "
+              f"max {lat[-1] * 1000:.0f}ms")
+        lookup.report()
+    for s in stubs:
+        s.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="多来源对冲例句查询")
+    sub = parser.add_subparsers(dest="cmd")
+    p_query = sub.add_parser("query", help="查询一个单词")
+    p_query.add_argument("word")
+    p_bench = sub.add_parser("bench", help="本地桩服务压测")
+    p_bench.add_argument("--words", type=int, default=1000)
+    p_bench.add_argument("--concurrency", type=int, default=20)
+    p_bench.add_argument("--latency", type=float, default=150)
+    p_bench.add_argument("--jitter", type=float, default=100)
+    p_bench.add_argument("--tail-rate", type=float, default=0.05, help="长尾请求比例")
+    p_bench.add_argument("--tail-ms", type=float, default=3000, help="长尾请求额外延迟")
+    p_bench.add_argument("--error-rate", type=float, default=0.02)
+    p_bench.add_argument("--corpus-coverage", type=float, default=0.5, help="本地语料覆盖的单词比例")
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.words, args.concurrency, args.latency, args.jitter, args.tail_rate, args.tail_ms,
+              args.error_rate, args.corpus_coverage)
+    elif args.cmd == "query":
+        print(json.dumps(find_example(args.word), ensure_ascii=False, indent=2))
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 统一的出站 HTTP：进程内共用一个 keep-alive 连接池，按主机限制并发与请求间隔，
+# 429/5xx 按指数退避 + 随机抖动重试，默认超时，每次请求回调计时钩子。
+# 爬虫、例句查询、飞书推送都经由这里发请求，批量抓取/补例句不再每次重新 TCP+TLS 握手。
+#
+# 用法：
+#   import bizvocab_http
+#   bizvocab_http.configure_host("english.koolearn.com", concurrency=1, interval=1.0)
+#   resp = bizvocab_http.get(url, headers=..., params=...)   # 与 requests 相同的参数和返回值
+#   resp = bizvocab_http.post(webhook, json=card)
+#
+#   python bizvocab_http.py get <url>                 # 手动发一次请求，打印状态、耗时、连接数
+#   python bizvocab_http.py bench [--requests 300] [--tls]
+#
+# 主机限制也可用环境变量配置：HTTP_HOST_LIMITS="tatoeba.org=2:1.0,english.koolearn.com=1:1"（并发:间隔秒）
+# 重试规则：GET 等幂等请求对 429/5xx 和连接错误重试；POST（飞书推送）只对 429 和建连超时重试，
+# 避免服务端已处理的请求被重复发送。重试用尽后返回最后一次的响应（或抛出最后一次的异常），调用方照常检查状态码。
+
+import os
+import time
+import random
+import argparse
+import threading
+import collections
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# ---------- 配置 ----------
+DEFAULT_TIMEOUT = (5, 10)   # (建连, 读取) 秒
+POOL_HOSTS = 16             # 保留连接池的主机数
+POOL_SIZE = 32              # 每个主机最多保留的空闲连接
+# 未单独配置的主机并发上限与连接池一致：超过连接池的并发请求用完即关连接，又要重新握手
+DEFAULT_HOST_CONCURRENCY = POOL_SIZE
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5          # 第 n 次重试的退避上限为 BACKOFF_BASE × 2^n，实际在 [0, 上限] 内随机
+BACKOFF_CAP = 10.0
+RETRY_AFTER_CAP = 30.0      # Retry-After 头最多等这么久
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+TIMING_WINDOW = 512         # 每个主机保留最近多少次耗时
+
+HttpTiming = collections.namedtuple("HttpTiming", "method host path status elapsed attempt error")
+
+# ---------- 按主机限流 ----------
+class HostLimit:
+    """并发上限（信号量）+ 最小请求间隔（预约发送时间点，在锁外等待）"""
+
+    def __init__(self, concurrency=DEFAULT_HOST_CONCURRENCY, interval=0.0):
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def pace(self, cancel=None):
+        """等到本请求的发送时间点；cancel（threading.Event）被置位时提前返回 False"""
+        if not self.interval:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at <= now:
+            return True
+        if cancel is not None:
+            return not cancel.wait(at - now)
+        time.sleep(at - now)
+        return True
+
+def parse_host_limits(spec):
+    limits = {}
+    for item in (spec or "").split(","):
+        host, _, value = item.strip().partition("=")
+        if not host or not value:
+            continue
+        concurrency, _, interval = value.partition(":")
+        limits[host] = (int(concurrency or DEFAULT_HOST_CONCURRENCY), float(interval or 0))
+    return limits
+
+# ---------- 计时钩子 ----------
+class TimingStats:
+    """作为钩子挂到 Transport 上，按主机统计次数、状态码、重试和耗时分位数"""
+
+    def __init__(self, window=TIMING_WINDOW):
+        self.lock = threading.Lock()
+        self.window = window
+        self.hosts = {}
+
+    def __call__(self, timing):
+        with self.lock:
+            entry = self.hosts.get(timing.host)
+            if entry is None:
+                entry = self.hosts[timing.host] = {
+                    "elapsed": collections.deque(maxlen=self.window), "statuses": collections.Counter(), "retries": 0,
+                }
+            entry["elapsed"].append(timing.elapsed)
+            entry["statuses"][timing.status or type(timing.error).__name__] += 1
+            if timing.attempt:
+                entry["retries"] += 1
+
+    def summary(self):
+        lines = []
+        with self.lock:
+            for host, entry in sorted(self.hosts.items()):
+                samples = sorted(entry["elapsed"])
+                if not samples:
+                    continue
+                p50 = samples[len(samples) // 2] * 1000
+                p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+                statuses = ", ".join(f"{k}×{v}" for k, v in entry["statuses"].most_common())
+                lines.append(f"{host}: p50 {p50:.0f}ms p99 {p99:.0f}ms 重试 {entry['retries']} 次 [{statuses}]")
+        return lines
+
+# ---------- 传输层 ----------
+class Transport:
+    def __init__(self, headers=None, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, host_limits=None):
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.retries = retries
+        self.limits = {}
+        self.limits_lock = threading.Lock()
+        self.hooks = []
+        self._session = None
+        self._pid = None
+        self.session_lock = threading.Lock()
+        for host, (concurrency, interval) in (host_limits or {}).items():
+            self.configure_host(host, concurrency, interval)
+
+    @property
+    def session(self):
+        # 多进程（fork）后子进程不能复用父进程的连接，按 pid 重建
+        if self._session is None or self._pid != os.getpid():
+            with self.session_lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    # 重试由 request() 自己做（带抖动、区分幂等），urllib3 层不重试
+                    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE, max_retries=0)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers.update(self.headers)
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+    def configure_host(self, host, concurrency=None, interval=None):
+        """host 为 URL 中的 netloc（带端口时含端口）；同一主机后设置的覆盖先设置的"""
+        with self.limits_lock:
+            old = self.limits.get(host)
+            limit = HostLimit(
+                concurrency if concurrency is not None else (old.concurrency if old else DEFAULT_HOST_CONCURRENCY),
+                interval if interval is not None else (old.interval if old else 0.0),
+            )
+            self.limits[host] = limit
+            return limit
+
+    def limit(self, host):
+        limit = self.limits.get(host)
+        if limit is None:
+            with self.limits_lock:
+                limit = self.limits.setdefault(host, HostLimit())
+        return limit
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def connections_opened(self):
+        """连接池累计新建的连接数（复用的不算）"""
+        total = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    total += pool.num_connections
+        return total
+
+    def _emit(self, timing):
+        for hook in self.hooks:
+            try:
+                hook(timing)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _backoff(attempt, resp):
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), RETRY_AFTER_CAP))
+            except ValueError:
+                pass
+        return delay
+
+    def request(self, method, url, retries=None, paced=True, **kwargs):
+        """与 requests.request 参数相同；paced=False 时跳过请求间隔（调用方已自行 pace，如对冲查询）"""
+        method = method.upper()
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault("timeout", self.timeout)
+        parts = urlsplit(url)
+        limit = self.limit(parts.netloc)
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            if paced:
+                limit.pace()
+            resp = error = None
+            t0 = time.perf_counter()
+            with limit.slots:
+                try:
+                    resp = self.session.request(method, url, **kwargs)
+                except requests.RequestException as e:
+                    error = e
+            self._emit(HttpTiming(method, parts.netloc, parts.path, resp.status_code if resp is not None else None,
+                                  time.perf_counter() - t0, attempt, error))
+            if resp is not None:
+                retryable = resp.status_code in RETRY_STATUSES and (idempotent or resp.status_code == 429)
+            else:
+                retryable = idempotent or isinstance(error, requests.ConnectTimeout)
+            if not retryable or attempt >= retries:
+                if error is not None:
+                    raise error
+                return resp
+            time.sleep(self._backoff(attempt, resp))
+            if resp is not None:
+                resp.close()
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+# ---------- 进程内默认实例 ----------
+DEFAULT = Transport(host_limits=parse_host_limits(os.getenv("HTTP_HOST_LIMITS")))
+STATS = DEFAULT.add_hook(TimingStats())
+
+def configure_host(host, concurrency=None, interval=None):
+    return DEFAULT.configure_host(host, concurrency, interval)
+
+def host_of(url):
+    return urlsplit(url).netloc
+
+def request(method, url, **kwargs):
+    return DEFAULT.request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return DEFAULT.get(url, **kwargs)
+
+def post(url, **kwargs):
+    return DEFAULT.post(url, **kwargs)
+
+# ---------- 压测 ----------
+def _self_signed(directory):
+    import subprocess
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-subj", "/CN=127.0.0.1",
+                    "-keyout", key, "-out", cert, "-days", "1"], check=True, capture_output=True)
+    return cert, key
+
+def bench(total=300, tls=False, error_rate=0.2):
+    import ssl
+    import tempfile
+    import warnings
+    import bizvocab_loadtest as lt
+
+    behavior = lt.StubBehavior(latency_ms=2)
+    server, base = lt.start_stub(lt.TatoebaStubHandler, behavior, no_chinese_rate=0.0)
+    if tls:
+        with tempfile.TemporaryDirectory() as tmp:
+            cert, key = _self_signed(tmp)
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(cert, key)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        base = base.replace("http://", "https://")
+        warnings.filterwarnings("ignore", message="Unverified HTTPS request")
+    url = base + "/en/api_v0/search"
+    try:
+        t0 = time.perf_counter()
+        for i in range(total):
+            requests.get(url, params={"query": f"w{i}"}, timeout=DEFAULT_TIMEOUT, verify=False).close()
+        oneoff = time.perf_counter() - t0
+
+        transport = Transport()
+        t0 = time.perf_counter()
+        for i in range(total):
+            transport.get(url, params={"query": f"w{i}"}, verify=False).close()
+        pooled = time.perf_counter() - t0
+        print(f"{'HTTPS' if tls else 'HTTP'} {total} 次顺序请求（桩服务 2ms）：")
+        print(f"  一次性 requests.get   {oneoff / total * 1000:6.2f}ms/次，新建连接 {total}")
+        print(f"  共用连接池 Transport  {pooled / total * 1000:6.2f}ms/次，新建连接 {transport.connections_opened()}")
+
+        # 注入 5xx/429 后的成功率：不重试 vs 带抖动退避重试
+        behavior.error_rate = error_rate
+        ok_plain = sum(Transport(retries=0).get(url, params={"query": "x"}, verify=False).status_code == 200
+                       for _ in range(total))
+        stats = TimingStats()
+        retrying = Transport()
+        retrying.add_hook(stats)
+        ok_retry = sum(retrying.get(url, params={"query": "x"}, verify=False).status_code == 200
+                       for _ in range(total))
+        print(f"  注入 {error_rate:.0%} 故障：不重试成功 {ok_plain}/{total}，重试成功 {ok_retry}/{total}")
+        for line in stats.summary():
+            print("  " + line)
+    finally:
+        server.shutdown()
+
+def main():
+    global BACKOFF_BASE
+    parser = argparse.ArgumentParser(description="共用 HTTP 连接池")
+    sub = parser.add_subparsers(dest="cmd")
+    p_get = sub.add_parser("get", help="发一次 GET 请求")
+    p_get.add_argument("url")
+    p_bench = sub.add_parser("bench", help="本地桩服务上对比一次性请求与连接池")
+    p_bench.add_argument("--requests", type=int, default=300)
+    p_bench.add_argument("--tls", action="store_true", help="桩服务启用 HTTPS（自签证书，需要 openssl）")
+    args = parser.parse_args()
+
+    if args.cmd == "get":
+        resp = get(args.url)
+        print(f"HTTP {resp.status_code}，{len(resp.content)} 字节，新建连接 {DEFAULT.connections_opened()}")
+        for line in STATS.summary():
+            print(line)
+    elif args.cmd == "bench":
+        BACKOFF_BASE = 0.01  # 压测里缩短退避，只看重试效果
+        bench(args.requests, args.tls)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 基于共享数据库的选主与租约：多台机器上的机器人实例只有一个在推送
+#
+# 用法：
+#   BOT_HA=db python bizvocab_learner.py      # 学习/复习脚本改用数据库租约代替本地文件锁
+#   python bizvocab_leader.py status          # 查看各租约持有者
+#   python bizvocab_leader.py simulate --procs 3 --duration 30
+#                                             # 本地起多个进程争抢同一租约，杀掉主节点并统计切换耗时
+
+import os
+import sys
+import time
+import uuid
+import socket
+import argparse
+import datetime
+import threading
+import multiprocessing
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_schema
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+LEASE_TTL = float(os.getenv("LEASE_TTL", 6))  # 租约有效期（秒），续约间隔为其 1/3
+
+# 注意 ON DUPLICATE KEY UPDATE 按书写顺序赋值，后面的表达式看到的是已更新的列：
+# 先按旧值算 fencing_token，再改 holder，最后 lease_until 只需判断 holder 是否已是自己
+ACQUIRE_SQL = """
+    INSERT INTO bot_leases (name, holder, fencing_token, lease_until)
+    VALUES (%s, %s, 1, NOW(3) + INTERVAL %s MICROSECOND)
+    ON DUPLICATE KEY UPDATE
+        fencing_token = IF(holder = VALUES(holder), fencing_token,
+                           IF(lease_until < NOW(3), fencing_token + 1, fencing_token)),
+        holder = IF(holder = VALUES(holder) OR lease_until < NOW(3), VALUES(holder), holder),
+        lease_until = IF(holder = VALUES(holder), VALUES(lease_until), lease_until)
+"""
+
+def node_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+# ---------- 租约 ----------
+class LeaderLease:
+    """数据库租约：持有者按 ttl/3 续约，过期后其他实例可接管，接管时 fencing_token 加一。
+
+    以数据库时钟判定过期，避免各节点时钟偏差；本地另记一个截止时间，
+    续约失败（如数据库不可达）时到点主动让位，不会出现两个实例同时认为自己是主。
+    """
+
+    def __init__(self, name, ttl=LEASE_TTL, holder=None, on_change=None):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or node_id()
+        self.on_change = on_change
+        self.fencing_token = None
+        self.local_deadline = 0.0
+        self.conn = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self._was_leader = False
+
+    def _cursor(self):
+        if self.conn is None or not self.conn.is_connected():
+            self.conn = mysql.connector.connect(**DB_CONFIG)
+            self.conn.autocommit = True
+        return self.conn.cursor()
+
+    def try_acquire(self):
+        """抢占或续约一次，返回当前是否为主"""
+        started = time.monotonic()
+        try:
+            cursor = self._cursor()
+            cursor.execute(ACQUIRE_SQL, (self.name, self.holder, int(self.ttl * 1_000_000)))
+            cursor.execute("SELECT holder, fencing_token FROM bot_leases WHERE name = %s", (self.name,))
+            holder, token = cursor.fetchone()
+            cursor.close()
+        except mysql.connector.Error as e:
+            self.conn = None
+            print(f"[{self.name}] 租约续约失败: {e}")
+            return self._update_state()
+        if holder == self.holder:
+            self.fencing_token = token
+            # 从发起请求时刻算起，留 1/10 余量
+            self.local_deadline = started + self.ttl * 0.9
+        else:
+            self.local_deadline = 0.0
+        return self._update_state()
+
+    def _update_state(self):
+        leader = self.is_leader()
+        if leader != self._was_leader:
+            self._was_leader = leader
+            if self.on_change:
+                self.on_change(leader)
+        return leader
+
+    def is_leader(self):
+        return time.monotonic() < self.local_deadline
+
+    def release(self):
+        if not self.is_leader():
+            return
+        self.local_deadline = 0.0
+        try:
+            cursor = self._cursor()
+            cursor.execute(
+                "UPDATE bot_leases SET lease_until = NOW(3) - INTERVAL 1 SECOND "
+                "WHERE name = %s AND holder = %s",
+                (self.name, self.holder)
+            )
+            cursor.close()
+        except mysql.connector.Error as e:
+            print(f"[{self.name}] 释放租约失败: {e}")
+        self._update_state()
+
+    def _heartbeat(self):
+        while not self.stop_event.is_set():
+            self.try_acquire()
+            self.stop_event.wait(self.ttl / 3)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._heartbeat, name=f"lease-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, release=True):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.ttl)
+        if release:
+            self.release()
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+def claim_run(job, run_date, lease):
+    """同一任务同一天只允许执行一次：主节点切换后新主不会重复推送。
+
+    先占位再推送（至多一次），旧主在推送过程中宕机时当天这次推送会丢失。
+    """
+    if not lease.is_leader():
+        return False
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT IGNORE INTO bot_runs (job, run_date, holder, fencing_token, started_at) "
+            "SELECT %s, %s, holder, fencing_token, NOW(3) FROM bot_leases "
+            "WHERE name = %s AND holder = %s AND fencing_token = %s AND lease_until > NOW(3)",
+            (job, run_date, lease.name, lease.holder, lease.fencing_token)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        cursor.close()
+        conn.close()
+
+def show_status():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT name, holder, fencing_token, lease_until, lease_until > NOW(3) AS alive FROM bot_leases"
+    )
+    for row in cursor.fetchall():
+        state = "有效" if row["alive"] else "已过期"
+        print(f"{row['name']}: {row['holder']} token={row['fencing_token']} 到期 {row['lease_until']}（{state}）")
+    cursor.close()
+    conn.close()
+
+# ---------- 多进程模拟 ----------
+def _simulate_worker(name, ttl, events, stop):
+    # 每 50ms 观察一次 is_leader()，本地截止时间早于库里租约到期，让位事件总会先于新主上报
+    lease = LeaderLease(name, ttl=ttl).start()
+    was_leader = False
+    while not stop.wait(0.05):
+        leader = lease.is_leader()
+        if leader != was_leader:
+            was_leader = leader
+            events.put((time.time(), os.getpid(), "leader" if leader else "follower"))
+    lease.stop(release=False)
+
+def simulate(procs, duration, ttl, name="simulate"):
+    bizvocab_schema.migrate()
+    ctx = multiprocessing.get_context("spawn")
+    events = ctx.Queue()
+    stops = [ctx.Event() for _ in range(procs)]
+    workers = [ctx.Process(target=_simulate_worker, args=(name, ttl, events, s)) for s in stops]
+    for w in workers:
+        w.start()
+
+    leaders = {}  # pid -> 成为主的时间
+    failovers = []
+    overlaps = 0
+    killed_at = None
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        try:
+            ts, pid, state = events.get(timeout=0.2)
+        except Exception:
+            ts = None
+        if ts is not None:
+            if state == "leader":
+                if leaders:
+                    overlaps += 1
+                leaders[pid] = ts
+                print(f"{datetime.datetime.fromtimestamp(ts, SH_TZ):%H:%M:%S.%f} 进程 {pid} 成为主节点")
+                if killed_at:
+                    failovers.append(ts - killed_at)
+                    killed_at = None
+            else:
+                leaders.pop(pid, None)
+        # 每个主节点当满 ttl*2 后强杀，模拟宕机
+        for w in workers:
+            if w.pid in leaders and w.is_alive() and time.time() - leaders[w.pid] > ttl * 2:
+                alive = sum(1 for x in workers if x.is_alive())
+                if alive <= 1:
+                    break
+                print(f"强杀主节点 {w.pid}")
+                w.kill()
+                leaders.pop(w.pid, None)
+                killed_at = time.time()
+
+    for s in stops:
+        s.set()
+    for w in workers:
+        w.join(timeout=ttl)
+        if w.is_alive():
+            w.kill()
+    print(f"切换次数 {len(failovers)}，切换耗时: " + ", ".join(f"{x:.2f}s" for x in failovers))
+    print(f"同时存在多个主节点的次数: {overlaps}")
+    return overlaps == 0
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库租约选主")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("status", help="查看租约（默认）")
+    p_sim = sub.add_parser("simulate", help="本地多进程争抢同一租约")
+    p_sim.add_argument("--procs", type=int, default=3)
+    p_sim.add_argument("--duration", type=float, default=30)
+    p_sim.add_argument("--ttl", type=float, default=LEASE_TTL)
+    args = parser.parse_args()
+
+    if args.cmd == "simulate":
+        sys.exit(0 if simulate(args.procs, args.duration, args.ttl) else 1)
+    else:
+        show_status()
+
+if __name__ == "__main__":
+    main()
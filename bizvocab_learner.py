@@ -7,9 +7,17 @@ import fcntl
 import sys
 import time
 import mysql.connector
-import requests
 from dotenv import load_dotenv
 
+import bizvocab_calendar
+import bizvocab_cards
+import bizvocab_curriculum
+import bizvocab_events
+import bizvocab_leader
+import bizvocab_schema
+import bizvocab_stats
+import bizvocab_work_queue
+
 SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
 
 # ---------- 配置 ----------
@@ -26,14 +34,11 @@ DB_CONFIG = {
 
 FEISHU_WEBHOOK = os.getenv("FEISHU_WEBHOOK")
 LOCK_FILE = "learnbot.lock"
+# file：本机文件锁（默认）；db：数据库租约选主，可在多台机器上部署多个实例
+HA_MODE = os.getenv("BOT_HA", "file")
 LOG_FILE = "learnbot.log"
 
-# ---------- 法定节假日列表 ----------
-HOLIDAYS = {
-    "2025-10-01", "2025-10-02", "2025-10-03",  # 国庆
-    "2025-10-04", "2025-10-05", "2025-10-06",
-    "2025-10-07", "2025-10-08"
-}
+NEW_WORDS_PER_DAY = 5  # 每天推送新词数
 
 # ---------- 工具函数 ----------
 def acquire_lock(lock_file):
@@ -53,78 +58,70 @@ def log(msg):
         f.write(line + "\n")
 
 def is_workday_today():
-    today = datetime.datetime.now(SH_TZ).date()
-    return today.weekday() < 5 and today.strftime("%Y-%m-%d") not in HOLIDAYS
+    """法定节假日和调休上班日见 bizvocab_calendar"""
+    return bizvocab_calendar.is_workday(datetime.datetime.now(SH_TZ).date())
 
 # ---------- 数据库逻辑 ----------
-def fetch_new_words(limit=5):
+def fetch_new_words(limit=NEW_WORDS_PER_DAY):
+    """按 bizvocab_curriculum 算好的优先级取前 limit 个未学单词（带少量抖动）"""
     conn = mysql.connector.connect(**DB_CONFIG)
     cursor = conn.cursor(dictionary=True)
-    cursor.execute(
-        "SELECT id, term, part_of_speech, translation, example_sentence, example_chinese "
-        "FROM business_vocab WHERE learned=0 ORDER BY RAND() LIMIT %s",
-        (limit,)
-    )
-    words = cursor.fetchall()
+    words = bizvocab_curriculum.fetch_new_words(cursor, limit)
     cursor.close()
     conn.close()
     return words
 
-def mark_words_learned(word_ids):
-    if not word_ids:
-        return
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
+def apply_words_learned(cursor, word_ids):
+    # 与聚合表增量更新放在同一事务里
+    bizvocab_stats.on_words_learned(cursor, word_ids)
+    bizvocab_events.record(cursor, bizvocab_events.EVENT_LEARN, word_ids)
     sql = """
         UPDATE business_vocab
         SET learned=1, needs_review=1, learn_date=CURDATE()
         WHERE id IN (%s)
     """ % (",".join(["%s"] * len(word_ids)))
     cursor.execute(sql, word_ids)
-    conn.commit()
-    cursor.close()
-    conn.close()
+
+def mark_words_learned(word_ids):
+    if not word_ids:
+        return
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        apply_words_learned(cursor, word_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
 
 # ---------- 飞书卡片 ----------
+WORD_TEMPLATE = bizvocab_cards.template("✨ **{term}** {pos}\n📝 {translation}{example}")
+
+def render_word(w):
+    pos = w.get("part_of_speech")
+    example = ""
+    if w.get("example_sentence"):
+        example = f"\n📖 {w['example_sentence']}"
+        if w.get("example_chinese"):
+            example += f"\n🇨🇳 {w['example_chinese']}"
+    return WORD_TEMPLATE(term=w["term"], pos=f"_({pos})_" if pos else "",
+                         translation=w["translation"], example=example)
+
 def build_feishu_card(words):
-    elements = []
+    """每个单词一节，单词很多时 bizvocab_cards.pack 会按请求体上限拆成几条消息；
+    单词片段取自进程内共享的片段缓存"""
+    card = bizvocab_cards.Card(f"今日必学商务词汇 ✨ | {datetime.datetime.now(SH_TZ).strftime('%Y-%m-%d')}", "green")
     for w in words:
-        term = w["term"]
-        pos = w.get("part_of_speech") or ""
-        translation = w["translation"]
-        eng_ex = w.get("example_sentence")
-        cn_ex = w.get("example_chinese")
-
-        word_line = f"✨ **{term}** {f'_({pos})_' if pos else ''}"
-        content = f"{word_line}\n📝 {translation}"
-        if eng_ex:
-            content += f"\n📖 {eng_ex}"
-            if cn_ex:
-                content += f"\n🇨🇳 {cn_ex}"
-
-        elements.append({
-            "tag": "div",
-            "text": {"tag": "lark_md", "content": content}
-        })
-
-    return {
-        "msg_type": "interactive",
-        "card": {
-            "config": {"wide_screen_mode": True},
-            "header": {
-                "template": "green",
-                "title": {
-                    "content": f"今日必学商务词汇 ✨ | {datetime.datetime.now(SH_TZ).strftime('%Y-%m-%d')}",
-                    "tag": "plain_text"
-                }
-            },
-            "elements": elements
-        }
-    }
-
-def send_to_feishu(card):
+        card.add(bizvocab_cards.FRAGMENTS.get("learn", w, render_word))
+    return card
+
+def send_to_feishu(card, webhook=None):
+    """card 为序列化好的消息字节或卡片 dict；Card 对象用 bizvocab_cards.send / Outbox 发送"""
     try:
-        resp = requests.post(FEISHU_WEBHOOK, json=card, timeout=10)
+        resp = bizvocab_cards.post(webhook or FEISHU_WEBHOOK, card, timeout=10)
         data = resp.json()
         if resp.status_code == 200 and data.get("StatusCode") == 0:
             log("飞书卡片发送成功")
@@ -137,38 +134,79 @@ def send_to_feishu(card):
         return False
 
 # ---------- 主逻辑 ----------
-def run_once():
-    if not is_workday_today():
+def run_once(webhook=None, check_workday=True, outbox=None):
+    """webhook 为空时推送到默认群；按学习者调度时由 bizvocab_dispatcher 传入并已按其本地日期判断过工作日。
+    返回是否推送成功，没有要推送的内容时返回 None。
+    传入 outbox 时只把卡片放进去，由调用方和同一时刻的其他卡片合并发送，此时返回 True 表示已放入"""
+    if check_workday and not is_workday_today():
         log("今天不是工作日或法定节假日，跳过推送。")
         return
 
-    words = fetch_new_words(5)
-    if not words:
+    # 多取一些候选再认领，并发的 worker/租户选中同一单词时只有一方能认领到
+    batch = bizvocab_work_queue.claim_words(
+        "learn", fetch_new_words(NEW_WORDS_PER_DAY * 2), limit=NEW_WORDS_PER_DAY)
+    if not batch.words:
         log("没有找到新的未学习单词。")
         return
-    card = build_feishu_card(words)
-    if send_to_feishu(card):
-        mark_words_learned([w["id"] for w in words])
+    own = outbox is None
+    outbox = bizvocab_cards.Outbox() if own else outbox
+
+    def on_result(ok):
+        if ok:
+            bizvocab_work_queue.commit(batch, apply=apply_words_learned)
+        else:
+            bizvocab_work_queue.release(batch)
+
+    outbox.add(build_feishu_card(batch.words), on_result)
+    # 每周五附带周报（只读聚合表），放得下时和单词卡片合成一条消息
+    if datetime.datetime.now(SH_TZ).weekday() == 4:
+        outbox.add(bizvocab_stats.build_weekly_card(bizvocab_stats.read_stats()))
+    if not own:
+        return True
+    sent = outbox.flush(lambda payload: send_to_feishu(payload, webhook))
+    log(f"学习推送：{outbox.summary()}")
+    return sent
 
 def main_loop():
-    lock_fh = acquire_lock(LOCK_FILE)
+    lease = lock_fh = None
+    bizvocab_schema.migrate()
+    if HA_MODE == "db":
+        lease = bizvocab_leader.LeaderLease(
+            "learnbot", on_change=lambda leader: log("当选主节点" if leader else "已不是主节点，转为备用")
+        ).start()
+    else:
+        lock_fh = acquire_lock(LOCK_FILE)
     try:
         while True:
             now = datetime.datetime.now(SH_TZ)
             # 每天 10:30 推送
             if now.hour == 10 and now.minute == 30:
-                run_once()
+                if lease is not None and not lease.is_leader():
+                    # 备用节点：主节点宕机时尽快接手本分钟的推送
+                    time.sleep(5)
+                    continue
+                # 同一天只推送一次，主节点切换后不会重复发送
+                if lease is None or bizvocab_leader.claim_run("learnbot", now.date(), lease):
+                    run_once()
+                    # 推送后重算优先级，新入库的单词从明天起按优先级参与挑选
+                    try:
+                        bizvocab_curriculum.recompute()
+                    except Exception as e:
+                        log(f"优先级重算失败: {e}")
                 # 等到下一分钟再检查，避免重复推送
                 time.sleep(60)
             else:
                 # 每 30 秒检查一次
                 time.sleep(30)
     finally:
-        try:
-            fcntl.flock(lock_fh, fcntl.LOCK_UN)
-            lock_fh.close()
-        except Exception:
-            pass
+        if lease is not None:
+            lease.stop()
+        else:
+            try:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+                lock_fh.close()
+            except Exception:
+                pass
 
 if __name__ == "__main__":
     main_loop()
\ No newline at end of file
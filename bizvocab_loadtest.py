@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 端到端压测：本地起飞书 webhook 和 Tatoeba 搜索接口的桩服务，按指定并发驱动
+# 学习卡片推送、复习卡片推送、例句查询三条网络路径，输出延迟分位数、吞吐和错误率。
+#
+# 用法：
+#   python bizvocab_loadtest.py --requests 1000 --concurrency 20
+#   python bizvocab_loadtest.py --flows enrich --tatoeba-latency 300 --tatoeba-error-rate 0.05
+#   python bizvocab_loadtest.py --serve-only     # 只启动桩服务，手动把 FEISHU_WEBHOOK / TATOEBA_API 指过来
+#
+# 不连数据库：卡片用合成单词构建，只压测渲染和网络路径。
+
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+import bizvocab_cards
+import bizvocab_http
+import bizvocab_learner
+import bizvocab_reviewer
+import business_vocab_example_query_v2 as example_query
+
+FEISHU_MAX_BODY = 20 * 1024  # 飞书自定义机器人请求体上限
+
+# ---------- 桩服务 ----------
+class StubBehavior:
+    """注入的延迟（毫秒，均值±抖动，tail_rate 比例的请求再额外慢 tail_ms）、错误率和限流（每秒请求数，0 为不限）"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit=0, tail_rate=0.0, tail_ms=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.tokens = float(rate_limit)
+        self.refilled = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def delay(self):
+        ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if self.tail_rate and random.random() < self.tail_rate:
+            ms += self.tail_ms
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def admit(self):
+        """令牌桶限流，返回 False 表示本次请求被限流"""
+        with self.lock:
+            self.requests += 1
+            if not self.rate_limit:
+                return True
+            now = time.monotonic()
+            self.tokens = min(self.rate_limit, self.tokens + (now - self.refilled) * self.rate_limit)
+            self.refilled = now
+            if self.tokens < 1:
+                self.throttled += 1
+                return False
+            self.tokens -= 1
+            return True
+
+    def fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            with self.lock:
+                self.errors += 1
+            return True
+        return False
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive，与真实服务一致
+    # 响应头和正文分两次写出；不关 Nagle 的话复用连接时每个请求都会碰上 40ms 的延迟 ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FeishuStubHandler(StubHandler):
+    """模拟自定义机器人 webhook：成功返回 StatusCode=0，限流返回 11232，故障返回 500"""
+
+    def do_POST(self):
+        behavior = self.server.behavior
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        behavior.delay()
+        if not behavior.admit():
+            return self.reply(200, {"code": 11232, "msg": "frequency limited"})
+        if behavior.fail():
+            return self.reply(500, {"code": 9499, "msg": "internal error"})
+        if len(body) > FEISHU_MAX_BODY:
+            return self.reply(200, {"code": 9499, "msg": "request body too large"})
+        try:
+            card = json.loads(body)
+        except ValueError:
+            return self.reply(400, {"code": 9499, "msg": "Bad Request"})
+        if card.get("msg_type") != "interactive":
+            return self.reply(200, {"code": 19002, "msg": "params error"})
+        self.reply(200, {"StatusCode": 0, "StatusMessage": "success", "code": 0, "msg": "success", "data": {}})
+
+class TatoebaStubHandler(StubHandler):
+    """模拟 /en/api_v0/search：限流返回 429，故障返回 503，按比例返回无中文翻译的结果"""
+
+    def do_GET(self):
+        behavior = self.server.behavior
+        behavior.delay()
+        if not behavior.admit():
+            return self.reply(429, {"message": "Too Many Requests"})
+        if behavior.fail():
+            return self.reply(503, {"message": "Service Unavailable"})
+        query = parse_qs(urlparse(self.path).query).get("query", [""])[0]
+        translations = [[{"text": f"我们今天讨论了{query}。", "lang": "cmn"}], []]
+        if random.random() < self.server.no_chinese_rate:
+            translations = [[], []]
+        self.reply(200, {"paging": {"Sentences": {"count": 1}}, "results": [
+            {"id": 1, "text": f"We discussed the {query} at today's meeting.", "lang": "eng",
+             "translations": translations}
+        ]})
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 默认 backlog 只有 5，高并发下建连会排队重试，测出的是桩服务瓶颈
+
+def start_stub(handler, behavior, **attrs):
+    server = StubServer(("127.0.0.1", 0), handler)
+    server.behavior = behavior
+    for k, v in attrs.items():
+        setattr(server, k, v)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# ---------- 合成数据 ----------
+def synthetic_words(n, seed=0):
+    rng = random.Random(seed)
+    words = []
+    for i in range(1, n + 1):
+        term = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 12)))
+        words.append({
+            "id": i, "term": term, "part_of_speech": rng.choice(["n", "v", "adj", "adv"]),
+            "translation": f"释义{i}，含义{i}",
+            "example_sentence": f"The {term} was approved by the board." if i % 3 else None,
+            "example_chinese": f"{term}已获董事会批准。" if i % 3 else None,
+            "review_count": rng.randint(0, 10),
+            "last_review_date": datetime.date.today() - datetime.timedelta(days=rng.randint(1, 30)) if i % 4 else None,
+        })
+    return words
+
+# ---------- 压测驱动 ----------
+def learner_op(words):
+    card = bizvocab_learner.build_feishu_card(random.sample(words, bizvocab_learner.NEW_WORDS_PER_DAY))
+    return bizvocab_cards.send(card, bizvocab_learner.send_to_feishu)
+
+def reviewer_op(words):
+    card = bizvocab_reviewer.build_review_card(random.sample(words, bizvocab_reviewer.REVIEW_WORDS_PER_DAY))
+    return bizvocab_cards.send(card, bizvocab_reviewer.send_to_feishu)
+
+def enrich_op(words):
+    return example_query.query_tatoeba_example(random.choice(words)["term"]) is not None
+
+FLOWS = {"learner": learner_op, "reviewer": reviewer_op, "enrich": enrich_op}
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def run_flow(op, words, requests_total, concurrency):
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal failures
+        t0 = time.perf_counter()
+        try:
+            ok = op(words)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_total)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": failures,
+        "error_rate": failures / max(len(latencies), 1),
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+def print_results(results):
+    print(f"{'路径':<10}{'请求':>8}{'错误率':>9}{'吞吐/s':>10}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'maxms':>9}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['requests']:>8}{r['error_rate']:>9.2%}{r['throughput']:>10.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="飞书/Tatoeba 网络路径压测")
+    parser.add_argument("--flows", default="learner,reviewer,enrich")
+    parser.add_argument("--requests", type=int, default=500, help="每条路径的请求数")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--words", type=int, default=200, help="合成单词数")
+    parser.add_argument("--feishu-latency", type=float, default=50)
+    parser.add_argument("--feishu-jitter", type=float, default=20)
+    parser.add_argument("--feishu-error-rate", type=float, default=0.0)
+    parser.add_argument("--feishu-rps", type=float, default=0, help="webhook 限流（每秒），0 为不限")
+    parser.add_argument("--tatoeba-latency", type=float, default=150)
+    parser.add_argument("--tatoeba-jitter", type=float, default=100)
+    parser.add_argument("--tatoeba-error-rate", type=float, default=0.0)
+    parser.add_argument("--tatoeba-rps", type=float, default=0)
+    parser.add_argument("--no-chinese-rate", type=float, default=0.2)
+    parser.add_argument("--serve-only", action="store_true")
+    parser.add_argument("--json", help="结果另存为 JSON")
+    args = parser.parse_args()
+
+    feishu_behavior = StubBehavior(args.feishu_latency, args.feishu_jitter, args.feishu_error_rate, args.feishu_rps)
+    tatoeba_behavior = StubBehavior(args.tatoeba_latency, args.tatoeba_jitter, args.tatoeba_error_rate,
+                                    args.tatoeba_rps)
+    feishu_server, feishu_url = start_stub(FeishuStubHandler, feishu_behavior)
+    tatoeba_server, tatoeba_url = start_stub(TatoebaStubHandler, tatoeba_behavior,
+                                             no_chinese_rate=args.no_chinese_rate)
+    feishu_url += "/open-apis/bot/v2/hook/loadtest"
+    tatoeba_url += "/en/api_v0/search"
+    print(f"飞书桩服务: {feishu_url}")
+    print(f"Tatoeba 桩服务: {tatoeba_url}")
+
+    if args.serve_only:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    # 指向桩服务；关闭例句查询的防反爬延迟和日志落盘
+    bizvocab_learner.FEISHU_WEBHOOK = feishu_url
+    bizvocab_reviewer.FEISHU_WEBHOOK = feishu_url
+    bizvocab_learner.LOG_FILE = bizvocab_reviewer.LOG_FILE = "/dev/null"
+    example_query.TATOEBA_API = tatoeba_url
+    # 请求间隔在导入时按 TATOEBA_API 的主机登记到 bizvocab_http，这里给桩服务的主机单独关掉
+    bizvocab_http.configure_host(bizvocab_http.host_of(tatoeba_url), interval=0)
+
+    words = synthetic_words(args.words)
+    results = {}
+    for name in args.flows.split(","):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = run_flow(FLOWS[name], words, args.requests, args.concurrency)
+    print_results(results)
+    for name, behavior in (("飞书", feishu_behavior), ("Tatoeba", tatoeba_behavior)):
+        print(f"{name}桩服务：收到 {behavior.requests} 次请求，限流 {behavior.throttled}，注入故障 {behavior.errors}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    feishu_server.shutdown()
+    tatoeba_server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 查词：把 business_vocab 装进内存索引，支持精确/前缀/拼写容错/中文反查，单次查询亚毫秒级
+#
+# 用法：
+#   python bizvocab_lookup.py query negotiat        # 英文：精确 → 前缀 → 拼写容错
+#   python bizvocab_lookup.py query 利润             # 中文：按释义反查英文
+#   python bizvocab_lookup.py bench --terms 50000   # 合成词库压测（不连数据库）
+# 飞书里在群中发“查 单词”或“/lookup 单词”，由 bizvocab_callback_server 回复查询卡片；
+# 回调服务同时提供 GET /lookup?q=单词。
+#
+# 索引结构：
+#   前缀树      term 逐字符建树，叶子挂单词 id
+#   对称删除    term 前 7 个字符删去至多 2 个字符得到的所有串 -> term（SymSpell），查询同样做删除后取交集再核对编辑距离
+#   n-gram     释义的单字/双字 -> id 倒排表，中文查询取双字倒排表交集
+# 增量刷新读 bizvocab_changes 变更日志里位点之后的 id：改过词条/词性/释义的重新拉取，先删旧条目再插入；
+# 删除的词从索引里移除。
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import gc
+import heapq
+import datetime
+import threading
+import collections
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_changes
+import bizvocab_schema
+import bizvocab_tiering
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+MAX_EDIT_DISTANCE = 2
+DELETE_PREFIX = 7       # 只对前 7 个字符做删除（SymSpell 的 prefix length），控制索引大小
+SHORT_TERM = 4          # 不超过该长度的查询只容忍 1 处拼写错误
+DEFAULT_LIMIT = 8
+REFRESH_INTERVAL = 30   # 增量刷新间隔（秒）
+
+MATCH_EXACT = "exact"
+MATCH_PREFIX = "prefix"
+MATCH_FUZZY = "fuzzy"
+MATCH_REVERSE = "reverse"
+
+CJK_RE = re.compile(r"[㐀-鿿]")
+GRAM_STRIP = re.compile(r"[\s，,；;、/（）()。.：:]+")
+SPACES = re.compile(r"\s+")
+LEAF = "\0"  # 前缀树节点里存放单词 id 的键
+
+def normalize_term(term):
+    return SPACES.sub(" ", (term or "").strip().lower())
+
+def translation_grams(text, n):
+    text = GRAM_STRIP.sub("", text or "")
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def deletes(word, distance):
+    """删除至多 distance 个字符得到的所有串（含原串）"""
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        nxt = set()
+        for w in frontier:
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= result
+        result |= nxt
+        frontier = nxt
+    return result
+
+def edit_distance(a, b, limit):
+    """限定上界的 OSA 编辑距离（允许相邻字符交换），超过 limit 时返回 limit + 1。
+
+    只计算 |i - j| <= limit 的对角带，带外的格子视为超限。
+    """
+    # 公共前后缀不影响距离，先去掉
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    n, m = len(a), len(b)
+    over = limit + 1
+    if abs(n - m) > limit:
+        return over
+    if not n or not m:
+        return max(n, m)
+    prev2 = None
+    prev = [j if j <= limit else over for j in range(m + 1)]
+    for i in range(1, n + 1):
+        cur = [over] * (m + 1)
+        if i <= limit:
+            cur[0] = i
+        lo, hi = max(1, i - limit), min(m, i + limit)
+        row_min = over
+        ai = a[i - 1]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (ai != b[j - 1])
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            if prev2 is not None and j > 1 and ai == b[j - 2] and a[i - 2] == b[j - 1] and prev2[j - 2] + 1 < v:
+                v = prev2[j - 2] + 1
+            cur[j] = v
+            if v < row_min:
+                row_min = v
+        if row_min > limit:
+            return over
+        prev2, prev = prev, cur
+    return prev[m] if prev[m] <= limit else over
+
+# ---------- 索引 ----------
+class VocabIndex:
+    def __init__(self):
+        self.words = {}                                # id -> (term, part_of_speech, translation)
+        self.by_term = collections.defaultdict(set)    # 规范化 term -> ids
+        self.trie = {}
+        self.delete_index = collections.defaultdict(set)  # (删除串, 原词长度) -> 规范化 term
+        self.grams = collections.defaultdict(set)      # 释义单字/双字 -> ids
+        self.stripped = {}                             # id -> 去掉分隔符的释义，反查排序用
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    # ---------- 写 ----------
+    def upsert(self, word_id, term, part_of_speech, translation):
+        with self.lock:
+            self._remove(word_id)
+            key = normalize_term(term)
+            if not key:
+                return
+            self.words[word_id] = (term, part_of_speech, translation)
+            if not self.by_term[key]:
+                for d in deletes(key[:DELETE_PREFIX], MAX_EDIT_DISTANCE):
+                    self.delete_index[d, len(key)].add(key)
+            self.by_term[key].add(word_id)
+            self.stripped[word_id] = GRAM_STRIP.sub("", translation or "")
+            node = self.trie
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node.setdefault(LEAF, set()).add(word_id)
+            for n in (1, 2):
+                for g in translation_grams(translation, n):
+                    self.grams[g].add(word_id)
+
+    def remove(self, word_id):
+        with self.lock:
+            self._remove(word_id)
+
+    def _remove(self, word_id):
+        old = self.words.pop(word_id, None)
+        if old is None:
+            return
+        term, _, translation = old
+        self.stripped.pop(word_id, None)
+        key = normalize_term(term)
+        self.by_term[key].discard(word_id)
+        if not self.by_term[key]:
+            del self.by_term[key]
+            for d in deletes(key[:DELETE_PREFIX], MAX_EDIT_DISTANCE):
+                bucket = self.delete_index.get((d, len(key)))
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self.delete_index[d, len(key)]
+        node = self.trie
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                break
+        else:
+            node.get(LEAF, set()).discard(word_id)
+        for n in (1, 2):
+            for g in translation_grams(translation, n):
+                ids = self.grams.get(g)
+                if ids is not None:
+                    ids.discard(word_id)
+                    if not ids:
+                        del self.grams[g]
+
+    # ---------- 查 ----------
+    def _result(self, word_id, match, distance=0):
+        term, pos, translation = self.words[word_id]
+        return {"id": word_id, "term": term, "part_of_speech": pos, "translation": translation,
+                "match": match, "distance": distance}
+
+    def _prefix_ids(self, key, limit):
+        node = self.trie
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return []
+        # 深度优先，凑够 limit 个就停，不遍历整棵子树
+        found = []
+        stack = [node]
+        while stack and len(found) < limit:
+            cur = stack.pop()
+            for k, child in cur.items():
+                if k == LEAF:
+                    found.extend(child)
+                else:
+                    stack.append(child)
+        return found[:limit]
+
+    def _fuzzy_terms(self, key):
+        limit = 1 if len(key) <= SHORT_TERM else MAX_EDIT_DISTANCE
+        candidates = set()
+        # 删除串按原词长度分桶，只取长度差在容错范围内的桶，短查询不会扫到大量无关候选
+        lengths = range(max(len(key) - limit, 1), len(key) + limit + 1)
+        for d in deletes(key[:DELETE_PREFIX], limit):
+            for n in lengths:
+                # 词条一侧也只取删除不超过 limit 次得到的串，否则容错 1 的查询会被 2 次删除的串带出大量候选
+                if len(d) < min(n, DELETE_PREFIX) - limit:
+                    continue
+                bucket = self.delete_index.get((d, n))
+                if bucket:
+                    candidates |= bucket
+        scored = []
+        for term in candidates:
+            dist = edit_distance(key, term, limit)
+            if dist <= limit:
+                scored.append((dist, len(term), term))
+        return sorted(scored)
+
+    def search_english(self, query, limit=DEFAULT_LIMIT):
+        key = normalize_term(query)
+        if not key:
+            return []
+        with self.lock:
+            results, seen = [], set()
+            for wid in sorted(self.by_term.get(key, ())):
+                results.append(self._result(wid, MATCH_EXACT))
+                seen.add(wid)
+            prefix = sorted(self._prefix_ids(key, limit + len(seen)),
+                            key=lambda wid: (len(self.words[wid][0]), self.words[wid][0]))
+            for wid in prefix:
+                if wid not in seen and len(results) < limit:
+                    results.append(self._result(wid, MATCH_PREFIX))
+                    seen.add(wid)
+            # 只有精确和前缀都没命中时才做拼写容错
+            if not results:
+                for dist, _, term in self._fuzzy_terms(key):
+                    for wid in sorted(self.by_term.get(term, ())):
+                        if wid not in seen and len(results) < limit:
+                            results.append(self._result(wid, MATCH_FUZZY, dist))
+                            seen.add(wid)
+            return results[:limit]
+
+    def search_chinese(self, query, limit=DEFAULT_LIMIT):
+        text = GRAM_STRIP.sub("", query or "")
+        if not text:
+            return []
+        with self.lock:
+            grams = translation_grams(text, 2) if len(text) >= 2 else {text}
+            postings = sorted((self.grams.get(g, set()) for g in grams), key=len)
+            if not postings or not postings[0]:
+                return []
+            ids = set(postings[0]).intersection(*postings[1:])
+            # 双字交集为空时退而按命中的双字数排序
+            if not ids:
+                counter = collections.Counter()
+                for p in postings:
+                    counter.update(p)
+                need = max(1, len(grams) // 2)
+                ids = {wid for wid, c in counter.items() if c >= need}
+            stripped = self.stripped
+            scored = heapq.nsmallest(
+                limit, ids, key=lambda wid: (text not in stripped[wid], len(stripped[wid]), wid))
+            return [self._result(wid, MATCH_REVERSE) for wid in scored]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        if CJK_RE.search(query or ""):
+            return self.search_chinese(query, limit)
+        return self.search_english(query, limit)
+
+    def contains(self, term):
+        """入库前判断 term 是否已存在（与 INSERT IGNORE 的唯一索引口径一致，忽略大小写）"""
+        with self.lock:
+            return bool(self.by_term.get(normalize_term(term)))
+
+# ---------- 数据库加载与增量刷新 ----------
+INDEXED_FIELDS = frozenset(["term", "part_of_speech", "translation"])
+
+def load_rows(since=None):
+    """返回 (行, 已删除的 id, 变更位点)；since 为空时全量，否则是上次返回的位点"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    columns = ["id", "term", "part_of_speech", "translation"]
+    if since is None:
+        # 先取位点再全量读：这之间的变更下次增量时会再读一遍，upsert 是幂等的；冷表里的词也能查到
+        offset = bizvocab_changes.latest_seq(cursor)
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {bizvocab_tiering.ALL_VIEW}")
+        rows, removed = cursor.fetchall(), set()
+    else:
+        ids, removed, offset = bizvocab_changes.changed_ids(cursor, since, INDEXED_FIELDS)
+        ids, rows = sorted(ids), []
+        for i in range(0, len(ids), 1000):
+            chunk = ids[i:i + 1000]
+            where = "id IN (%s)" % ",".join(["%s"] * len(chunk))
+            cursor.execute(bizvocab_tiering.union_sql(columns, where), chunk * 2)
+            rows.extend(cursor.fetchall())
+        # 日志里是更新、读的时候已被删掉的词
+        removed |= set(ids) - {r[0] for r in rows}
+    cursor.close()
+    conn.close()
+    return rows, removed, offset
+
+class LookupService:
+    def __init__(self, loader=load_rows):
+        self.loader = loader
+        self.index = VocabIndex()
+        self.offset = None
+        self.refreshed = 0.0
+
+    def load(self):
+        rows, _, offset = self.loader()
+        index = VocabIndex()
+        for row in rows:
+            index.upsert(*row)
+        # 索引建好后基本不再变化，移出分代 GC 的扫描范围，避免查询时碰上全量回收
+        gc.collect()
+        gc.freeze()
+        self.index, self.offset = index, offset
+        self.refreshed = time.monotonic()
+        return len(rows)
+
+    def refresh(self):
+        """返回本次变化了的单词 id（含删除），调用方可据此让自己的缓存失效"""
+        if self.offset is None:
+            self.load()
+            return None
+        rows, removed, offset = self.loader(since=self.offset)
+        for word_id in removed:
+            self.index.remove(word_id)
+        for row in rows:
+            self.index.upsert(*row)
+        self.offset = offset
+        self.refreshed = time.monotonic()
+        return {r[0] for r in rows} | set(removed)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        return self.index.search(query, limit)
+
+_service = None
+_service_lock = threading.Lock()
+
+def lookup(query, limit=DEFAULT_LIMIT, max_age=REFRESH_INTERVAL):
+    """库函数：进程内共享一个索引，距上次刷新超过 max_age 秒时先增量刷新"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = LookupService()
+            _service.load()
+        elif time.monotonic() - _service.refreshed > max_age:
+            _service.refresh()
+    return _service.search(query, limit)
+
+# ---------- 飞书 ----------
+MATCH_LABELS = {MATCH_EXACT: "", MATCH_PREFIX: "（前缀）", MATCH_FUZZY: "（你是不是要找）", MATCH_REVERSE: ""}
+
+def parse_command(text):
+    """“查 xxx” / “/lookup xxx” 返回查询词，否则 None；群聊里 @机器人 的占位符一并去掉"""
+    text = re.sub(r"@_user_\d+", "", text or "").strip()
+    for prefix in ("/lookup", "查词", "查"):
+        if text.lower().startswith(prefix):
+            query = text[len(prefix):].strip()
+            return query or None
+    return None
+
+def build_lookup_card(query, results):
+    if results:
+        lines = [
+            f"**{r['term']}** {r['part_of_speech'] or ''} {r['translation'] or ''}{MATCH_LABELS[r['match']]}"
+            for r in results
+        ]
+        content = "\n".join(lines)
+    else:
+        content = "词库里没有找到相关单词。"
+    return {
+        "msg_type": "interactive",
+        "card": {
+            "config": {"wide_screen_mode": True},
+            "header": {"title": {"tag": "plain_text", "content": f"🔍 查词：{query}"}, "template": "blue"},
+            "elements": [{"tag": "div", "text": {"tag": "lark_md", "content": content}}],
+        },
+    }
+
+# ---------- 压测 ----------
+def synthetic_rows(n, seed=0):
+    rng = random.Random(seed)
+    hanzi = "利润收益成本预算合同谈判市场销售客户产品服务管理投资风险资本股份价格折扣报价订单发票付款贷款利息汇率"
+    rows, seen = [], set()
+    while len(rows) < n:
+        term = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 12)))
+        if term in seen:
+            continue
+        seen.add(term)
+        meaning = "，".join("".join(rng.choice(hanzi) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3)))
+        rows.append((len(rows) + 1, term, rng.choice(["n", "v", "adj"]), meaning))
+    return rows
+
+def typo(word, rng):
+    i = rng.randrange(len(word))
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+    return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i:]
+
+def bench(terms, queries):
+    rows = synthetic_rows(terms)
+    t0 = time.perf_counter()
+    service = LookupService(loader=lambda since=None: (rows if since is None else [], set(), 0))
+    service.load()
+    print(f"索引 {terms} 个单词耗时 {time.perf_counter() - t0:.2f}s，"
+          f"删除串 {len(service.index.delete_index)} 个，n-gram {len(service.index.grams)} 个")
+    rng = random.Random(1)
+    picks = [rng.choice(rows) for _ in range(queries)]
+    kinds = {
+        "精确": [r[1] for r in picks],
+        "前缀": [r[1][:3] for r in picks],
+        "拼写容错": [typo(r[1], rng) for r in picks],
+        "中文反查": [r[3].split("，")[0] for r in picks],
+    }
+    for name, qs in kinds.items():
+        lat = []
+        hits = 0
+        for q in qs:
+            t = time.perf_counter()
+            hits += bool(service.search(q))
+            lat.append(time.perf_counter() - t)
+        lat.sort()
+        pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] * 1e6
+        print(f"{name:<6} 命中 {hits}/{len(qs)}  p50 {pct(0.5):.0f}µs  p99 {pct(0.99):.0f}µs  max {lat[-1] * 1e6:.0f}µs")
+    # 增量更新
+    t = time.perf_counter()
+    for r in rows[:1000]:
+        service.index.upsert(r[0], r[1] + "x", r[2], r[3] + "费用")
+    print(f"增量更新 1000 个单词耗时 {(time.perf_counter() - t) * 1000:.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="查词")
+    sub = parser.add_subparsers(dest="cmd")
+    p_query = sub.add_parser("query", help="查一个词")
+    p_query.add_argument("text")
+    p_query.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    p_bench = sub.add_parser("bench", help="合成词库压测（不连数据库）")
+    p_bench.add_argument("--terms", type=int, default=50000)
+    p_bench.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.terms, args.queries)
+    elif args.cmd == "query":
+        bizvocab_schema.migrate()
+        for r in lookup(args.text, args.limit):
+            label = MATCH_LABELS[r["match"]]
+            print(f"{r['term']:<24}{r['part_of_speech'] or '':<6}{r['translation'] or ''}{label}")
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
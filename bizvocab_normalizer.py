@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 入库前的校验与规范化：爬虫解析出的词条逐条流过一组预先编译好的规则，合格的写库，
+# 不合格的写进隔离文件（JSON Lines）待人工处理，不再事后跑 sql_wrong_washer.py 全表清洗。
+#
+# 用法：
+#   python bizvocab_normalizer.py check "yield n. 有效产量 abroad adv. 在国外"   # 单条试跑，打印结果
+#   python bizvocab_normalizer.py scan [--apply]        # 用同一套规则检查库里已有词条（默认只报告）
+#   python bizvocab_normalizer.py quarantine [--tail 20]
+#   python bizvocab_normalizer.py bench [--records 200000]
+#
+# 规则按顺序执行（RULES），每条规则输入一个词条、输出零到多个词条，或抛出 Reject 进入隔离文件：
+#   spaces    全角空格、不间断空格等换成半角并合并连续空白；单词做 NFKC（全角字母数字转半角）；
+#             释义里的半角分号逗号括号统一成中文全角，去掉全角标点两侧和首尾多余的空格、分隔符
+#   pos       词性统一成不带点的小写简写：a./adj. → adj，ad./adv. → adv，n./v./vt./vi. 等去点，多词性用“/”连接
+#   split     释义里混进了“单词 词性. 释义”（页面换行丢失时多个词条粘在一起），拆成多条
+#   validate  单词必须是英文（字母、空格、连字符、撇号、点），释义必须含中文，长度不超过表字段
+# 同一批里拆出来的重复单词只保留第一条；库里已有的由 INSERT IGNORE 按 uk_term 去重。
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import unicodedata
+import collections
+import mysql.connector
+from dotenv import load_dotenv
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+QUARANTINE_FILE = os.getenv("VOCAB_QUARANTINE", "vocab_quarantine.jsonl")
+TERM_MAX = 128         # business_vocab.term VARCHAR(128)
+TRANSLATION_MAX = 512  # business_vocab.translation VARCHAR(512)
+POS_MAX = 32
+
+# 词性写法 → 规范简写；不在表里的词性整条进隔离文件
+POS_CANONICAL = {
+    "n": "n", "v": "v", "vt": "vt", "vi": "vi",
+    "a": "adj", "adj": "adj",
+    "ad": "adv", "adv": "adv",
+    "prep": "prep", "conj": "conj", "pron": "pron", "num": "num", "art": "art",
+    "int": "int", "interj": "int", "abbr": "abbr", "phr": "phr",
+}
+
+# ---------- 规则 ----------
+class Reject(Exception):
+    """词条不合格；reason 为隔离文件里的原因代码"""
+    def __init__(self, reason, detail=""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+        self.detail = detail
+
+SPACE_RE = re.compile(r"[\s　  -​﻿]+")
+TRANSLATION_PUNCT = str.maketrans({";": "；", ",": "，", "(": "（", ")": "）"})
+PUNCT_SPACE_RE = re.compile(r" ?([；，、（）：]) ?")
+TRIM_CHARS = " ；，、;,"
+POS_PART_RE = re.compile(r"[a-z]+")
+# 释义里粘着的下一个词条：英文单词/词组 + 空白 + 词性 + 点；词性按长的优先匹配，避免 adj 被当成 a
+POS_ALTERNATION = "|".join(sorted(map(re.escape, POS_CANONICAL), key=len, reverse=True))
+ENTRY_RE = re.compile(rf"(?<![A-Za-z])([A-Za-z][A-Za-z'\- ]*?)\s+({POS_ALTERNATION})\.\s*")
+TERM_RE = re.compile(r"^[A-Za-z][A-Za-z0-9'\-. /&]*$")
+CJK_RE = re.compile(r"[一-鿿]")
+
+def rule_spaces(record):
+    term = unicodedata.normalize("NFKC", record.get("term") or "")
+    record["term"] = SPACE_RE.sub(" ", term).strip()
+    translation = SPACE_RE.sub(" ", record.get("translation") or "").translate(TRANSLATION_PUNCT)
+    record["translation"] = PUNCT_SPACE_RE.sub(r"\1", translation).strip(TRIM_CHARS)
+    if record.get("part_of_speech"):
+        record["part_of_speech"] = SPACE_RE.sub("", record["part_of_speech"])
+    yield record
+
+def canonical_pos(pos):
+    """“a.”→adj，“n./v.”→n/v；空值返回 None，认不出的词性抛 Reject"""
+    if not pos:
+        return None
+    parts = POS_PART_RE.findall(unicodedata.normalize("NFKC", pos).lower())
+    canonical = []
+    for part in parts:
+        if part not in POS_CANONICAL:
+            raise Reject("unknown_pos", pos)
+        if POS_CANONICAL[part] not in canonical:
+            canonical.append(POS_CANONICAL[part])
+    return "/".join(canonical) or None
+
+def rule_pos(record):
+    record["part_of_speech"] = canonical_pos(record.get("part_of_speech"))
+    yield record
+
+def rule_split(record):
+    translation = record["translation"]
+    matches = list(ENTRY_RE.finditer(translation))
+    if not matches:
+        yield record
+        return
+    record["translation"] = translation[:matches[0].start()].strip(TRIM_CHARS)
+    yield record
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(translation)
+        yield {
+            **record,
+            "term": match.group(1).strip(),
+            "part_of_speech": POS_CANONICAL[match.group(2)],
+            "translation": translation[match.end():end].strip(TRIM_CHARS),
+            "example_sentence": None,
+            "example_chinese": None,
+            "split_from": record["term"],
+        }
+
+def rule_validate(record):
+    term, translation = record["term"], record["translation"]
+    if not term:
+        raise Reject("empty_term")
+    if len(term) > TERM_MAX:
+        raise Reject("term_too_long", term[:40])
+    if not TERM_RE.match(term):
+        raise Reject("bad_term", term)
+    if not translation:
+        raise Reject("empty_translation", term)
+    if not CJK_RE.search(translation):
+        raise Reject("no_chinese", translation[:40])
+    if len(translation) > TRANSLATION_MAX:
+        raise Reject("translation_too_long", term)
+    if record.get("part_of_speech") and len(record["part_of_speech"]) > POS_MAX:
+        raise Reject("pos_too_long", record["part_of_speech"])
+    yield record
+
+RULES = (("spaces", rule_spaces), ("pos", rule_pos), ("split", rule_split), ("validate", rule_validate))
+
+# ---------- 隔离文件 ----------
+class Quarantine:
+    """不合格词条追加写入 JSON Lines：时间、来源、原因、原始词条"""
+    def __init__(self, path=QUARANTINE_FILE):
+        self.path = path
+        self._fh = None
+
+    def write(self, raw, reason, detail="", source=None):
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write(json.dumps({
+            "at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "source": source, "reason": reason, "detail": detail, "record": raw,
+        }, ensure_ascii=False, default=str) + "\n")
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------- 流水线 ----------
+class Pipeline:
+    def __init__(self, rules=RULES, quarantine=None, source=None):
+        self.rules = rules
+        self.quarantine = quarantine
+        self.source = source
+        self.seen = set()
+        self.stats = collections.Counter()
+
+    def _reject(self, record, error):
+        self.stats["rejected"] += 1
+        self.stats[f"rejected:{error.reason}"] += 1
+        if self.quarantine is not None:
+            self.quarantine.write(record, error.reason, error.detail, self.source)
+
+    def apply(self, record):
+        """依次执行各条规则；拆出来的词条各自校验，一条不合格不影响同一行里的其他词条"""
+        raw = dict(record)
+        batch = [dict(record)]
+        for name, rule in self.rules:
+            out = []
+            for r in batch:
+                try:
+                    produced = list(rule(r))
+                except Reject as e:
+                    # 原始行整条进隔离文件；拆出来的词条带 split_from，记录拆分后的样子
+                    self._reject(r if "split_from" in r else raw, e)
+                    continue
+                if len(produced) != 1:
+                    self.stats[name] += len(produced) - 1
+                out.extend(produced)
+            batch = out
+        return batch
+
+    def process(self, record):
+        """单条原始词条 → 合格词条列表；不合格的写隔离文件"""
+        self.stats["in"] += 1
+        raw = dict(record)
+        out = self.apply(record)
+        kept = []
+        for r in out:
+            key = r["term"].lower()
+            if key in self.seen:
+                self.stats["duplicate"] += 1
+                continue
+            self.seen.add(key)
+            if r != raw:
+                self.stats["changed"] += 1
+            kept.append(r)
+        self.stats["out"] += len(kept)
+        return kept
+
+    def run(self, records):
+        """流式处理：逐条读入、逐条产出"""
+        for record in records:
+            yield from self.process(record)
+
+    def summary(self):
+        s = self.stats
+        reasons = "，".join(f"{k.split(':', 1)[1]} {v}" for k, v in sorted(s.items()) if k.startswith("rejected:"))
+        return (f"输入 {s['in']} 条 → 合格 {s['out']} 条（改写 {s['changed']}，拆分 {s['split']}，重复 {s['duplicate']}），"
+                f"隔离 {s['rejected']} 条" + (f"（{reasons}）" if reasons else ""))
+
+def normalize(records, source=None, quarantine_path=QUARANTINE_FILE):
+    """一次性处理一批词条，返回 (合格词条列表, Pipeline)；供 crawler.save_to_database 等直接调用"""
+    with Quarantine(quarantine_path) as q:
+        pipeline = Pipeline(quarantine=q, source=source)
+        return list(pipeline.run(records)), pipeline
+
+# ---------- 库内已有词条 ----------
+def scan(apply=False, quarantine_path=QUARANTINE_FILE):
+    """用同一套规则检查库里的词条：改写的 UPDATE，拆出来的 INSERT IGNORE，不合格的只记隔离文件不删除"""
+    import bizvocab_stats
+    import bizvocab_tiering
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id, term, part_of_speech, translation FROM business_vocab")
+    rows = cursor.fetchall()
+    updates, inserts = [], []
+    with Quarantine(quarantine_path) as q:
+        pipeline = Pipeline(quarantine=q, source="business_vocab")
+        for row in rows:
+            out = pipeline.process(row)
+            if not out:
+                continue
+            first = out[0]
+            if (first["term"], first["part_of_speech"], first["translation"]) != \
+                    (row["term"], row["part_of_speech"], row["translation"]):
+                updates.append((first["part_of_speech"], first["translation"], row["id"]))
+            inserts.extend((r["term"], r["part_of_speech"], r["translation"]) for r in out[1:])
+    print(pipeline.summary())
+    print(f"需要改写 {len(updates)} 条，拆出新词条 {len(inserts)} 条{'' if apply else '（未写入，加 --apply 执行）'}")
+    if apply:
+        # 单词本身的规范化（全角转半角等）可能与已有行冲突，这里只改词性和释义，单词保持原样
+        cursor.executemany("UPDATE business_vocab SET part_of_speech=%s, translation=%s WHERE id=%s", updates)
+        inserted = 0
+        if inserts:
+            plain = conn.cursor()
+            cold = bizvocab_tiering.cold_terms(plain, [t for t, _, _ in inserts])
+            plain.close()
+            inserts = [r for r in inserts if r[0].lower() not in cold]
+        if inserts:
+            cursor.executemany(
+                "INSERT IGNORE INTO business_vocab (term, part_of_speech, translation) VALUES (%s, %s, %s)", inserts)
+            inserted = cursor.rowcount
+        bizvocab_stats.on_words_inserted(cursor, inserted)
+        conn.commit()
+        print(f"已改写 {len(updates)} 条，新增 {inserted} 条")
+    cursor.close()
+    conn.close()
+    return pipeline
+
+def show_quarantine(path=QUARANTINE_FILE, tail=20):
+    if not os.path.exists(path):
+        print("隔离文件为空。")
+        return
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    reasons = collections.Counter(json.loads(line)["reason"] for line in lines)
+    print(f"{path}：共 {len(lines)} 条；" + "，".join(f"{k} {v}" for k, v in reasons.most_common()))
+    for line in lines[-tail:]:
+        item = json.loads(line)
+        rec = item["record"]
+        print(f"  {item['at']}  {item['reason']:<18}{rec.get('term')!s:<24}{rec.get('translation')!s:.40}")
+
+# ---------- 压测 ----------
+def _letters(i):
+    """整数 → 纯字母单词（爬虫页面里粘连的词条不含数字）"""
+    word = ""
+    while True:
+        i, r = divmod(i, 26)
+        word += chr(ord("a") + r)
+        if not i:
+            return word
+
+def synthetic_records(n, seed=0):
+    rng = random.Random(seed)
+    pos = ["n.", "v", "adj", "a", "adv.", "vt", "n./v."]
+    out = []
+    for i in range(n):
+        term = f"term{i}"
+        translation = f"释义{i}; 含义{i}"
+        kind = rng.random()
+        if kind < 0.05:
+            translation += f" extra {_letters(i)} {rng.choice(['n', 'adj', 'v'])}. 附加{i} more {_letters(i)} adv. 更多{i}"
+        elif kind < 0.08:
+            term = f"ｆｕｌｌ{i}　word"
+        elif kind < 0.10:
+            translation = "no chinese here"
+        out.append({"term": term, "part_of_speech": rng.choice(pos), "translation": translation,
+                    "example_sentence": None, "example_chinese": None})
+    return out
+
+def bench(records=200000):
+    data = synthetic_records(records)
+    pipeline = Pipeline()
+    t0 = time.perf_counter()
+    kept = sum(1 for _ in pipeline.run(data))
+    elapsed = time.perf_counter() - t0
+    print(pipeline.summary())
+    print(f"{records} 条 {elapsed:.2f}s，{records / elapsed:.0f} 条/s，产出 {kept} 条")
+
+def main():
+    parser = argparse.ArgumentParser(description="词条入库前的校验与规范化")
+    sub = parser.add_subparsers(dest="cmd")
+    p_check = sub.add_parser("check", help="单条试跑")
+    p_check.add_argument("line", help="与爬虫页面相同的“单词 词性. 释义”一行")
+    p_scan = sub.add_parser("scan", help="检查库里已有词条")
+    p_scan.add_argument("--apply", action="store_true", help="写回改写和拆分结果")
+    p_quarantine = sub.add_parser("quarantine", help="查看隔离文件")
+    p_quarantine.add_argument("--tail", type=int, default=20)
+    p_bench = sub.add_parser("bench", help="合成词条压测")
+    p_bench.add_argument("--records", type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.cmd == "check":
+        m = re.match(r"^\s*(\S+)\s+([A-Za-z./]+?)\.?\s+(.*)$", args.line)
+        if not m:
+            print("格式应为：单词 词性. 释义")
+            sys.exit(1)
+        rejects = []
+        pipeline = Pipeline()
+        pipeline._reject = lambda record, error: rejects.append((record, error))
+        out = pipeline.apply({"term": m.group(1), "part_of_speech": m.group(2), "translation": m.group(3)})
+        for r in out:
+            print(f"{r['term']:<24}{r['part_of_speech'] or '-':<8}{r['translation']}")
+        for record, error in rejects:
+            print(f"隔离：{record['term']}  {error}")
+        if rejects:
+            sys.exit(1)
+    elif args.cmd == "scan":
+        scan(args.apply)
+    elif args.cmd == "quarantine":
+        show_quarantine(tail=args.tail)
+    else:
+        bench(getattr(args, "records", 200000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 爬虫原始页面归档：每次抓到的页面追加写入压缩归档（类 WARC），另有 URL/偏移索引；
+# 页面结构变了或解析正则修好后，直接对归档离线重解析，不用重新爬站。
+#
+# 用法：
+#   python bizvocab_page_archive.py list                     # 每个 URL 最新一次抓取
+#   python bizvocab_page_archive.py show <url>               # 输出归档里的页面 HTML
+#   python bizvocab_page_archive.py reparse [--workers 8] [--dry-run] [--url 关键字] [--update]
+#                                            # --update：已入库单词（含冷表）的词性、释义也按重解析结果更新，
+#                                            # 并列出有差异的行；与 --dry-run 一起用时只列差异不写库
+#
+# 存储格式（PAGE_ARCHIVE_DIR，默认 archive/pages）：
+#   pages-00001.gz ...   段文件，只追加；每条记录是一个独立的 gzip 成员，
+#                        解压后为一行 JSON 头（url、抓取时间、状态码、sha1、长度，
+#                        以及抓取它的来源名 source）+ 页面原始字节
+#   pages.idx            索引，每行“url<TAB>段号<TAB>偏移<TAB>压缩长度<TAB>抓取时间<TAB>sha1<TAB>类型”
+# 单条记录可按偏移直接 seek 解压；段文件本身也能被 zcat 整体解开。
+
+import os
+import sys
+import json
+import gzip
+import fcntl
+import hashlib
+import argparse
+import datetime
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+PAGE_ARCHIVE_DIR = os.getenv("PAGE_ARCHIVE_DIR", os.path.join("archive", "pages"))
+SEGMENT_SIZE = 64 * 1024 * 1024  # 段文件超过该大小后换新段
+INDEX_FILE = "pages.idx"
+
+KIND_INDEX = "index"  # 字母分类导航页
+KIND_VOCAB = "vocab"  # 词汇页
+
+IndexEntry = collections.namedtuple("IndexEntry", "url segment offset length fetched_at sha1 kind")
+
+def segment_name(segment):
+    return f"pages-{segment:05d}.gz"
+
+def _parse_index_line(line):
+    parts = line.rstrip("\n").split("\t")
+    if len(parts) != 7:
+        return None
+    url, seg, off, length, fetched_at, sha1, kind = parts
+    return IndexEntry(url, int(seg), int(off), int(length), fetched_at, sha1, kind)
+
+class PageArchive:
+    def __init__(self, root=PAGE_ARCHIVE_DIR):
+        self.root = root
+        # append 去重用：每个 URL 最后一次内容的 sha1，以及已读到的索引位置；
+        # 别的进程追加的部分在加锁后从该位置往后补读，不用每次重读整个索引
+        self._last_sha1 = {}
+        self._index_pos = 0
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    # ---------- 读 ----------
+    def entries(self):
+        path = self._path(INDEX_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [e for e in map(_parse_index_line, f) if e is not None]
+
+    def latest(self, kind=None):
+        """每个 URL 最后一次抓取的索引项，按首次出现顺序"""
+        latest = {}
+        for entry in self.entries():
+            if kind is None or entry.kind == kind:
+                latest[entry.url] = entry
+        return list(latest.values())
+
+    def read(self, entry):
+        """返回 (头信息 dict, 页面字节)"""
+        with open(self._path(segment_name(entry.segment)), "rb") as f:
+            f.seek(entry.offset)
+            raw = gzip.decompress(f.read(entry.length))
+        header, _, body = raw.partition(b"\n")
+        return json.loads(header), body
+
+    def read_text(self, entry, encoding="utf-8"):
+        return self.read(entry)[1].decode(encoding, errors="replace")
+
+    # ---------- 写 ----------
+    def append(self, url, body, status=200, kind=KIND_VOCAB, source=None):
+        """追加一条抓取记录；与该 URL 上次内容相同则只跳过不写。返回索引项或 None。
+        source 为 bizvocab_sources 的来源名，同主机有多个来源时重解析靠它找适配器"""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        sha1 = hashlib.sha1(body).hexdigest()
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(INDEX_FILE), "a+", encoding="utf-8") as idx:
+            # 多个爬虫进程同时写时按索引文件加锁串行
+            fcntl.flock(idx, fcntl.LOCK_EX)
+            try:
+                self._catch_up(idx)
+                if self._last_sha1.get(url) == sha1:
+                    return None
+                segment = self._current_segment()
+                fetched_at = datetime.datetime.now(SH_TZ).isoformat(timespec="seconds")
+                meta = {"url": url, "fetched_at": fetched_at, "status": status,
+                        "sha1": sha1, "length": len(body), "kind": kind}
+                if source:
+                    meta["source"] = source
+                header = json.dumps(meta, ensure_ascii=False)
+                record = gzip.compress(header.encode("utf-8") + b"\n" + body)
+                with open(self._path(segment_name(segment)), "ab") as seg:
+                    offset = seg.tell()
+                    seg.write(record)
+                entry = IndexEntry(url, segment, offset, len(record), fetched_at, sha1, kind)
+                idx.write("\t".join(str(v) for v in entry) + "\n")
+                idx.flush()
+                self._last_sha1[url] = sha1
+                self._index_pos = idx.tell()
+                return entry
+            finally:
+                fcntl.flock(idx, fcntl.LOCK_UN)
+
+    def _catch_up(self, idx):
+        """持锁时调用：把索引里上次读到之后的行并入 url -> sha1"""
+        idx.seek(0, os.SEEK_END)
+        if idx.tell() < self._index_pos:
+            # 索引被替换或截断过，从头重读
+            self._last_sha1.clear()
+            self._index_pos = 0
+        idx.seek(self._index_pos)
+        for entry in map(_parse_index_line, idx.read().splitlines()):
+            if entry is not None:
+                self._last_sha1[entry.url] = entry.sha1
+        self._index_pos = idx.tell()
+
+    def _current_segment(self):
+        segments = sorted(int(n[6:11]) for n in os.listdir(self.root) if n.startswith("pages-") and n.endswith(".gz"))
+        if not segments:
+            return 1
+        last = segments[-1]
+        if os.path.getsize(self._path(segment_name(last))) >= SEGMENT_SIZE:
+            return last + 1
+        return last
+
+# ---------- 离线重解析 ----------
+def _parse_entry(args):
+    """进程池任务：读一条记录并用 crawler 当前的解析逻辑提取词汇"""
+    root, entry = args
+    import crawler
+    header, body = PageArchive(root).read(IndexEntry(*entry))
+    source = header.get("source")
+    html = body.decode("utf-8", errors="replace")
+    return entry[0], source, crawler.parse_vocab_html(html, entry[0], verbose=False, source=source)
+
+def reparse(root=PAGE_ARCHIVE_DIR, workers=None, url_filter=None, dry_run=False, update=False):
+    archive = PageArchive(root)
+    entries = [e for e in archive.latest(KIND_VOCAB) if not url_filter or url_filter in e.url]
+    if not entries:
+        print("归档里没有可解析的词汇页。")
+        return {}
+    t0 = datetime.datetime.now()
+    results, sources = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for url, source, vocab_list in pool.map(_parse_entry, [(root, tuple(e)) for e in entries], chunksize=4):
+            results[url] = vocab_list
+            sources[url] = source
+    elapsed = (datetime.datetime.now() - t0).total_seconds()
+    total = sum(len(v) for v in results.values())
+    empty = [u for u, v in results.items() if not v]
+    print(f"重解析 {len(entries)} 个页面，提取 {total} 个词汇，耗时 {elapsed:.2f}s")
+    for url in empty:
+        print(f"  ⚠️ 未提取到词汇：{url}")
+    if (update or not dry_run) and total:
+        import crawler
+        import bizvocab_sources
+        for url, vocab_list in results.items():
+            # 与解析时一样按归档里的来源名（旧归档按 URL）找来源，BEC 级别取该来源的设置
+            adapter = (bizvocab_sources.adapter_for_url(url, sources[url])
+                       or bizvocab_sources.ADAPTERS[crawler.SOURCE])
+            crawler.save_to_database(vocab_list, source=url, bec_level=adapter.bec_level,
+                                     update=update, dry_run=dry_run)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="爬虫原始页面归档")
+    parser.add_argument("--root", default=PAGE_ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("list", help="每个 URL 最新一次抓取（默认）")
+    p_show = sub.add_parser("show", help="输出页面 HTML")
+    p_show.add_argument("url")
+    p_reparse = sub.add_parser("reparse", help="用当前解析逻辑离线重解析归档并入库")
+    p_reparse.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    p_reparse.add_argument("--url", default=None, help="只处理 URL 包含该关键字的页面")
+    p_reparse.add_argument("--dry-run", action="store_true", help="只解析不入库（配合 --update 时只列差异）")
+    p_reparse.add_argument("--update", action="store_true", help="已有单词的词性、释义也按解析结果更新")
+    args = parser.parse_args()
+
+    archive = PageArchive(args.root)
+    if args.cmd == "show":
+        matches = [e for e in archive.latest() if e.url == args.url]
+        if not matches:
+            print(f"归档里没有 {args.url}")
+            sys.exit(1)
+        sys.stdout.write(archive.read_text(matches[-1]))
+    elif args.cmd == "reparse":
+        reparse(args.root, args.workers, args.url, args.dry_run, args.update)
+    else:
+        entries = archive.latest()
+        for e in entries:
+            print(f"{e.fetched_at}  {e.kind:<6} {segment_name(e.segment)}@{e.offset:<10} {e.url}")
+        print(f"共 {len(entries)} 个 URL，{len(archive.entries())} 次抓取")
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,22 @@
 import os
 import datetime
 import fcntl
+import functools
 import sys
 import time
 import random
 import mysql.connector
-import requests
 from dotenv import load_dotenv
 
+import bizvocab_calendar
+import bizvocab_cards
+import bizvocab_distractors
+import bizvocab_events
+import bizvocab_leader
+import bizvocab_schema
+import bizvocab_stats
+import bizvocab_tuner
+
 SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
 
 # ---------- 配置 ----------
@@ -27,13 +36,13 @@ DB_CONFIG = {
 
 FEISHU_WEBHOOK = os.getenv("FEISHU_WEBHOOK")
 LOCK_FILE = "reviewbot.lock"
+# file：本机文件锁（默认）；db：数据库租约选主，可在多台机器上部署多个实例
+HA_MODE = os.getenv("BOT_HA", "file")
 LOG_FILE = "reviewbot.log"
 
-HOLIDAYS = {
-    "2025-10-01", "2025-10-02", "2025-10-03",
-    "2025-10-04", "2025-10-05", "2025-10-06",
-    "2025-10-07", "2025-10-08"
-}
+# 以下两项是默认值，bizvocab_tuner 拟合出的参数文件里有对应项时以文件为准
+REVIEW_WORDS_PER_DAY = 10    # 每天复习单词数
+REVIEW_WEIGHT_EXPONENT = 1.5  # 抽样权重 1/(1+review_count)^指数
 
 # ---------- 工具函数 ----------
 def acquire_lock(lock_file):
@@ -53,29 +62,63 @@ def log(msg):
         f.write(line + "\n")
 
 def is_workday_today():
-    today = datetime.datetime.now(SH_TZ).date()
-    today_str = today.strftime("%Y-%m-%d")
-    return today.weekday() < 5 and today_str not in HOLIDAYS
+    """法定节假日和调休上班日见 bizvocab_calendar"""
+    return bizvocab_calendar.is_workday(datetime.datetime.now(SH_TZ).date())
 
 # ---------- 数据库逻辑 ----------
-def fetch_review_words(limit=10):
+def review_weight(review_count, exponent=REVIEW_WEIGHT_EXPONENT):
+    """复习次数越多权重越低；按整数份数放进抽样池，至少 1 份"""
+    weight = 1 / (1 + review_count)**exponent
+    return max(int(weight * 100), 1)
+
+def fetch_review_words(limit=None):
+    """limit 为空时取调优参数里的每天复习数"""
     conn = mysql.connector.connect(**DB_CONFIG)
     cursor = conn.cursor(dictionary=True)
     cursor.execute(
-        "SELECT id, term, part_of_speech, translation, review_count, last_review_date, example_sentence "
+        "SELECT id, term, part_of_speech, translation, review_count, last_review_date, learn_date, example_sentence "
         "FROM business_vocab WHERE learned=1 AND needs_review=1"
     )
     rows = cursor.fetchall()
     cursor.close()
     conn.close()
+    return pick_review_words(rows, limit)
 
-    if not rows:
+def is_due(word, gaps, today):
+    """距上次复习（没复习过则距学习）已满调优出的间隔；没有间隔参数或日期时都算到期"""
+    last = word.get('last_review_date') or word.get('learn_date')
+    if not gaps or last is None:
+        return True
+    return (today - last).days >= bizvocab_tuner.interval_for(gaps, word['review_count'])
+
+def pick_review_words(rows, limit=None, params=None):
+    """先从已到期的词里抽，不够再从未到期的词里补；纯 CPU 计算，分片运行时在各进程里各算各的。
+    params 默认取 bizvocab_tuner.params()，缺的项用本模块的常量"""
+    params = bizvocab_tuner.params() if params is None else params
+    if limit is None:
+        limit = params.get("words_per_day", REVIEW_WORDS_PER_DAY)
+    exponent = params.get("weight_exponent", REVIEW_WEIGHT_EXPONENT)
+    gaps = params.get("intervals")
+    if not gaps:
+        return weighted_pick(rows, limit, exponent)
+
+    today = datetime.datetime.now(SH_TZ).date()
+    due, later = [], []
+    for w in rows:
+        (due if is_due(w, gaps, today) else later).append(w)
+    result = weighted_pick(due, limit, exponent)
+    if len(result) < limit:
+        result.extend(weighted_pick(later, limit - len(result), exponent))
+    return result
+
+def weighted_pick(rows, limit, exponent=REVIEW_WEIGHT_EXPONENT):
+    """按复习次数加权无放回抽样后去重，不足 limit 时均匀补齐"""
+    if not rows or limit <= 0:
         return []
 
     weighted_list = []
     for w in rows:
-        weight = 1 / (1 + w['review_count'])**1.5
-        weighted_list.extend([w] * max(int(weight * 100), 1))
+        weighted_list.extend([w] * review_weight(w['review_count'], exponent))
 
     selected = random.sample(weighted_list, min(limit, len(rows)))
 
@@ -98,57 +141,112 @@ def mark_words_reviewed(word_ids):
         return
     conn = mysql.connector.connect(**DB_CONFIG)
     cursor = conn.cursor()
-    sql = """
-        UPDATE business_vocab
-        SET review_count = review_count + 1,
-            last_review_date = CURDATE()
-        WHERE id IN (%s)
-    """ % (",".join(["%s"] * len(word_ids)))
-    cursor.execute(sql, word_ids)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    try:
+        # 与聚合表增量更新放在同一事务里
+        bizvocab_stats.on_words_reviewed(cursor, word_ids)
+        bizvocab_events.record(cursor, bizvocab_events.EVENT_REVIEW, word_ids)
+        sql = """
+            UPDATE business_vocab
+            SET review_count = review_count + 1,
+                last_review_date = CURDATE()
+            WHERE id IN (%s)
+        """ % (",".join(["%s"] * len(word_ids)))
+        cursor.execute(sql, word_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
 
 # ---------- 飞书卡片 ----------
-def build_review_card(words):
-    elements = []
-    for idx, w in enumerate(words, start=1):
-        last_review = w['last_review_date'].strftime('%Y-%m-%d') if w['last_review_date'] else "未复习过"
-        pos_str = f"_({w['part_of_speech']})_" if w.get('part_of_speech') else ""
+# 题干 = 序号 + 单词片段 + 上次复习日期，三段转义后的字节直接拼接。
+# 题干片段很短，查片段缓存（算内容版本、查字典）不比直接渲染省时间，复习卡片不走 bizvocab_cards.FRAGMENTS
+CHOICE_CN_FRAGMENT = bizvocab_cards.fragment("✨ **{translation}** {pos}\n📝 请选出英文单词")
+CHOICE_EN_FRAGMENT = bizvocab_cards.fragment("✨ **{term}** {pos}\n📝 请选出中文意思")
+FILL_CN_FRAGMENT = bizvocab_cards.fragment("✨ **{translation}** {pos}\n📝 请写出英文单词")
+FILL_EN_FRAGMENT = bizvocab_cards.fragment("✨ **{term}** {pos}{example}\n📝 请写出中文意思")
 
+def _fragment_renderer(fragment):
+    def render(w):
+        pos = f"_({w['part_of_speech']})_" if w.get('part_of_speech') else ""
+        # 英文填空题显示例句（如果有），其余题型模板里没有 example
+        example = f"\n📖 {w['example_sentence']}" if w.get('example_sentence') else ""
+        return fragment(term=w['term'], translation=w['translation'], pos=pos, example=example)
+    return render
+
+QUESTION_RENDERERS = {
+    "mc_cn2en": _fragment_renderer(CHOICE_CN_FRAGMENT),
+    "mc_en2cn": _fragment_renderer(CHOICE_EN_FRAGMENT),
+    "cn2en": _fragment_renderer(FILL_CN_FRAGMENT),
+    "en2cn": _fragment_renderer(FILL_EN_FRAGMENT),
+}
+
+def _input_renderer(mode):
+    def render(w):
+        return bizvocab_cards.dumps({
+            "tag": "action",
+            "actions": [{
+                "tag": "input",
+                "name": f"answer_{w['id']}",
+                "placeholder": {"tag": "plain_text", "content": "输入答案后回车提交"},
+                "value": {"action": "answer", "word_id": w['id'], "mode": mode}
+            }]
+        })
+    return render
+
+INPUT_RENDERERS = {mode: _input_renderer(mode) for mode in ("cn2en", "en2cn")}
+
+@functools.lru_cache(maxsize=256)
+def index_prefix(idx):
+    return bizvocab_cards.escape(f"{idx}. ")
+
+@functools.lru_cache(maxsize=1024)
+def last_review_suffix(last_review_date):
+    last_review = last_review_date.strftime('%Y-%m-%d') if last_review_date else "未复习过"
+    return bizvocab_cards.escape(f"\n⏰ 上次复习: {last_review}")
+
+def question(mode, idx, w):
+    body = QUESTION_RENDERERS[mode](w)
+    return bizvocab_cards.join_div(index_prefix(idx), body, last_review_suffix(w['last_review_date']))
+
+def build_review_card(words, choices=None):
+    """choices: bizvocab_distractors.fetch_choices 的结果；为空或某词干扰项不足时只出填空题。
+    每题（题干 + 按钮或输入框）一节，题目很多时按请求体上限拆成几条消息"""
+    choices = choices or {}
+    card = bizvocab_cards.Card(f"今日复习单词 🔄 | {datetime.datetime.now(SH_TZ).strftime('%Y-%m-%d')}", "blue")
+    for idx, w in enumerate(words, start=1):
         # 随机决定题型：True=中文题（提示中文，答英文），False=英文题（提示英文，答中文）
         do_chinese = random.choice([True, False])
 
-        if do_chinese:
-            # 中文题：提示中文，答英文，不显示例句
-            content = f"{idx}. ✨ **{w['translation']}** {pos_str}\n📝 请写出英文单词\n⏰ 上次复习: {last_review}"
-        else:
-            # 英文题：提示英文，答中文，显示例句（如果有）
-            content = f"{idx}. ✨ **{w['term']}** {pos_str}"
-            if w.get('example_sentence'):
-                content += f"\n📖 {w['example_sentence']}"
-            content += f"\n📝 请写出中文意思\n⏰ 上次复习: {last_review}"
-
-        elements.append({"tag": "div", "text": {"tag": "lark_md", "content": content}})
-
-    return {
-        "msg_type": "interactive",
-        "card": {
-            "config": {"wide_screen_mode": True},
-            "header": {
-                "template": "blue",
-                "title": {
-                    "content": f"今日复习单词 🔄 | {datetime.datetime.now(SH_TZ).strftime('%Y-%m-%d')}",
-                    "tag": "plain_text"
-                }
-            },
-            "elements": elements
-        }
-    }
-
-def send_to_feishu(card):
+        # 有预计算的近邻词时，一半概率改为四选一，选项按钮点一下即判分
+        options = None
+        if w['id'] in choices and random.random() < 0.5:
+            options = bizvocab_distractors.pick_options(w, choices[w['id']], show_term=do_chinese)
+        if options:
+            mode = "mc_cn2en" if do_chinese else "mc_en2cn"
+            card.add(question(mode, idx, w), {
+                "tag": "action",
+                "actions": [{
+                    "tag": "button",
+                    "text": {"tag": "plain_text", "content": text},
+                    "type": "default",
+                    "value": {"action": "answer", "word_id": w['id'], "mode": mode, "choice": option_id}
+                } for option_id, text in options]
+            })
+            continue
+
+        # 中文题：提示中文，答英文，不显示例句；英文题：提示英文，答中文，显示例句
+        # 答题输入框：回车提交后由 bizvocab_callback_server 判分
+        mode = "cn2en" if do_chinese else "en2cn"
+        card.add(question(mode, idx, w), INPUT_RENDERERS[mode](w))
+    return card
+
+def send_to_feishu(card, webhook=None):
+    """card 为序列化好的消息字节或卡片 dict；Card 对象用 bizvocab_cards.send / Outbox 发送"""
     try:
-        resp = requests.post(FEISHU_WEBHOOK, json=card, timeout=10)
+        resp = bizvocab_cards.post(webhook or FEISHU_WEBHOOK, card, timeout=10)
         data = resp.json()
         if resp.status_code == 200 and data.get("StatusCode") == 0:
             log("飞书复习卡片发送成功")
@@ -161,35 +259,76 @@ def send_to_feishu(card):
         return False
 
 # ---------- 主逻辑 ----------
-def run_review():
-    if not is_workday_today():
+def run_review(webhook=None, check_workday=True, outbox=None):
+    """webhook 为空时推送到默认群；按学习者调度时由 bizvocab_dispatcher 传入并已按其本地日期判断过工作日。
+    返回是否推送成功，没有要推送的内容时返回 None。
+    传入 outbox 时只把卡片放进去，由调用方和同一时刻的其他卡片合并发送，此时返回 True 表示已放入"""
+    if check_workday and not is_workday_today():
         log("今天不是工作日或节假日，跳过复习。")
         return
-    words = fetch_review_words(10)
+    words = fetch_review_words()
     if not words:
         log("没有找到待复习的单词。")
         return
-    card = build_review_card(words)
-    if send_to_feishu(card):
-        mark_words_reviewed([w['id'] for w in words])
+    try:
+        choices = bizvocab_distractors.fetch_choices([w['id'] for w in words])
+    except Exception as e:
+        # 近邻表还没建好或查询失败时退回纯填空题
+        log(f"读取选择题干扰项失败: {e}")
+        choices = {}
+    own = outbox is None
+    outbox = bizvocab_cards.Outbox() if own else outbox
+    outbox.add(build_review_card(words, choices),
+               lambda ok: ok and mark_words_reviewed([w['id'] for w in words]))
+    if not own:
+        return True
+    sent = outbox.flush(lambda payload: send_to_feishu(payload, webhook))
+    log(f"复习推送：{outbox.summary()}")
+    return sent
 
 def main_loop():
-    lock_fh = acquire_lock(LOCK_FILE)
+    lease = lock_fh = None
+    bizvocab_schema.migrate()
+    if HA_MODE == "db":
+        lease = bizvocab_leader.LeaderLease(
+            "reviewbot", on_change=lambda leader: log("当选主节点" if leader else "已不是主节点，转为备用")
+        ).start()
+    else:
+        lock_fh = acquire_lock(LOCK_FILE)
     try:
         while True:
             now = datetime.datetime.now(SH_TZ)
             # 每天 10:25 执行复习
             if now.hour == 10 and now.minute == 25:
-                run_review()
+                if lease is not None and not lease.is_leader():
+                    # 备用节点：主节点宕机时尽快接手本分钟的复习推送
+                    time.sleep(5)
+                    continue
+                # 同一天只推送一次，主节点切换后不会重复发送
+                if lease is None or bizvocab_leader.claim_run("reviewbot", now.date(), lease):
+                    run_review()
+                    # 复习推送后顺带补建事件日志分区、汇总到今天
+                    try:
+                        bizvocab_events.maintain()
+                    except Exception as e:
+                        log(f"事件日志维护失败: {e}")
+                    # 为新入库的单词补算选择题干扰项（增量，只重排受影响的旧词）
+                    try:
+                        bizvocab_distractors.update()
+                    except Exception as e:
+                        log(f"干扰项更新失败: {e}")
                 time.sleep(60)  # 避免一分钟内重复执行
             else:
                 time.sleep(30)
     finally:
-        try:
-            fcntl.flock(lock_fh, fcntl.LOCK_UN)
-            lock_fh.close()
-        except Exception:
-            pass
+        if lease is not None:
+            lease.stop()
+        else:
+            try:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+                lock_fh.close()
+            except Exception:
+                pass
 
 if __name__ == "__main__":
     main_loop()
\ No newline at end of file
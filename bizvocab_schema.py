@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 表结构管理：所有表/索引由这里的迁移统一创建和演进，并检查热点查询的执行计划
+#
+# 用法：
+#   python bizvocab_schema.py migrate       # 执行未应用的迁移（多实例同时执行时用 GET_LOCK 串行）
+#   python bizvocab_schema.py status        # 查看迁移版本
+#   python bizvocab_schema.py check-plans   # EXPLAIN 热点查询，出现全表扫描时返回非零退出码
+#
+# 执行计划检查请在接近生产数据量的库上运行：表很小时优化器可能认为全表扫描更便宜。
+
+import os
+import sys
+import argparse
+import datetime
+import mysql.connector
+from dotenv import load_dotenv
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+LOCK_NAME = "bizvocab_schema"
+LOCK_TIMEOUT = 60
+
+# 例句状态：取代原来写在 example_sentence 里的“暂无例句”哨兵字符串
+EXAMPLE_MISSING = "missing"    # 还没有英文例句
+EXAMPLE_PARTIAL = "partial"    # 有英文例句，缺中文翻译
+EXAMPLE_COMPLETE = "complete"  # 中英文例句齐全
+LEGACY_EMPTY_MARKERS = ("暂无例句", "暂无中文翻译")
+
+# ---------- 迁移步骤辅助 ----------
+def _index_columns(cursor, table):
+    """返回 {索引名: (是否唯一, [列...])}"""
+    cursor.execute(
+        "SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+        (table,)
+    )
+    indexes = {}
+    for name, non_unique, column in cursor.fetchall():
+        indexes.setdefault(name, (not non_unique, []))[1].append(column)
+    return indexes
+
+def add_index(table, name, columns, unique=False):
+    """按列判断是否已有等价索引（兼容手工建过索引的旧库），没有才创建"""
+    def step(cursor):
+        for is_unique, cols in _index_columns(cursor, table).values():
+            if cols[:len(columns)] == list(columns) and (is_unique or not unique):
+                return
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)})")
+    return step
+
+def add_column(table, column, definition):
+    def step(cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (table, column)
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+# ---------- 已发布版本的表结构（冻结） ----------
+# 下面的 DDL 和触发器按对应版本发布时的定义原样写死，不调用 bizvocab_events / bizvocab_changes /
+# bizvocab_tiering 里会随代码演进的函数：定义要变时追加新版本，不改这里。
+
+# 版本 9：建表当月起再往后 3 个月的分区，之后由 bizvocab_events maintain 补建（分区名同为 pYYYYMM）
+def _create_events_table_v9(cursor):
+    first = datetime.datetime.now(SH_TZ).date().replace(day=1)
+    months = []
+    for i in range(5):
+        y, m = divmod(first.year * 12 + first.month - 1 + i, 12)
+        months.append(datetime.date(y, m + 1, 1))
+    parts = [f"PARTITION p{lo:%Y%m} VALUES LESS THAN ('{hi}')" for lo, hi in zip(months, months[1:])]
+    parts.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    # 分区键必须包含在主键里；按 event_at 范围查询靠 idx_event_at 加分区裁剪
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vocab_events (
+            id BIGINT NOT NULL AUTO_INCREMENT,
+            event_at DATETIME(3) NOT NULL,
+            event_type ENUM('learn', 'review', 'answer') NOT NULL,
+            word_id INT NOT NULL,
+            correct TINYINT(1) NULL,
+            PRIMARY KEY (id, event_at),
+            KEY idx_event_at (event_at, event_type),
+            KEY idx_word (word_id, event_at)
+        ) DEFAULT CHARSET=utf8mb4
+        PARTITION BY RANGE COLUMNS (event_at) (%s)
+        """ % ", ".join(parts)
+    )
+
+# 版本 13：变更日志、消费位点与三个触发器；UPDATE 只在下列 13 列有变化时记录
+CHANGES_TABLE_V13 = """
+    CREATE TABLE IF NOT EXISTS vocab_changes (
+        seq BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        changed_at DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+        op ENUM('insert', 'update', 'delete') NOT NULL,
+        word_id INT NOT NULL,
+        fields SET('term', 'part_of_speech', 'translation', 'example_sentence', 'example_chinese',
+                   'example_status', 'learned', 'needs_review', 'learn_date', 'review_count',
+                   'last_review_date', 'bec_level', 'priority_score') NULL,
+        KEY idx_changed_at (changed_at)
+    ) DEFAULT CHARSET=utf8mb4
+"""
+
+CHANGE_OFFSETS_TABLE_V13 = """
+    CREATE TABLE IF NOT EXISTS vocab_change_offsets (
+        consumer VARCHAR(64) NOT NULL PRIMARY KEY,
+        seq BIGINT NOT NULL DEFAULT 0,
+        updated_at DATETIME(3) NOT NULL
+    ) DEFAULT CHARSET=utf8mb4
+"""
+
+INSERT_TRIGGER_V13 = """
+    CREATE TRIGGER trg_vocab_changes_insert AFTER INSERT ON business_vocab FOR EACH ROW
+    INSERT INTO vocab_changes (op, word_id) VALUES ('insert', NEW.id)
+"""
+
+UPDATE_TRIGGER_V13 = """
+    CREATE TRIGGER trg_vocab_changes_update AFTER UPDATE ON business_vocab FOR EACH ROW
+    BEGIN
+        DECLARE changed VARCHAR(512);
+        SET changed = CONCAT_WS(',',
+            IF(NOT (OLD.term <=> NEW.term), 'term', NULL),
+            IF(NOT (OLD.part_of_speech <=> NEW.part_of_speech), 'part_of_speech', NULL),
+            IF(NOT (OLD.translation <=> NEW.translation), 'translation', NULL),
+            IF(NOT (OLD.example_sentence <=> NEW.example_sentence), 'example_sentence', NULL),
+            IF(NOT (OLD.example_chinese <=> NEW.example_chinese), 'example_chinese', NULL),
+            IF(NOT (OLD.example_status <=> NEW.example_status), 'example_status', NULL),
+            IF(NOT (OLD.learned <=> NEW.learned), 'learned', NULL),
+            IF(NOT (OLD.needs_review <=> NEW.needs_review), 'needs_review', NULL),
+            IF(NOT (OLD.learn_date <=> NEW.learn_date), 'learn_date', NULL),
+            IF(NOT (OLD.review_count <=> NEW.review_count), 'review_count', NULL),
+            IF(NOT (OLD.last_review_date <=> NEW.last_review_date), 'last_review_date', NULL),
+            IF(NOT (OLD.bec_level <=> NEW.bec_level), 'bec_level', NULL),
+            IF(NOT (OLD.priority_score <=> NEW.priority_score), 'priority_score', NULL));
+        IF changed <> '' THEN
+            INSERT INTO vocab_changes (op, word_id, fields) VALUES ('update', NEW.id, changed);
+        END IF;
+    END
+"""
+
+DELETE_TRIGGER_V13 = """
+    CREATE TRIGGER trg_vocab_changes_delete AFTER DELETE ON business_vocab FOR EACH ROW
+    INSERT INTO vocab_changes (op, word_id) VALUES ('delete', OLD.id)
+"""
+
+# 版本 14：冷表与 business_vocab 同列（id 不自增，另加 frozen_at），只保留主键和 uk_term，压缩行格式。
+# 之后热表加的列由 bizvocab_tiering.sync_columns 在每次 freeze / thaw 前补到冷表并重建视图
+COLD_TABLE_V14 = """
+    CREATE TABLE IF NOT EXISTS business_vocab_cold (
+        id INT NOT NULL PRIMARY KEY,
+        term VARCHAR(128) NOT NULL,
+        part_of_speech VARCHAR(32) NULL,
+        translation VARCHAR(512) NULL,
+        example_sentence TEXT NULL,
+        example_chinese TEXT NULL,
+        learned TINYINT(1) NOT NULL DEFAULT 0,
+        needs_review TINYINT(1) NOT NULL DEFAULT 0,
+        learn_date DATE NULL,
+        review_count INT NOT NULL DEFAULT 0,
+        last_review_date DATE NULL,
+        example_status ENUM('missing', 'partial', 'complete') NOT NULL DEFAULT 'missing',
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        bec_level TINYINT NULL,
+        priority_score FLOAT NOT NULL DEFAULT 0,
+        frozen_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uk_term (term)
+    ) DEFAULT CHARSET=utf8mb4 ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+"""
+
+COLD_STATS_TABLE_V14 = """
+    CREATE TABLE IF NOT EXISTS vocab_answer_stats_cold (
+        word_id INT NOT NULL PRIMARY KEY,
+        correct_count INT NOT NULL DEFAULT 0,
+        wrong_count INT NOT NULL DEFAULT 0,
+        last_answer_at DATETIME NOT NULL,
+        last_correct TINYINT(1) NOT NULL DEFAULT 0
+    ) DEFAULT CHARSET=utf8mb4 ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+"""
+
+_VOCAB_COLUMNS_V14 = (
+    "id, term, part_of_speech, translation, example_sentence, example_chinese, learned, needs_review, "
+    "learn_date, review_count, last_review_date, example_status, updated_at, bec_level, priority_score"
+)
+ALL_VIEW_V14 = (
+    f"CREATE OR REPLACE VIEW business_vocab_all AS "
+    f"SELECT {_VOCAB_COLUMNS_V14} FROM business_vocab "
+    f"UNION ALL SELECT {_VOCAB_COLUMNS_V14} FROM business_vocab_cold"
+)
+
+# bizvocab_tiering 冷热移动时设置 @bizvocab_tiering，单词没有消失，不记删除
+DELETE_TRIGGER_V14 = """
+    CREATE TRIGGER trg_vocab_changes_delete AFTER DELETE ON business_vocab FOR EACH ROW
+    BEGIN
+        IF @bizvocab_tiering IS NULL THEN
+            INSERT INTO vocab_changes (op, word_id) VALUES ('delete', OLD.id);
+        END IF;
+    END
+"""
+
+# 版本 17：priority_score 由 bizvocab_curriculum 批量重算，变化不影响任何派生数据，不再记日志
+UPDATE_TRIGGER_V17 = """
+    CREATE TRIGGER trg_vocab_changes_update AFTER UPDATE ON business_vocab FOR EACH ROW
+    BEGIN
+        DECLARE changed VARCHAR(512);
+        SET changed = CONCAT_WS(',',
+            IF(NOT (OLD.term <=> NEW.term), 'term', NULL),
+            IF(NOT (OLD.part_of_speech <=> NEW.part_of_speech), 'part_of_speech', NULL),
+            IF(NOT (OLD.translation <=> NEW.translation), 'translation', NULL),
+            IF(NOT (OLD.example_sentence <=> NEW.example_sentence), 'example_sentence', NULL),
+            IF(NOT (OLD.example_chinese <=> NEW.example_chinese), 'example_chinese', NULL),
+            IF(NOT (OLD.example_status <=> NEW.example_status), 'example_status', NULL),
+            IF(NOT (OLD.learned <=> NEW.learned), 'learned', NULL),
+            IF(NOT (OLD.needs_review <=> NEW.needs_review), 'needs_review', NULL),
+            IF(NOT (OLD.learn_date <=> NEW.learn_date), 'learn_date', NULL),
+            IF(NOT (OLD.review_count <=> NEW.review_count), 'review_count', NULL),
+            IF(NOT (OLD.last_review_date <=> NEW.last_review_date), 'last_review_date', NULL),
+            IF(NOT (OLD.bec_level <=> NEW.bec_level), 'bec_level', NULL));
+        IF changed <> '' THEN
+            INSERT INTO vocab_changes (op, word_id, fields) VALUES ('update', NEW.id, changed);
+        END IF;
+    END
+"""
+
+# ---------- 迁移列表（只追加，不修改已发布的版本） ----------
+MIGRATIONS = [
+    (1, "business_vocab 基础表", [
+        """
+        CREATE TABLE IF NOT EXISTS business_vocab (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            term VARCHAR(128) NOT NULL,
+            part_of_speech VARCHAR(32) NULL,
+            translation VARCHAR(512) NULL,
+            example_sentence TEXT NULL,
+            example_chinese TEXT NULL,
+            learned TINYINT(1) NOT NULL DEFAULT 0,
+            needs_review TINYINT(1) NOT NULL DEFAULT 0,
+            learn_date DATE NULL,
+            review_count INT NOT NULL DEFAULT 0,
+            last_review_date DATE NULL
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+        # 爬虫和清洗脚本依赖 INSERT IGNORE 按 term 去重
+        add_index("business_vocab", "uk_term", ["term"], unique=True),
+    ]),
+    (2, "答题统计表", [
+        """
+        CREATE TABLE IF NOT EXISTS vocab_answer_stats (
+            word_id INT NOT NULL PRIMARY KEY,
+            correct_count INT NOT NULL DEFAULT 0,
+            wrong_count INT NOT NULL DEFAULT 0,
+            last_answer_at DATETIME NOT NULL,
+            last_correct TINYINT(1) NOT NULL DEFAULT 0
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (3, "学习进度聚合表", [
+        """
+        CREATE TABLE IF NOT EXISTS vocab_stats_totals (
+            id TINYINT NOT NULL PRIMARY KEY,
+            total_words INT NOT NULL DEFAULT 0,
+            learned_words INT NOT NULL DEFAULT 0,
+            pending_review INT NOT NULL DEFAULT 0,
+            total_reviews BIGINT NOT NULL DEFAULT 0,
+            updated_at DATETIME NULL
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS vocab_stats_review_hist (
+            review_count INT NOT NULL PRIMARY KEY,
+            words INT NOT NULL DEFAULT 0
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS vocab_stats_weekly (
+            week_start DATE NOT NULL PRIMARY KEY,
+            learned_words INT NOT NULL DEFAULT 0,
+            reviews INT NOT NULL DEFAULT 0
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+        "INSERT IGNORE INTO vocab_stats_totals (id) VALUES (1)",
+    ]),
+    (4, "选主租约与运行记录", [
+        """
+        CREATE TABLE IF NOT EXISTS bot_leases (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            holder VARCHAR(128) NOT NULL,
+            fencing_token BIGINT NOT NULL DEFAULT 1,
+            lease_until DATETIME(3) NOT NULL
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS bot_runs (
+            job VARCHAR(64) NOT NULL,
+            run_date DATE NOT NULL,
+            holder VARCHAR(128) NOT NULL,
+            fencing_token BIGINT NOT NULL,
+            started_at DATETIME(3) NOT NULL,
+            PRIMARY KEY (job, run_date)
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (5, "单词认领队列", [
+        """
+        CREATE TABLE IF NOT EXISTS vocab_claims (
+            queue VARCHAR(32) NOT NULL,
+            word_id INT NOT NULL,
+            claim_token CHAR(32) NOT NULL,
+            expires_at DATETIME(3) NOT NULL,
+            PRIMARY KEY (queue, word_id),
+            KEY idx_claim_token (claim_token),
+            KEY idx_queue_expires (queue, expires_at)
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (6, "学习/复习热点查询索引", [
+        # learned=0 挑新词、按 id 顺序认领
+        add_index("business_vocab", "idx_learned_id", ["learned", "id"]),
+        # learned=1 AND needs_review=1 取复习候选，review_count 用于加权
+        add_index("business_vocab", "idx_review", ["learned", "needs_review", "review_count"]),
+    ]),
+    (7, "例句状态枚举取代“暂无例句”哨兵字符串", [
+        add_column("business_vocab", "example_status",
+                   "ENUM('missing', 'partial', 'complete') NOT NULL DEFAULT 'missing'"),
+        "ALTER TABLE business_vocab MODIFY example_sentence TEXT NULL, MODIFY example_chinese TEXT NULL",
+        """
+        UPDATE business_vocab SET example_status = CASE
+            WHEN example_sentence IS NULL OR example_sentence IN ('', '暂无例句') THEN 'missing'
+            WHEN example_chinese IS NULL OR example_chinese IN ('', '暂无例句', '暂无中文翻译') THEN 'partial'
+            ELSE 'complete' END
+        """,
+        "UPDATE business_vocab SET example_sentence = NULL WHERE example_sentence IN ('', '暂无例句')",
+        "UPDATE business_vocab SET example_chinese = NULL WHERE example_chinese IN ('', '暂无例句', '暂无中文翻译')",
+        # 只有少量行是 missing，(example_status, id) 让补例句按 id 顺序走索引范围扫描
+        add_index("business_vocab", "idx_example_status", ["example_status", "id"]),
+    ]),
+    (8, "学习者及其本地推送时间", [
+        """
+        CREATE TABLE IF NOT EXISTS learners (
+            id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(64) NOT NULL,
+            webhook VARCHAR(512) NOT NULL,
+            timezone VARCHAR(64) NOT NULL DEFAULT 'Asia/Shanghai',
+            review_time TIME NOT NULL DEFAULT '10:25:00',
+            learn_time TIME NOT NULL DEFAULT '10:30:00',
+            active TINYINT(1) NOT NULL DEFAULT 1,
+            updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+            KEY idx_updated (updated_at)
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (9, "按月分区的事件日志与按天汇总", [
+        _create_events_table_v9,
+        """
+        CREATE TABLE IF NOT EXISTS vocab_events_daily (
+            day DATE NOT NULL,
+            event_type ENUM('learn', 'review', 'answer') NOT NULL,
+            events INT NOT NULL DEFAULT 0,
+            words INT NOT NULL DEFAULT 0,
+            correct INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, event_type)
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (10, "business_vocab 修改时间（查词索引增量刷新）", [
+        add_column("business_vocab", "updated_at",
+                   "TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)"),
+        add_index("business_vocab", "idx_updated_at", ["updated_at"]),
+    ]),
+    (11, "选择题干扰项（近邻词）", [
+        """
+        CREATE TABLE IF NOT EXISTS vocab_neighbors (
+            word_id INT NOT NULL,
+            kind ENUM('spelling', 'meaning') NOT NULL,
+            rank_no TINYINT NOT NULL,
+            neighbor_id INT NOT NULL,
+            score FLOAT NOT NULL,
+            PRIMARY KEY (word_id, kind, rank_no)
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    (12, "学习顺序：BEC 级别与优先级", [
+        add_column("business_vocab", "bec_level", "TINYINT NULL"),
+        add_column("business_vocab", "priority_score", "FLOAT NOT NULL DEFAULT 0"),
+        # 挑新词在 learned=0 范围内按 priority_score 倒序扫描前几行，主键 id 隐含在二级索引末尾
+        add_index("business_vocab", "idx_learned_priority", ["learned", "priority_score"]),
+    ]),
+    (13, "business_vocab 变更日志（触发器）与消费位点", [
+        CHANGES_TABLE_V13,
+        CHANGE_OFFSETS_TABLE_V13,
+        "DROP TRIGGER IF EXISTS trg_vocab_changes_insert",
+        INSERT_TRIGGER_V13,
+        "DROP TRIGGER IF EXISTS trg_vocab_changes_update",
+        UPDATE_TRIGGER_V13,
+        "DROP TRIGGER IF EXISTS trg_vocab_changes_delete",
+        DELETE_TRIGGER_V13,
+    ]),
+    (14, "冷热分层：压缩冷表与两层视图", [
+        COLD_TABLE_V14,
+        COLD_STATS_TABLE_V14,
+        ALL_VIEW_V14,
+        "DROP TRIGGER IF EXISTS trg_vocab_changes_delete",
+        DELETE_TRIGGER_V14,
+    ]),
+    (15, "每日卡片（全局进度下所有学习者共用一份）", [
+        """
+        CREATE TABLE IF NOT EXISTS daily_editions (
+            edition_date DATE NOT NULL,
+            kind ENUM('review', 'learn') NOT NULL,
+            cards MEDIUMTEXT NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (edition_date, kind)
+        ) DEFAULT CHARSET=utf8mb4
+        """,
+    ]),
+    # 版本 3 只插入了全 0 的总表行，已有单词的库要按冷热两层全量统计一次，之后才由写路径增量维护。
+    # 与 bizvocab_stats.compute_from_scratch / rebuild_aggregates 同口径，SQL 按本版本冻结在这里；
+    # 每周复习次数无法还原，保留原值
+    (16, "学习进度聚合表按现有单词回填", [
+        "INSERT IGNORE INTO vocab_stats_totals (id) VALUES (1)",
+        """
+        UPDATE vocab_stats_totals t,
+            (SELECT COUNT(*) AS total, COALESCE(SUM(learned=1), 0) AS learned,
+                    COALESCE(SUM(learned=1 AND needs_review=1), 0) AS pending,
+                    COALESCE(SUM(review_count), 0) AS reviews
+             FROM business_vocab_all) s
+        SET t.total_words = s.total, t.learned_words = s.learned, t.pending_review = s.pending,
+            t.total_reviews = s.reviews, t.updated_at = NOW()
+        WHERE t.id = 1
+        """,
+        "DELETE FROM vocab_stats_review_hist",
+        """
+        INSERT INTO vocab_stats_review_hist (review_count, words)
+        SELECT COALESCE(review_count, 0), COUNT(*) FROM business_vocab_all GROUP BY 1
+        """,
+        "UPDATE vocab_stats_weekly SET learned_words = 0",
+        """
+        INSERT INTO vocab_stats_weekly (week_start, learned_words)
+        SELECT s.wk, s.n FROM
+            (SELECT DATE_SUB(learn_date, INTERVAL WEEKDAY(learn_date) DAY) AS wk, COUNT(*) AS n
+             FROM business_vocab_all WHERE learned=1 AND learn_date IS NOT NULL GROUP BY 1) s
+        ON DUPLICATE KEY UPDATE learned_words = s.n
+        """,
+    ]),
+    # 变更日志只有查词索引和调度器的内存消费者（自己记位点），持久化位点表从没有消费者用过
+    (17, "变更日志不再跟踪 priority_score，删除消费位点表", [
+        "DROP TRIGGER IF EXISTS trg_vocab_changes_update",
+        UPDATE_TRIGGER_V17,
+        "DROP TABLE IF EXISTS vocab_change_offsets",
+    ]),
+]
+
+# ---------- 执行迁移 ----------
+def _applied_versions(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(128) NOT NULL,
+            applied_at DATETIME NOT NULL
+        ) DEFAULT CHARSET=utf8mb4
+        """
+    )
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {r[0] for r in cursor.fetchall()}
+
+def migrate(verbose=False):
+    """应用所有未执行的迁移，返回本次应用的版本号列表。DDL 会隐式提交，每个版本执行完立即记录。"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    applied_now = []
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("等待表结构迁移锁超时，可能有其他实例正在迁移")
+        try:
+            applied = _applied_versions(cursor)
+            for version, name, steps in MIGRATIONS:
+                if version in applied:
+                    continue
+                if verbose:
+                    print(f"应用迁移 {version}: {name}")
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, NOW())",
+                    (version, name)
+                )
+                conn.commit()
+                applied_now.append(version)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return applied_now
+
+def show_status():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    applied = _applied_versions(cursor)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    for version, name, _ in MIGRATIONS:
+        print(f"{'✅' if version in applied else '⏳'} {version:>3} {name}")
+
+# ---------- 热点查询执行计划检查 ----------
+HOT_QUERIES = [
+    ("挑选新词",
+     "SELECT id, term FROM business_vocab WHERE learned=0 ORDER BY priority_score DESC, id DESC LIMIT 30", ()),
+    ("复习候选",
+     "SELECT id, term, review_count FROM business_vocab WHERE learned=1 AND needs_review=1", ()),
+    ("补充例句",
+     "SELECT id, term FROM business_vocab WHERE example_status = %s ORDER BY id LIMIT 20",
+     (EXAMPLE_MISSING,)),
+    ("认领新词",
+     "SELECT v.id FROM business_vocab v WHERE v.learned = 0 AND v.id >= %s "
+     "AND NOT EXISTS (SELECT 1 FROM vocab_claims c WHERE c.queue = %s AND c.word_id = v.id "
+     "AND c.expires_at > NOW(3)) ORDER BY v.id LIMIT 20",
+     (0, "learn")),
+    ("按 token 查认领", "SELECT word_id FROM vocab_claims WHERE claim_token = %s", ("0" * 32,)),
+    ("读变更日志", "SELECT seq, changed_at, op, word_id, fields FROM vocab_changes WHERE seq > %s ORDER BY seq LIMIT 1000",
+     (0,)),
+    ("变更日志稳定位点",
+     "SELECT COALESCE(MAX(seq), 0) FROM vocab_changes WHERE changed_at < NOW(3) - INTERVAL 5 SECOND", ()),
+]
+
+def check_plans(queries=HOT_QUERIES):
+    """EXPLAIN 每条热点查询，任一表出现 type=ALL（全表扫描）即判定失败"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    failures = []
+    for name, sql, params in queries:
+        cursor.execute("EXPLAIN " + sql, params)
+        for row in cursor.fetchall():
+            access = (row.get("type") or "").upper()
+            line = (f"{name}: 表 {row.get('table')} 访问方式 {access or '-'} "
+                    f"索引 {row.get('key') or '-'} 预估行数 {row.get('rows')}")
+            if access == "ALL":
+                failures.append(line)
+                print("❌ " + line)
+            else:
+                print("✅ " + line)
+    cursor.close()
+    conn.close()
+    if failures:
+        print(f"{len(failures)} 处热点查询退化为全表扫描")
+    return not failures
+
+def main():
+    parser = argparse.ArgumentParser(description="表结构迁移与执行计划检查")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("migrate", help="执行未应用的迁移")
+    sub.add_parser("status", help="查看迁移版本（默认）")
+    sub.add_parser("check-plans", help="检查热点查询执行计划")
+    args = parser.parse_args()
+
+    if args.cmd == "migrate":
+        applied = migrate(verbose=True)
+        print(f"已应用 {len(applied)} 个迁移" if applied else "表结构已是最新")
+    elif args.cmd == "check-plans":
+        sys.exit(0 if check_plans() else 1)
+    else:
+        show_status()
+
+if __name__ == "__main__":
+    main()
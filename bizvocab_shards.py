@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 分片执行每日推送：学习者按一致性哈希分到若干节点，节点内再分到进程池的各个分片，
+# 协调进程取当天的卡片（bizvocab_editions，每天每项任务只选词一次），各分片进程把同一份消息推给各自的学习者，
+# 协调进程汇总各分片的结果、失败和耗时。
+#
+# 用法：
+#   python bizvocab_shards.py run review [--processes 4] [--node node1 --nodes node1,node2,node3] [--force]
+#   python bizvocab_shards.py run learn  [--processes 4]
+#   python bizvocab_shards.py plan [--learners 100000 --processes 4 --nodes node1,node2,node3]  # 分片均衡度与扩容迁移比例
+#   python bizvocab_shards.py bench [--learners 20000 --candidates 3000 --processes 1,2,4] [--send] # 不连数据库
+#
+# 节点列表也可用环境变量 SHARD_NODES=node1,node2,node3 与 SHARD_NODE=node1 配置；每个节点只处理哈希到自己的学习者，
+# 增删节点时只有约 1/N 的学习者换节点。节点内分片同样走一致性哈希，进程数变化时大部分学习者留在原分片。
+#
+# 每个分片进程在 fork 之后才建立自己的数据库连接和 HTTP 连接池（bizvocab_http 按 pid 重建），不与其他进程共享。
+# 学习进度是全局的，与 bizvocab_dispatcher 共用 daily_editions 里的当天卡片（按 UTC 日期），
+# 同一天两边都跑时也只推进一次进度。
+
+import os
+import sys
+import time
+import zlib
+import random
+import argparse
+import functools
+import datetime
+import collections
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_cards
+import bizvocab_editions
+import bizvocab_http
+import bizvocab_schema
+import bizvocab_learner
+import bizvocab_reviewer
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+JOB_REVIEW = "review"
+JOB_LEARN = "learn"
+JOBS = (JOB_REVIEW, JOB_LEARN)  # 与 bizvocab_editions 的 KIND_* 相同
+
+VNODES = 1024          # 每个成员在环上的虚拟节点数；1024 时 4 个分片的最大/平均约 1.05
+WEBHOOK_CHUNK = 1000   # 分片内按块查 webhook
+FAILURES_SHOWN = 20
+
+ShardResult = collections.namedtuple(
+    "ShardResult", "shard learners sent empty failed failures elapsed cpu latencies http_requests http_seconds connections"
+)
+
+# ---------- 一致性哈希 ----------
+def mix64(keys):
+    """splitmix64 终混，向量化；让连续的学习者 id 在环上均匀散开"""
+    x = np.asarray(keys, dtype=np.uint64).copy()
+    with np.errstate(over="ignore"):
+        x += np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return x
+
+class HashRing:
+    def __init__(self, members, vnodes=VNODES):
+        if not members:
+            raise ValueError("哈希环至少需要一个成员")
+        self.members = list(members)
+        seeds = [zlib.crc32(f"{m}#{i}".encode()) for m in self.members for i in range(vnodes)]
+        owners = np.repeat(np.arange(len(self.members)), vnodes)
+        points = mix64(seeds)
+        order = np.argsort(points, kind="stable")
+        self.points = points[order]
+        self.owners = owners[order]
+
+    def assign(self, keys):
+        """返回每个 key 所属成员的下标数组：顺时针找到的第一个虚拟节点"""
+        idx = np.searchsorted(self.points, mix64(keys), side="right")
+        return self.owners[idx % len(self.points)]
+
+    def groups(self, keys):
+        keys = np.asarray(keys)
+        owner = self.assign(keys)
+        return {m: keys[owner == i] for i, m in enumerate(self.members)}
+
+def node_list(spec=None):
+    spec = spec if spec is not None else os.getenv("SHARD_NODES", "")
+    return [n.strip() for n in spec.split(",") if n.strip()]
+
+def owned_learners(ids, node=None, nodes=None):
+    """多节点部署时只保留哈希到本节点的学习者；未配置节点列表时全部保留"""
+    nodes = nodes or node_list()
+    node = node or os.getenv("SHARD_NODE")
+    if not nodes:
+        return np.asarray(ids)
+    if node not in nodes:
+        raise ValueError(f"本节点 {node!r} 不在节点列表 {nodes} 中")
+    return HashRing(nodes).groups(ids)[node]
+
+def shard_ring(node, processes):
+    return HashRing([f"{node or 'local'}/{k}" for k in range(processes)])
+
+# ---------- 分片进程 ----------
+_conn = None
+_http = {"requests": 0, "seconds": 0.0}
+
+def _http_timer(timing):
+    _http["requests"] += 1
+    _http["seconds"] += timing.elapsed
+
+def _init_worker():
+    global _conn
+    _conn = None
+    _http.update(requests=0, seconds=0.0)
+    bizvocab_http.DEFAULT.add_hook(_http_timer)
+
+def _connection():
+    """本进程独占的数据库连接，断开后重连"""
+    global _conn
+    if _conn is None or not _conn.is_connected():
+        _conn = mysql.connector.connect(**DB_CONFIG)
+    return _conn
+
+def fetch_webhooks(learner_ids):
+    cursor = _connection().cursor()
+    result = []
+    try:
+        for i in range(0, len(learner_ids), WEBHOOK_CHUNK):
+            chunk = [int(x) for x in learner_ids[i:i + WEBHOOK_CHUNK]]
+            cursor.execute(
+                "SELECT id, webhook FROM learners WHERE active = 1 AND id IN (%s)" % ",".join(["%s"] * len(chunk)),
+                chunk
+            )
+            result.extend(cursor.fetchall())
+    finally:
+        cursor.close()
+    return result
+
+def run_shard(job, shard, learner_ids, targets=None, messages=None):
+    """在分片进程里把当天的消息逐个推给学习者；targets 为 (推送函数, [(学习者 id, webhook)]) 时跳过查库（压测用）"""
+    run = functools.partial(bizvocab_editions.send, messages) if targets is None else targets[0]
+    pairs = fetch_webhooks(learner_ids) if targets is None else targets[1]
+    sent = empty = failed = 0
+    failures = []
+    latencies = []
+    before = dict(_http)
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    for learner_id, webhook in pairs:
+        t1 = time.perf_counter()
+        try:
+            ok = run(webhook=webhook, check_workday=False)
+        except Exception as e:
+            ok = False
+            if len(failures) < FAILURES_SHOWN:
+                failures.append((int(learner_id), f"{type(e).__name__}: {e}"))
+        latencies.append(time.perf_counter() - t1)
+        if ok is None:
+            empty += 1
+        elif ok:
+            sent += 1
+        else:
+            failed += 1
+    return ShardResult(shard, len(pairs), sent, empty, failed, failures, time.perf_counter() - t0,
+                       time.process_time() - c0, np.asarray(latencies, dtype=np.float32), _http["requests"] - before["requests"],
+                       _http["seconds"] - before["seconds"], bizvocab_http.DEFAULT.connections_opened())
+
+# ---------- 协调进程 ----------
+def dispatch(job, learner_ids, processes, node=None, targets=None, messages=None):
+    """按一致性哈希拆成 processes 个分片交给进程池，返回按分片号排序的结果"""
+    ring = shard_ring(node, processes)
+    groups = ring.groups(learner_ids)
+    results = []
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+        futures = {}
+        for k, member in enumerate(ring.members):
+            ids = groups[member]
+            if not len(ids):
+                continue
+            shard_targets = None
+            if targets is not None:
+                run, pairs = targets
+                wanted = set(ids.tolist())
+                shard_targets = (run, [p for p in pairs if p[0] in wanted])
+            futures[pool.submit(run_shard, job, k, ids, shard_targets, messages)] = k
+        for fut in as_completed(futures):
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                # 整个分片进程崩溃：记为该分片全部失败，其他分片照常汇总
+                k = futures[fut]
+                n = len(groups[ring.members[k]])
+                results.append(ShardResult(k, n, 0, 0, n, [(-1, f"分片进程异常: {e}")], 0.0, 0.0,
+                                           np.zeros(0, dtype=np.float32), 0, 0.0, 0))
+    return sorted(results, key=lambda r: r.shard)
+
+def merge(results, wall):
+    latencies = np.concatenate([r.latencies for r in results]) if results else np.zeros(0)
+    return {
+        "learners": sum(r.learners for r in results),
+        "sent": sum(r.sent for r in results),
+        "empty": sum(r.empty for r in results),
+        "failed": sum(r.failed for r in results),
+        "failures": [f for r in results for f in r.failures][:FAILURES_SHOWN],
+        "wall": wall,
+        "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        "p99": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        "http_requests": sum(r.http_requests for r in results),
+        "http_seconds": sum(r.http_seconds for r in results),
+        "connections": sum(r.connections for r in results),
+        "skew": max(r.elapsed for r in results) / max(np.mean([r.elapsed for r in results]), 1e-9) if results else 1.0,
+        # 各分片 CPU 时间：核数不少于进程数时，总耗时约等于最慢分片的 CPU 时间加上等网络的时间
+        "cpu": sum(r.cpu for r in results),
+        "cpu_max": max((r.cpu for r in results), default=0.0),
+    }
+
+def print_report(results, summary):
+    print(f"{'分片':>4}{'学习者':>9}{'成功':>8}{'无内容':>8}{'失败':>6}{'耗时s':>9}{'p99ms':>9}{'HTTP':>8}{'连接':>6}")
+    for r in results:
+        p99 = float(np.percentile(r.latencies, 99)) * 1000 if len(r.latencies) else 0.0
+        print(f"{r.shard:>4}{r.learners:>9}{r.sent:>8}{r.empty:>8}{r.failed:>6}{r.elapsed:>9.2f}{p99:>9.1f}"
+              f"{r.http_requests:>8}{r.connections:>6}")
+    s = summary
+    print(f"合计 {s['learners']} 个学习者：成功 {s['sent']}，无内容 {s['empty']}，失败 {s['failed']}；"
+          f"总耗时 {s['wall']:.2f}s，单人 p50 {s['p50'] * 1000:.1f}ms p99 {s['p99'] * 1000:.1f}ms，"
+          f"最慢分片/平均 {s['skew']:.2f}，HTTP {s['http_requests']} 次共 {s['http_seconds']:.1f}s，"
+          f"新建连接 {s['connections']}")
+    for learner_id, err in s["failures"]:
+        print(f"  ❌ 学习者 {learner_id}: {err}")
+
+def load_active_ids():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM learners WHERE active = 1 ORDER BY id")
+    ids = np.fromiter((row[0] for row in cursor), dtype=np.int64)
+    cursor.close()
+    conn.close()
+    return ids
+
+def run(job, processes, node=None, nodes=None, force=False):
+    check = bizvocab_reviewer.is_workday_today if job == JOB_REVIEW else bizvocab_learner.is_workday_today
+    if not force and not check():
+        print("今天不是工作日或节假日，跳过。")
+        return None
+    ids = owned_learners(load_active_ids(), node, nodes)
+    if not len(ids):
+        print("没有需要推送的学习者。")
+        return None
+    t0 = time.perf_counter()
+    messages = bizvocab_editions.payloads((job,), datetime.datetime.now(datetime.timezone.utc).date())
+    if not messages:
+        print("今天没有要推送的内容。")
+        return None
+    results = dispatch(job, ids, processes, node, messages=messages)
+    summary = merge(results, time.perf_counter() - t0)
+    print_report(results, summary)
+    return summary
+
+# ---------- 均衡度 / 压测 ----------
+def plan(learners, processes, nodes, seed=0):
+    ids = np.random.default_rng(seed).choice(learners * 20, size=learners, replace=False)
+    nodes = nodes or ["local"]
+    by_node = HashRing(nodes).groups(ids)
+    for node in nodes:
+        sizes = [len(v) for v in shard_ring(node, processes).groups(by_node[node]).values()]
+        print(f"{node}: {len(by_node[node])} 个学习者，分片 {sizes}，最大/平均 {max(sizes) / np.mean(sizes):.3f}")
+    grown = HashRing(nodes + [f"node{len(nodes) + 1}"]).assign(ids)
+    moved = float(np.mean(grown != HashRing(nodes).assign(ids)))
+    print(f"增加一个节点：{moved:.1%} 的学习者换节点（理想值 {1 / (len(nodes) + 1):.1%}）")
+    more = shard_ring(nodes[0], processes + 1).assign(by_node[nodes[0]])
+    moved = float(np.mean(more != shard_ring(nodes[0], processes).assign(by_node[nodes[0]])))
+    print(f"{nodes[0]} 进程数 {processes}→{processes + 1}：{moved:.1%} 的学习者换分片")
+
+def _bench_noop(messages, webhook=None, check_workday=False):
+    return bool(messages)
+
+def bench(learners, candidates, process_counts, send=False, seed=0):
+    """与 run 相同：选词、渲染只在协调进程里做一次，分片进程只推送；不加 send 时只测分片调度开销"""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    rows = [
+        {"id": i, "term": f"term{i}", "part_of_speech": "n", "translation": f"释义{i}",
+         "review_count": rng.randint(0, 12), "last_review_date": today,
+         "example_sentence": f"Example sentence {i}."}
+        for i in range(candidates)
+    ]
+    server = None
+    webhook = None
+    if send:
+        import bizvocab_loadtest as lt
+        server, base = lt.start_stub(lt.FeishuStubHandler, lt.StubBehavior())
+        webhook = base + "/open-apis/bot/v2/hook/bench"
+    bizvocab_reviewer.log = bizvocab_learner.log = lambda msg: None  # 压测时不写日志文件
+    t0 = time.perf_counter()
+    words = bizvocab_reviewer.pick_review_words(rows, bizvocab_reviewer.REVIEW_WORDS_PER_DAY)
+    messages = [m.payload for m in bizvocab_cards.pack([bizvocab_reviewer.build_review_card(words)])]
+    build = time.perf_counter() - t0
+    job = functools.partial(bizvocab_editions.send if send else _bench_noop, messages)
+    ids = np.arange(1, learners + 1)
+    pairs = [(int(i), webhook) for i in ids]
+    print(f"{learners} 个学习者共用一份卡片（从 {candidates} 个候选选词 + 渲染 {build * 1000:.1f}ms）"
+          f"{'，推送到本地桩服务' if send else '，不推送'}；CPU 核数 {os.cpu_count()}")
+    base_wall = base_cpu = None
+    for processes in process_counts:
+        t0 = time.perf_counter()
+        results = dispatch(JOB_REVIEW, ids, processes, targets=(job, pairs))
+        summary = merge(results, time.perf_counter() - t0)
+        base_wall = base_wall or summary["wall"] * process_counts[0]
+        base_cpu = base_cpu or summary["cpu"]
+        print(f"进程 {processes:>2}：总耗时 {summary['wall']:6.2f}s（加速 {base_wall / summary['wall']:.2f}×）  "
+              f"CPU 合计 {summary['cpu']:6.2f}s  最慢分片 CPU {summary['cpu_max']:6.2f}s"
+              f"（核数足够时加速 {base_cpu / max(summary['cpu_max'], 1e-9):.2f}×）  "
+              f"单人 p99 {summary['p99'] * 1000:.1f}ms  失败 {summary['failed']}")
+    if server is not None:
+        server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="分片执行每日推送")
+    sub = parser.add_subparsers(dest="cmd")
+    p_run = sub.add_parser("run", help="按分片推送")
+    p_run.add_argument("job", choices=JOBS)
+    p_run.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    p_run.add_argument("--node", default=None, help="本节点名，默认 SHARD_NODE")
+    p_run.add_argument("--nodes", default=None, help="逗号分隔的全部节点，默认 SHARD_NODES")
+    p_run.add_argument("--force", action="store_true", help="非工作日也推送")
+    p_plan = sub.add_parser("plan", help="合成数据查看分片均衡度与扩容迁移比例")
+    p_plan.add_argument("--learners", type=int, default=100000)
+    p_plan.add_argument("--processes", type=int, default=4)
+    p_plan.add_argument("--nodes", default="node1,node2,node3")
+    p_bench = sub.add_parser("bench", help="合成数据压测不同进程数")
+    p_bench.add_argument("--learners", type=int, default=20000)
+    p_bench.add_argument("--candidates", type=int, default=3000)
+    p_bench.add_argument("--processes", default="1,2,4")
+    p_bench.add_argument("--send", action="store_true", help="推送到本地飞书桩服务")
+    args = parser.parse_args()
+
+    if args.cmd == "plan":
+        plan(args.learners, args.processes, node_list(args.nodes))
+    elif args.cmd == "bench":
+        bench(args.learners, args.candidates, [int(p) for p in args.processes.split(",")], args.send)
+    elif args.cmd == "run":
+        bizvocab_schema.migrate()
+        summary = run(args.job, args.processes, args.node, node_list(args.nodes) if args.nodes else None, args.force)
+        if summary and summary["failed"]:
+            sys.exit(1)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 学习过程模拟器：在内存模型上回放 N 天 × M 个学习者，评估每日上限/复习权重对积压、覆盖率、
+# 数据库查询量和飞书推送量的影响，用于容量规划。
+#
+# 用法：
+#   python bizvocab_simulator.py --learners 10000 --days 365 --vocab 1200
+#   python bizvocab_simulator.py --new-per-day 8 --review-per-day 15 --exponent 1.0 --csv sim.csv
+#   python bizvocab_simulator.py --params review_params.json   # 默认读 REVIEW_PARAMS；--no-params 只用常量
+#
+# 内存模型：同一 review_count、同一“距上次复习天数”的已学单词对抽样来说可互换，因此每个学习者只需保存
+#   unlearned[m]        未学单词数
+#   hist[m, r, a]       review_count = r、距上次复习（没复习过则距学习）a 天的已学单词数；
+#                       r 的最后一格为 ≥ r（权重已到下限 1 份），a 的最后一格为 ≥ a（对所有桶都已到期）
+# 所有学习者按 NumPy 数组整体推进，每天的复习抽样是 review_per_day 次向量化的按桶加权抽取。
+#
+# 选词与更新沿用线上逻辑：复习参数与 bizvocab_reviewer.pick_review_words 一样取 bizvocab_tuner 的参数文件
+# （--params，缺的项退回 bizvocab_reviewer 里的常量；命令行显式给出的 --review-per-day / --exponent 优先），
+# 权重取 bizvocab_reviewer.review_weight。有间隔参数时先从已到期（a ≥ 该桶间隔，同 is_due）的词里抽，
+# 不够再从未到期的词里补。复习先于学习（10:25 / 10:30），只在工作日推送，学习后 needs_review 永久为 1。
+# 线上复习抽样是“加权池无放回抽样后去重、不足再均匀补齐”，这里按单词做加权无放回抽取来近似，
+# 池子较大时两者几乎一致。桶内抽中的词从最久没复习的开始扣：到期的词在被复习前一直到期，扣哪一天的
+# 都一样；未到期的补齐会略偏向快到期的词。
+# 推送量按合并后的飞书消息计：周五的周报与学习卡片装进同一条消息；--same-time 时复习和学习在同一时刻触发
+# （bizvocab_dispatcher 的复习+学习），每个学习者当天只有一条消息。
+
+import csv
+import sys
+import time
+import argparse
+import datetime
+import numpy as np
+
+from bizvocab_curriculum import candidate_pool
+import bizvocab_calendar
+import bizvocab_tuner
+from bizvocab_learner import NEW_WORDS_PER_DAY
+from bizvocab_reviewer import REVIEW_WORDS_PER_DAY, REVIEW_WEIGHT_EXPONENT, review_weight
+
+MAX_BUCKETS = 64  # review_count 桶数上限，超过的合并进最后一格
+
+# 每次推送对应的 SQL 语句数（按 run_once / run_review 实际执行的语句统计）
+LEARN_STATEMENTS = 9   # 候选查询、认领 2 条、提交事务 6 条（锁行、聚合表 2 条、标记已学、删认领等）
+REVIEW_STATEMENTS = 6  # 候选查询、聚合表 4 条、标记已复习
+
+# ---------- 参数 ----------
+def bucket_weights(exponent):
+    """每个 review_count 桶的抽样份数；找到权重降到 1 份的位置作为最后一格"""
+    weights = []
+    for rc in range(MAX_BUCKETS):
+        weights.append(review_weight(rc, exponent))
+        if weights[-1] == 1:
+            break
+    return np.array(weights, dtype=np.float64)
+
+def due_thresholds(gaps, buckets):
+    """每个桶到期所需的整天数（is_due 里 天数 >= 间隔）；没有间隔参数时全为 0，即都算到期"""
+    if not gaps:
+        return np.zeros(buckets, dtype=np.int64)
+    return np.array([int(np.ceil(bizvocab_tuner.interval_for(gaps, r))) for r in range(buckets)], dtype=np.int64)
+
+def resolve_params(params, review_per_day=None, exponent=None):
+    """与 pick_review_words 相同的取值顺序；命令行显式给出的值优先"""
+    params = params or {}
+    if review_per_day is None:
+        review_per_day = params.get("words_per_day", REVIEW_WORDS_PER_DAY)
+    if exponent is None:
+        exponent = params.get("weight_exponent", REVIEW_WEIGHT_EXPONENT)
+    return review_per_day, exponent, params.get("intervals")
+
+# ---------- 模拟 ----------
+def age(hist, days):
+    """所有单词的“距上次复习天数”加 days，超出最后一格的并进最后一格"""
+    if days <= 0:
+        return hist
+    ages = hist.shape[2]
+    aged = np.zeros_like(hist)
+    if days < ages:
+        aged[:, :, days:] = hist[:, :, :ages - days]
+        aged[:, :, -1] += hist[:, :, ages - days:].sum(axis=2, dtype=hist.dtype)
+    else:
+        aged[:, :, -1] = hist.sum(axis=2, dtype=hist.dtype)
+    return aged
+
+def weighted_draws(rng, remaining, weights, quota, limit):
+    """每个学习者从各桶剩余词里按权重无放回抽 quota 个，返回各桶抽中数"""
+    learners, buckets = remaining.shape
+    rows = np.arange(learners)
+    remaining = remaining.astype(np.int64)
+    picked = np.zeros_like(remaining)
+    for j in range(limit):
+        draw = quota > j
+        if not draw.any():
+            break
+        cum = np.cumsum(remaining * weights, axis=1)
+        u = rng.random(learners) * cum[:, -1]
+        bucket = np.minimum((cum <= u[:, None]).sum(axis=1), buckets - 1)
+        sel = rows[draw]
+        remaining[sel, bucket[draw]] -= 1
+        picked[sel, bucket[draw]] += 1
+    return picked
+
+def take_oldest(counts, k):
+    """counts[m, a] 里按 a 从大到小扣掉 k[m] 个，返回每格扣掉的数"""
+    rev = counts[:, ::-1]
+    before = np.cumsum(rev, axis=1) - rev
+    return np.clip(k[:, None] - before, 0, rev)[:, ::-1].astype(counts.dtype)
+
+def simulate(learners, days, vocab, new_per_day=NEW_WORDS_PER_DAY, review_per_day=REVIEW_WORDS_PER_DAY,
+             exponent=REVIEW_WEIGHT_EXPONENT, join_spread=0, start=None, seed=0, same_time=False, gaps=None):
+    """gaps 为 bizvocab_tuner 参数文件里的 intervals（各复习次数的间隔天数），为空时不按到期筛选"""
+    rng = np.random.default_rng(seed)
+    weights = bucket_weights(exponent)
+    buckets = len(weights)
+    thresholds = due_thresholds(gaps, buckets)
+    ages = int(thresholds.max()) + 1
+    start = start or datetime.date.today()
+
+    dtype = np.int16 if vocab <= np.iinfo(np.int16).max else np.int32
+    unlearned = np.full(learners, vocab, dtype=np.int32)
+    hist = np.zeros((learners, buckets, ages), dtype=dtype)
+    # 学习者分批加入：第 join_day 天之前不推送
+    join_day = rng.integers(0, join_spread + 1, size=learners) if join_spread else np.zeros(learners, dtype=np.int32)
+
+    series = []
+    last = None
+    # 整段区间的工作日一次从日历位图里取出，只遍历推送日
+    for d in np.flatnonzero(bizvocab_calendar.default().workday_mask(start, days)):
+        day = start + datetime.timedelta(days=int(d))
+        active = join_day <= d
+        if last is not None:
+            hist = age(hist, int(d) - last)
+        last = int(d)
+
+        # 10:25 复习：先从到期的词里按桶加权无放回抽取，不够再从未到期的词里补，共 review_per_day 个
+        due = np.stack([hist[:, r, t:].sum(axis=1, dtype=np.int64) for r, t in enumerate(thresholds)], axis=1)
+        per_bucket = hist.sum(axis=2, dtype=np.int64)
+        learned = per_bucket.sum(axis=1)
+        quota = np.where(active, np.minimum(review_per_day, learned), 0)
+        from_due = np.minimum(quota, due.sum(axis=1))
+        picked_due = weighted_draws(rng, due, weights, from_due, review_per_day)
+        picked_later = weighted_draws(rng, per_bucket - due, weights, quota - from_due, review_per_day)
+        for r, t in enumerate(thresholds):
+            for ages_part, k in ((slice(t, None), picked_due[:, r]), (slice(0, t), picked_later[:, r])):
+                sel = np.flatnonzero(k)  # 每人每天只抽十来个词，多数桶只涉及少数学习者
+                if sel.size:
+                    hist[sel, r, ages_part] -= take_oldest(hist[sel, r, ages_part], k[sel])
+        # review_count + 1、距上次复习归零：每个桶被抽中的单词整体右移一格，最后一格留在原地
+        picked = (picked_due + picked_later).astype(dtype)
+        hist[:, 1:, 0] += picked[:, :-1]
+        hist[:, -1, 0] += picked[:, -1]
+        reviewers = quota > 0
+
+        # 10:30 学习：未学单词里取 new_per_day 个
+        new = np.where(active, np.minimum(new_per_day, unlearned), 0)
+        unlearned -= new
+        hist[:, 0, 0] += new.astype(dtype)
+        pushed = new > 0
+
+        learned = hist.sum(axis=(1, 2), dtype=np.int64)
+        total_learned = int(learned.sum())
+        series.append({
+            "date": day.isoformat(),
+            "active_learners": int(active.sum()),
+            "backlog": total_learned,  # learned=1 AND needs_review=1
+            "backlog_per_learner": total_learned / max(int(active.sum()), 1),
+            "due": int(due.sum()),
+            "unlearned": int(unlearned.sum()),
+            "coverage": 1 - int(hist[:, 0].sum(dtype=np.int64)) / total_learned if total_learned else 0.0,
+            "reviews": int(picked.sum(dtype=np.int64)),
+            "reviews_not_due": int(picked_later.sum()),
+            "new_words": int(new.sum()),
+            "queries": int(reviewers.sum()) * REVIEW_STATEMENTS + int(pushed.sum()) * LEARN_STATEMENTS,
+            # 复习候选查询读出全部待复习行；挑新词按优先级索引只读前 candidate_pool 行
+            "rows_read": int(learned[reviewers].sum())
+                         + int(np.minimum(unlearned + new, candidate_pool(new_per_day * 2))[pushed].sum()),
+            # 周报并进学习卡片的消息，不再单独计一次
+            "webhooks": int((reviewers | pushed).sum()) if same_time else int(reviewers.sum()) + int(pushed.sum()),
+        })
+    return series, hist
+
+# ---------- 报告 ----------
+def print_report(series, every=30):
+    header = (f"{'日期':<12}{'积压/人':>9}{'到期':>10}{'未学':>12}{'覆盖率':>8}{'复习':>10}{'未到期补':>9}"
+              f"{'SQL/天':>10}{'读行/天':>14}{'推送/天':>9}")
+    print(header)
+    for i, s in enumerate(series):
+        if i % every == 0 or i == len(series) - 1:
+            print(f"{s['date']:<12}{s['backlog_per_learner']:>9.0f}{s['due']:>10}{s['unlearned']:>12}"
+                  f"{s['coverage']:>8.1%}{s['reviews']:>10}{s['reviews_not_due']:>9}"
+                  f"{s['queries']:>10}{s['rows_read']:>14}{s['webhooks']:>9}")
+
+def write_csv(series, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(series[0].keys()))
+        writer.writeheader()
+        writer.writerows(series)
+
+def main():
+    parser = argparse.ArgumentParser(description="学习过程模拟器")
+    parser.add_argument("--learners", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--vocab", type=int, default=1200, help="每个学习者的词库大小")
+    parser.add_argument("--new-per-day", type=int, default=NEW_WORDS_PER_DAY)
+    parser.add_argument("--review-per-day", type=int, default=None, help="默认取参数文件的 words_per_day")
+    parser.add_argument("--exponent", type=float, default=None, help="默认取参数文件的 weight_exponent")
+    parser.add_argument("--params", default=bizvocab_tuner.PARAMS_FILE, help="bizvocab_tuner 的复习参数文件")
+    parser.add_argument("--no-params", action="store_true", help="不读参数文件，只用 bizvocab_reviewer 的常量")
+    parser.add_argument("--join-spread", type=int, default=0, help="学习者在前 N 天内随机加入")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=None, help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--every", type=int, default=20, help="每隔多少个工作日打印一行")
+    parser.add_argument("--same-time", action="store_true", help="复习和学习在同一时刻推送（合并成一条消息）")
+    parser.add_argument("--csv", help="逐日结果写入 CSV")
+    args = parser.parse_args()
+
+    params = {} if args.no_params else bizvocab_tuner.load(args.params)
+    review_per_day, exponent, gaps = resolve_params(params, args.review_per_day, args.exponent)
+    print(f"每天复习 {review_per_day} 词，权重指数 {exponent:g}，"
+          + (f"间隔 {', '.join(f'{g:g}' for g in gaps)} 天" if gaps else "不按间隔筛选"))
+    t0 = time.perf_counter()
+    series, hist = simulate(args.learners, args.days, args.vocab, args.new_per_day, review_per_day,
+                            exponent, args.join_spread, args.start, args.seed, args.same_time, gaps)
+    elapsed = time.perf_counter() - t0
+    if not series:
+        print("模拟区间内没有工作日。")
+        sys.exit(0)
+
+    print_report(series, args.every)
+    dist = hist.sum(axis=(0, 2), dtype=np.int64)
+    print("期末 review_count 分布（最后一格为 ≥）: " + ", ".join(f"{i}:{n}" for i, n in enumerate(dist) if n))
+    print(f"合计：SQL {sum(s['queries'] for s in series)} 条，读行 {sum(s['rows_read'] for s in series)}，"
+          f"推送 {sum(s['webhooks'] for s in series)} 次")
+    print(f"模拟 {args.learners} 人 × {args.days} 天（{len(series)} 个工作日）耗时 {elapsed:.2f}s")
+    if args.csv:
+        write_csv(series, args.csv)
+        print(f"逐日结果已写入 {args.csv}")
+
+if __name__ == "__main__":
+    main()
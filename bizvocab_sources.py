@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 词汇来源适配：每个网站是一份声明式描述（入口页、链接发现、内容区域、行语法、跳过规则），
+# 启动时编译成匹配器（正则、SoupStrainer、字符替换表），多个来源在共用的按主机礼貌限速下并发抓取。
+#
+# 用法：
+#   python bizvocab_sources.py list
+#   python bizvocab_sources.py crawl [--source koolearn_bec1 ...] [--workers 4] [--dry-run]
+#   python bizvocab_sources.py selftest [--source ...] [--repeat 200]   # 用各来源自带的样例页校验解析并测吞吐
+#   python -m pytest tests                                              # 同样的样例页校验，另含归档重解析按来源名找适配器
+#   python bizvocab_sources.py bench [--sources 3 --pages 20 --interval 0.2]   # 本地桩站点上比较串行/并发抓取
+#
+# 新增来源不用复制爬虫脚本：在 SOURCES 里加一项，或写进 CRAWLER_SOURCES 指向的 JSON 文件（键相同）：
+#   {"mysite_bec2": {"title": "...", "index_url": "https://...", "link_text": "BEC中级",
+#                    "container": {"tag": "div", "class": "content"},
+#                    "line": "^(?P<term>[A-Za-z][A-Za-z\\- ]*)\\s+(?P<pos>[a-z.]+?)\\.?\\s+(?P<translation>.+)$",
+#                    "skip": ["^[A-Z\\-]+$"], "bec_level": 2, "interval": 1,
+#                    "fixture": {"page_html": "...", "entries": [["term", "pos", "释义"]]}}}
+# 字段：
+#   index_url     入口页；pages 给出固定页面列表时不做链接发现
+#   link_text     入口页里 <a> 文字匹配该正则的链接即词汇页；相对链接按入口页补全
+#   container     内容区域 {"tag": ..., "class": ... 或 "id": ...}，只解析这一块
+#   line          行语法，命名分组 term / pos / translation（pos 可省略）
+#   skip          跳过的行：正则列表，编译成一个多选正则
+#   replace       解析前的字符替换，如全角空格
+#   bec_level     入库时写入 business_vocab.bec_level
+#   interval / concurrency   对该主机的最小请求间隔（秒）和并发上限；多个来源同主机时取最严的
+#   page_url      归档重解析时按 URL 找来源用的正则，默认同主机
+#   fixture       样例入口页 / 词汇页和期望结果，selftest 用
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+import collections
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+from dotenv import load_dotenv
+
+import bizvocab_http
+
+# ---------- 配置 ----------
+load_dotenv()
+
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+}
+EXTRA_SOURCES = os.getenv("CRAWLER_SOURCES")
+DEFAULT_INTERVAL = 1.0  # 秒；与原爬虫的 REQUEST_DELAY 相同
+
+KOOLEARN_INDEX = "https://english.koolearn.com/20170619/821129.html"
+
+SOURCES = {
+    "koolearn_bec1": {
+        "title": "新东方在线 BEC 初级必备词汇",
+        "index_url": KOOLEARN_INDEX,
+        "link_text": r"BEC商务英语初级必备词汇：",
+        "referer": "https://english.koolearn.com/",
+        "container": {"tag": "div", "class": "xqy_core_text"},
+        # 例："yield n. 有效产量"、"abroad adv. 在国外，出国"
+        "line": r"^(?P<term>\w+)\s+(?P<pos>[a-zA-Z.]+)\.\s+(?P<translation>.*)$",
+        # 字母标题（A、B、Y-Z）和广告/导航文字
+        "skip": [r"^[A-Z\-]+$", r"更多请点击", r"新东方在线"],
+        "replace": {"　": " "},  # 页面里的空格是全角“　”
+        "bec_level": 1,
+        "interval": DEFAULT_INTERVAL,
+        "concurrency": 1,
+        "page_url": r"^https?://english\.koolearn\.com/",
+        "fixture": {
+            "index_html": (
+                '<html><body><ul>'
+                '<li><a href="/20170619/821130.html">BEC商务英语初级必备词汇：A</a></li>'
+                '<li><a href="https://english.koolearn.com/20170619/821131.html">BEC商务英语初级必备词汇：B</a></li>'
+                '<li><a href="/20170620/900000.html">BEC商务英语中级口语</a></li>'
+                '</ul></body></html>'
+            ),
+            "links": [
+                "https://english.koolearn.com/20170619/821130.html",
+                "https://english.koolearn.com/20170619/821131.html",
+            ],
+            "page_html": (
+                '<html><body><div class="nav">abroad adv. 导航里的假词条</div>'
+                '<div class="xqy_core_text"><p>A</p>'
+                '<p>abroad　adv.　在国外，出国</p><p>account n. 账户</p>'
+                '<p>更多请点击：BEC词汇</p><p>Y-Z</p><p>yield n. 有效产量</p>'
+                '<p>新东方在线 版权所有</p></div></body></html>'
+            ),
+            "entries": [["abroad", "adv", "在国外，出国"], ["account", "n", "账户"], ["yield", "n", "有效产量"]],
+        },
+    },
+    # 同一入口页下的中级词汇系列，页面模板与初级相同；中级词表里有词组和连字符词，行语法放宽了 term。
+    # 链接文字按初级系列的命名推断，没有联网核对过：crawl 时若发现 0 个链接，先用 list/show 看入口页再调整
+    "koolearn_bec2": {
+        "title": "新东方在线 BEC 中级必备词汇",
+        "index_url": KOOLEARN_INDEX,
+        "link_text": r"BEC商务英语中级必备词汇：",
+        "referer": "https://english.koolearn.com/",
+        "container": {"tag": "div", "class": "xqy_core_text"},
+        # 例："balance sheet n. 资产负债表"、"break-even adj. 收支平衡的"
+        "line": r"^(?P<term>[A-Za-z][A-Za-z\-' ]*?)\s+(?P<pos>[a-zA-Z]+)\.\s+(?P<translation>.*)$",
+        "skip": [r"^[A-Z\-]+$", r"更多请点击", r"新东方在线"],
+        "replace": {"　": " "},
+        "bec_level": 2,
+        "interval": DEFAULT_INTERVAL,
+        "concurrency": 1,
+        # 与初级同主机、URL 没有可区分的规律：抓取时页面归档记下来源名，重解析按来源名找适配器
+        "page_url": r"^https?://english\.koolearn\.com/",
+        "fixture": {
+            "index_html": (
+                '<html><body><ul>'
+                '<li><a href="/20170619/821130.html">BEC商务英语初级必备词汇：A</a></li>'
+                '<li><a href="/20170705/830001.html">BEC商务英语中级必备词汇：A</a></li>'
+                '<li><a href="/20170705/830002.html">BEC商务英语中级必备词汇：B</a></li>'
+                '<li><a href="/20170705/830001.html">BEC商务英语中级必备词汇：A</a></li>'
+                '</ul></body></html>'
+            ),
+            "links": [
+                "https://english.koolearn.com/20170705/830001.html",
+                "https://english.koolearn.com/20170705/830002.html",
+            ],
+            "page_html": (
+                '<html><body><div class="xqy_core_text"><p>A</p>'
+                '<p>accountant　n.　会计师</p><p>acquisition n. 收购，获得</p><p>B</p>'
+                '<p>balance sheet n. 资产负债表</p><p>bankrupt adj. 破产的</p><p>break-even adj. 收支平衡的</p>'
+                '<p>更多请点击：BEC中级词汇</p><p>新东方在线 版权所有</p></div></body></html>'
+            ),
+            "entries": [["accountant", "n", "会计师"], ["acquisition", "n", "收购，获得"],
+                        ["balance sheet", "n", "资产负债表"], ["bankrupt", "adj", "破产的"],
+                        ["break-even", "adj", "收支平衡的"]],
+        },
+    },
+}
+
+def load_sources(path=EXTRA_SOURCES):
+    specs = dict(SOURCES)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            specs.update(json.load(f))
+    return specs
+
+# ---------- 编译 ----------
+class Adapter:
+    """一份来源描述编译后的匹配器"""
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self.title = spec.get("title", name)
+        self.index_url = spec.get("index_url")
+        self.pages = list(spec.get("pages") or [])
+        self.referer = spec.get("referer")
+        self.bec_level = spec.get("bec_level")
+        self.interval = float(spec.get("interval", DEFAULT_INTERVAL))
+        self.concurrency = int(spec.get("concurrency", 1))
+        self.host = bizvocab_http.host_of(self.index_url or self.pages[0])
+        self.link_re = re.compile(spec.get("link_text", "."))
+        container = dict(spec.get("container") or {})
+        tag = container.pop("tag", None)
+        attrs = {("class_" if k == "class" else k): v for k, v in container.items()}
+        self.container_strainer = SoupStrainer(tag, **attrs) if tag or attrs else None
+        self.link_strainer = SoupStrainer("a", href=True)
+        self.line_re = re.compile(spec["line"])
+        skip = spec.get("skip") or []
+        self.skip_re = re.compile("|".join(f"(?:{s})" for s in skip)) if skip else None
+        self.table = str.maketrans(spec.get("replace") or {})
+        self.page_url_re = re.compile(spec.get("page_url") or rf"^https?://{re.escape(self.host)}/")
+
+    # ---------- 链接发现 ----------
+    def discover(self, html):
+        """入口页 → [(链接文字, 绝对 URL)]，按出现顺序去重"""
+        soup = BeautifulSoup(html, "html.parser", parse_only=self.link_strainer)
+        links, seen = [], set()
+        for a in soup.find_all("a", href=True):
+            text = a.get_text(strip=True)
+            if self.link_re.search(text):
+                url = urljoin(self.index_url, a["href"])
+                if url not in seen:
+                    seen.add(url)
+                    links.append((text, url))
+        return links
+
+    # ---------- 解析 ----------
+    def lines(self, html):
+        if self.container_strainer is not None:
+            soup = BeautifulSoup(html, "html.parser", parse_only=self.container_strainer)
+            if not soup.contents:
+                return None
+        else:
+            soup = BeautifulSoup(html, "html.parser")
+        text = soup.get_text(separator="\n", strip=True).translate(self.table)
+        return [line.strip() for line in text.split("\n") if line.strip()]
+
+    def parse(self, html):
+        """词汇页 → 词条列表；找不到内容区域时返回 None"""
+        lines = self.lines(html)
+        if lines is None:
+            return None
+        records = []
+        skip = self.skip_re.search if self.skip_re is not None else None
+        match = self.line_re.match
+        for line in lines:
+            if skip is not None and skip(line):
+                continue
+            m = match(line)
+            if m:
+                fields = m.groupdict()
+                records.append({
+                    "term": fields["term"].strip(),
+                    "part_of_speech": (fields.get("pos") or "").strip() or None,
+                    "translation": fields["translation"].strip(),
+                    "example_sentence": None,  # 后续由例句补充脚本填充
+                    "example_chinese": None,
+                })
+        return records
+
+    # ---------- 抓取 ----------
+    def fetch(self, url, referer=None):
+        headers = dict(BROWSER_HEADERS)
+        if referer:
+            headers["Referer"] = referer
+        response = bizvocab_http.get(url, headers=headers)
+        response.encoding = "utf-8"
+        return response
+
+def compile_sources(specs=None):
+    return {name: Adapter(name, spec) for name, spec in (specs or load_sources()).items()}
+
+ADAPTERS = compile_sources()
+
+def adapter_for_url(url, source=None):
+    """source 为归档里记下的来源名，优先按名字找；没有（旧归档）时取第一个 URL 匹配的来源"""
+    if source in ADAPTERS:
+        return ADAPTERS[source]
+    for adapter in ADAPTERS.values():
+        if adapter.page_url_re.match(url):
+            return adapter
+    return None
+
+def configure_politeness(adapters):
+    """同一主机上的多个来源共用一个限速：并发取最小、间隔取最大。
+    已是同样设置的主机不再重建，避免清掉正在计时的请求间隔"""
+    per_host = {}
+    for a in adapters:
+        c, i = per_host.get(a.host, (a.concurrency, a.interval))
+        per_host[a.host] = (min(c, a.concurrency), max(i, a.interval))
+    for host, (concurrency, interval) in per_host.items():
+        current = bizvocab_http.DEFAULT.limits.get(host)
+        if current is None or (current.concurrency, current.interval) != (concurrency, interval):
+            bizvocab_http.configure_host(host, concurrency=concurrency, interval=interval)
+    return per_host
+
+# ---------- 并发抓取 ----------
+SourceStats = collections.namedtuple("SourceStats", "pages failed entries saved bytes fetch_seconds parse_seconds elapsed")
+
+class _Tally:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = collections.Counter()
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def add(self, **kw):
+        with self.lock:
+            self.values.update(kw)
+            self.finished = time.perf_counter()
+
+    def stats(self):
+        v = self.values
+        return SourceStats(v["pages"], v["failed"], v["entries"], v["saved"], v["bytes"],
+                           v["fetch_seconds"], v["parse_seconds"], self.finished - self.started)
+
+def _page_job(adapter, url, tally, archive, save):
+    t0 = time.perf_counter()
+    try:
+        response = adapter.fetch(url, referer=adapter.index_url)
+    except Exception as e:
+        print(f"[{adapter.name}] 抓取页面 {url} 失败：{e}")
+        tally.add(failed=1)
+        return
+    t1 = time.perf_counter()
+    if archive is not None:
+        from bizvocab_page_archive import KIND_VOCAB
+        archive.append(url, response.content, response.status_code, KIND_VOCAB, source=adapter.name)
+    records = adapter.parse(response.text)
+    t2 = time.perf_counter()
+    if records is None:
+        print(f"[{adapter.name}] 页面 {url} 未找到内容区域")
+        tally.add(pages=1, failed=1, bytes=len(response.content), fetch_seconds=t1 - t0, parse_seconds=t2 - t1)
+        return
+    saved = save(records, url, adapter) if save and records else 0
+    tally.add(pages=1, entries=len(records), saved=saved or 0, bytes=len(response.content),
+              fetch_seconds=t1 - t0, parse_seconds=t2 - t1)
+
+def _discover_job(adapter, archive):
+    if adapter.pages:
+        return [(url, url) for url in adapter.pages]
+    response = adapter.fetch(adapter.index_url, referer=adapter.referer)
+    if archive is not None:
+        from bizvocab_page_archive import KIND_INDEX
+        archive.append(adapter.index_url, response.content, response.status_code, KIND_INDEX, source=adapter.name)
+    links = adapter.discover(response.text)
+    print(f"[{adapter.name}] 成功获取 {len(links)} 个词汇页链接")
+    return links
+
+def _save_to_database(records, url, adapter):
+    import crawler
+    return crawler.save_to_database(records, source=url, bec_level=adapter.bec_level)
+
+def _interleave(lists):
+    """各来源的页面轮流排队，慢主机的页面不会堵住其他来源"""
+    queues = [collections.deque(items) for items in lists]
+    while any(queues):
+        for q in queues:
+            if q:
+                yield q.popleft()
+
+def crawl(adapters, workers=4, archive=None, save=_save_to_database):
+    """并发抓取多个来源；每个主机的并发和间隔由共用的 HTTP 传输层控制。返回 {来源名: SourceStats}"""
+    configure_politeness(adapters)
+    tallies = {a.name: _Tally() for a in adapters}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl") as pool:
+        discovered = {a.name: pool.submit(_discover_job, a, archive) for a in adapters}
+        jobs = []
+        for a in adapters:
+            try:
+                jobs.append([(a, url) for _, url in discovered[a.name].result()])
+            except Exception as e:
+                print(f"[{a.name}] 获取入口页失败：{e}")
+                tallies[a.name].add(failed=1)
+                jobs.append([])
+        futures = [pool.submit(_page_job, a, url, tallies[a.name], archive, save) for a, url in _interleave(jobs)]
+        for f in futures:
+            f.result()
+    return {name: t.stats() for name, t in tallies.items()}
+
+def print_stats(results):
+    print(f"{'来源':<18}{'页面':>6}{'失败':>6}{'词条':>8}{'入库':>8}{'KB':>8}{'耗时s':>8}{'页/s':>8}{'解析 ms/页':>12}")
+    for name, s in results.items():
+        rate = s.pages / s.elapsed if s.elapsed > 0 else 0
+        parse_ms = s.parse_seconds / s.pages * 1000 if s.pages else 0
+        print(f"{name:<18}{s.pages:>6}{s.failed:>6}{s.entries:>8}{s.saved:>8}{s.bytes / 1024:>8.0f}"
+              f"{s.elapsed:>8.1f}{rate:>8.2f}{parse_ms:>12.2f}")
+
+# ---------- 样例自检 ----------
+def selftest(adapters, repeat=200):
+    """各来源的 fixture：链接发现、内容解析与期望一致，并测解析吞吐；返回是否全部通过"""
+    ok = True
+    for a in adapters:
+        fixture = a.spec.get("fixture")
+        if not fixture:
+            print(f"[{a.name}] 没有样例，跳过")
+            continue
+        problems = []
+        if "index_html" in fixture:
+            links = [url for _, url in a.discover(fixture["index_html"])]
+            if links != fixture.get("links", []):
+                problems.append(f"链接发现：期望 {fixture.get('links')}，实际 {links}")
+        records = a.parse(fixture["page_html"]) or []
+        got = [[r["term"], r["part_of_speech"], r["translation"]] for r in records]
+        if "entries" in fixture:
+            # 期望值按入库前规范化之后的形式写，解析结果先过一遍 bizvocab_normalizer
+            import bizvocab_normalizer
+            normalized = [[r["term"], r["part_of_speech"], r["translation"]]
+                          for r in bizvocab_normalizer.Pipeline().run(records)]
+            if normalized != fixture["entries"]:
+                problems.append(f"解析：期望 {fixture['entries']}，实际 {normalized}（规范化前 {got}）")
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            a.parse(fixture["page_html"])
+        per_page = (time.perf_counter() - t0) / repeat
+        status = "通过" if not problems else "失败"
+        print(f"[{a.name}] {status}：{len(got)} 个词条，解析 {per_page * 1000:.2f}ms/页"
+              f"（{len(fixture['page_html']) / per_page / 2**20:.1f}MB/s，{len(got) / per_page:.0f} 词条/s）")
+        for p in problems:
+            print(f"    {p}")
+        ok = ok and not problems
+    return ok
+
+# ---------- 压测 ----------
+def bench(n_sources=3, pages=20, interval=0.2, words=300, workers=8):
+    """每个来源一个本地桩站点（不同端口即不同主机），比较逐来源串行抓取和并发抓取的总耗时"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    body_lines = "".join(f"<p>term{chr(97 + i % 26)}{i} n. 释义{i}</p>" for i in range(words))
+    page = f'<html><body><div class="content"><p>A</p>{body_lines}</div></body></html>'.encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/index.html":
+                data = "".join(f'<a href="/p{i}.html">词汇 {i}</a>' for i in range(pages)).encode("utf-8")
+            else:
+                data = page
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), Handler) for _ in range(n_sources)]
+    for s in servers:
+        threading.Thread(target=s.serve_forever, daemon=True).start()
+    adapters = [Adapter(f"stub{i}", {
+        "index_url": f"http://127.0.0.1:{s.server_address[1]}/index.html",
+        "link_text": "词汇", "container": {"tag": "div", "class": "content"},
+        "line": r"^(?P<term>\w+)\s+(?P<pos>[a-z.]+?)\.\s+(?P<translation>.+)$",
+        "skip": [r"^[A-Z\-]+$"], "interval": interval, "concurrency": 1,
+    }) for i, s in enumerate(servers)]
+    try:
+        print(f"{n_sources} 个来源 × {pages} 页 × {words} 词，每主机间隔 {interval}s、并发 1")
+        t0 = time.perf_counter()
+        for a in adapters:
+            crawl([a], workers=workers, save=None)
+        serial = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        results = crawl(adapters, workers=workers, save=None)
+        concurrent = time.perf_counter() - t0
+        print_stats(results)
+        total_pages = sum(s.pages for s in results.values())
+        print(f"逐来源串行 {serial:.2f}s，并发 {concurrent:.2f}s（{total_pages / concurrent:.1f} 页/s，"
+              f"{serial / concurrent:.2f}×）；礼貌限速下限 {(pages + 1) * interval:.2f}s")
+    finally:
+        for s in servers:
+            s.shutdown()
+
+def pick(names):
+    if not names:
+        return list(ADAPTERS.values())
+    unknown = [n for n in names if n not in ADAPTERS]
+    if unknown:
+        print(f"未知来源：{', '.join(unknown)}；可用：{', '.join(ADAPTERS)}")
+        sys.exit(1)
+    return [ADAPTERS[n] for n in names]
+
+def main():
+    parser = argparse.ArgumentParser(description="词汇来源适配与并发抓取")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("list", help="列出来源（默认）")
+    p_crawl = sub.add_parser("crawl", help="抓取并入库")
+    p_crawl.add_argument("--source", action="append", help="来源名，可重复；默认全部")
+    p_crawl.add_argument("--workers", type=int, default=4)
+    p_crawl.add_argument("--dry-run", action="store_true", help="只抓取解析，不入库")
+    p_self = sub.add_parser("selftest", help="用样例页校验解析并测吞吐")
+    p_self.add_argument("--source", action="append")
+    p_self.add_argument("--repeat", type=int, default=200)
+    p_bench = sub.add_parser("bench", help="本地桩站点上比较串行/并发抓取")
+    p_bench.add_argument("--sources", type=int, default=3)
+    p_bench.add_argument("--pages", type=int, default=20)
+    p_bench.add_argument("--interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.cmd == "crawl":
+        from bizvocab_page_archive import PageArchive
+        results = crawl(pick(args.source), args.workers, archive=PageArchive(),
+                        save=None if args.dry_run else _save_to_database)
+        print_stats(results)
+    elif args.cmd == "selftest":
+        sys.exit(0 if selftest(pick(args.source), args.repeat) else 1)
+    elif args.cmd == "bench":
+        bench(args.sources, args.pages, args.interval)
+    else:
+        for name, a in ADAPTERS.items():
+            print(f"{name:<18}{a.title}  {a.index_url or f'{len(a.pages)} 个固定页面'}  "
+                  f"BEC {a.bec_level or '-'}  间隔 {a.interval}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 学习进度聚合表：写路径增量维护，统计只读聚合表，不扫 business_vocab
+#
+# 用法：
+#   python bizvocab_stats.py stats            # 查看进度
+#   python bizvocab_stats.py weekly [--send]  # 生成/推送周报卡片
+#   python bizvocab_stats.py check [--repair] # 与全表扫描结果核对，不一致时重建
+#   python bizvocab_stats.py rebuild          # 从 business_vocab_all（冷热两层）全量重建聚合表
+
+import os
+import sys
+import argparse
+import datetime
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_schema
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+WEEKS_SHOWN = 8  # 统计/周报中展示的最近周数
+
+def week_start(day=None):
+    day = day or datetime.datetime.now(SH_TZ).date()
+    return day - datetime.timedelta(days=day.weekday())
+
+# ---------- 增量维护（在调用方事务内执行，须在更新 business_vocab 之前调用） ----------
+def _id_list(word_ids):
+    return ",".join(["%s"] * len(word_ids))
+
+def _bump_totals(cursor, total=0, learned=0, pending=0, reviews=0):
+    cursor.execute(
+        """
+        UPDATE vocab_stats_totals
+        SET total_words = total_words + %s, learned_words = learned_words + %s,
+            pending_review = pending_review + %s, total_reviews = total_reviews + %s,
+            updated_at = NOW()
+        WHERE id = 1
+        """,
+        (total, learned, pending, reviews)
+    )
+
+def _bump_hist(cursor, deltas):
+    rows = [(rc, n) for rc, n in deltas.items() if n]
+    if rows:
+        cursor.executemany(
+            "INSERT INTO vocab_stats_review_hist (review_count, words) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE words = words + VALUES(words)",
+            rows
+        )
+
+def _bump_week(cursor, learned=0, reviews=0):
+    cursor.execute(
+        "INSERT INTO vocab_stats_weekly (week_start, learned_words, reviews) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE learned_words = learned_words + VALUES(learned_words), "
+        "reviews = reviews + VALUES(reviews)",
+        (week_start(), learned, reviews)
+    )
+
+def on_words_learned(cursor, word_ids):
+    """mark_words_learned 之前调用：锁定这些行，按原状态计算增量"""
+    if not word_ids:
+        return
+    cursor.execute(
+        "SELECT learned, needs_review FROM business_vocab WHERE id IN (%s) FOR UPDATE" % _id_list(word_ids),
+        list(word_ids)
+    )
+    rows = cursor.fetchall()
+    newly_learned = sum(1 for r in rows if not r[0])
+    newly_pending = sum(1 for r in rows if not (r[0] and r[1]))
+    _bump_totals(cursor, learned=newly_learned, pending=newly_pending)
+    if newly_learned:
+        _bump_week(cursor, learned=newly_learned)
+
+def on_words_reviewed(cursor, word_ids):
+    """mark_words_reviewed 之前调用：review_count 分布整体右移一格"""
+    if not word_ids:
+        return
+    cursor.execute(
+        "SELECT review_count, COUNT(*) FROM business_vocab WHERE id IN (%s) "
+        "GROUP BY review_count FOR UPDATE" % _id_list(word_ids),
+        list(word_ids)
+    )
+    deltas = {}
+    reviewed = 0
+    for rc, n in cursor.fetchall():
+        rc = rc or 0
+        deltas[rc] = deltas.get(rc, 0) - n
+        deltas[rc + 1] = deltas.get(rc + 1, 0) + n
+        reviewed += n
+    _bump_hist(cursor, deltas)
+    _bump_totals(cursor, reviews=reviewed)
+    _bump_week(cursor, reviews=reviewed)
+
+def on_words_inserted(cursor, count):
+    """入库路径（爬虫、清洗拆分）新插入 count 个未学单词后调用"""
+    if count <= 0:
+        return
+    _bump_totals(cursor, total=count)
+    _bump_hist(cursor, {0: count})
+
+def on_words_tiered(cursor, pending):
+    """bizvocab_tiering 移动单词后调用：移到冷表的词退出复习（pending 为负），移回热表的重新进入；
+    总词数、复习次数分布不变"""
+    if pending:
+        _bump_totals(cursor, pending=pending)
+
+# ---------- 读取（只读聚合表） ----------
+def read_stats(weeks=WEEKS_SHOWN):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT total_words, learned_words, pending_review, total_reviews, updated_at "
+        "FROM vocab_stats_totals WHERE id = 1"
+    )
+    totals = cursor.fetchone() or {}
+    cursor.execute("SELECT review_count, words FROM vocab_stats_review_hist WHERE words > 0 ORDER BY review_count")
+    hist = [(r["review_count"], r["words"]) for r in cursor.fetchall()]
+    cursor.execute(
+        "SELECT week_start, learned_words, reviews FROM vocab_stats_weekly "
+        "ORDER BY week_start DESC LIMIT %s",
+        (weeks,)
+    )
+    weekly = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return {"totals": totals, "review_hist": hist, "weekly": weekly}
+
+def format_stats(stats):
+    t = stats["totals"]
+    lines = [
+        f"总词汇: {t.get('total_words', 0)}",
+        f"已学习: {t.get('learned_words', 0)}",
+        f"未学习: {t.get('total_words', 0) - t.get('learned_words', 0)}",
+        f"待复习: {t.get('pending_review', 0)}",
+        f"累计复习次数: {t.get('total_reviews', 0)}",
+        "复习次数分布: " + ", ".join(f"{rc}次×{n}" for rc, n in stats["review_hist"]),
+        "每周学习/复习:",
+    ]
+    for w in stats["weekly"]:
+        lines.append(f"  {w['week_start']}  新学 {w['learned_words']}  复习 {w['reviews']}")
+    return "\n".join(lines)
+
+def build_weekly_card(stats):
+    t = stats["totals"]
+    this_week = stats["weekly"][0] if stats["weekly"] else {"learned_words": 0, "reviews": 0}
+    total = t.get("total_words", 0) or 0
+    learned = t.get("learned_words", 0) or 0
+    progress = f"{learned * 100 / total:.1f}%" if total else "0%"
+    content = (
+        f"📚 本周新学 **{this_week['learned_words']}** 个，复习 **{this_week['reviews']}** 次\n"
+        f"✅ 累计已学 **{learned}** / {total}（{progress}）\n"
+        f"🔄 待复习 **{t.get('pending_review', 0)}** 个"
+    )
+    trend = "\n".join(
+        f"{w['week_start'].strftime('%m-%d')} 周：新学 {w['learned_words']}，复习 {w['reviews']}"
+        for w in stats["weekly"]
+    )
+    elements = [{"tag": "div", "text": {"tag": "lark_md", "content": content}}]
+    if trend:
+        elements.append({"tag": "hr"})
+        elements.append({"tag": "div", "text": {"tag": "lark_md", "content": trend}})
+    return {
+        "msg_type": "interactive",
+        "card": {
+            "config": {"wide_screen_mode": True},
+            "header": {
+                "template": "purple",
+                "title": {
+                    "content": f"本周学习周报 📊 | {datetime.datetime.now(SH_TZ).strftime('%Y-%m-%d')}",
+                    "tag": "plain_text"
+                }
+            },
+            "elements": elements
+        }
+    }
+
+# ---------- 全量重建 / 一致性核对 ----------
+def compute_from_scratch(cursor):
+    """冷热两层一起统计（business_vocab_all 视图）"""
+    cursor.execute(
+        "SELECT COUNT(*), COALESCE(SUM(learned=1), 0), COALESCE(SUM(learned=1 AND needs_review=1), 0), "
+        "COALESCE(SUM(review_count), 0) FROM business_vocab_all"
+    )
+    total, learned, pending, reviews = (int(x) for x in cursor.fetchone())
+    cursor.execute("SELECT COALESCE(review_count, 0), COUNT(*) FROM business_vocab_all GROUP BY 1")
+    hist = {int(rc): int(n) for rc, n in cursor.fetchall()}
+    cursor.execute(
+        "SELECT DATE_SUB(learn_date, INTERVAL WEEKDAY(learn_date) DAY), COUNT(*) "
+        "FROM business_vocab_all WHERE learned=1 AND learn_date IS NOT NULL GROUP BY 1"
+    )
+    weekly = {wk: int(n) for wk, n in cursor.fetchall()}
+    return {"totals": (total, learned, pending, reviews), "hist": hist, "weekly_learned": weekly}
+
+def read_for_check(cursor):
+    cursor.execute(
+        "SELECT total_words, learned_words, pending_review, total_reviews FROM vocab_stats_totals WHERE id = 1"
+    )
+    row = cursor.fetchone() or (0, 0, 0, 0)
+    cursor.execute("SELECT review_count, words FROM vocab_stats_review_hist WHERE words <> 0")
+    hist = {int(rc): int(n) for rc, n in cursor.fetchall()}
+    cursor.execute("SELECT week_start, learned_words FROM vocab_stats_weekly WHERE learned_words <> 0")
+    weekly = {wk: int(n) for wk, n in cursor.fetchall()}
+    return {"totals": tuple(int(x) for x in row), "hist": hist, "weekly_learned": weekly}
+
+def rebuild_aggregates(cursor, scratch):
+    """每周复习次数无法从 business_vocab 还原，重建时保留原值"""
+    total, learned, pending, reviews = scratch["totals"]
+    cursor.execute("INSERT IGNORE INTO vocab_stats_totals (id) VALUES (1)")
+    cursor.execute(
+        "UPDATE vocab_stats_totals SET total_words=%s, learned_words=%s, pending_review=%s, "
+        "total_reviews=%s, updated_at=NOW() WHERE id = 1",
+        (total, learned, pending, reviews)
+    )
+    cursor.execute("DELETE FROM vocab_stats_review_hist")
+    _bump_hist(cursor, scratch["hist"])
+    cursor.execute("UPDATE vocab_stats_weekly SET learned_words = 0")
+    rows = list(scratch["weekly_learned"].items())
+    if rows:
+        cursor.executemany(
+            "INSERT INTO vocab_stats_weekly (week_start, learned_words) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE learned_words = VALUES(learned_words)",
+            rows
+        )
+
+def check_aggregates(repair=False, force=False):
+    bizvocab_schema.migrate()
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        # 锁住聚合总表，避免核对期间写路径并发修改
+        cursor.execute("SELECT id FROM vocab_stats_totals WHERE id = 1 FOR UPDATE")
+        cursor.fetchall()
+        scratch = compute_from_scratch(cursor)
+        stored = read_for_check(cursor)
+        diffs = [k for k in ("totals", "hist", "weekly_learned") if scratch[k] != stored[k]]
+        if diffs:
+            print(f"聚合表与全表统计不一致: {', '.join(diffs)}")
+            for k in diffs:
+                print(f"  {k}: 聚合表={stored[k]} 全表={scratch[k]}")
+        else:
+            print("聚合表与全表统计一致。")
+        if force or (diffs and repair):
+            rebuild_aggregates(cursor, scratch)
+            print("已从 business_vocab_all 重建聚合表。")
+        conn.commit()
+        return not diffs
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+# ---------- 命令行 ----------
+def main():
+    parser = argparse.ArgumentParser(description="学习进度统计")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("stats", help="查看进度（默认）")
+    p_weekly = sub.add_parser("weekly", help="生成周报卡片")
+    p_weekly.add_argument("--send", action="store_true", help="推送到飞书")
+    p_check = sub.add_parser("check", help="与全表扫描结果核对")
+    p_check.add_argument("--repair", action="store_true", help="不一致时重建")
+    sub.add_parser("rebuild", help="全量重建聚合表")
+    args = parser.parse_args()
+
+    if args.cmd == "check":
+        sys.exit(0 if check_aggregates(repair=args.repair) else 1)
+    elif args.cmd == "rebuild":
+        check_aggregates(force=True)
+    elif args.cmd == "weekly":
+        card = build_weekly_card(read_stats())
+        if args.send:
+            import bizvocab_learner
+            bizvocab_learner.send_to_feishu(card)
+        else:
+            print(card)
+    else:
+        print(format_stats(read_stats()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 冷热分层：复习多次且答得稳的单词连同答题统计移到压缩的冷表，business_vocab 只留未学和仍在复习的词，
+# 热点查询扫描/索引的行数和占用的 buffer pool 不随累计词汇量增长。
+#
+# 用法：
+#   python bizvocab_tiering.py status [--buffer-pool]   # 两层行数与表空间大小、热点查询耗时
+#                                                       # --buffer-pool 统计各表在 buffer pool 中的页数（会扫整个 pool，慎用）
+#   python bizvocab_tiering.py freeze [--min-reviews 8] [--min-accuracy 0.8] [--batch 500] [--dry-run]
+#                                                       # 把成熟单词移到冷表（建议每天跑一次）
+#   python bizvocab_tiering.py thaw 单词 [单词...]        # 移回热表，重新参与复习
+#   python bizvocab_tiering.py verify [--database 库名] [--keep]
+#                                                       # 在单独的库（默认 <DB_NAME>_verify，先删后建）里跑迁移、
+#                                                       # freeze/thaw、bizvocab_transfer 导出/导回，逐项核对
+#
+# 表：
+#   business_vocab_cold         与 business_vocab 同列，另加 frozen_at；只保留主键和 uk_term，ROW_FORMAT=COMPRESSED
+#   vocab_answer_stats_cold     冷词的 vocab_answer_stats 行
+#   business_vocab_all          两层 UNION ALL 的视图，供全量读取（查词索引加载、聚合表重建、干扰项计算）
+# 按 id 取词不要走视图（条件未必能下推进 UNION），用 union_sql 把条件写进每个分支，或像
+# bizvocab_distractors.fetch_choices 那样分别 LEFT JOIN 两张表。
+#
+# 成熟：learned=1、needs_review=1、review_count >= min_reviews，且没有答题记录或最近一次答对、
+# 正确率不低于 min_accuracy。移到冷表的词 needs_review 置 0（退出复习），聚合表的 pending_review 同步减少。
+# 移动时会话变量 @bizvocab_tiering 让变更日志的删除触发器跳过记录：单词没有消失，只是换了层，
+# 查词索引和片段缓存不需要失效；thaw 插回热表时照常记一条 insert。
+# 学习/复习/答题事件仍留在按月分区的 vocab_events 里，由 bizvocab_events archive 按月归档。
+# 以后给 business_vocab 加列时不用单独改冷表：每次 freeze 前 sync_columns 会把缺的列补到冷表并重建视图。
+
+import os
+import sys
+import time
+import argparse
+import datetime
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_schema
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+HOT_TABLE = "business_vocab"
+COLD_TABLE = "business_vocab_cold"
+ALL_VIEW = "business_vocab_all"
+STATS_TABLE = "vocab_answer_stats"
+COLD_STATS_TABLE = "vocab_answer_stats_cold"
+
+MIN_REVIEWS = int(os.getenv("TIER_MIN_REVIEWS", 8))
+MIN_ACCURACY = float(os.getenv("TIER_MIN_ACCURACY", 0.8))
+BATCH = 500           # 每个事务移动的单词数
+LATENCY_RUNS = 5      # status 里每条热点查询执行几次取中位数
+
+STATS_COLUMNS = ["word_id", "correct_count", "wrong_count", "last_answer_at", "last_correct"]
+
+# ---------- 冷表列同步 ----------
+def _columns(cursor, table):
+    """[(列名, 列类型)]，按表中顺序"""
+    cursor.execute(
+        "SELECT COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table,)
+    )
+    return cursor.fetchall()
+
+def sync_columns(cursor):
+    """热表新加的列补到冷表（一律允许 NULL），再按热表的列重建视图；返回补上的列名"""
+    cold = {name for name, _ in _columns(cursor, COLD_TABLE)}
+    hot = _columns(cursor, HOT_TABLE)
+    added = []
+    for name, column_type in hot:
+        if name not in cold:
+            cursor.execute(f"ALTER TABLE {COLD_TABLE} ADD COLUMN {name} {column_type} NULL")
+            added.append(name)
+    cursor.execute(f"CREATE OR REPLACE VIEW {ALL_VIEW} AS {union_sql([name for name, _ in hot])}")
+    return added
+
+# ---------- 读取 ----------
+def union_sql(columns, where=""):
+    """热表和冷表各查一遍再 UNION ALL；where 写进每个分支，参数需要传两遍"""
+    cols = ", ".join(columns)
+    cond = f" WHERE {where}" if where else ""
+    return f"SELECT {cols} FROM {HOT_TABLE}{cond} UNION ALL SELECT {cols} FROM {COLD_TABLE}{cond}"
+
+def cold_terms(cursor, terms):
+    """terms 中已在冷表里的单词（小写）；入库前用来去重，热表的 INSERT IGNORE 管不到冷表"""
+    terms = list({t for t in terms if t})
+    found = set()
+    for i in range(0, len(terms), 1000):
+        chunk = terms[i:i + 1000]
+        cursor.execute(
+            f"SELECT term FROM {COLD_TABLE} WHERE term IN (%s)" % ",".join(["%s"] * len(chunk)), chunk
+        )
+        found.update(row[0].lower() for row in cursor.fetchall())
+    return found
+
+# ---------- 移动 ----------
+CANDIDATES_SQL = f"""
+    SELECT v.id FROM {HOT_TABLE} v LEFT JOIN {STATS_TABLE} s ON s.word_id = v.id
+    WHERE v.learned = 1 AND v.needs_review = 1 AND v.review_count >= %s AND v.id > %s
+      AND (s.word_id IS NULL
+           OR (s.last_correct = 1 AND s.correct_count >= %s * (s.correct_count + s.wrong_count)))
+    ORDER BY v.id LIMIT %s
+"""
+
+def _id_list(ids):
+    return ",".join(["%s"] * len(ids))
+
+def _move(cursor, ids, source, target, columns, needs_review, extra=()):
+    """business_vocab 行和答题统计从 source 层移到 target 层，在调用方事务内执行；返回移动的单词数"""
+    cursor.execute(
+        f"SELECT id FROM {source} WHERE id IN ({_id_list(ids)}) FOR UPDATE", list(ids)
+    )
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return 0
+    select = ", ".join(str(needs_review) if c == "needs_review" else c for c in columns)
+    cursor.execute(
+        f"INSERT INTO {target} ({', '.join(columns + [c for c, _ in extra])}) "
+        f"SELECT {select}{''.join(', ' + v for _, v in extra)} FROM {source} WHERE id IN ({_id_list(ids)})",
+        ids
+    )
+    stats_source, stats_target = ((STATS_TABLE, COLD_STATS_TABLE) if source == HOT_TABLE
+                                  else (COLD_STATS_TABLE, STATS_TABLE))
+    # 冻结后才到的作答（卡片在冻结前已推出）会在热层统计表里新建一行，移回时合并
+    cursor.execute(
+        f"""
+        INSERT INTO {stats_target} ({', '.join(STATS_COLUMNS)})
+        SELECT {', '.join(STATS_COLUMNS)} FROM {stats_source} WHERE word_id IN ({_id_list(ids)})
+        ON DUPLICATE KEY UPDATE
+            correct_count = correct_count + VALUES(correct_count),
+            wrong_count = wrong_count + VALUES(wrong_count),
+            last_correct = IF(VALUES(last_answer_at) >= last_answer_at, VALUES(last_correct), last_correct),
+            last_answer_at = GREATEST(last_answer_at, VALUES(last_answer_at))
+        """,
+        ids
+    )
+    cursor.execute(f"DELETE FROM {stats_source} WHERE word_id IN ({_id_list(ids)})", ids)
+    cursor.execute(f"DELETE FROM {source} WHERE id IN ({_id_list(ids)})", ids)
+    return len(ids)
+
+def freeze(min_reviews=MIN_REVIEWS, min_accuracy=MIN_ACCURACY, batch=BATCH, dry_run=False):
+    """按 id 顺序分批把成熟单词移到冷表，每批一个事务；返回移动（或 dry_run 时符合条件）的单词数"""
+    import bizvocab_stats
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    moved = 0
+    after = 0
+    try:
+        added = sync_columns(cursor)
+        if added:
+            print(f"冷表补上了新列: {', '.join(added)}")
+        columns = [name for name, _ in _columns(cursor, HOT_TABLE)]
+        cursor.execute("SET @bizvocab_tiering = 1")
+        while True:
+            cursor.execute(CANDIDATES_SQL, (min_reviews, after, min_accuracy, batch))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            after = ids[-1]
+            if dry_run:
+                moved += len(ids)
+                conn.rollback()
+                continue
+            try:
+                # 与学习/复习写路径一样，先锁单词行再更新聚合总表
+                n = _move(cursor, ids, HOT_TABLE, COLD_TABLE, columns, 0, [("frozen_at", "NOW()")])
+                bizvocab_stats.on_words_tiered(cursor, -n)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            moved += n
+    finally:
+        # 会话变量随连接关闭失效，不会影响其他连接上的删除
+        cursor.close()
+        conn.close()
+    return moved
+
+def thaw(terms):
+    """把冷表里的单词移回热表并重新进入复习；返回移回的单词数"""
+    import bizvocab_stats
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        sync_columns(cursor)
+        columns = [name for name, _ in _columns(cursor, HOT_TABLE)]
+        cursor.execute(
+            f"SELECT id FROM {COLD_TABLE} WHERE term IN ({_id_list(terms)})", list(terms)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0
+        try:
+            n = _move(cursor, ids, COLD_TABLE, HOT_TABLE, columns, 1)
+            bizvocab_stats.on_words_tiered(cursor, n)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        cursor.close()
+        conn.close()
+    return n
+
+# ---------- 状态 ----------
+def table_sizes(cursor):
+    tables = [HOT_TABLE, COLD_TABLE, STATS_TABLE, COLD_STATS_TABLE]
+    cursor.execute(
+        "SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH, ROW_FORMAT FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN (%s)" % _id_list(tables), tables
+    )
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def buffer_pool_pages(cursor):
+    """各表在 buffer pool 中的页数与字节数；INNODB_BUFFER_PAGE 会遍历整个 pool，生产库上慎用"""
+    cursor.execute(
+        "SELECT TABLE_NAME, COUNT(*), SUM(COMPRESSED_SIZE), SUM(DATA_SIZE) "
+        "FROM information_schema.INNODB_BUFFER_PAGE "
+        "WHERE TABLE_NAME IS NOT NULL AND TABLE_NAME LIKE %s GROUP BY TABLE_NAME ORDER BY COUNT(*) DESC",
+        ("%vocab%",)
+    )
+    return cursor.fetchall()
+
+def query_latency(cursor, queries=None, runs=LATENCY_RUNS):
+    """bizvocab_schema.HOT_QUERIES 中针对热表的查询各执行 runs 次，返回 [(名称, 中位数毫秒)]"""
+    queries = bizvocab_schema.HOT_QUERIES if queries is None else queries
+    result = []
+    for name, sql, params in queries:
+        if HOT_TABLE not in sql:
+            continue
+        times = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        result.append((name, times[len(times) // 2] * 1000))
+    return result
+
+def status(buffer_pool=False):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(learned = 0), 0) FROM {HOT_TABLE}")
+    hot, unlearned = cursor.fetchone()
+    cursor.execute(f"SELECT COUNT(*), MIN(frozen_at), MAX(frozen_at) FROM {COLD_TABLE}")
+    cold, first, last = cursor.fetchone()
+    print(f"热表 {hot} 词（未学 {unlearned}，复习中 {hot - unlearned}），冷表 {cold} 词"
+          + (f"（{first} ~ {last} 冻结）" if cold else ""))
+    for table, (rows, data, index, row_format) in sorted(table_sizes(cursor).items()):
+        print(f"  {table:<26} 约 {rows} 行  数据 {data / 2**20:.1f}MB  索引 {index / 2**20:.1f}MB  {row_format}")
+    print("热点查询（中位数）：")
+    for name, ms in query_latency(cursor):
+        print(f"  {name:<12} {ms:.2f}ms")
+    if buffer_pool:
+        print("buffer pool：")
+        for table, pages, compressed, data in buffer_pool_pages(cursor):
+            print(f"  {table:<40} {pages} 页  数据 {int(data or 0) / 2**20:.1f}MB"
+                  + (f"  压缩 {int(compressed) / 2**20:.1f}MB" if compressed else ""))
+    cursor.close()
+    conn.close()
+
+# ---------- 端到端核对 ----------
+VERIFY_WORDS = [
+    # (term, learned, needs_review, review_count, 答题统计 (correct, wrong, last_correct) 或 None)
+    ("verify-mature", 1, 1, 10, (9, 1, 1)),    # 成熟：冻结后再 thaw 回来
+    ("verify-no-answers", 1, 1, 9, None),      # 成熟且没有答题记录：留在冷表
+    ("verify-wrong-last", 1, 1, 12, (9, 1, 0)),  # 最近一次答错：不冻结
+    ("verify-young", 1, 1, 2, (2, 0, 1)),      # 复习次数不够：不冻结
+    ("verify-new", 0, 0, 0, None),             # 未学
+]
+
+def verify(database=None, keep=False):
+    """在单独的库里建表、造几条词，依次跑 freeze / thaw / 导出 / 导回，逐项核对两层行数、
+    答题统计、变更日志与聚合表；返回是否全部通过。会先删掉同名的核对库，不要指向正在用的库"""
+    import tempfile
+    import bizvocab_stats
+    import bizvocab_transfer
+    database = database or DB_CONFIG["database"] + "_verify"
+    if database == DB_CONFIG["database"]:
+        raise ValueError("核对库不能是当前配置的库")
+    modules = [bizvocab_schema, bizvocab_stats, bizvocab_transfer]
+    saved = [m.DB_CONFIG["database"] for m in modules] + [DB_CONFIG["database"]]
+    server = {k: v for k, v in DB_CONFIG.items() if k != "database"}
+    conn = mysql.connector.connect(**server)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}` DEFAULT CHARSET utf8mb4")
+    cursor.close()
+    conn.close()
+    for m in modules + [None]:
+        (m.DB_CONFIG if m else DB_CONFIG)["database"] = database
+
+    failures = []
+    def check(name, ok, detail=""):
+        print(f"  {'通过' if ok else '失败'}  {name}" + (f"：{detail}" if detail and not ok else ""))
+        if not ok:
+            failures.append(name)
+
+    def snapshot(cursor):
+        cursor.execute(
+            f"SELECT term, translation, learned, review_count FROM {ALL_VIEW} ORDER BY term"
+        )
+        return cursor.fetchall()
+
+    try:
+        print(f"核对库 {database}：")
+        applied = bizvocab_schema.migrate()
+        check("迁移", applied == [v for v, _, _ in bizvocab_schema.MIGRATIONS], f"应用了 {applied}")
+        conn = mysql.connector.connect(**DB_CONFIG)
+        conn.autocommit = True
+        cursor = conn.cursor()
+        for term, learned, needs_review, review_count, stats in VERIFY_WORDS:
+            cursor.execute(
+                f"INSERT INTO {HOT_TABLE} (term, translation, learned, needs_review, review_count, learn_date) "
+                "VALUES (%s, %s, %s, %s, %s, IF(%s, CURDATE(), NULL))",
+                (term, f"核对 {term}", learned, needs_review, review_count, learned)
+            )
+            if stats:
+                cursor.execute(
+                    f"INSERT INTO {STATS_TABLE} (word_id, correct_count, wrong_count, last_answer_at, last_correct) "
+                    "VALUES (%s, %s, %s, NOW(), %s)", (cursor.lastrowid,) + stats
+                )
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM vocab_changes")
+        seq = cursor.fetchone()[0]
+        # 造数据绕过了写路径，先全量重建一次聚合表，之后每一步都应保持一致
+        bizvocab_stats.check_aggregates(force=True)
+        before = snapshot(cursor)
+
+        moved = freeze(min_reviews=8, min_accuracy=0.8)
+        cursor.execute(f"SELECT term FROM {COLD_TABLE} ORDER BY term")
+        cold = [r[0] for r in cursor.fetchall()]
+        check("freeze 只移动成熟单词", cold == ["verify-mature", "verify-no-answers"], f"移动 {moved} 词：{cold}")
+        cursor.execute(f"SELECT COUNT(*) FROM {COLD_STATS_TABLE}")
+        check("答题统计随单词进冷表", cursor.fetchone()[0] == 1)
+        cursor.execute("SELECT COUNT(*) FROM vocab_changes WHERE seq > %s AND op = 'delete'", (seq,))
+        check("冷热移动不记删除", cursor.fetchone()[0] == 0)
+        check("freeze 后聚合表一致", bizvocab_stats.check_aggregates())
+        check("freeze 后视图内容不变", snapshot(cursor) == before)
+
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM vocab_changes")
+        seq = cursor.fetchone()[0]
+        check("thaw 移回一词", thaw(["verify-mature"]) == 1)
+        cursor.execute(
+            f"SELECT v.needs_review, s.correct_count FROM {HOT_TABLE} v "
+            f"JOIN {STATS_TABLE} s ON s.word_id = v.id WHERE v.term = %s", ("verify-mature",)
+        )
+        check("thaw 后重新进入复习、答题统计回到热层", cursor.fetchall() == [(1, 9)])
+        cursor.execute("SELECT op FROM vocab_changes WHERE seq > %s", (seq,))
+        check("thaw 记一条 insert", [r[0] for r in cursor.fetchall()] == ["insert"])
+        check("thaw 后聚合表一致", bizvocab_stats.check_aggregates())
+
+        before = snapshot(cursor)
+        with tempfile.TemporaryDirectory() as tmp:
+            for table in ("vocab", "progress"):
+                path = os.path.join(tmp, f"{table}.csv.gz")
+                exported = bizvocab_transfer.export(table, path)
+                check(f"导出 {table}", exported > 0, f"{exported} 行")
+                bizvocab_transfer.import_file(table, path, restart=True)
+        cursor.execute(f"SELECT COUNT(*) FROM {HOT_TABLE} h JOIN {COLD_TABLE} c ON c.term = h.term")
+        check("导回后冷表单词没有在热表重复", cursor.fetchone()[0] == 0)
+        check("导回后内容不变", snapshot(cursor) == before)
+        check("导回后聚合表一致", bizvocab_stats.check_aggregates())
+        cursor.close()
+        conn.close()
+    finally:
+        for m, name in zip(modules + [None], saved):
+            (m.DB_CONFIG if m else DB_CONFIG)["database"] = name
+        if not keep:
+            conn = mysql.connector.connect(**server)
+            cursor = conn.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            cursor.close()
+            conn.close()
+    print("全部通过。" if not failures else f"{len(failures)} 项失败。")
+    return not failures
+
+def main():
+    parser = argparse.ArgumentParser(description="单词冷热分层")
+    sub = parser.add_subparsers(dest="cmd")
+    p_status = sub.add_parser("status", help="两层大小与热点查询耗时（默认）")
+    p_status.add_argument("--buffer-pool", action="store_true")
+    p_freeze = sub.add_parser("freeze", help="把成熟单词移到冷表")
+    p_freeze.add_argument("--min-reviews", type=int, default=MIN_REVIEWS)
+    p_freeze.add_argument("--min-accuracy", type=float, default=MIN_ACCURACY)
+    p_freeze.add_argument("--batch", type=int, default=BATCH)
+    p_freeze.add_argument("--dry-run", action="store_true")
+    p_thaw = sub.add_parser("thaw", help="把单词移回热表")
+    p_thaw.add_argument("terms", nargs="+")
+    p_verify = sub.add_parser("verify", help="在单独的核对库里跑一遍迁移、freeze/thaw、导出/导回")
+    p_verify.add_argument("--database", default=None, help="核对库名，默认 <DB_NAME>_verify，会先删除重建")
+    p_verify.add_argument("--keep", action="store_true", help="保留核对库以便查看")
+    args = parser.parse_args()
+
+    if args.cmd == "verify":
+        sys.exit(0 if verify(args.database, args.keep) else 1)
+    bizvocab_schema.migrate()
+    if args.cmd == "freeze":
+        n = freeze(args.min_reviews, args.min_accuracy, args.batch, args.dry_run)
+        print(f"符合条件 {n} 词（--dry-run，未移动）" if args.dry_run else f"已移到冷表 {n} 词")
+    elif args.cmd == "thaw":
+        print(f"已移回热表 {thaw(args.terms)} 词")
+    else:
+        status(getattr(args, "buffer_pool", False))
+
+if __name__ == "__main__":
+    main()
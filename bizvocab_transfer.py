@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 词库与学习进度的批量导出/导入：服务端游标分块流式读出，写成 CSV（可 .gz）或 Parquet；
+# 导入按块批量 upsert，每块提交后记录断点，中断后重跑同一命令从断点继续。内存占用只与块大小有关。
+#
+# 用法：
+#   python bizvocab_transfer.py export vocab vocab.parquet          # 扩展名决定格式：.csv / .csv.gz / .parquet
+#   python bizvocab_transfer.py export progress progress.csv.gz
+#   python bizvocab_transfer.py import vocab vocab.parquet [--restart] [--dry-run]
+#   python bizvocab_transfer.py import progress progress.csv.gz
+#   python bizvocab_transfer.py import vocab deck.txt --format anki # Anki“纯文本笔记”导出（正面<TAB>背面）
+#   python bizvocab_transfer.py bench [--rows 1000000]
+#
+# 不同实例的单词 id 不通用，两张表都以 term 作为关联键：词库按 uk_term upsert，
+# 进度（vocab_answer_stats）导出时带上 term，导入时按 term 换成本库的 word_id，本库没有的单词跳过。
+# 导入时文件里为空（NULL）的字段不覆盖库里已有的值；列可以只给一部分（如只有 term, translation 的词表 CSV）。
+# 冷热两层（bizvocab_tiering）都导出；导入时已在冷表里的单词更新冷表，不会在热表里再插一份。
+# CSV 里 NULL 写作 \N（与 LOAD DATA 相同），日期为 ISO 格式。Parquet 需要 pyarrow。
+
+import os
+import re
+import csv
+import gzip
+import json
+import time
+import html
+import resource
+import argparse
+import datetime
+import tempfile
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_schema
+import bizvocab_tiering
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+CHUNK_ROWS = 5000
+CSV_NULL = "\\N"
+
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+FORMAT_ANKI = "anki"
+
+# ---------- 表定义：(列名, 类型) ----------
+TABLES = {
+    "vocab": {
+        "columns": [
+            ("term", "str"), ("part_of_speech", "str"), ("translation", "str"),
+            ("example_sentence", "str"), ("example_chinese", "str"), ("example_status", "str"),
+            ("learned", "int"), ("needs_review", "int"), ("learn_date", "date"),
+            ("review_count", "int"), ("last_review_date", "date"),
+            ("bec_level", "int"), ("priority_score", "float"),
+        ],
+        "select": "SELECT {cols} FROM business_vocab_all ORDER BY id",
+    },
+    "progress": {
+        "columns": [
+            ("term", "str"), ("correct_count", "int"), ("wrong_count", "int"),
+            ("last_answer_at", "datetime"), ("last_correct", "int"),
+        ],
+        "select": "SELECT term, correct_count, wrong_count, last_answer_at, last_correct FROM ("
+                  "SELECT s.word_id, v.term, s.correct_count, s.wrong_count, s.last_answer_at, s.last_correct "
+                  "FROM vocab_answer_stats s JOIN business_vocab v ON v.id = s.word_id "
+                  "UNION ALL "
+                  "SELECT s.word_id, v.term, s.correct_count, s.wrong_count, s.last_answer_at, s.last_correct "
+                  "FROM vocab_answer_stats_cold s JOIN business_vocab_cold v ON v.id = s.word_id"
+                  ") t ORDER BY word_id",
+    },
+}
+
+def column_names(table):
+    return [name for name, _ in TABLES[table]["columns"]]
+
+def column_types(table):
+    return dict(TABLES[table]["columns"])
+
+def detect_format(path):
+    if path.endswith(".parquet"):
+        return FORMAT_PARQUET
+    if path.endswith(".txt"):
+        return FORMAT_ANKI
+    return FORMAT_CSV
+
+def _open_text(path, mode):
+    if path.endswith(".gz"):
+        # 默认压缩级别 9 写出慢了一倍多，体积只小几个百分点
+        return gzip.open(path, mode + "t", compresslevel=6, encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+# ---------- 写出 ----------
+class CsvSink:
+    def __init__(self, path, columns):
+        self.f = _open_text(path, "w")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow([name for name, _ in columns])
+
+    @staticmethod
+    def _cell(value):
+        if value is None:
+            return CSV_NULL
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+        return value
+
+    def write(self, rows):
+        cell = self._cell
+        self.writer.writerows([cell(v) for v in row] for row in rows)
+
+    def close(self):
+        self.f.close()
+
+PARQUET_TYPES = {"str": "string", "int": "int64", "float": "float32", "date": "date32", "datetime": "timestamp_ms"}
+
+class ParquetSink:
+    """每块写成一个 row group，不在内存里攒整表"""
+    def __init__(self, path, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([
+            (name, pa.timestamp("ms") if kind == "datetime" else getattr(pa, PARQUET_TYPES[kind])())
+            for name, kind in columns
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        pa = self.pa
+        arrays = [pa.array(list(col), type=field.type) for col, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+def open_sink(path, columns):
+    if detect_format(path) == FORMAT_PARQUET:
+        return ParquetSink(path, columns)
+    return CsvSink(path, columns)
+
+def write_chunks(chunks, path, columns):
+    sink = open_sink(path, columns)
+    total = 0
+    try:
+        for rows in chunks:
+            if rows:
+                sink.write(rows)
+                total += len(rows)
+    finally:
+        sink.close()
+    return total
+
+def _cursor_chunks(cursor, size):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+def export(table, path, chunk=CHUNK_ROWS):
+    spec = TABLES[table]
+    conn = mysql.connector.connect(**DB_CONFIG)
+    # 非缓冲游标：结果集留在服务端按需读取，不会一次把整表拉进内存
+    cursor = conn.cursor(buffered=False)
+    t0 = time.perf_counter()
+    try:
+        cursor.execute(spec["select"].format(cols=", ".join(column_names(table))))
+        total = write_chunks(_cursor_chunks(cursor, chunk), path, spec["columns"])
+    finally:
+        cursor.close()
+        conn.close()
+    elapsed = time.perf_counter() - t0
+    print(f"导出 {table} {total} 行到 {path}，耗时 {elapsed:.1f}s（{total / max(elapsed, 1e-9):,.0f} 行/s）")
+    return total
+
+# ---------- 读入：每次产出 (列名, [行元组...]) ----------
+def read_csv(path, table, skip=0, chunk=CHUNK_ROWS):
+    types = column_types(table)
+    with _open_text(path, "r") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        numeric = [types.get(h, "str") != "str" for h in header]
+        rows = []
+        for i, row in enumerate(reader):
+            if i < skip:
+                continue
+            # 数值/日期列的空串也按 NULL 处理，文本列只有 \N 是 NULL
+            rows.append(tuple(
+                None if v == CSV_NULL or (num and v == "") else v for v, num in zip(row, numeric)
+            ))
+            if len(rows) == chunk:
+                yield header, rows
+                rows = []
+        if rows:
+            yield header, rows
+
+def read_parquet(path, table, skip=0, chunk=CHUNK_ROWS):
+    import pyarrow.parquet as pq
+    # pre_buffer 会把整段列数据预读进内存，关掉后内存只与 row group / 批大小有关
+    pf = pq.ParquetFile(path, pre_buffer=False)
+    header = pf.schema_arrow.names
+    # 续传时直接从断点所在的 row group 开始读，前面的不解压
+    groups = list(range(pf.num_row_groups))
+    seen = 0
+    while groups and seen + pf.metadata.row_group(groups[0]).num_rows <= skip:
+        seen += pf.metadata.row_group(groups.pop(0)).num_rows
+    if not groups:
+        return
+    for batch in pf.iter_batches(batch_size=chunk, row_groups=groups):
+        start = max(skip - seen, 0)
+        seen += batch.num_rows
+        if start >= batch.num_rows:
+            continue
+        if start:
+            batch = batch.slice(start)
+        yield header, list(zip(*(batch.column(i).to_pylist() for i in range(batch.num_columns))))
+
+ANKI_TAG = re.compile(r"<[^>]+>")
+ANKI_POS = re.compile(r"^([a-zA-Z]+)\.\s*(.+)$", re.S)
+ANKI_SEPARATORS = {"tab": "\t", "comma": ",", "semicolon": ";", "pipe": "|", "space": " "}
+
+def _anki_text(field):
+    text = ANKI_TAG.sub(" ", field.replace("<br>", "；").replace("<br/>", "；").replace("<br />", "；"))
+    return " ".join(html.unescape(text).split())
+
+def read_anki(path, table, skip=0, chunk=CHUNK_ROWS):
+    """Anki 纯文本笔记：文件头 #separator:/#html: 等行，之后每行“正面<SEP>背面[<SEP>...]”；
+    正面作 term，背面作 translation，背面以“n. ”这类词性开头时拆出词性"""
+    if table != "vocab":
+        raise ValueError("Anki 卡组只能导入 vocab")
+    header = ["term", "part_of_speech", "translation"]
+    separator = "\t"
+    with open(path, encoding="utf-8-sig") as f:
+        reader = None
+        rows = []
+        n = 0
+        for line in f:
+            if reader is None and line.startswith("#"):
+                key, _, value = line[1:].strip().partition(":")
+                if key == "separator":
+                    separator = ANKI_SEPARATORS.get(value.strip().lower(), value.strip() or "\t")
+                continue
+            if reader is None:
+                reader = True
+            fields = next(csv.reader([line.rstrip("\r\n")], delimiter=separator))
+            if len(fields) < 2:
+                continue
+            term, back = _anki_text(fields[0]), _anki_text(fields[1])
+            if not term:
+                continue
+            n += 1
+            if n <= skip:
+                continue
+            m = ANKI_POS.match(back)
+            rows.append((term, m.group(1), m.group(2)) if m else (term, None, back))
+            if len(rows) == chunk:
+                yield header, rows
+                rows = []
+        if rows:
+            yield header, rows
+
+READERS = {FORMAT_CSV: read_csv, FORMAT_PARQUET: read_parquet, FORMAT_ANKI: read_anki}
+
+# ---------- upsert ----------
+def vocab_upsert(cursor, header, rows):
+    known = set(column_names("vocab"))
+    if "term" not in header:
+        raise ValueError("词库文件缺少 term 列")
+    keep = [i for i, h in enumerate(header) if h in known]
+    cols = [header[i] for i in keep]
+    if len(keep) < len(header):
+        rows = [tuple(row[i] for i in keep) for row in rows]
+    # 已冻结的单词只更新冷表；冷表的 id 不自增，不能走 INSERT ... ON DUPLICATE KEY
+    term_at = cols.index("term")
+    cold = bizvocab_tiering.cold_terms(cursor, [row[term_at] for row in rows])
+    frozen = [row for row in rows if row[term_at].lower() in cold]
+    if frozen:
+        rows = [row for row in rows if row[term_at].lower() not in cold]
+        sets = [c for c in cols if c != "term"]
+        if sets:
+            cursor.executemany(
+                f"UPDATE {bizvocab_tiering.COLD_TABLE} SET "
+                f"{', '.join(f'{c} = COALESCE(%s, {c})' for c in sets)} WHERE term = %s",
+                [tuple(row[cols.index(c)] for c in sets) + (row[term_at],) for row in frozen]
+            )
+    if rows:
+        updates = ", ".join(f"{c} = COALESCE(VALUES({c}), {c})" for c in cols if c != "term")
+        sql = (f"INSERT INTO business_vocab ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))}) "
+               f"ON DUPLICATE KEY UPDATE {updates or 'term = term'}")
+        cursor.executemany(sql, rows)
+    return len(rows) + len(frozen)
+
+def progress_upsert(cursor, header, rows):
+    cols = column_names("progress")
+    if header != cols:
+        index = {h: i for i, h in enumerate(header)}
+        missing = [c for c in cols if c not in index]
+        if missing:
+            raise ValueError(f"进度文件缺少列: {', '.join(missing)}")
+        rows = [tuple(row[index[c]] for c in cols) for row in rows]
+    terms = list({row[0] for row in rows})
+    where = "term IN (%s)" % ",".join(["%s"] * len(terms))
+    cursor.execute(bizvocab_tiering.union_sql(["term", "id"], where), terms * 2)
+    ids = dict(cursor.fetchall())
+    # 冷词的统计写冷层统计表，与 bizvocab_tiering 移动单词时一致
+    cold = bizvocab_tiering.cold_terms(cursor, terms)
+    tiers = {bizvocab_tiering.STATS_TABLE: [], bizvocab_tiering.COLD_STATS_TABLE: []}
+    for row in rows:
+        if row[0] in ids:
+            table = bizvocab_tiering.COLD_STATS_TABLE if row[0].lower() in cold else bizvocab_tiering.STATS_TABLE
+            tiers[table].append((ids[row[0]],) + tuple(row[1:]))
+    for table, params in tiers.items():
+        if params:
+            cursor.executemany(
+                f"INSERT INTO {table} (word_id, correct_count, wrong_count, last_answer_at, last_correct) "
+                "VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+                "correct_count = VALUES(correct_count), wrong_count = VALUES(wrong_count), "
+                "last_answer_at = VALUES(last_answer_at), last_correct = VALUES(last_correct)",
+                params
+            )
+    return sum(len(params) for params in tiers.values())
+
+UPSERTS = {"vocab": vocab_upsert, "progress": progress_upsert}
+
+# ---------- 断点 ----------
+def _source_id(path, table):
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "table": table, "size": st.st_size, "mtime": int(st.st_mtime)}
+
+def load_checkpoint(path, source):
+    """同一文件（大小、修改时间不变）的断点才有效，返回已提交的行数"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if any(saved.get(k) != v for k, v in source.items()):
+        print("断点对应的文件已变化，从头导入。")
+        return 0
+    return int(saved.get("rows", 0))
+
+def save_checkpoint(path, source, rows):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(source, rows=rows), f)
+    os.replace(tmp, path)
+
+def import_file(table, path, fmt=None, chunk=CHUNK_ROWS, checkpoint=None, restart=False, dry_run=False):
+    """每块一个事务；提交后才推进断点，重复导入同一块是幂等的 upsert"""
+    fmt = fmt or detect_format(path)
+    checkpoint = checkpoint or path + ".ckpt"
+    source = _source_id(path, table)
+    done = 0 if restart else load_checkpoint(checkpoint, source)
+    if done:
+        print(f"从断点继续：已导入 {done} 行")
+    upsert = UPSERTS[table]
+    conn = None if dry_run else mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor() if conn else None
+    applied = 0
+    t0 = time.perf_counter()
+    try:
+        for header, rows in READERS[fmt](path, table, skip=done, chunk=chunk):
+            if cursor is not None:
+                try:
+                    applied += upsert(cursor, header, rows)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            done += len(rows)
+            if not dry_run:
+                save_checkpoint(checkpoint, source, done)
+        if table == "vocab" and cursor is not None:
+            cursor.close()
+            cursor = None
+            # 导入绕过了写路径的增量维护，结束后按全表重建进度聚合表
+            import bizvocab_stats
+            bizvocab_stats.check_aggregates(force=True)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+    if not dry_run and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    elapsed = time.perf_counter() - t0
+    print(f"导入 {table}：读取到第 {done} 行，写入 {applied} 行，耗时 {elapsed:.1f}s"
+          f"{'（dry-run，未写入）' if dry_run else ''}")
+    return applied
+
+# ---------- 压测 ----------
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _synthetic_chunks(rows, chunk):
+    """模拟服务端游标的 fetchmany：按块生成词库行"""
+    from bizvocab_lookup import synthetic_rows
+    base = synthetic_rows(min(rows, 50000))
+    day = datetime.date(2025, 10, 1)
+    for start in range(0, rows, chunk):
+        out = []
+        for i in range(start, min(start + chunk, rows)):
+            _, term, pos, meaning = base[i % len(base)]
+            learned = i % 3 == 0
+            out.append((f"{term}{i}", pos, meaning, f"The {term} example sentence number {i}.", None,
+                        "partial", int(learned), int(learned), day if learned else None,
+                        i % 7, None, 1 + i % 3, (i % 1000) / 1000))
+        yield out
+
+def bench(rows=1000000, chunk=CHUNK_ROWS):
+    columns = TABLES["vocab"]["columns"]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{rows:,} 行词库，每块 {chunk} 行；起始峰值 RSS {_peak_rss_mb():.0f}MB")
+        for name in ("vocab.csv.gz", "vocab.parquet"):
+            path = os.path.join(tmp, name)
+            t0 = time.perf_counter()
+            write_chunks(_synthetic_chunks(rows, chunk), path, columns)
+            t1 = time.perf_counter()
+            n = 0
+            for header, part in READERS[detect_format(path)](path, "vocab", chunk=chunk):
+                n += len(part)
+            t2 = time.perf_counter()
+            print(f"{name:<15} 大小 {os.path.getsize(path) / 1e6:6.1f}MB  写出 {rows / (t1 - t0):>9,.0f} 行/s  "
+                  f"读入 {n / (t2 - t1):>9,.0f} 行/s  峰值 RSS {_peak_rss_mb():.0f}MB")
+        # 断点续传：从中间继续只读剩余行
+        path = os.path.join(tmp, "vocab.parquet")
+        rest = sum(len(p) for _, p in read_parquet(path, "vocab", skip=rows // 2 + 123, chunk=chunk))
+        print(f"从第 {rows // 2 + 123} 行续读剩余 {rest} 行")
+
+def main():
+    parser = argparse.ArgumentParser(description="词库/学习进度批量导出导入")
+    sub = parser.add_subparsers(dest="cmd")
+    p_export = sub.add_parser("export", help="导出为 CSV / Parquet")
+    p_export.add_argument("table", choices=sorted(TABLES))
+    p_export.add_argument("path")
+    p_export.add_argument("--chunk", type=int, default=CHUNK_ROWS)
+    p_import = sub.add_parser("import", help="从 CSV / Parquet / Anki 卡组导入")
+    p_import.add_argument("table", choices=sorted(TABLES))
+    p_import.add_argument("path")
+    p_import.add_argument("--format", choices=sorted(READERS), default=None, help="默认按扩展名判断")
+    p_import.add_argument("--chunk", type=int, default=CHUNK_ROWS)
+    p_import.add_argument("--checkpoint", default=None, help="断点文件，默认 <path>.ckpt")
+    p_import.add_argument("--restart", action="store_true", help="忽略断点从头导入")
+    p_import.add_argument("--dry-run", action="store_true", help="只解析不写库")
+    p_bench = sub.add_parser("bench", help="合成数据压测读写吞吐与内存")
+    p_bench.add_argument("--rows", type=int, default=1000000)
+    p_bench.add_argument("--chunk", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.rows, args.chunk)
+        return
+    if args.cmd is None:
+        parser.print_help()
+        return
+    if args.cmd == "import" and args.dry_run:
+        import_file(args.table, args.path, args.format, args.chunk, args.checkpoint, args.restart, dry_run=True)
+        return
+    bizvocab_schema.migrate()
+    if args.cmd == "export":
+        export(args.table, args.path, args.chunk)
+    else:
+        import_file(args.table, args.path, args.format, args.chunk, args.checkpoint, args.restart)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 复习参数调优：从 vocab_events 里的推送与答题记录拟合遗忘曲线，给复习选词生成参数文件
+#
+# 用法：
+#   python bizvocab_tuner.py fit [--since 2025-06-01] [--target 0.85] [--dry-run]
+#                                             # 读事件日志拟合，写入 REVIEW_PARAMS（默认 review_params.json）
+#   python bizvocab_tuner.py show             # 查看当前生效的参数
+#   python bizvocab_tuner.py bench [--answers 2000000] [--stability 3] [--ease 1.8]
+#                                             # 按已知参数生成模拟记录，看能否拟合回来、要多久
+#
+# 模型：复习前已复习 k 次、距上次见到该词 d 天时答对的概率 p = exp(-d / S_k)，S_k = stability * ease^k。
+#   1. 每次复习推送后的第一次作答是一条样本：k 是这次推送前的复习次数，d 是这次推送与上一次推送的间隔。
+#      用 --since 或旧分区已被 bizvocab_events archive 归档时，窗口里看不到早先的复习，
+#      k 按 business_vocab.review_count 倒推：当前复习次数减去窗口里这次推送及之后的复习事件数
+#   2. 样本按 (k, d) 聚成计数表（k 封顶 MAX_K，d 按天取整封顶 MAX_DAYS），之后的计算量与记录数无关
+#   3. stability × ease 在网格上一次算出全部对数似然，取最大值附近再细分一轮
+#   4. 间隔 I_k = S_k * ln(1/目标保持率)：上次见到该词不足 I_k 天的先不复习
+#   5. 抽样权重 1/(1+k)^指数 的指数按各 k 的实际答错率加权最小二乘拟合
+#   6. 每天复习数 = 各 k 待复习词数 / I_k 之和，即稳态下平均每天到期的词数
+#
+# 参数文件由 bizvocab_reviewer 的 fetch_review_words / pick_review_words 读取，文件改动后
+# 最多 RELOAD_INTERVAL 秒内生效；文件不存在或某项不合法时该项退回 bizvocab_reviewer 里的常量。
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import threading
+import numpy as np
+import mysql.connector
+from dotenv import load_dotenv
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+PARAMS_FILE = os.getenv("REVIEW_PARAMS", "review_params.json")
+RELOAD_INTERVAL = 60  # 秒，检查参数文件是否有改动的间隔
+
+KIND_LEARN, KIND_REVIEW, KIND_ANSWER = 1, 2, 3  # event_type 的 ENUM 下标（event_type+0）
+FETCH_CHUNK = 200000  # 每次从游标取多少行转成数组
+
+MAX_K = 15        # 复习次数封顶，更多次的归到最后一档
+MAX_DAYS = 120    # 间隔天数封顶
+MIN_RECORDS = 200  # 样本少于这个数不写参数文件
+
+TARGET_RETENTION = 0.85  # 到期时预计仍记得的比例
+STABILITY_GRID = np.geomspace(0.25, 120, 97)  # 天
+EASE_GRID = np.linspace(1.0, 4.0, 61)
+EXPONENT_GRID = np.linspace(0.0, 4.0, 401)
+REFINE_STEPS = 41  # 细分一轮时每个维度的点数
+
+MIN_INTERVAL, MAX_INTERVAL = 1.0, 180.0
+WORDS_PER_DAY_MIN, WORDS_PER_DAY_MAX = 5, 30
+
+# ---------- 载入记录 ----------
+def load_events(since=None):
+    """vocab_events 全表（或 since 之后）读成 (word_id, 秒级时间戳, 类型, correct) 四个数组，correct 为空记 -1"""
+    sql = ("SELECT word_id, CAST(UNIX_TIMESTAMP(event_at) AS SIGNED), event_type+0, IFNULL(correct, -1) "
+           "FROM vocab_events")
+    params = ()
+    if since is not None:
+        sql += " WHERE event_at >= %s"
+        params = (since,)
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    chunks = []
+    try:
+        # 不在库里排序，取回后在 NumPy 里排
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_CHUNK)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    finally:
+        cursor.close()
+        conn.close()
+    data = np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.int64)
+    return data[:, 0], data[:, 1], data[:, 2].astype(np.int8), data[:, 3].astype(np.int8)
+
+def load_word_reviews():
+    """每个单词当前的 review_count（冷热两层），返回按 id 排序的 (ids, counts)"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    chunks = []
+    try:
+        cursor.execute("SELECT id, IFNULL(review_count, 0) FROM business_vocab_all")
+        while True:
+            rows = cursor.fetchmany(FETCH_CHUNK)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    finally:
+        cursor.close()
+        conn.close()
+    data = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+    order = np.argsort(data[:, 0], kind="stable")
+    return data[order, 0], data[order, 1]
+
+def load_review_counts():
+    """待复习词按 review_count 的分布，下标为 k（封顶 MAX_K）"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT review_count, COUNT(*) FROM business_vocab "
+        "WHERE learned=1 AND needs_review=1 GROUP BY review_count"
+    )
+    counts = np.zeros(MAX_K + 1, dtype=np.int64)
+    for rc, n in cursor.fetchall():
+        counts[min(int(rc or 0), MAX_K)] += int(n)
+    cursor.close()
+    conn.close()
+    return counts
+
+# ---------- 样本 ----------
+def answer_samples(word, ts, kind, correct, word_reviews=None):
+    """每次复习推送后的第一次作答 -> (推送前已复习次数 k, 距上一次推送的天数 d, 是否答对)。
+    窗口里第一次推送没有“上一次推送”，直接丢掉。
+
+    word_reviews 为 load_word_reviews() 的 (ids, counts) 时，窗口之前的复习次数按当前 review_count
+    减去窗口内的复习事件数补上；不给时假定每个词的全部复习都在窗口里（模拟数据）"""
+    order = np.lexsort((kind, ts, word))  # 同一秒内推送排在作答前面
+    word, ts, kind, correct = word[order], ts[order], kind[order], correct[order]
+    n = len(word)
+    exposure = kind != KIND_ANSWER
+    pos = np.arange(n)
+    last = np.maximum.accumulate(np.where(exposure, pos, -1))  # 每个事件及之前最近一次推送
+    shown = np.flatnonzero(exposure)
+    prev = np.full(n, -1, dtype=np.int64)
+    prev[shown[1:]] = shown[:-1]                                # 每次推送的上一次推送
+    review = kind == KIND_REVIEW
+    seen = np.cumsum(review)
+    start = np.r_[True, word[1:] != word[:-1]] if n else np.zeros(0, dtype=bool)
+    base = np.maximum.accumulate(np.where(start, seen - review, 0))  # 该词之前所有词的复习数
+
+    ans = np.flatnonzero(~exposure & (correct >= 0))
+    e1 = last[ans]
+    keep = e1 >= 0
+    ans, e1 = ans[keep], e1[keep]
+    keep = (word[e1] == word[ans]) & (kind[e1] == KIND_REVIEW)
+    ans, e1 = ans[keep], e1[keep]
+    # 同一张卡片上重复作答只算第一次；ans 递增，e1 也不减
+    first = np.r_[True, e1[1:] != e1[:-1]] if len(e1) else np.zeros(0, dtype=bool)
+    ans, e1 = ans[first], e1[first]
+    e0 = prev[e1]
+    keep = e0 >= 0
+    keep[keep] = word[e0[keep]] == word[e1[keep]]
+    ans, e1, e0 = ans[keep], e1[keep], e0[keep]
+
+    k = seen[e1] - base[e1] - 1  # 窗口里这次推送之前的复习数
+    if word_reviews is not None and len(k):
+        k += _reviews_before_window(word, seen, base, start, word[e1], word_reviews)
+    days = (ts[e1] - ts[e0]) / 86400.0
+    return k, days, correct[ans].astype(np.int64)
+
+def _reviews_before_window(word, seen, base, start, words, word_reviews):
+    """words 中每个词在窗口之前的复习次数：当前 review_count 减去窗口内该词的复习事件数，不小于 0"""
+    firsts = np.flatnonzero(start)
+    lasts = np.r_[firsts[1:] - 1, len(word) - 1]
+    in_window = seen[lasts] - base[lasts]                    # 每个词窗口内的复习数，按 firsts 顺序
+    at = np.searchsorted(word[firsts], words)                # 事件已按词排序
+    ids, counts = word_reviews
+    pos = np.clip(np.searchsorted(ids, words), 0, max(len(ids) - 1, 0))
+    found = (ids[pos] == words) if len(ids) else np.zeros(len(words), dtype=bool)
+    current = np.where(found, counts[pos] if len(ids) else 0, 0)
+    return np.maximum(current - in_window[at], 0)
+
+def aggregate(k, days, correct):
+    """样本按 (k, d) 聚成计数表，只返回有样本的格子：k, d, 样本数, 答对数"""
+    width = MAX_DAYS + 1
+    kk = np.minimum(k, MAX_K)
+    dd = np.clip(np.rint(days), 1, MAX_DAYS).astype(np.int64)
+    cell = kk * width + dd
+    size = (MAX_K + 1) * width
+    total = np.bincount(cell, minlength=size)
+    hits = np.bincount(cell, weights=correct, minlength=size)
+    used = np.flatnonzero(total)
+    return used // width, (used % width).astype(np.float64), total[used].astype(np.float64), hits[used]
+
+# ---------- 拟合 ----------
+def log_likelihood(stability, ease, k, d, n, c):
+    """网格上每个 (stability, ease) 的对数似然，形状 (len(stability), len(ease))"""
+    growth = ease[:, None] ** k[None, :]  # (E, 格子数)
+    out = np.empty((len(stability), len(ease)))
+    miss = n - c
+    for i, s in enumerate(stability):
+        x = np.maximum(d / (s * growth), 1e-12)  # -ln p
+        out[i] = -(c * x).sum(axis=1) + (miss * np.log(-np.expm1(-x))).sum(axis=1)
+    return out
+
+def _search(stability, ease, table):
+    ll = log_likelihood(stability, ease, *table)
+    i, j = np.unravel_index(np.argmax(ll), ll.shape)
+    return i, j, ll[i, j]
+
+def fit_forgetting(table):
+    """先在粗网格上找最大值，再在相邻格点之间细分一轮"""
+    i, j, _ = _search(STABILITY_GRID, EASE_GRID, table)
+    s_lo, s_hi = STABILITY_GRID[max(i - 1, 0)], STABILITY_GRID[min(i + 1, len(STABILITY_GRID) - 1)]
+    e_lo, e_hi = EASE_GRID[max(j - 1, 0)], EASE_GRID[min(j + 1, len(EASE_GRID) - 1)]
+    fine_s = np.geomspace(s_lo, s_hi, REFINE_STEPS)
+    fine_e = np.linspace(e_lo, e_hi, REFINE_STEPS)
+    i, j, ll = _search(fine_s, fine_e, table)
+    return float(fine_s[i]), float(fine_e[j]), float(ll)
+
+def fit_exponent(table):
+    """权重 w_k = a/(1+k)^指数 去拟合各 k 的答错率，按样本数加权；有样本的 k 不足两档时返回 None"""
+    k, _, n, c = table
+    total = np.bincount(k, weights=n, minlength=MAX_K + 1)
+    hits = np.bincount(k, weights=c, minlength=MAX_K + 1)
+    used = np.flatnonzero(total)
+    if len(used) < 2:
+        return None
+    err = 1 - hits[used] / total[used]
+    w = total[used]
+    f = (1.0 + used)[None, :] ** -EXPONENT_GRID[:, None]  # (网格, k)
+    scale = (w * f * err).sum(axis=1) / (w * f * f).sum(axis=1)
+    sse = (w * (scale[:, None] * f - err) ** 2).sum(axis=1)
+    return float(EXPONENT_GRID[np.argmin(sse)])
+
+def intervals(stability, ease, target=TARGET_RETENTION):
+    """k = 0..MAX_K 各档的最短复习间隔（天）"""
+    days = stability * ease ** np.arange(MAX_K + 1) * np.log(1 / target)
+    return np.round(np.clip(days, MIN_INTERVAL, MAX_INTERVAL), 1)
+
+def words_per_day(review_counts, gaps):
+    due = float((review_counts / gaps).sum())
+    return int(np.clip(round(due), WORDS_PER_DAY_MIN, WORDS_PER_DAY_MAX))
+
+def fit(word, ts, kind, correct, target=TARGET_RETENTION, review_counts=None, word_reviews=None):
+    """从事件数组拟合出参数；样本不足时返回 None"""
+    k, days, ok = answer_samples(word, ts, kind, correct, word_reviews)
+    if len(k) < MIN_RECORDS:
+        return None
+    table = aggregate(k, days, ok)
+    stability, ease, ll = fit_forgetting(table)
+    gaps = intervals(stability, ease, target)
+    rate = ok.mean()
+    baseline = -(rate * np.log(rate) + (1 - rate) * np.log(1 - rate)) if 0 < rate < 1 else 0.0
+    params = {
+        "fitted_at": datetime.datetime.now(SH_TZ).isoformat(timespec="seconds"),
+        "records": int(len(k)),
+        "stability_days": round(stability, 3),
+        "ease": round(ease, 3),
+        "target_retention": target,
+        "intervals": gaps.tolist(),
+        "log_loss": round(-ll / len(k), 4),
+        "baseline_log_loss": round(float(baseline), 4),
+    }
+    exponent = fit_exponent(table)
+    if exponent is not None:
+        params["weight_exponent"] = exponent
+    if review_counts is not None:
+        params["words_per_day"] = words_per_day(review_counts, gaps)
+    return params
+
+def save(params, path=PARAMS_FILE):
+    """先写临时文件再改名，读取方不会读到半个文件"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+# ---------- 读取参数 ----------
+def validate(raw):
+    """只保留取值合法的项，其余交给调用方退回默认值"""
+    params = {}
+    exponent = raw.get("weight_exponent")
+    if isinstance(exponent, (int, float)) and 0 <= exponent <= 10:
+        params["weight_exponent"] = float(exponent)
+    limit = raw.get("words_per_day")
+    if isinstance(limit, int) and limit > 0:
+        params["words_per_day"] = limit
+    gaps = raw.get("intervals")
+    if isinstance(gaps, list) and gaps and all(isinstance(g, (int, float)) and g >= 0 for g in gaps):
+        params["intervals"] = [float(g) for g in gaps]
+    return params
+
+def load(path=PARAMS_FILE):
+    """文件不存在返回空字典；读坏了打印后也返回空字典"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"读取复习参数 {path} 失败：{e}", file=sys.stderr)
+        return {}
+    return validate(raw) if isinstance(raw, dict) else {}
+
+_params = None
+_signature = None
+_checked = 0.0
+_params_lock = threading.Lock()
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+def params():
+    """进程内共享的参数；每 RELOAD_INTERVAL 秒检查一次文件大小和修改时间，有变化就重新加载"""
+    global _params, _signature, _checked
+    now = time.monotonic()
+    if _params is not None and now - _checked < RELOAD_INTERVAL:
+        return _params
+    with _params_lock:
+        sig = _file_signature(PARAMS_FILE)
+        if _params is None or sig != _signature:
+            _params, _signature = load(), sig
+        _checked = now
+    return _params
+
+def interval_for(gaps, review_count):
+    return gaps[min(review_count, len(gaps) - 1)]
+
+# ---------- 模拟数据 ----------
+def synthetic_events(answers, stability, ease, max_gap=30, seed=0):
+    """每个词：学习一次，之后 1~20 次复习，间隔 1~max_gap 天随机，推送后 5 分钟作答，答对按模型概率抽"""
+    rng = np.random.default_rng(seed)
+    per_word = rng.integers(1, 21, size=answers // 10 + 1)
+    per_word = per_word[np.cumsum(per_word) <= answers]
+    words = len(per_word)
+    n = int(per_word.sum())
+    word = np.repeat(np.arange(words, dtype=np.int64), per_word)
+    group_start = np.cumsum(per_word) - per_word
+    k = np.arange(n) - np.repeat(group_start, per_word)
+    gap = rng.integers(1, max_gap + 1, size=n)
+    learned = rng.integers(1_600_000_000, 1_700_000_000, size=words)
+    elapsed = np.cumsum(gap) - np.repeat(np.cumsum(gap)[group_start] - gap[group_start], per_word)
+    shown = np.repeat(learned, per_word) + elapsed * 86400
+    p = np.exp(-gap / (stability * ease ** k))
+    ok = (rng.random(n) < p).astype(np.int8)
+
+    word_all = np.concatenate([np.arange(words, dtype=np.int64), word, word])
+    ts_all = np.concatenate([learned, shown, shown + 300])
+    kind_all = np.concatenate([np.full(words, KIND_LEARN), np.full(n, KIND_REVIEW),
+                               np.full(n, KIND_ANSWER)]).astype(np.int8)
+    correct_all = np.concatenate([np.full(words + n, -1, dtype=np.int8), ok])
+    # 打乱顺序，和从库里不排序取回时一样
+    shuffle = rng.permutation(len(word_all))
+    return word_all[shuffle], ts_all[shuffle], kind_all[shuffle], correct_all[shuffle]
+
+# ---------- 命令 ----------
+def print_params(p):
+    for key in ("fitted_at", "records", "stability_days", "ease", "target_retention",
+                "weight_exponent", "words_per_day", "log_loss", "baseline_log_loss"):
+        if key in p:
+            print(f"  {key}: {p[key]}")
+    if "intervals" in p:
+        print("  intervals: " + " ".join(f"{g:g}" for g in p["intervals"]))
+
+def cmd_fit(args):
+    since = datetime.date.fromisoformat(args.since) if args.since else None
+    t0 = time.perf_counter()
+    events = load_events(since)
+    t1 = time.perf_counter()
+    p = fit(*events, target=args.target, review_counts=load_review_counts(), word_reviews=load_word_reviews())
+    t2 = time.perf_counter()
+    print(f"读取 {len(events[0])} 条事件 {t1 - t0:.2f}s，拟合 {t2 - t1:.2f}s")
+    if p is None:
+        print(f"有效作答少于 {MIN_RECORDS} 条，不更新参数")
+        return
+    print_params(p)
+    if args.dry_run:
+        print("（--dry-run，未写入）")
+    else:
+        save(p)
+        print(f"已写入 {PARAMS_FILE}")
+
+def cmd_show(args):
+    p = load()
+    if not p:
+        print(f"{PARAMS_FILE} 不存在或无有效参数，使用 bizvocab_reviewer 里的默认值")
+        return
+    print(f"{PARAMS_FILE}:")
+    print_params(p)
+
+def cmd_bench(args):
+    events = synthetic_events(args.answers, args.stability, args.ease)
+    print(f"模拟事件 {len(events[0])} 条（真实参数 stability={args.stability} ease={args.ease}）")
+    t0 = time.perf_counter()
+    k, days, ok = answer_samples(*events)
+    t1 = time.perf_counter()
+    table = aggregate(k, days, ok)
+    t2 = time.perf_counter()
+    stability, ease, _ = fit_forgetting(table)
+    t3 = time.perf_counter()
+    exponent = fit_exponent(table)
+    t4 = time.perf_counter()
+    print(f"样本 {len(k)} 条，聚合后 {len(table[0])} 格")
+    print(f"  提取样本 {t1 - t0:.2f}s  聚合 {t2 - t1:.2f}s  网格搜索 {t3 - t2:.2f}s  指数 {t4 - t3:.3f}s")
+    print(f"  合计 {t4 - t0:.2f}s")
+    print(f"拟合结果 stability={stability:.3f} ease={ease:.3f} weight_exponent={exponent}")
+    print("intervals: " + " ".join(f"{g:g}" for g in intervals(stability, ease)))
+
+def main():
+    parser = argparse.ArgumentParser(description="复习参数调优")
+    sub = parser.add_subparsers(dest="cmd")
+    p_fit = sub.add_parser("fit", help="读事件日志拟合并写参数文件")
+    p_fit.add_argument("--since", default=None, help="YYYY-MM-DD，只用这天之后的事件")
+    p_fit.add_argument("--target", type=float, default=TARGET_RETENTION, help="到期时的目标保持率")
+    p_fit.add_argument("--dry-run", action="store_true")
+    sub.add_parser("show", help="查看当前参数")
+    p_bench = sub.add_parser("bench", help="模拟数据上的拟合耗时")
+    p_bench.add_argument("--answers", type=int, default=2000000)
+    p_bench.add_argument("--stability", type=float, default=3.0)
+    p_bench.add_argument("--ease", type=float, default=1.8)
+    args = parser.parse_args()
+
+    if args.cmd == "fit":
+        cmd_fit(args)
+    elif args.cmd == "bench":
+        cmd_bench(args)
+    else:
+        cmd_show(args)
+
+if __name__ == "__main__":
+    main()
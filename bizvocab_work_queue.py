@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# 基于认领的工作队列：多个 worker / 租户并发挑词、补例句、清洗时互不重复
+#
+# 认领流程：claim_next / claim_words 原子地为一批单词写入带 token 和过期时间的认领记录，
+# 处理成功后 commit（可在同一事务里执行业务更新并删除认领），失败则 release；
+# worker 宕机时认领到期自动失效，别的 worker 可重新认领。
+#
+# 用法：
+#   python bizvocab_work_queue.py status
+#   python bizvocab_work_queue.py bench --queue enrich --workers 1,2,4,8 --duration 10
+
+import os
+import time
+import uuid
+import argparse
+import datetime
+import multiprocessing
+import mysql.connector
+from dotenv import load_dotenv
+
+import bizvocab_schema
+
+SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
+
+# ---------- 配置 ----------
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "englishbot"),
+    "charset": "utf8mb4"
+}
+
+CLAIM_TTL = int(os.getenv("CLAIM_TTL", 300))  # 认领有效期（秒）
+
+# 各队列的待处理条件（v 为 business_vocab 别名）
+QUEUES = {
+    "learn": ("v.learned = 0", ()),
+    "review": ("v.learned = 1 AND v.needs_review = 1", ()),
+    "enrich": ("v.example_status = %s", (bizvocab_schema.EXAMPLE_MISSING,)),
+    # 与 sql_wrong_washer 的拆分正则对应的粗筛：释义里还夹着“单词 词性.”
+    "wash": ("v.translation REGEXP %s", ("[a-zA-Z- ]+ *(adj|v|n|a[.]|adv)[.]",)),
+}
+
+WORD_COLUMNS = (
+    "v.id, v.term, v.part_of_speech, v.translation, v.example_sentence, v.example_chinese, "
+    "v.review_count, v.last_review_date"
+)
+
+# 已过期的认领可被新 token 覆盖；赋值按书写顺序执行，expires_at 据已更新的 claim_token 判断
+CLAIM_SQL = """
+    INSERT INTO vocab_claims (queue, word_id, claim_token, expires_at)
+    VALUES (%s, %s, %s, NOW(3) + INTERVAL %s SECOND)
+    ON DUPLICATE KEY UPDATE
+        claim_token = IF(expires_at < NOW(3), VALUES(claim_token), claim_token),
+        expires_at = IF(claim_token = VALUES(claim_token), VALUES(expires_at), expires_at)
+"""
+
+class ClaimBatch:
+    def __init__(self, queue, token, words):
+        self.queue = queue
+        self.token = token
+        self.words = words
+
+    @property
+    def word_ids(self):
+        return [w["id"] for w in self.words]
+
+def _id_list(ids):
+    return ",".join(["%s"] * len(ids))
+
+def _insert_claims(cursor, queue, token, word_ids, ttl):
+    cursor.executemany(CLAIM_SQL, [(queue, wid, token, ttl) for wid in word_ids])
+    cursor.execute("SELECT word_id FROM vocab_claims WHERE claim_token = %s", (token,))
+    return {r[0] if isinstance(r, tuple) else r["word_id"] for r in cursor.fetchall()}
+
+# ---------- 认领 ----------
+def claim_next(queue, limit, ttl=CLAIM_TTL, start_id=None):
+    """按 id 顺序认领下一批待处理单词（FOR UPDATE SKIP LOCKED，并发 worker 互不等待）。
+
+    start_id 用于从随机位置开始扫描，不足 limit 时再从头补齐。
+    """
+    where, params = QUEUES[queue]
+    token = uuid.uuid4().hex
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction(isolation_level="READ COMMITTED")
+        select_sql = (
+            f"SELECT {WORD_COLUMNS} FROM business_vocab v "
+            f"WHERE {where} AND v.id {{op}} %s "
+            "AND NOT EXISTS (SELECT 1 FROM vocab_claims c "
+            "  WHERE c.queue = %s AND c.word_id = v.id AND c.expires_at > NOW(3)) "
+            "ORDER BY v.id LIMIT %s FOR UPDATE OF v SKIP LOCKED"
+        )
+        start = start_id or 0
+        cursor.execute(select_sql.format(op=">="), params + (start, queue, limit))
+        words = cursor.fetchall()
+        if start and len(words) < limit:
+            cursor.execute(select_sql.format(op="<"), params + (start, queue, limit - len(words)))
+            words += cursor.fetchall()
+        if words:
+            got = _insert_claims(cursor, queue, token, [w["id"] for w in words], ttl)
+            words = [w for w in words if w["id"] in got]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return ClaimBatch(queue, token, words)
+
+def claim_words(queue, candidates, limit=None, ttl=CLAIM_TTL):
+    """认领调用方已挑好的候选单词（如随机/加权选出的），被别人认领中的会被跳过。
+
+    候选是在事务外挑的，认领前在同一事务里锁住这些行并重新检查队列条件：
+    挑选之后被别的 worker 处理完（如已标记为已学）的单词不会被再次认领。
+    """
+    where, params = QUEUES[queue]
+    token = uuid.uuid4().hex
+    if not candidates:
+        return ClaimBatch(queue, token, [])
+    ids = [w["id"] for w in candidates]
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction(isolation_level="READ COMMITTED")
+        cursor.execute(
+            f"SELECT v.id FROM business_vocab v WHERE v.id IN ({_id_list(ids)}) AND {where} FOR UPDATE",
+            ids + list(params)
+        )
+        pending = [r[0] for r in cursor.fetchall()]
+        got = _insert_claims(cursor, queue, token, pending, ttl) if pending else set()
+        words = [w for w in candidates if w["id"] in got]
+        extra = [w["id"] for w in words[limit:]] if limit is not None else []
+        if extra:
+            cursor.execute(
+                "DELETE FROM vocab_claims WHERE claim_token = %s AND word_id IN (%s)" % ("%s", _id_list(extra)),
+                [token] + extra
+            )
+            words = words[:limit]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return ClaimBatch(queue, token, words)
+
+def commit(batch, apply=None, word_ids=None):
+    """在同一事务里对仍由本 token 持有的单词执行 apply(cursor, word_ids) 并删除其认领，返回实际提交的 id。
+
+    word_ids 缺省为整批；未列出的单词保留认领直到过期，相当于延后重试。
+    """
+    targets = batch.word_ids if word_ids is None else list(word_ids)
+    if not targets:
+        return []
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        cursor.execute(
+            "SELECT word_id FROM vocab_claims WHERE claim_token = %s FOR UPDATE", (batch.token,)
+        )
+        held = {r[0] for r in cursor.fetchall()}
+        word_ids = [wid for wid in targets if wid in held]
+        if word_ids:
+            if apply is not None:
+                apply(cursor, word_ids)
+            cursor.execute(
+                "DELETE FROM vocab_claims WHERE claim_token = %s AND word_id IN (%s)" % ("%s", _id_list(word_ids)),
+                [batch.token] + word_ids
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    lost = len(targets) - len(word_ids)
+    if lost:
+        print(f"[{batch.queue}] {lost} 个单词的认领已过期并被他人接手，未提交")
+    return word_ids
+
+def release(batch):
+    if not batch.words:
+        return
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM vocab_claims WHERE claim_token = %s", (batch.token,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def extend(batch, ttl=CLAIM_TTL):
+    """长任务续期"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE vocab_claims SET expires_at = NOW(3) + INTERVAL %s SECOND "
+        "WHERE claim_token = %s AND expires_at > NOW(3)",
+        (ttl, batch.token)
+    )
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def reap_expired(limit=1000):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM vocab_claims WHERE expires_at < NOW(3) LIMIT %s", (limit,))
+    removed = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return removed
+
+def show_status():
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT queue, SUM(expires_at > NOW(3)), SUM(expires_at <= NOW(3)) FROM vocab_claims GROUP BY queue"
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    if not rows:
+        print("当前没有认领记录。")
+    for queue, active, expired in rows:
+        print(f"{queue}: 认领中 {int(active)}，已过期 {int(expired)}")
+
+# ---------- 压测：worker 数量与吞吐 ----------
+def _bench_worker(queue, batch_size, work_ms, duration, results):
+    processed = claims = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        batch = claim_next(queue, batch_size)
+        claims += 1
+        if not batch.words:
+            time.sleep(0.05)
+            continue
+        # 模拟每个单词的处理耗时（如调用例句 API）
+        time.sleep(work_ms / 1000 * len(batch.words))
+        processed += len(batch.words)
+        # 压测不改数据：处理完释放认领，单词可被再次认领
+        release(batch)
+    results.put((processed, claims))
+
+def bench(queue, worker_counts, batch_size, work_ms, duration):
+    bizvocab_schema.migrate()
+    reap_expired(limit=100000)
+    ctx = multiprocessing.get_context("spawn")
+    baseline = None
+    for n in worker_counts:
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_bench_worker, args=(queue, batch_size, work_ms, duration, results))
+                 for _ in range(n)]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        processed = sum(t[0] for t in totals)
+        rate = processed / duration
+        baseline = baseline or rate / n
+        print(f"worker={n:>3}  处理 {processed:>7} 个  {rate:8.1f} 个/秒  "
+              f"线性扩展效率 {rate / (baseline * n) * 100:5.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="单词认领队列")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("status", help="查看认领情况（默认）")
+    sub.add_parser("reap", help="清理过期认领")
+    p_bench = sub.add_parser("bench", help="多进程认领吞吐压测（只认领/释放，不改数据）")
+    p_bench.add_argument("--queue", choices=sorted(QUEUES), default="enrich")
+    p_bench.add_argument("--workers", default="1,2,4,8")
+    p_bench.add_argument("--batch", type=int, default=20)
+    p_bench.add_argument("--work-ms", type=float, default=20)
+    p_bench.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        counts = [int(x) for x in args.workers.split(",")]
+        bench(args.queue, counts, args.batch, args.work_ms, args.duration)
+    elif args.cmd == "reap":
+        print(f"已清理 {reap_expired()} 条过期认领")
+    else:
+        show_status()
+
+if __name__ == "__main__":
+    main()
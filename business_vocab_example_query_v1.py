@@ -1,9 +1,11 @@
 import requests
-import time
 import mysql.connector
 from dotenv import load_dotenv
 import os
 
+import bizvocab_http
+import bizvocab_schema
+
 # -------------------------- 1. 加载配置（数据库+API）--------------------------
 load_dotenv()  # 读取.env文件中的数据库配置
 DB_CONFIG = {
@@ -13,22 +15,22 @@ DB_CONFIG = {
     'database': 'english_study',
     'port': int(os.getenv('DB_PORT', 3306))  # 支持自定义端口（默认3306）
 }
-API_DELAY = 1  # API请求间隔（1秒，防反爬）
-EMPTY_SENTENCE_MARKER = '暂无例句'  # 未填充例句的标记（与数据库一致）
+API_DELAY = float(os.getenv('TATOEBA_API_DELAY', 1))  # API请求间隔（1秒，防反爬）
+TATOEBA_API = os.getenv('TATOEBA_API', 'https://tatoeba.org/en/api_v0/search')
+EXAMPLE_MISSING = bizvocab_schema.EXAMPLE_MISSING  # 未填充例句的状态（example_status 列）
+# 请求间隔由共用 HTTP 连接池按主机控制
+bizvocab_http.configure_host(bizvocab_http.host_of(TATOEBA_API), interval=API_DELAY)
 
 
 # -------------------------- 2. Tatoeba API查询（带延迟）--------------------------
 def query_tatoeba_example(word, from_lang="eng", to_lang="cmn"):
-    """调用Tatoeba API获取中英文例句，带1秒延迟"""
-    # 1. 防反爬：请求前延迟1秒
-    time.sleep(API_DELAY)
-    
+    """调用Tatoeba API获取中英文例句，同一主机的请求间隔 API_DELAY 秒"""
     # 2. 构造请求（处理关键词中的空格，避免URL错误）
     encoded_word = requests.utils.quote(word)  # 对单词编码（如"set up"→"set%20up"）
-    url = f"https://tatoeba.org/en/api_v0/search?from={from_lang}&query={encoded_word}&to={to_lang}"
+    url = f"{TATOEBA_API}?from={from_lang}&query={encoded_word}&to={to_lang}"
     
     try:
-        resp = requests.get(url, timeout=10)  # 超时控制（10秒）
+        resp = bizvocab_http.get(url, timeout=10)  # 超时控制（10秒），429/5xx 自动退避重试
         if resp.status_code != 200:
             print(f"⚠️  单词[{word}] API请求失败（状态码：{resp.status_code}）")
             return None
@@ -66,7 +68,7 @@ def query_tatoeba_example(word, from_lang="eng", to_lang="cmn"):
 
 # -------------------------- 3. 数据库联动（查询待补充数据+更新）--------------------------
 def update_vocab_with_examples():
-    """从数据库读取“暂无例句”的词汇，调用API补充后更新回数据库"""
+    """从数据库读取未填充例句的词汇，调用API补充后更新回数据库"""
     conn = None
     cursor = None
     try:
@@ -75,14 +77,14 @@ def update_vocab_with_examples():
         cursor = conn.cursor(dictionary=True)  # 用字典格式返回查询结果（便于取值）
         print("📦 成功连接数据库")
         
-        # 2. 查询待补充例句的数据（只查example_sentence为“暂无例句”的记录）
+        # 2. 查询待补充例句的数据（只查example_status为missing的记录，走索引）
         query_sql = """
         SELECT id, term 
         FROM business_vocab 
-        WHERE example_sentence = %s 
+        WHERE example_status = %s 
         ORDER BY id ASC  # 按ID顺序处理，避免重复
         """
-        cursor.execute(query_sql, (EMPTY_SENTENCE_MARKER,))
+        cursor.execute(query_sql, (EXAMPLE_MISSING,))
         pending_words = cursor.fetchall()  # 待处理的词汇列表
         
         if not pending_words:
@@ -94,8 +96,8 @@ def update_vocab_with_examples():
         # 3. 逐个处理词汇（查询API+更新数据库）
         update_sql = """
         UPDATE business_vocab 
-        SET example_sentence = %s, example_chinese = %s 
-        WHERE id = %s AND example_sentence = %s  # 加条件：确保只更新“未填充”的记录（防覆盖）
+        SET example_sentence = %s, example_chinese = %s, example_status = %s 
+        WHERE id = %s AND example_status = %s  # 加条件：确保只更新“未填充”的记录（防覆盖）
         """
         
         success_count = 0  # 成功更新计数
@@ -115,8 +117,9 @@ def update_vocab_with_examples():
                     (
                         example_data["example_sentence"],
                         example_data["example_chinese"],
+                        bizvocab_schema.EXAMPLE_COMPLETE,  # 本脚本只写入中英文齐全的例句
                         vocab_id,
-                        EMPTY_SENTENCE_MARKER  # 关键：只更新“暂无例句”的记录，避免覆盖已有的
+                        EXAMPLE_MISSING  # 关键：只更新未填充的记录，避免覆盖已有的
                     )
                 )
                 conn.commit()  # 实时提交（避免批量失败丢失数据）
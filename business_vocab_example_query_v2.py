@@ -1,8 +1,14 @@
 import requests
-import time
 import mysql.connector
 from dotenv import load_dotenv
 import os
+import sys
+import multiprocessing
+
+import bizvocab_example_sources
+import bizvocab_http
+import bizvocab_schema
+import bizvocab_work_queue
 
 # -------------------------- 1. 配置常量 --------------------------
 load_dotenv()
@@ -13,20 +19,24 @@ DB_CONFIG = {
     'database': 'english_study',
     'port': int(os.getenv('DB_PORT', 3306))
 }
-API_DELAY = 1  # 1秒延迟防反爬
-EMPTY_SENTENCE_MARKER = '暂无例句'  # 未填充标记（英文/中文通用）
-EMPTY_CHINESE_MARKER = '暂无中文翻译'  # 中文缺失时的专用标记（可选，也可仍用EMPTY_SENTENCE_MARKER）
+API_DELAY = float(os.getenv('TATOEBA_API_DELAY', 1))  # 1秒延迟防反爬
+TATOEBA_API = os.getenv('TATOEBA_API', 'https://tatoeba.org/en/api_v0/search')  # 压测时指向本地桩服务
+# 请求间隔由共用 HTTP 连接池按主机控制，与 bizvocab_example_sources 的 Tatoeba 查询共用同一节奏
+bizvocab_http.configure_host(bizvocab_http.host_of(TATOEBA_API), interval=API_DELAY)
+# 例句是否已填充由 example_status 列记录（见 bizvocab_schema），不再往例句列里写哨兵字符串
+EXAMPLE_MISSING = bizvocab_schema.EXAMPLE_MISSING    # 未填充
+EXAMPLE_PARTIAL = bizvocab_schema.EXAMPLE_PARTIAL    # 只有英文，中文缺失（example_chinese 为 NULL）
+EXAMPLE_COMPLETE = bizvocab_schema.EXAMPLE_COMPLETE  # 中英文齐全
 
 
 # -------------------------- 2. Tatoeba API查询（核心优化）--------------------------
 def query_tatoeba_example(word, from_lang="eng", to_lang="cmn"):
-    """优化：有英文就保留，中文缺失则填充默认值"""
-    time.sleep(API_DELAY)
+    """优化：有英文就保留，中文缺失时 example_chinese 为 None"""
     encoded_word = requests.utils.quote(word)
-    url = f"https://tatoeba.org/en/api_v0/search?from={from_lang}&query={encoded_word}&to={to_lang}"
+    url = f"{TATOEBA_API}?from={from_lang}&query={encoded_word}&to={to_lang}"
     
     try:
-        resp = requests.get(url, timeout=10)
+        resp = bizvocab_http.get(url, timeout=10)
         if resp.status_code != 200:
             print(f"⚠️  单词[{word}] API请求失败（状态码：{resp.status_code}）")
             return None
@@ -44,23 +54,24 @@ def query_tatoeba_example(word, from_lang="eng", to_lang="cmn"):
             print(f"❌ 单词[{word}] 英文例句为空，跳过")
             return None
         
-        # 提取中文翻译（缺失则用默认值）
+        # 提取中文翻译（缺失则为 None）
         translations = first_result.get("translations", [])
-        chn_sentence = EMPTY_CHINESE_MARKER  # 默认值：中文缺失
+        chn_sentence = None
         if translations and isinstance(translations[0], list) and translations[0]:
             chn_text = translations[0][0].get("text", "").strip()
-            if chn_text:  # 只有中文非空时才替换默认值
+            if chn_text:
                 chn_sentence = chn_text
         
         # 日志区分“中文缺失”和“完整例句”
-        if chn_sentence == EMPTY_CHINESE_MARKER:
+        if chn_sentence is None:
             print(f"ℹ️  单词[{word}] 获取到英文例句，中文缺失（英文：{eng_sentence[:30]}...）")
         else:
             print(f"✅ 单词[{word}] 成功获取完整例句（英文：{eng_sentence[:30]}...）")
         
         return {
             "example_sentence": eng_sentence,
-            "example_chinese": chn_sentence
+            "example_chinese": chn_sentence,
+            "example_status": EXAMPLE_COMPLETE if chn_sentence else EXAMPLE_PARTIAL
         }
     
     except Exception as e:
@@ -81,10 +92,10 @@ def update_vocab_with_examples():
         query_sql = """
         SELECT id, term 
         FROM business_vocab 
-        WHERE example_sentence = %s 
+        WHERE example_status = %s 
         ORDER BY id ASC
         """
-        cursor.execute(query_sql, (EMPTY_SENTENCE_MARKER,))
+        cursor.execute(query_sql, (EXAMPLE_MISSING,))
         pending_words = cursor.fetchall()
         
         if not pending_words:
@@ -96,8 +107,8 @@ def update_vocab_with_examples():
         # 更新SQL：仍保留防覆盖条件
         update_sql = """
         UPDATE business_vocab 
-        SET example_sentence = %s, example_chinese = %s 
-        WHERE id = %s AND example_sentence = %s
+        SET example_sentence = %s, example_chinese = %s, example_status = %s 
+        WHERE id = %s AND example_status = %s
         """
         
         success_count = 0
@@ -105,7 +116,7 @@ def update_vocab_with_examples():
             vocab_id = vocab["id"]
             vocab_term = vocab["term"]
             
-            example_data = query_tatoeba_example(vocab_term)
+            example_data = bizvocab_example_sources.find_example(vocab_term)
             if not example_data:
                 continue
             
@@ -116,8 +127,9 @@ def update_vocab_with_examples():
                     (
                         example_data["example_sentence"],
                         example_data["example_chinese"],
+                        example_data["example_status"],
                         vocab_id,
-                        EMPTY_SENTENCE_MARKER
+                        EXAMPLE_MISSING
                     )
                 )
                 conn.commit()
@@ -128,8 +140,8 @@ def update_vocab_with_examples():
                 print(f"⚠️  词汇[{vocab_term}]（ID：{vocab_id}）数据库更新失败：{str(e)}\n")
         
         print(f"\n📊 处理完成！共成功更新 {success_count}/{len(pending_words)} 个词汇")
-        print(f"   - 完整例句（含中文）：{sum(1 for v in pending_words if query_tatoeba_example(v['term']) and query_tatoeba_example(v['term'])['example_chinese'] != EMPTY_CHINESE_MARKER)} 个")
-        print(f"   - 仅英文例句（中文缺失）：{success_count - sum(1 for v in pending_words if query_tatoeba_example(v['term']) and query_tatoeba_example(v['term'])['example_chinese'] != EMPTY_CHINESE_MARKER)} 个")
+        print(f"   - 完整例句（含中文）：{sum(1 for v in pending_words if query_tatoeba_example(v['term']) and query_tatoeba_example(v['term'])['example_chinese'] is not None)} 个")
+        print(f"   - 仅英文例句（中文缺失）：{success_count - sum(1 for v in pending_words if query_tatoeba_example(v['term']) and query_tatoeba_example(v['term'])['example_chinese'] is not None)} 个")
     
     except mysql.connector.Error as db_err:
         print(f"❌ 数据库操作异常：{db_err}")
@@ -143,10 +155,59 @@ def update_vocab_with_examples():
             print("\n📦 已关闭数据库连接")
 
 
-# -------------------------- 4. 主程序入口 --------------------------
+# -------------------------- 4. 并行补充（认领队列，可多进程/多机同时跑）--------------------------
+def apply_examples(results):
+    """返回 commit 用的回调：只更新本批认领且仍未填充例句的记录"""
+    def apply(cursor, word_ids):
+        rows = [
+            (results[wid]["example_sentence"], results[wid]["example_chinese"],
+             results[wid]["example_status"], wid, EXAMPLE_MISSING)
+            for wid in word_ids if wid in results
+        ]
+        if rows:
+            cursor.executemany(
+                "UPDATE business_vocab SET example_sentence = %s, example_chinese = %s, example_status = %s "
+                "WHERE id = %s AND example_status = %s",
+                rows
+            )
+    return apply
+
+def run_enrich_worker(batch_size=20):
+    success_count = 0
+    while True:
+        batch = bizvocab_work_queue.claim_next("enrich", batch_size)
+        if not batch.words:
+            break
+        results = {}
+        try:
+            for vocab in batch.words:
+                # 多来源对冲查询：Tatoeba 慢或失败时由镜像/本地语料/词典补上
+                example_data = bizvocab_example_sources.find_example(vocab["term"])
+                if example_data:
+                    results[vocab["id"]] = example_data
+        except BaseException:
+            bizvocab_work_queue.release(batch)
+            raise
+        # 查不到例句的词不提交，认领保留到过期后再重试，本轮不会被再次拿到
+        committed = bizvocab_work_queue.commit(batch, apply=apply_examples(results), word_ids=list(results))
+        success_count += len(committed)
+    print(f"📊 worker {os.getpid()} 完成，共更新 {success_count} 个词汇")
+
+
+# -------------------------- 5. 主程序入口 --------------------------
 if __name__ == "__main__":
     print("=" * 60)
     print("📚 商务英语词汇例句补充工具（优化版：保留英文，中文缺失用默认值）")
     print("=" * 60)
-    update_vocab_with_examples()
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        # python business_vocab_example_query_v2.py worker [进程数]
+        bizvocab_schema.migrate()
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        procs = [multiprocessing.Process(target=run_enrich_worker) for _ in range(workers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+    else:
+        update_vocab_with_examples()
     print("\n👋 程序结束")
\ No newline at end of file
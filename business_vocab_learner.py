@@ -7,9 +7,11 @@ import datetime
 import fcntl
 import sys
 import mysql.connector
-import requests
 from dotenv import load_dotenv
 
+import bizvocab_http
+import bizvocab_learner
+
 SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
 
 # ---------- 配置 ----------
@@ -68,19 +70,8 @@ def fetch_new_words(limit=5):
 
 
 def mark_words_learned(word_ids):
-    if not word_ids:
-        return
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    sql = """
-        UPDATE business_vocab
-        SET learned=1, needs_review=1, learn_date=CURDATE()
-        WHERE id IN (%s)
-    """ % (",".join(["%s"] * len(word_ids)))
-    cursor.execute(sql, word_ids)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # 走 bizvocab_learner 的写路径：聚合表、事件日志与 business_vocab 在同一事务里更新
+    bizvocab_learner.mark_words_learned(word_ids)
 
 
 # ---------- 飞书卡片 ----------
@@ -129,7 +120,7 @@ def build_feishu_card(words):
 
 def send_to_feishu(card):
     try:
-        resp = requests.post(FEISHU_WEBHOOK, json=card, timeout=10)
+        resp = bizvocab_http.post(FEISHU_WEBHOOK, json=card, timeout=10)
         data = resp.json()
         if resp.status_code == 200 and data.get("StatusCode") == 0:
             log("飞书卡片发送成功")
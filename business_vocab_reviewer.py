@@ -8,9 +8,11 @@ import fcntl
 import sys
 import random
 import mysql.connector
-import requests
 from dotenv import load_dotenv
 
+import bizvocab_http
+import bizvocab_reviewer
+
 SH_TZ = datetime.timezone(datetime.timedelta(hours=8))  # 上海时区
 
 # ---------- 配置 ----------
@@ -85,20 +87,8 @@ def fetch_review_words(limit=10):
     return result[:limit]
 
 def mark_words_reviewed(word_ids):
-    if not word_ids:
-        return
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    sql = """
-        UPDATE business_vocab
-        SET review_count = review_count + 1,
-            last_review_date = CURDATE()
-        WHERE id IN (%s)
-    """ % (",".join(["%s"] * len(word_ids)))
-    cursor.execute(sql, word_ids)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    # 走 bizvocab_reviewer 的写路径：聚合表、事件日志与 business_vocab 在同一事务里更新
+    bizvocab_reviewer.mark_words_reviewed(word_ids)
 
 # ---------- 飞书卡片 ----------
 def build_review_card(words):
@@ -139,7 +129,7 @@ def build_review_card(words):
 
 def send_to_feishu(card):
     try:
-        resp = requests.post(FEISHU_WEBHOOK, json=card, timeout=10)
+        resp = bizvocab_http.post(FEISHU_WEBHOOK, json=card, timeout=10)
         data = resp.json()
         if resp.status_code == 200 and data.get("StatusCode") == 0:
             log("飞书复习卡片发送成功")
@@ -1,11 +1,14 @@
 # 本次爬虫来源 https://english.koolearn.com/20170619/821129.html
-import requests
-from bs4 import BeautifulSoup
-import time
 import mysql.connector
 from dotenv import load_dotenv
 import os
-import re
+import argparse
+
+import bizvocab_normalizer
+import bizvocab_sources
+import bizvocab_stats
+import bizvocab_tiering
+from bizvocab_page_archive import PageArchive, KIND_INDEX, KIND_VOCAB
 
 # 加载数据库配置
 load_dotenv()
@@ -16,108 +19,141 @@ DB_CONFIG = {
     'database': 'english_study'
 }
 
-# 主页面URL（包含A-Z分类链接）
-INDEX_URL = "https://english.koolearn.com/20170619/821129.html"
-# 爬取间隔（秒），避免请求过于频繁
-REQUEST_DELAY = 1
+# 站点描述（入口页、链接文字、内容区域、行语法、跳过规则）见 bizvocab_sources.SOURCES，
+# 这里只保留原有的函数入口，供归档重解析等旧调用方使用
+SOURCE = "koolearn_bec1"
+INDEX_URL = bizvocab_sources.KOOLEARN_INDEX
+# 本来源为 BEC 初级词汇，入库时写入 bec_level 供 bizvocab_curriculum 排序
+BEC_LEVEL = bizvocab_sources.SOURCES[SOURCE]["bec_level"]
+# 抓到的页面都写入压缩归档，解析逻辑改了之后用 bizvocab_page_archive.py reparse 离线重跑
+PAGE_ARCHIVE = PageArchive()
 
 def get_letter_links():
     """从主页面获取所有字母分类的词汇页面链接"""
+    adapter = bizvocab_sources.ADAPTERS[SOURCE]
+    bizvocab_sources.configure_politeness([adapter])
     try:
-        response = requests.get(INDEX_URL, headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Referer": "https://english.koolearn.com/"  # 新增Referer，模拟正常访问
-        })
-        response.encoding = 'utf-8'
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        letter_links = []
-        for a in soup.find_all('a', href=True):
-            if "BEC商务英语初级必备词汇：" in a.text:
-                full_url = a['href'] if a['href'].startswith('http') else f"https://english.koolearn.com{a['href']}"
-                letter_links.append((a.text.strip(), full_url))
-        
+        response = adapter.fetch(INDEX_URL, referer=adapter.referer)
+        PAGE_ARCHIVE.append(INDEX_URL, response.content, response.status_code, KIND_INDEX, source=SOURCE)
+        letter_links = adapter.discover(response.text)
         print(f"成功获取 {len(letter_links)} 个字母分类链接")
         return letter_links
-    
     except Exception as e:
         print(f"获取字母链接失败：{str(e)}")
         return []
 
 def parse_vocab_page(url):
-    """解析单个字母页面，提取词汇、词性、中文解释（核心修改处）"""
+    """抓取单个字母页面（原始页面先归档）后解析"""
+    adapter = bizvocab_sources.adapter_for_url(url) or bizvocab_sources.ADAPTERS[SOURCE]
+    bizvocab_sources.configure_politeness([adapter])
     try:
-        time.sleep(REQUEST_DELAY)
-        response = requests.get(url, headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Referer": INDEX_URL  # 关联主页面，避免反爬
-        })
-        response.encoding = 'utf-8'
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # -------------------------- 关键修改1：修改内容区域的class --------------------------
-        content_div = soup.find('div', class_='xqy_core_text')  # 原class是art-content，现在改成xqy_core_text
-        if not content_div:
-            print(f"页面 {url} 未找到内容区域（xqy_core_text）")
-            # 调试用：打印页面前1000字符，确认是否获取到页面内容
-            print(f"页面预览：{response.text[:1000]}")
-            return []
-        
-        # 提取文本并处理全角空格（页面里的空格是全角“　”，先换成半角“ ”）
-        text = content_div.get_text(separator='\n', strip=True)
-        text = text.replace('\u3000', ' ')  # 全角空格转半角，避免影响正则匹配
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        # -------------------------- 关键修改2：优化正则，适配页面格式 --------------------------
-        # 匹配规则：开头允许空格 + 单词 + 空格 + 词性（如n.、adv.） + . + 空格 + 中文解释
-        # 例："yield n. 有效产量"、"abroad adv. 在国外，出国"
-        pattern = re.compile(r'^(\w+)\s+([a-zA-Z.]+)\.\s+(.*)$')
-        
-        vocab_list = []
-        for line in lines:
-            # 跳过字母标题（如"A"、"B"、"Y-Z"）和无关内容（如介绍文字）
-            if re.match(r'^[A-Z\-]+$', line):  # 匹配纯字母或字母+横杠（如Y-Z）
-                continue
-            if "更多请点击" in line or "新东方在线" in line:  # 跳过广告/导航文字
-                continue
-            
-            match = pattern.match(line)
-            if match:
-                term = match.group(1).strip()
-                pos = match.group(2).strip()  # 词性（n、adv、v等）
-                translation = match.group(3).strip()
-                vocab_list.append({
-                    'term': term,
-                    'part_of_speech': pos,
-                    'translation': translation,
-                    'example_sentence': '暂无例句',  # 后续可补充
-                    'example_chinese': ''
-                })
-        
-        print(f"从 {url} 提取到 {len(vocab_list)} 个词汇")
-        # 调试用：打印前3个词汇，确认匹配正确
-        if vocab_list:
-            print(f"示例词汇：{vocab_list[:3]}")
-        return vocab_list
-    
+        response = adapter.fetch(url, referer=adapter.index_url)
+        PAGE_ARCHIVE.append(url, response.content, response.status_code, KIND_VOCAB, source=adapter.name)
+    except Exception as e:
+        print(f"抓取页面 {url} 失败：{str(e)}")
+        return []
+    return parse_vocab_html(response.text, url, source=adapter.name)
+
+def parse_vocab_html(html, url, verbose=True, source=None):
+    """按来源名（归档里记下的）或 URL 找到对应来源的适配器解析词汇页；不联网，也用于归档重解析"""
+    adapter = bizvocab_sources.adapter_for_url(url, source) or bizvocab_sources.ADAPTERS[SOURCE]
+    try:
+        vocab_list = adapter.parse(html)
     except Exception as e:
         print(f"解析页面 {url} 失败：{str(e)}")
         return []
+    if vocab_list is None:
+        print(f"页面 {url} 未找到内容区域（{adapter.name}）")
+        if verbose:
+            print(f"页面预览：{html[:1000]}")
+        return []
+    print(f"从 {url} 提取到 {len(vocab_list)} 个词汇")
+    if vocab_list and verbose:
+        print(f"示例词汇：{vocab_list[:3]}")
+    return vocab_list
+
+def _existing_rows(cursor, terms):
+    """terms 在热表/冷表里已有的行：{小写 term: (表名, id, term, 词性, 释义)}"""
+    terms = list({t for t in terms if t})
+    found = {}
+    for table in (bizvocab_tiering.HOT_TABLE, bizvocab_tiering.COLD_TABLE):
+        for i in range(0, len(terms), 1000):
+            chunk = terms[i:i + 1000]
+            cursor.execute(
+                f"SELECT id, term, part_of_speech, translation FROM {table} WHERE term IN (%s)"
+                % ",".join(["%s"] * len(chunk)), chunk
+            )
+            for wid, term, pos, translation in cursor.fetchall():
+                found[term.lower()] = (table, wid, term, pos, translation)
+    return found
 
-def save_to_database(vocab_list):
-    """将词汇数据保存到数据库"""
+def _update_existing(cursor, vocab_list, dry_run=False):
+    """已入库单词的词性、释义与解析结果不同时按解析结果更新（冷表里的也更新），返回有差异的
+    [(表名, 原 term, 原 (词性, 释义), 新 (词性, 释义))]；dry_run 时只比较不写库"""
+    existing = _existing_rows(cursor, [v['term'] for v in vocab_list])
+    diffs, hot, cold = [], [], []
+    for v in vocab_list:
+        row = existing.get(v['term'].lower())
+        if row is None:
+            continue
+        table, wid, term, pos, translation = row
+        new = (v['part_of_speech'], v['translation'])
+        if (pos, translation) == new:
+            continue
+        diffs.append((table, term, (pos, translation), new))
+        (hot if table == bizvocab_tiering.HOT_TABLE else cold).append(new + (wid,))
+    if dry_run:
+        return diffs
+    for table, rows in ((bizvocab_tiering.HOT_TABLE, hot), (bizvocab_tiering.COLD_TABLE, cold)):
+        if rows:
+            cursor.executemany(f"UPDATE {table} SET part_of_speech = %s, translation = %s WHERE id = %s", rows)
+    if cold:
+        # 冷表没有触发器，手动记一条变更，查词索引按 id 增量刷新时两层都会查
+        cursor.executemany(
+            "INSERT INTO vocab_changes (op, word_id, fields) VALUES ('update', %s, 'part_of_speech,translation')",
+            [(r[2],) for r in cold]
+        )
+    return diffs
+
+def save_to_database(vocab_list, source=None, bec_level=BEC_LEVEL, update=False, dry_run=False):
+    """词汇先经 bizvocab_normalizer 校验、规范化（拆分粘连词条、统一词性和标点），
+    合格的保存到数据库，不合格的写入隔离文件；返回新增行数。
+    默认只插入新词（INSERT IGNORE）；update=True 时已有单词（含冷表）的词性、释义也按本次结果更新，
+    并打印有差异的行，dry_run 时只打印差异不写库"""
+    if not vocab_list:
+        return 0
+    vocab_list, pipeline = bizvocab_normalizer.normalize(vocab_list, source=source)
+    print(pipeline.summary())
     if not vocab_list:
-        return
+        return 0
+    saved = 0
     
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor()
+        if update:
+            diffs = _update_existing(cursor, vocab_list, dry_run)
+            for table, term, old, new in diffs:
+                tier = "冷表" if table == bizvocab_tiering.COLD_TABLE else "热表"
+                print(f"  {tier} {term}: {old[0] or '-'} {old[1] or '-'} -> {new[0] or '-'} {new[1] or '-'}")
+            print(f"{'将更新' if dry_run else '已更新'} {len(diffs)} 个已有单词的词性/释义")
+            if dry_run:
+                conn.rollback()
+                return 0
+        # 已冻结到冷表的单词热表 uk_term 拦不住，先剔除
+        cold = bizvocab_tiering.cold_terms(cursor, [v['term'] for v in vocab_list])
+        if cold:
+            vocab_list = [v for v in vocab_list if v['term'].lower() not in cold]
+            print(f"跳过冷表中已有的 {len(cold)} 个单词")
+            if not vocab_list:
+                conn.commit()
+                return 0
         
         insert_sql = """
         INSERT IGNORE INTO business_vocab 
         (term, part_of_speech, translation, example_sentence, example_chinese, 
-         learned, needs_review, learn_date, review_count, last_review_date)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+         learned, needs_review, learn_date, review_count, last_review_date, bec_level)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         
         data = [
@@ -127,13 +163,16 @@ def save_to_database(vocab_list):
                 vocab['translation'],
                 vocab['example_sentence'],
                 vocab['example_chinese'],
-                False, False, None, 0, None
+                False, False, None, 0, None, bec_level
             ) for vocab in vocab_list
         ]
         
         cursor.executemany(insert_sql, data)
+        # INSERT IGNORE 的 rowcount 即真正新增的行数，同步计入进度聚合表
+        saved = cursor.rowcount
+        bizvocab_stats.on_words_inserted(cursor, saved)
         conn.commit()
-        print(f"成功保存 {cursor.rowcount} 条新词汇到数据库\n")
+        print(f"成功保存 {saved} 条新词汇到数据库\n")
     
     except mysql.connector.Error as err:
         print(f"数据库错误：{err}\n")
@@ -141,20 +180,19 @@ def save_to_database(vocab_list):
         if 'conn' in locals() and conn.is_connected():
             cursor.close()
             conn.close()
+    return saved
 
 def main():
-    letter_links = get_letter_links()
-    if not letter_links:
-        print("未获取到分类链接，程序退出")
-        return
-    
-    for letter, url in letter_links:
-        print(f"=== 开始爬取 {letter}：{url} ===")
-        vocab_list = parse_vocab_page(url)
-        if vocab_list:
-            save_to_database(vocab_list)
-    
+    """默认只爬原来的 BEC 初级来源；--source 可指定多个来源并发抓取（同主机共用礼貌限速）"""
+    parser = argparse.ArgumentParser(description="商务词汇爬虫")
+    parser.add_argument("--source", action="append", help=f"来源名，可重复；默认 {SOURCE}")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    adapters = bizvocab_sources.pick(args.source or [SOURCE])
+    results = bizvocab_sources.crawl(adapters, args.workers, archive=PAGE_ARCHIVE)
+    bizvocab_sources.print_stats(results)
     print("所有词汇爬取完成！")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
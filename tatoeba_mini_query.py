@@ -1,8 +1,11 @@
-import requests
+import os
+
+import bizvocab_http
+
+TATOEBA_API = os.getenv("TATOEBA_API", "https://tatoeba.org/en/api_v0/search")
 
 def query_one_example(word, from_lang="eng", to_lang="cmn"):
-    url = f"https://tatoeba.org/en/api_v0/search?from={from_lang}&query={word}&to={to_lang}"
-    resp = requests.get(url)
+    resp = bizvocab_http.get(TATOEBA_API, params={"from": from_lang, "query": word, "to": to_lang})
     if resp.status_code != 200:
         return None
 
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# 词汇来源适配：每个来源自带的样例页（fixture）要能发现链接、解析出期望的词条，不联网
+
+import pytest
+
+import bizvocab_normalizer
+import bizvocab_sources
+from bizvocab_page_archive import PageArchive, KIND_VOCAB, _parse_entry
+
+WITH_FIXTURE = [a for a in bizvocab_sources.ADAPTERS.values() if a.spec.get("fixture")]
+
+def rows(records):
+    return [[r["term"], r["part_of_speech"], r["translation"]] for r in records]
+
+@pytest.mark.parametrize("adapter", WITH_FIXTURE, ids=lambda a: a.name)
+def test_discover_links(adapter):
+    fixture = adapter.spec["fixture"]
+    if "index_html" not in fixture:
+        pytest.skip("来源给的是固定页面列表")
+    assert [url for _, url in adapter.discover(fixture["index_html"])] == fixture["links"]
+
+@pytest.mark.parametrize("adapter", WITH_FIXTURE, ids=lambda a: a.name)
+def test_parse_entries(adapter):
+    fixture = adapter.spec["fixture"]
+    records = adapter.parse(fixture["page_html"])
+    assert rows(bizvocab_normalizer.Pipeline().run(records)) == fixture["entries"]
+
+@pytest.mark.parametrize("adapter", WITH_FIXTURE, ids=lambda a: a.name)
+def test_missing_container(adapter):
+    if adapter.container_strainer is None:
+        pytest.skip("来源没有限定内容区域")
+    assert adapter.parse("<html><body><p>abroad adv. 在国外</p></body></html>") is None
+
+def test_selftest_passes():
+    assert bizvocab_sources.selftest(WITH_FIXTURE, repeat=1)
+
+def test_bec_levels():
+    levels = {a.name: a.bec_level for a in bizvocab_sources.ADAPTERS.values()}
+    assert levels["koolearn_bec1"] == 1
+    assert levels["koolearn_bec2"] == 2
+
+def test_adapter_for_url_prefers_recorded_source():
+    url = "https://english.koolearn.com/20170705/830001.html"
+    # 同主机的两个来源：没记来源名的旧归档取第一个匹配的
+    assert bizvocab_sources.adapter_for_url(url).name == "koolearn_bec1"
+    assert bizvocab_sources.adapter_for_url(url, "koolearn_bec2").name == "koolearn_bec2"
+    assert bizvocab_sources.adapter_for_url(url, "no_such_source").name == "koolearn_bec1"
+    assert bizvocab_sources.adapter_for_url("https://example.com/x.html") is None
+
+def test_reparse_uses_archived_source(tmp_path):
+    adapter = bizvocab_sources.ADAPTERS["koolearn_bec2"]
+    fixture = adapter.spec["fixture"]
+    url = fixture["links"][0]
+    archive = PageArchive(str(tmp_path))
+    entry = archive.append(url, fixture["page_html"], 200, KIND_VOCAB, source=adapter.name)
+    # 内容没变的重复抓取不再写
+    assert archive.append(url, fixture["page_html"], 200, KIND_VOCAB, source=adapter.name) is None
+    got_url, source, records = _parse_entry((str(tmp_path), tuple(entry)))
+    assert (got_url, source) == (url, "koolearn_bec2")
+    # 中级的行语法才认得词组；按 URL 会落到初级来源，漏掉 balance sheet
+    assert ["balance sheet", "n", "资产负债表"] in rows(records)